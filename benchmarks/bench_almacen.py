@@ -0,0 +1,191 @@
+"""
+Consolas de despacho concurrentes sobre el almacén compartido (sistema_experto.almacen).
+
+Siembra una región con --patrullas unidades y --historial asignaciones ya cerradas.
+Luego lanza --consolas procesos que consultan los cambios cada --intervalo-ms y
+--despachadores procesos que asignan y cierran patrullas al azar (--ritmo escrituras
+por segundo cada uno) con concurrencia optimista sobre la versión de su copia local,
+así que chocan entre sí.
+
+Mide la latencia de las consultas y de las escrituras y cuántos despachos perdieron
+por conflicto. Falla si:
+
+- el p95 de las consultas supera el presupuesto;
+- una consulta de cambios no usa índice;
+- alguna patrulla quedó con dos asignaciones activas;
+- alguna consola terminó con un estado distinto del almacén.
+
+Uso:
+    python benchmarks/bench_almacen.py --consolas 30 --despachadores 4 --segundos 10 --presupuesto-ms 20
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_experto.almacen import AlmacenDespacho
+
+REGION = 'bench'
+
+
+def aplicar(estado, cambios):
+    for p in cambios['patrullas']:
+        estado[p['id']] = (p['status'], p['version'], p['nodo_actual'])
+    return cambios['secuencia']
+
+
+def consola(ruta, segundos, intervalo_s, cola):
+    almacen = AlmacenDespacho(ruta)
+    estado, latencias, filas = {}, [], 0
+    desde = aplicar(estado, almacen.cambios(REGION, 0))
+    fin = time.time() + segundos
+    while time.time() < fin:
+        inicio = time.perf_counter()
+        cambios = almacen.cambios(REGION, desde)
+        desde = aplicar(estado, cambios)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        filas += len(cambios['patrullas']) + len(cambios['incidentes']) + len(cambios['asignaciones'])
+        time.sleep(max(0.0, intervalo_s - (time.perf_counter() - inicio)))
+    # Tras el último despacho (los despachadores terminan antes) la consola converge
+    time.sleep(1.0)
+    aplicar(estado, almacen.cambios(REGION, desde))
+    cola.put(('consola', latencias, filas, estado))
+
+
+def despachador(ruta, segundos, ritmo, semilla, cola):
+    almacen = AlmacenDespacho(ruta)
+    rng = random.Random(semilla)
+    estado = {}
+    desde = aplicar(estado, almacen.cambios(REGION, 0))
+    escrituras, ganados, conflictos, propias = [], 0, 0, []
+    fin = time.time() + segundos
+    while time.time() < fin:
+        time.sleep(rng.expovariate(ritmo))
+        desde = aplicar(estado, almacen.cambios(REGION, desde))
+        inicio = time.perf_counter()
+        if propias and rng.random() < 0.4:
+            patrulla = propias.pop(rng.randrange(len(propias)))
+            almacen.completar(REGION, [(patrulla['id'], patrulla['destino'], patrulla['asignacion'])])
+        else:
+            libres = [u for u, (status, _, _) in estado.items() if status == 'disponible']
+            if not libres:
+                continue
+            u = rng.choice(libres)
+            _, version, nodo = estado[u]
+            destino = rng.randrange(100000)
+            resultado = almacen.asignar(REGION, u, [nodo, destino], [0.0, 60.0], version=version,
+                                        incidente={'nodo': destino, 'lat': None, 'lon': None}, tipo_ruta='rapida')
+            if resultado is None:
+                conflictos += 1
+            else:
+                ganados += 1
+                propias.append({'id': u, 'destino': destino, 'asignacion': resultado['asignacion']})
+        escrituras.append((time.perf_counter() - inicio) * 1000)
+    cola.put(('despachador', escrituras, ganados, conflictos))
+
+
+def sembrar(almacen, patrullas, historial):
+    almacen.registrar_patrullas(REGION, [{'id': f"U-{i:04d}", 'nodo_actual': i, 'status': 'disponible'}
+                                         for i in range(patrullas)])
+    # Historial cerrado: las consultas de cambios no deben recorrerlo
+    ids = [f"U-{i:04d}" for i in range(patrullas)]
+    for inicio in range(0, historial, patrullas):
+        for u in ids[:min(patrullas, historial - inicio)]:
+            resultado = almacen.asignar(REGION, u, [0, 1], [0.0, 60.0], incidente={'nodo': 1, 'lat': None, 'lon': None})
+            almacen.completar(REGION, [(u, 1, resultado['asignacion'])])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patrullas", type=int, default=300)
+    parser.add_argument("--historial", type=int, default=20000, help="Asignaciones cerradas previas")
+    parser.add_argument("--consolas", type=int, default=30)
+    parser.add_argument("--despachadores", type=int, default=4)
+    parser.add_argument("--ritmo", type=float, default=20, help="Escrituras por segundo de cada despachador")
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--intervalo-ms", type=float, default=200, help="Periodo de consulta de cada consola")
+    parser.add_argument("--presupuesto-ms", type=float, default=20)
+    parser.add_argument("--base", help="Archivo SQLite (por defecto, uno temporal)")
+    parser.add_argument("--salida", help="JSON con los resultados")
+    args = parser.parse_args()
+
+    ruta = args.base or os.path.join(tempfile.mkdtemp(), "despacho.sqlite3")
+    almacen = AlmacenDespacho(ruta)
+    inicio = time.perf_counter()
+    sembrar(almacen, args.patrullas, args.historial)
+    print(f"Sembradas {args.patrullas} patrullas y {args.historial} asignaciones en {time.perf_counter() - inicio:.1f} s")
+
+    fallas = []
+    conexion = almacen._conexion()
+    for tabla in ('patrullas', 'incidentes', 'asignaciones'):
+        plan = conexion.execute(f"EXPLAIN QUERY PLAN SELECT * FROM {tabla} WHERE region = ? AND cambio > ?",
+                                (REGION, 0)).fetchall()
+        if not any('INDEX' in fila[-1] for fila in plan):
+            fallas.append(f"la consulta de cambios de {tabla} no usa índice: {plan}")
+
+    cola = multiprocessing.Queue()
+    procesos = [multiprocessing.Process(target=consola, args=(ruta, args.segundos, args.intervalo_ms / 1000, cola))
+                for _ in range(args.consolas)]
+    procesos += [multiprocessing.Process(target=despachador, args=(ruta, args.segundos * 0.9, args.ritmo, semilla, cola))
+                 for semilla in range(args.despachadores)]
+    for proceso in procesos:
+        proceso.start()
+    resultados_procesos = [cola.get() for _ in procesos]
+    for proceso in procesos:
+        proceso.join()
+
+    consultas = [x for r in resultados_procesos if r[0] == 'consola' for x in r[1]]
+    escrituras = [x for r in resultados_procesos if r[0] == 'despachador' for x in r[1]]
+    ganados = sum(r[2] for r in resultados_procesos if r[0] == 'despachador')
+    conflictos = sum(r[3] for r in resultados_procesos if r[0] == 'despachador')
+    filas = [r[2] for r in resultados_procesos if r[0] == 'consola']
+    resultados = {
+        'consolas': args.consolas,
+        'despachadores': args.despachadores,
+        'consultas': len(consultas),
+        'consulta_p50_ms': round(float(np.percentile(consultas, 50)), 2),
+        'consulta_p95_ms': round(float(np.percentile(consultas, 95)), 2),
+        'filas_por_consulta': round(float(np.mean(filas)) / max(len(consultas) / args.consolas, 1), 1),
+        'escritura_p50_ms': round(float(np.percentile(escrituras, 50)), 2),
+        'escritura_p95_ms': round(float(np.percentile(escrituras, 95)), 2),
+        'despachos': ganados,
+        'conflictos': conflictos,
+    }
+    print(f"{args.consolas} consolas: {len(consultas)} consultas, p50 {resultados['consulta_p50_ms']:.2f} ms, "
+          f"p95 {resultados['consulta_p95_ms']:.2f} ms, {resultados['filas_por_consulta']:.1f} filas por consulta")
+    print(f"{args.despachadores} despachadores: {len(escrituras)} escrituras, p50 {resultados['escritura_p50_ms']:.2f} ms, "
+          f"p95 {resultados['escritura_p95_ms']:.2f} ms; {ganados} despachos, {conflictos} rechazados por conflicto")
+
+    dobles = conexion.execute("SELECT patrulla, COUNT(*) FROM asignaciones WHERE region = ? AND estado = 'activa' "
+                              "GROUP BY patrulla HAVING COUNT(*) > 1", (REGION,)).fetchall()
+    if dobles:
+        fallas.append(f"{len(dobles)} patrullas con más de una asignación activa")
+    final = {p['id']: (p['status'], p['version'], p['nodo_actual']) for p in almacen.patrullas(REGION)}
+    divergentes = sum(r[3] != final for r in resultados_procesos if r[0] == 'consola')
+    if divergentes:
+        fallas.append(f"{divergentes} consolas no convergieron al estado del almacén")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+    for falla in fallas:
+        print(f"❌ {falla}")
+    if resultados['consulta_p95_ms'] > args.presupuesto_ms:
+        print(f"❌ p95 de {resultados['consulta_p95_ms']:.2f} ms por consulta, sobre el presupuesto de "
+              f"{args.presupuesto_ms:.0f} ms")
+    if fallas or resultados['consulta_p95_ms'] > args.presupuesto_ms:
+        sys.exit(1)
+    print(f"✅ p95 de {resultados['consulta_p95_ms']:.2f} ms por consulta con {args.consolas} consolas, "
+          f"dentro de {args.presupuesto_ms:.0f} ms; todas convergieron")
+
+
+if __name__ == "__main__":
+    main()
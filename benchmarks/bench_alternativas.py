@@ -0,0 +1,86 @@
+"""
+Costo y calidad de las rutas alternativas (sistema_experto.alternativas).
+
+Para pares origen–destino al azar mide lo que tarda generar las alternativas
+(dos búsquedas y la selección de mesetas) frente a una búsqueda A* simple, y
+reporta cuántas se encuentran con su estiramiento y solape. Falla si la mediana
+supera --factor-max búsquedas simples.
+
+Uso:
+    python benchmarks/bench_alternativas.py --instantanea instantanea --pares 200 --factor-max 2
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_experto.alternativas import NUM_ALTERNATIVAS, rutas_alternativas
+from sistema_experto.costos import calcular_costos
+from sistema_experto.grafo import GrafoEmpaquetado
+from sistema_experto.ruteo import a_estrella
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instantanea", default="instantanea")
+    parser.add_argument("--pares", type=int, default=100)
+    parser.add_argument("--k", type=int, default=NUM_ALTERNATIVAS)
+    parser.add_argument("--nivel", default="trafico_alto")
+    parser.add_argument("--clima", default="lluvia")
+    parser.add_argument("--factor-max", type=float, default=2.0, help="Tiempo máximo en búsquedas A* simples")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="JSON con los resultados")
+    args = parser.parse_args()
+
+    grafo = GrafoEmpaquetado.cargar(args.instantanea, mapear=True)
+    mu, _ = calcular_costos(grafo, args.nivel, args.clima)
+    rng = np.random.default_rng(args.semilla)
+    # La primera búsqueda carga SciPy y queda fuera de la medición
+    rutas_alternativas(grafo, 0, grafo.num_nodos - 1, mu, args.k)
+
+    simples, generacion, encontradas, estiramientos, solapes = [], [], [], [], []
+    while len(simples) < args.pares:
+        origen, destino = (int(n) for n in rng.integers(0, grafo.num_nodos, 2))
+        inicio = time.perf_counter()
+        rapida = a_estrella(grafo, origen, destino, mu)
+        simples.append((time.perf_counter() - inicio) * 1000)
+        if rapida is None:
+            simples.pop()
+            continue
+        inicio = time.perf_counter()
+        alternativas = rutas_alternativas(grafo, origen, destino, mu, args.k)
+        generacion.append((time.perf_counter() - inicio) * 1000)
+        encontradas.append(len(alternativas))
+        estiramientos += [a['estiramiento'] for a in alternativas]
+        solapes += [a['solape'] for a in alternativas]
+
+    factor = float(np.median(generacion) / np.median(simples))
+    resultados = {
+        'pares': args.pares,
+        'k': args.k,
+        'a_estrella_p50_ms': round(float(np.median(simples)), 2),
+        'alternativas_p50_ms': round(float(np.median(generacion)), 2),
+        'alternativas_p95_ms': round(float(np.percentile(generacion, 95)), 2),
+        'factor': round(factor, 2),
+        'encontradas': np.bincount(encontradas, minlength=args.k + 1).tolist(),
+        'estiramiento_p50': round(float(np.median(estiramientos)), 3) if estiramientos else None,
+        'solape_p50': round(float(np.median(solapes)), 3) if solapes else None,
+    }
+    print(json.dumps(resultados, ensure_ascii=False, indent=1))
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+    if factor > args.factor_max:
+        print(f"❌ Las alternativas tardan {factor:.1f} búsquedas simples (máximo {args.factor_max:.1f})")
+        sys.exit(1)
+    print(f"✅ {args.k} alternativas en {factor:.1f} búsquedas simples; "
+          f"{np.mean(np.asarray(encontradas) == args.k):.0%} de los pares con las {args.k}")
+
+
+if __name__ == "__main__":
+    main()
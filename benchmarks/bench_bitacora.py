@@ -0,0 +1,241 @@
+"""
+Bitácora de despacho (sistema_experto.bitacora) y su reproducción (sistema_experto.reproduccion).
+
+Simula una noche intensa: --incidentes incidentes en --horas horas con --patrullas
+unidades en una flota en memoria con reloj simulado. Cada incidente se decide con
+el motor (ranking por ETA p90 de todas las disponibles y ruta de un tipo al azar
+entre rápida, segura y alternativa; una fracción llega en lotes) y se despacha por
+la flota con la bitácora, que rota segmentos pequeños (--max-kib) y los comprime.
+Cada tanto se cierra o reabre una calle, como desde el mapa.
+
+Luego reproduce la bitácora dos veces con el mismo motor y una con otro percentil.
+Falla si:
+
+- falta algún evento o algún segmento quedó sin comprimir;
+- la reproducción con el mismo motor encuentra diferencias o las dos huellas no
+  coinciden (no sería determinista);
+- con otro percentil no aparece ninguna diferencia (la comparación no detectaría cambios);
+- el p95 de la latencia por decisión reproducida supera el presupuesto.
+
+Uso:
+    python benchmarks/bench_bitacora.py --instantanea instantanea --incidentes 2000 --patrullas 60 --presupuesto-ms 50
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_experto.bitacora import BitacoraDespacho, leer_bitacora, segmentos
+from sistema_experto.costos import nivel_trafico_en
+from sistema_experto.despacho import PERCENTIL_ETA, despachar_lote, eta_percentil
+from sistema_experto.fiabilidad import PLAZO_MIN
+from sistema_experto.grafo import GrafoEmpaquetado
+from sistema_experto.reproduccion import Motor, reproducir
+from sistema_experto.seguimiento import Flota
+from sistema_experto.simulador import generar_incidentes
+
+REGION = 'bench'
+TIPOS_RUTA = ['rapida', 'rapida', 'segura', 'alternativa_1']
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def tiempos_en(matriz, ruta):
+    ruta = np.asarray(ruta)
+    if len(ruta) < 2:
+        return np.zeros(len(ruta))
+    return np.concatenate([[0.0], np.cumsum(np.asarray(matriz[ruta[:-1], ruta[1:]]).ravel())])
+
+
+def simular(grafo, motor, flota, reloj, args, rng):
+    """
+    Decide y despacha los incidentes de la noche. Retorna (latencias de despacho en
+    ms, despachos, lotes).
+    """
+    tiempos, nodos = generar_incidentes(grafo, args.incidentes, args.horas, args.hora_inicio, semilla=args.semilla)
+    cierres, latencias, despachos, lotes = [], [], 0, 0
+    i = 0
+    while i < len(tiempos):
+        reloj.ahora = float(tiempos[i])
+        flota.avanzar()
+        if rng.random() < args.cambio_cierres:
+            if cierres and rng.random() < 0.5:
+                cierres.pop(0)
+            else:
+                e = int(rng.integers(grafo.num_arcos))
+                cierres.append(sorted([int(grafo.origen[e]), int(grafo.destino[e])]))
+        perfil = {'nivel': nivel_trafico_en((args.hora_inicio + reloj.ahora / 3600) % 24), 'clima': 'despejado',
+                  'semilla': 0, 'k': 1.5, 'percentil': PERCENTIL_ETA, 'plazo_s': PLAZO_MIN * 60,
+                  'cierres': list(cierres)}
+        costos = motor.costos(REGION, perfil)
+        matriz = costos['matrices'][0]
+        disponibles = [p for p in flota.patrullas() if p['status'] == 'disponible']
+        candidatas = [[p['id'], p['nodo_actual']] for p in disponibles]
+        if not disponibles:
+            i += 1
+            continue
+
+        if rng.random() < args.fraccion_lote:
+            grupo = [int(n) for n in nodos[i:i + 3]]
+            lote = f"lote-{i}"
+            for indice, asignacion in enumerate(despachar_lote(grafo, costos['mu'], disponibles, grupo, matriz)):
+                if asignacion['patrulla'] is None:
+                    continue
+                origen = next(p['nodo_actual'] for p in disponibles if p['id'] == asignacion['patrulla'])
+                ruta = motor.ruta(costos, 'rapida', origen, grupo[indice], perfil)
+                decision = {'lote': lote, 'indice': indice, 'incidentes': grupo, 'candidatas': candidatas,
+                            'ranking': [[asignacion['patrulla'], asignacion['eta'], None, None]], 'perfil': perfil}
+                inicio = time.perf_counter()
+                flota.despachar(asignacion['patrulla'], ruta, tiempos_en(matriz, ruta), version=None,
+                                incidente={'nodo': grupo[indice], 'lat': None, 'lon': None}, tipo_ruta='lote',
+                                decision=decision)
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                despachos += 1
+            lotes += 1
+            i += len(grupo)
+            continue
+
+        nodo = int(nodos[i])
+        eta, media, desviacion = eta_percentil(grafo, costos['mu'], costos['sigma'],
+                                               [p['nodo_actual'] for p in disponibles], nodo,
+                                               matrices=costos['matrices'])
+        orden = [j for j in np.argsort(eta, kind='stable') if np.isfinite(eta[j])]
+        if orden:
+            elegida = disponibles[orden[0]]
+            tipo = TIPOS_RUTA[int(rng.integers(len(TIPOS_RUTA)))]
+            ruta = motor.ruta(costos, tipo, elegida['nodo_actual'], nodo, perfil)
+            if ruta is None:
+                tipo, ruta = 'rapida', motor.ruta(costos, 'rapida', elegida['nodo_actual'], nodo, perfil)
+            # Como la consola: solo las más cercanas llegan al ranking registrado
+            ranking = [[disponibles[j]['id'], float(eta[j]), float(media[j]), float(desviacion[j])]
+                       for j in orden[:args.ranking]]
+            decision = {'reportado': reloj.ahora, 'candidatas': candidatas, 'ranking': ranking, 'perfil': perfil}
+            inicio = time.perf_counter()
+            flota.despachar(elegida['id'], ruta, tiempos_en(matriz, ruta), version=elegida['version'],
+                            incidente={'nodo': nodo, 'lat': float(grafo.lat[nodo]), 'lon': float(grafo.lon[nodo])},
+                            tipo_ruta=tipo, decision=decision)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            despachos += 1
+        i += 1
+    # Todas terminan su ruta
+    reloj.ahora += 24 * 3600
+    flota.avanzar()
+    return latencias, despachos, lotes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instantanea", default="instantanea")
+    parser.add_argument("--incidentes", type=int, default=2000)
+    parser.add_argument("--horas", type=float, default=8)
+    parser.add_argument("--hora-inicio", type=float, default=18)
+    parser.add_argument("--patrullas", type=int, default=60)
+    parser.add_argument("--fraccion-lote", type=float, default=0.1, help="Probabilidad de que llegue un lote de 3")
+    parser.add_argument("--cambio-cierres", type=float, default=0.02, help="Probabilidad de cerrar o reabrir una calle")
+    parser.add_argument("--ranking", type=int, default=8, help="Patrullas del ranking registrado")
+    parser.add_argument("--max-kib", type=int, default=512, help="Tamaño de cada segmento antes de rotar")
+    parser.add_argument("--percentil-alternativo", type=float, default=50)
+    parser.add_argument("--presupuesto-ms", type=float, default=50, help="p95 por decisión reproducida")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--carpeta", help="Carpeta de la bitácora (por defecto, una temporal)")
+    parser.add_argument("--salida", help="JSON con los resultados")
+    args = parser.parse_args()
+
+    grafo = GrafoEmpaquetado.cargar(args.instantanea, mapear=True)
+    rng = np.random.default_rng(args.semilla)
+    carpeta = args.carpeta or tempfile.mkdtemp(prefix="bitacora-")
+    bitacora = BitacoraDespacho(carpeta, max_bytes=args.max_kib * 1024)
+    reloj = Reloj()
+    flota = Flota(grafo, reloj=reloj, region=REGION, bitacora=bitacora)
+    nodos = rng.choice(grafo.num_nodos, size=args.patrullas, replace=False)
+    flota.registrar([{'id': f"U-{i + 1:03d}", 'nodo_actual': int(n), 'status': 'disponible'}
+                     for i, n in enumerate(nodos)])
+
+    motor = Motor(lambda region: grafo)
+    inicio = time.perf_counter()
+    latencias, despachos, lotes = simular(grafo, motor, flota, reloj, args, rng)
+    simulacion_s = time.perf_counter() - inicio
+    bitacora.cerrar()
+
+    fallas = []
+    archivos = segmentos(carpeta)
+    sin_comprimir = [ruta for ruta in archivos if not ruta.endswith('.gz')] + glob.glob(os.path.join(carpeta, '*.tmp'))
+    if sin_comprimir:
+        fallas.append(f"{len(sin_comprimir)} segmentos sin comprimir: {sin_comprimir[:3]}")
+    comprimidos = sum(os.path.getsize(ruta) for ruta in archivos)
+    eventos = list(leer_bitacora(carpeta))
+    crudos = sum(len(json.dumps(e, ensure_ascii=False, separators=(',', ':')).encode('utf-8')) + 1 for e in eventos)
+    por_tipo = {tipo: sum(e['tipo'] == tipo for e in eventos) for tipo in ('segmento', 'despacho', 'estado')}
+    llegadas = sum(e['tipo'] == 'estado' and e['motivo'] == 'llegada' for e in eventos)
+    if por_tipo['despacho'] != despachos:
+        fallas.append(f"{despachos} despachos y {por_tipo['despacho']} eventos de despacho en la bitácora")
+    if llegadas != despachos:
+        fallas.append(f"{despachos} despachos y {llegadas} llegadas en la bitácora")
+    if any(a['t'] > b['t'] for a, b in zip(eventos, eventos[1:])):
+        fallas.append("la lectura de la bitácora no está ordenada por instante")
+
+    resultados = {
+        'incidentes': args.incidentes,
+        'patrullas': args.patrullas,
+        'despachos': despachos,
+        'lotes': lotes,
+        'eventos': por_tipo,
+        'segmentos': len(archivos),
+        'bytes_por_despacho': round(crudos / max(despachos, 1)),
+        'bytes_comprimidos_por_despacho': round(comprimidos / max(despachos, 1)),
+        'despacho_p50_ms': round(float(np.percentile(latencias, 50)), 3),
+        'despacho_p95_ms': round(float(np.percentile(latencias, 95)), 3),
+        'simulacion_s': round(simulacion_s, 1),
+    }
+    print(f"{despachos} despachos ({lotes} lotes) en {len(archivos)} segmentos: "
+          f"{resultados['bytes_por_despacho']} B por despacho, {resultados['bytes_comprimidos_por_despacho']} B "
+          f"comprimidos; despacho con bitácora p95 {resultados['despacho_p95_ms']:.2f} ms")
+
+    corridas = {}
+    for nombre, percentil in (('mismo_motor', None), ('repeticion', None), ('otro_percentil', args.percentil_alternativo)):
+        corridas[nombre] = reproducir(leer_bitacora(carpeta), Motor(lambda region: grafo, percentil))
+        resumen = corridas[nombre]
+        cambios = ', '.join(f"{d} {n}" for d, n in resumen['diferencias'].items() if n) or 'ninguna'
+        print(f"{nombre}: {resumen['decisiones']} decisiones a {resumen['decisiones_por_s']:.0f}/s, "
+              f"p50 {resumen['latencia_p50_ms']:.1f} ms, p95 {resumen['latencia_p95_ms']:.1f} ms; "
+              f"diferencias: {cambios}; {resumen['incompletas']} incompletas")
+        resultados[nombre] = {clave: valor for clave, valor in resumen.items() if clave != 'ejemplos'}
+
+    mismo = corridas['mismo_motor']
+    if mismo['con_diferencias'] or mismo['incompletas']:
+        fallas.append(f"con el mismo motor {mismo['con_diferencias']} decisiones difieren y {mismo['incompletas']} "
+                      f"no se pudieron reproducir; p. ej. {json.dumps(mismo['ejemplos'][:1], ensure_ascii=False)[:400]}")
+    if mismo['huella'] != corridas['repeticion']['huella']:
+        fallas.append("dos reproducciones con el mismo motor dieron huellas distintas")
+    if not corridas['otro_percentil']['con_diferencias']:
+        fallas.append(f"con percentil {args.percentil_alternativo:g} no se detectó ninguna diferencia")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+    for falla in fallas:
+        print(f"❌ {falla}")
+    if mismo['latencia_p95_ms'] > args.presupuesto_ms:
+        print(f"❌ p95 de {mismo['latencia_p95_ms']:.1f} ms por decisión reproducida, sobre el presupuesto de "
+              f"{args.presupuesto_ms:.0f} ms")
+    if fallas or mismo['latencia_p95_ms'] > args.presupuesto_ms:
+        sys.exit(1)
+    print(f"✅ {mismo['decisiones']} decisiones reproducidas sin diferencias a {mismo['decisiones_por_s']:.0f}/s "
+          f"(p95 {mismo['latencia_p95_ms']:.1f} ms), huella estable")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Reproducción (sistema_experto.reproduccion) de una bitácora escrita por el mapa.
+
+Arma el HTML del mapa como la app (nodos con su zona, arcos con los factores de zona
+de --semilla-costos, ETAs de la matriz de zonas por patrulla y seguimiento en vivo
+contra una flota con bitácora) y ejecuta su script en Node con Leaflet y el DOM
+reemplazados por objetos vacíos. Para cada incidente hace clic en el mapa y
+asigna la patrulla recomendada con una ruta de cada tipo, como lo haría un operador;
+el mapa envía el despacho (con su decisión) al servidor de seguimiento, que lo
+escribe en la bitácora.
+
+Luego reproduce la bitácora. Falla si:
+
+- el mapa no registró cada despacho que hizo, o alguno sin las patrullas evaluadas o
+  sin la semilla de los costos (los incidentes que ninguna búsqueda A* del mapa alcanza
+  dentro de su límite de nodos no se despachan y solo se cuentan);
+- la reproducción encuentra diferencias o decisiones incompletas;
+- al quitar la patrulla elegida de las evaluadas la reproducción no elige otra (no
+  estaría respetando la preselección de la consola);
+- con otra semilla no aparece ninguna diferencia (la comparación no detectaría que la
+  consola usó otros costos).
+
+Requiere Node.js (node en el PATH).
+
+Uso:
+    python benchmarks/bench_bitacora_mapa.py --instantanea instantanea --patrullas 8 --incidentes 6
+"""
+import argparse
+import copy
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_experto.bitacora import BitacoraDespacho, leer_bitacora
+from sistema_experto.costos import NIVELES_TRAFICO
+from sistema_experto.despacho import MARGEN_PRESELECCION_S, MAX_CANDIDATOS_ASTAR
+from sistema_experto.grafo import GrafoEmpaquetado
+from sistema_experto.mapa import datos_arcos, datos_nodos, generar_mapa_html
+from sistema_experto.matriz_zonas import MatrizTiempos, precalcular_matriz, zonas_rejilla
+from sistema_experto.reproduccion import Motor, reproducir
+from sistema_experto.seguimiento import Flota, iniciar_servidor_seguimiento
+
+REGION = 'bench'
+TIPOS_RUTA = ['rapida', 'segura', 'a_tiempo', 'alternativa_1']
+
+# Ejecuta el script del mapa en un contexto de vm cuyo objeto global hace de window
+OPERADOR_JS = r"""
+const vm = require('vm');
+const fs = require('fs');
+const guion = fs.readFileSync(process.argv[2], 'utf8');
+const incidentes = JSON.parse(fs.readFileSync(process.argv[3], 'utf8'));
+
+// Cualquier propiedad, llamada o construcción de un objeto vacío da otro objeto vacío
+function vacio(propias = {}) {
+    return new Proxy(function () {}, {
+        get: (_, p) => p in propias ? propias[p] : p === Symbol.toPrimitive ? () => '' : p === 'then' ? undefined : vacio(),
+        set: () => true,
+        apply: () => vacio(),
+        construct: () => vacio(),
+    });
+}
+
+function latLng(lat, lng) {
+    if (Array.isArray(lat)) [lat, lng] = lat;
+    return {
+        lat, lng,
+        distanceTo(otro) {
+            const rad = Math.PI / 180;
+            const a = Math.sin((otro.lat - lat) * rad / 2) ** 2 +
+                Math.cos(lat * rad) * Math.cos(otro.lat * rad) * Math.sin((otro.lng - lng) * rad / 2) ** 2;
+            return 2 * 6371000 * Math.asin(Math.sqrt(a));
+        },
+    };
+}
+
+// El mapa de Leaflet guarda sus manejadores para poder hacer clic como el operador
+const manejadores = {};
+const mapa = vacio({ setView: () => mapa, on: (evento, f) => { manejadores[evento] = f; return mapa; } });
+
+const despachos = [], intervalos = [];
+const contexto = {
+    L: vacio({ latLng, map: () => mapa }),
+    document: vacio(),
+    localStorage: { getItem: () => null, setItem() {}, removeItem() {} },
+    navigator: { sendBeacon: () => true },
+    fetch: (url, opciones) => {
+        const respuesta = fetch(url, opciones);
+        if (String(url).includes('/despacho')) despachos.push(respuesta.then(r => r.status));
+        return respuesta;
+    },
+    setInterval: (...argumentos) => { const id = setInterval(...argumentos); intervalos.push(id); return id; },
+    performance, setTimeout, clearTimeout, clearInterval,
+    console: { log() {}, info() {}, warn: console.error, error: console.error },
+};
+contexto.window = contexto;
+vm.createContext(contexto);
+vm.runInContext(guion, contexto);
+let procesadas = 0;
+const procesar = contexto.procesarEmergencia;
+contexto.procesarEmergencia = coordenadas => { procesar(coordenadas); procesadas++; };
+
+const esperar = ms => new Promise(resolver => setTimeout(resolver, ms));
+
+(async () => {
+    for (const [i, { nodo, lat, lon, tipo }] of incidentes.entries()) {
+        manejadores.click({ latlng: latLng(lat, lon) });
+        while (procesadas <= i) await esperar(20);
+        // Sin decisión, ninguna búsqueda A* del mapa llegó al incidente dentro de su límite
+        if (vm.runInContext('decisionDespacho === null', contexto)) {
+            console.log(JSON.stringify({ indice: i, sin_ruta: true }));
+            continue;
+        }
+        let listo = false;
+        for (let intento = 0; intento < 600 && !listo; intento++) {
+            await esperar(20);
+            listo = vm.runInContext(
+                `decisionDespacho !== null && rutasActivas.rapida !== undefined && rutasActivas.rapida.destino === ${nodo}`,
+                contexto);
+        }
+        if (!listo) {
+            console.log(JSON.stringify({ indice: i, error: 'el mapa no mostró las rutas de la recomendada' }));
+            continue;
+        }
+        const [patrulla, tipoRuta] = vm.runInContext(
+            `[decisionDespacho.ranking[0][0], rutasActivas['${tipo}'] ? '${tipo}' : 'rapida']`, contexto);
+        vm.runInContext(`asignarPatrulla('${patrulla}', '${tipoRuta}')`, contexto);
+        const estado = await despachos[despachos.length - 1];
+        console.log(JSON.stringify({ indice: i, patrulla, tipo_ruta: tipoRuta, estado }));
+    }
+    // Sin consultas en curso, las conexiones persistentes se cierran limpiamente
+    intervalos.forEach(clearInterval);
+    await esperar(500);
+    process.exit(0);
+})();
+"""
+
+
+def html_mapa(grafo, matriz, patrullas, nivel, seguimiento, args):
+    """
+    HTML del mapa con los datos que le pasa la app.
+    """
+    matriz_eta = matriz.matriz(nivel)
+    eta_zonas = {p['id']: [round(float(t), 1) if np.isfinite(t) else None
+                           for t in matriz_eta[matriz.zona_de_nodo[p['nodo_actual']]]] for p in patrullas}
+    return generar_mapa_html(
+        json.dumps(datos_nodos(grafo, matriz.zona_de_nodo)), json.dumps(datos_arcos(grafo, args.semilla_costos)),
+        patrullas, nivel, 'despejado', 1.5, '22:00', modo_incidente_activo=True, eta_zonas=eta_zonas,
+        seguimiento=seguimiento, semilla_costos=args.semilla_costos, max_candidatos_astar=args.max_candidatos,
+        margen_preseleccion_s=args.margen_s,
+    )
+
+
+def operar(html, incidentes, carpeta, timeout_s):
+    """
+    Ejecuta el script del mapa en Node y despacha los incidentes. Retorna un
+    diccionario por incidente ({'patrulla', 'tipo_ruta', 'estado'}, {'sin_ruta'} o {'error'}).
+    """
+    guion = re.findall(r'<script>(.*?)</script>', html, re.S)[-1]
+    rutas = {nombre: os.path.join(carpeta, nombre) for nombre in ('mapa.js', 'incidentes.json', 'operador.js')}
+    for nombre, contenido in (('mapa.js', guion), ('incidentes.json', json.dumps(incidentes)),
+                              ('operador.js', OPERADOR_JS)):
+        with open(rutas[nombre], 'w', encoding='utf-8') as f:
+            f.write(contenido)
+    proceso = subprocess.run(['node', rutas['operador.js'], rutas['mapa.js'], rutas['incidentes.json']],
+                             capture_output=True, text=True, timeout=timeout_s)
+    if proceso.stderr.strip():
+        print(proceso.stderr.strip()[-2000:], file=sys.stderr)
+    return [json.loads(linea) for linea in proceso.stdout.splitlines() if linea.startswith('{')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instantanea", default="instantanea")
+    parser.add_argument("--patrullas", type=int, default=8)
+    parser.add_argument("--incidentes", type=int, default=6)
+    parser.add_argument("--nivel", default="trafico_alto", choices=NIVELES_TRAFICO)
+    parser.add_argument("--semilla-costos", type=int, default=0, help="Semilla de los factores de zona del mapa")
+    parser.add_argument("--max-candidatos", type=int, default=MAX_CANDIDATOS_ASTAR,
+                        help="Patrullas preseleccionadas por zona (0 = todas)")
+    parser.add_argument("--margen-s", type=float, default=MARGEN_PRESELECCION_S, help="Margen de la preselección")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=300, help="Segundos para el script del mapa")
+    args = parser.parse_args()
+
+    if shutil.which('node') is None:
+        print("❌ Se necesita Node.js (node en el PATH) para ejecutar el script del mapa")
+        sys.exit(1)
+    if args.incidentes > args.patrullas:
+        parser.error("cada incidente ocupa una patrulla: --incidentes no puede superar a --patrullas")
+
+    grafo = GrafoEmpaquetado.cargar(args.instantanea, mapear=True)
+    rng = np.random.default_rng(args.semilla)
+    carpeta = tempfile.mkdtemp(prefix="bitacora-mapa-")
+
+    # Matriz de zonas para la preselección del mapa, solo del nivel que se usa
+    zona_de_nodo, rejilla = zonas_rejilla(grafo)
+    precalcular_matriz(grafo, os.path.join(carpeta, 'zonas'), zona_de_nodo, rejilla, niveles=[args.nivel])
+    matriz = MatrizTiempos(os.path.join(carpeta, 'zonas'))
+
+    # El mapa no acepta el nodo 0 como incidente
+    nodos = rng.choice(np.arange(1, grafo.num_nodos), size=args.patrullas + args.incidentes, replace=False)
+    patrullas = [{'id': f"U-{i + 1:02d}", 'nodo_actual': int(n), 'status': 'disponible'}
+                 for i, n in enumerate(nodos[:args.patrullas])]
+    incidentes = [{'nodo': int(n), 'lat': float(grafo.lat[n]), 'lon': float(grafo.lon[n]),
+                   'tipo': TIPOS_RUTA[i % len(TIPOS_RUTA)]} for i, n in enumerate(nodos[args.patrullas:])]
+
+    bitacora = BitacoraDespacho(os.path.join(carpeta, 'bitacora'))
+    flota = Flota(grafo, region=REGION, bitacora=bitacora)
+    flota.registrar(patrullas)
+    servidor = iniciar_servidor_seguimiento({REGION: flota}, 0)
+    puerto = servidor.server_address[1]
+    seguimiento = {'url': f"http://127.0.0.1:{puerto}", 'puerto': puerto, 'flota': REGION, 'token': servidor.token}
+    try:
+        html = html_mapa(grafo, matriz, patrullas, args.nivel, seguimiento, args)
+        resultados = operar(html, incidentes, carpeta, args.timeout)
+    finally:
+        servidor.shutdown()
+        bitacora.cerrar()
+
+    fallas = []
+    despachados = [r for r in resultados if 'estado' in r]
+    sin_ruta = sum('sin_ruta' in r for r in resultados)
+    if len(resultados) != args.incidentes:
+        fallas.append(f"el script del mapa terminó tras {len(resultados)} de {args.incidentes} incidentes")
+    for resultado in resultados:
+        if 'error' in resultado or resultado.get('estado', 200) != 200:
+            fallas.append(f"incidente {resultado['indice']}: {resultado.get('error') or resultado['estado']}")
+    eventos = list(leer_bitacora(os.path.join(carpeta, 'bitacora')))
+    despachos = [e for e in eventos if e['tipo'] == 'despacho' and e.get('decision')]
+    decisiones = [e['decision'] for e in despachos]
+    print(f"{len(resultados)} incidentes operados en el mapa ({sin_ruta} sin ruta dentro del límite de su A*), "
+          f"{len(decisiones)} despachos en la bitácora; evaluadas: {[len(d.get('evaluadas') or []) for d in decisiones]} "
+          f"de {[len(d['candidatas']) for d in decisiones]} candidatas")
+    if not despachados or len(decisiones) != len(despachados):
+        fallas.append(f"{len(despachados)} despachos desde el mapa y {len(decisiones)} con decisión en la bitácora")
+    if any(d.get('evaluadas') is None or d['perfil'].get('semilla') is None for d in decisiones):
+        fallas.append("hay decisiones sin las patrullas evaluadas o sin la semilla de los costos")
+        decisiones = []
+
+    resumen = reproducir(eventos, Motor(lambda region: grafo))
+    cambios = ', '.join(f"{d} {n}" for d, n in resumen['diferencias'].items() if n) or 'ninguna'
+    print(f"reproducción: {resumen['decisiones']} decisiones; diferencias: {cambios}; "
+          f"{resumen['incompletas']} incompletas")
+    if resumen['con_diferencias'] or resumen['incompletas'] or resumen['decisiones'] != len(despachos):
+        fallas.append(f"{resumen['con_diferencias']} decisiones difieren y {resumen['incompletas']} no se pudieron "
+                      f"reproducir; p. ej. {json.dumps(resumen['ejemplos'][:1], ensure_ascii=False)[:400]}")
+
+    if decisiones:
+        # Sin la elegida entre las evaluadas, la reproducción debe elegir otra patrulla
+        sin_elegida = copy.deepcopy([e for e in despachos if len(e['decision']['evaluadas']) > 1])
+        for evento in sin_elegida:
+            evento['decision']['evaluadas'].remove(evento['patrulla'])
+        control = reproducir(sin_elegida, Motor(lambda region: grafo))
+        print(f"sin la elegida: {control['diferencias']['patrulla']} de {control['decisiones']} decisiones "
+              f"eligen otra patrulla")
+        if sin_elegida and not control['diferencias']['patrulla']:
+            fallas.append("sin la patrulla elegida entre las evaluadas la reproducción eligió la misma")
+
+        # Con otros factores de zona la reproducción debe notar que los costos no son los del mapa
+        otra_semilla = copy.deepcopy(despachos)
+        for evento in otra_semilla:
+            evento['decision']['perfil']['semilla'] += 1
+        control = reproducir(otra_semilla, Motor(lambda region: grafo))
+        print(f"otra semilla: {control['con_diferencias']} de {control['decisiones']} decisiones con diferencias")
+        if not control['con_diferencias']:
+            fallas.append("con otra semilla de costos no se detectó ninguna diferencia")
+
+    for falla in fallas:
+        print(f"❌ {falla}")
+    if fallas:
+        sys.exit(1)
+    print(f"✅ {resumen['decisiones']} decisiones tomadas por el mapa reproducidas sin diferencias")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: A* dependiente del tiempo frente a A* estático (un nivel de tráfico para todo el viaje).
+
+Uso:
+    python benchmarks/bench_dependiente_tiempo.py --consultas 200 --semilla 7
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_experto.costos import HORARIO_TRAFICO, calcular_costos, nivel_trafico_en, tiempo_sin_trafico
+from sistema_experto.dependiente_tiempo import (
+    SEGUNDOS_DIA, a_estrella_dependiente, evaluar_ruta_dependiente, perfil_trafico, tiempo_recorrido
+)
+from sistema_experto.grafo import construir_grafo, empaquetar_grafo
+from sistema_experto.ruteo import a_estrella
+
+
+def horas_salida(rng, n):
+    """
+    Mitad de salidas uniformes en el día y mitad en los 15 minutos previos a un cambio de franja.
+    """
+    cambios = np.array([hora * 3600 for hora, _ in HORARIO_TRAFICO[1:]])
+    uniformes = rng.uniform(0, SEGUNDOS_DIA, n - n // 2)
+    cercanas = rng.choice(cambios, n // 2) - rng.uniform(0, 900, n // 2)
+    return np.concatenate([uniformes, cercanas])
+
+
+def verificar_fifo(perfil, pasos=2000):
+    """
+    Comprueba que la llegada sea no decreciente con la salida para cada tipo de vía.
+    """
+    inicios, factores = perfil
+    salidas = np.linspace(0, SEGUNDOS_DIA, pasos)
+    for tipo in range(len(factores[0])):
+        llegadas = [s + tiempo_recorrido(600.0, tipo, s, inicios, factores) for s in salidas]
+        if np.any(np.diff(llegadas) < -1e-9):
+            return False
+    return True
+
+
+def percentil(valores, q):
+    return float(np.percentile(valores, q)) if valores else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lugar", default="Tacna, Peru")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--clima", default="despejado")
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    grafo = empaquetar_grafo(construir_grafo(args.lugar))
+    rng = np.random.default_rng(args.semilla)
+    perfil = perfil_trafico()
+    trabajo = tiempo_sin_trafico(grafo, args.clima)
+    mu_por_nivel = {nivel: calcular_costos(grafo, nivel, args.clima)[0] for _, nivel in HORARIO_TRAFICO}
+
+    pares = rng.integers(0, grafo.num_nodos, size=(args.consultas, 2))
+    salidas = horas_salida(rng, args.consultas)
+
+    estatico_ms, dependiente_ms = [], []
+    estatico_nodos, dependiente_nodos = [], []
+    error_estatico, mejora = [], []
+    for (origen, destino), salida in zip(pares.tolist(), salidas.tolist()):
+        nivel = nivel_trafico_en((salida % SEGUNDOS_DIA) / 3600)
+        estatico = a_estrella(grafo, origen, destino, mu_por_nivel[nivel])
+        dependiente = a_estrella_dependiente(grafo, origen, destino, salida, trabajo, perfil)
+        if estatico is None or dependiente is None:
+            continue
+        estatico_ms.append(estatico['tiempo_ms'])
+        dependiente_ms.append(dependiente['tiempo_ms'])
+        estatico_nodos.append(estatico['nodos_explorados'])
+        dependiente_nodos.append(dependiente['nodos_explorados'])
+
+        # Llegada real de la ruta estática y error de su ETA frente a la dependiente del tiempo
+        llegada_real = evaluar_ruta_dependiente(grafo, estatico['arcos'], salida, trabajo, perfil)
+        error_estatico.append(abs(estatico['costo'] - (llegada_real - salida)))
+        mejora.append(llegada_real - dependiente['llegada'])
+
+    print(f"Grafo: {grafo.num_nodos} nodos, {grafo.num_arcos} arcos — {len(estatico_ms)} consultas válidas")
+    print(f"FIFO verificado: {'sí' if verificar_fifo(perfil) else 'NO'}")
+    print(f"{'Motor':<24}{'media ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'nodos':>10}")
+    for nombre, tiempos, nodos in (("A* estático", estatico_ms, estatico_nodos),
+                                   ("A* dependiente tiempo", dependiente_ms, dependiente_nodos)):
+        print(f"{nombre:<24}{np.mean(tiempos):>10.2f}{percentil(tiempos, 50):>10.2f}"
+              f"{percentil(tiempos, 95):>10.2f}{np.mean(nodos):>10.0f}")
+    print(f"Sobrecosto dependiente/estático: ×{np.mean(dependiente_ms) / np.mean(estatico_ms):.2f}")
+    print(f"Error medio de la ETA estática: {np.mean(error_estatico):.1f} s (p95 {percentil(error_estatico, 95):.1f} s)")
+    print(f"Llegada más temprana con ruteo dependiente: {np.mean(mejora):.1f} s de media, "
+          f"{np.mean(np.asarray(mejora) > 1e-6) * 100:.1f}% de consultas con mejora")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark de escala: tiempo y memoria de cada etapa del pipeline frente al tamaño
+del grafo, con redes sintéticas (sistema_experto.sintetico).
+
+Cada tamaño se mide en procesos separados (uno para tiempos y otro para memoria
+con tracemalloc, que ralentiza las etapas), así los picos no se contaminan entre
+tamaños. Con networkx, 10⁵ nodos necesitan ~1 GB y 10⁶ nodos ~10 GB de RAM.
+
+Uso:
+    python benchmarks/bench_escala.py --tamanos 10000 30000 100000 300000 --salida escala.json --grafico escala.png
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_experto.costos import calcular_costos
+from sistema_experto.grafo import empaquetar_grafo, enriquecer_grafo, preparar_grafo
+from sistema_experto.mapa import datos_arcos, datos_nodos
+from sistema_experto.ruteo import a_estrella, matriz_costos, uno_a_todos
+from sistema_experto.sintetico import red_sintetica
+
+ETAPAS = ['generacion', 'carga', 'enriquecimiento', 'empaquetado', 'serializacion', 'costos',
+          'ruteo_a_estrella', 'ruteo_dijkstra']
+CONSULTAS_A_ESTRELLA = 20
+CONSULTAS_DIJKSTRA = 5
+
+
+def serializar_mapa(grafo):
+    """
+    Mismos registros de nodos y arcos que la app embebe en el HTML del mapa.
+    """
+    return json.dumps(datos_nodos(grafo)) + json.dumps(datos_arcos(grafo))
+
+
+def medir_tamano(num_nodos, con_memoria, semilla):
+    """
+    Ejecuta todas las etapas para un tamaño. Retorna {etapa: {'s', 'mb'?}} y metadatos.
+    """
+    rng = np.random.default_rng(semilla)
+    medidas = {}
+    estado = {}
+
+    def etapa(nombre, funcion):
+        if con_memoria:
+            tracemalloc.reset_peak()
+            antes = tracemalloc.get_traced_memory()[0]
+        inicio = time.perf_counter()
+        resultado = funcion()
+        medidas[nombre] = {'s': time.perf_counter() - inicio}
+        if con_memoria:
+            # Memoria adicional que la etapa llegó a ocupar sobre lo ya asignado
+            medidas[nombre]['mb'] = (tracemalloc.get_traced_memory()[1] - antes) / 2 ** 20
+        return resultado
+
+    if con_memoria:
+        tracemalloc.start()
+    crudo = etapa('generacion', lambda: red_sintetica(num_nodos, semilla))
+    G = etapa('carga', lambda: preparar_grafo(crudo))
+    del crudo
+    etapa('enriquecimiento', lambda: enriquecer_grafo(G))
+    grafo = etapa('empaquetado', lambda: empaquetar_grafo(G))
+    estado['nodos'], estado['arcos'] = grafo.num_nodos, grafo.num_arcos
+    del G
+    estado['bytes_mapa'] = len(etapa('serializacion', lambda: serializar_mapa(grafo)))
+    mu, _ = etapa('costos', lambda: calcular_costos(grafo, 'trafico_medio'))
+
+    pares = rng.integers(0, grafo.num_nodos, size=(CONSULTAS_A_ESTRELLA, 2)).tolist()
+    pesos = mu.tolist()
+    etapa('ruteo_a_estrella', lambda: [a_estrella(grafo, o, d, pesos) for o, d in pares])
+    matriz = matriz_costos(grafo, mu)
+    etapa('ruteo_dijkstra', lambda: uno_a_todos(matriz, rng.integers(0, grafo.num_nodos, CONSULTAS_DIJKSTRA)))
+    if con_memoria:
+        tracemalloc.stop()
+
+    # Las etapas de ruteo se reportan por consulta
+    medidas['ruteo_a_estrella']['s'] /= CONSULTAS_A_ESTRELLA
+    medidas['ruteo_dijkstra']['s'] /= CONSULTAS_DIJKSTRA
+    return {'etapas': medidas, **estado}
+
+
+def medir_en_proceso(num_nodos, con_memoria, semilla):
+    orden = [sys.executable, os.path.abspath(__file__), '--medir', str(num_nodos), '--semilla', str(semilla)]
+    if con_memoria:
+        orden.append('--con-memoria')
+    proceso = subprocess.run(orden, capture_output=True, text=True)
+    if proceso.returncode != 0:
+        return None, proceso.stderr.strip().splitlines()[-1:] or [f"código {proceso.returncode}"]
+    return json.loads(proceso.stdout), None
+
+
+def graficar(resultados, ruta):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, (ax_tiempo, ax_memoria) = plt.subplots(1, 2, figsize=(13, 5))
+    for nombre in ETAPAS:
+        puntos = [(r['nodos'], r['etapas'][nombre]) for r in resultados]
+        nodos = [n for n, _ in puntos]
+        ax_tiempo.plot(nodos, [m['s'] for _, m in puntos], marker='o', label=nombre)
+        if all('mb' in m for _, m in puntos):
+            ax_memoria.plot(nodos, [m['mb'] for _, m in puntos], marker='o', label=nombre)
+    for ax, titulo, unidad in ((ax_tiempo, 'Tiempo por etapa', 's (ruteo: por consulta)'),
+                               (ax_memoria, 'Memoria pico por etapa', 'MB sobre lo ya asignado (tracemalloc)')):
+        ax.set_xscale('log')
+        # symlog admite etapas que no ocupan memoria adicional (0 MB)
+        ax.set_yscale('log' if ax is ax_tiempo else 'symlog')
+        ax.set_xlabel('nodos')
+        ax.set_ylabel(unidad)
+        ax.set_title(titulo)
+        ax.grid(True, which='both', alpha=0.3)
+    ax_memoria.set_ylim(bottom=0)
+    ax_tiempo.legend(fontsize=8)
+    fig.tight_layout()
+    fig.savefig(ruta, dpi=120)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10000, 30000, 100000, 300000])
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--sin-memoria", action="store_true", help="Omite la pasada con tracemalloc")
+    parser.add_argument("--salida", default="resultados_escala.json")
+    parser.add_argument("--grafico", default="resultados_escala.png")
+    parser.add_argument("--medir", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--con-memoria", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Modo interno: un solo tamaño, resultado en JSON por stdout
+    if args.medir:
+        print(json.dumps(medir_tamano(args.medir, args.con_memoria, args.semilla)))
+        return
+
+    resultados = []
+    print(f"{'nodos':>9}{'arcos':>10}" + ''.join(f"{e[:12]:>14}" for e in ETAPAS))
+    for tamano in args.tamanos:
+        medida, error = medir_en_proceso(tamano, False, args.semilla)
+        if medida is None:
+            print(f"{tamano:>9} ❌ {error[0]}")
+            continue
+        if not args.sin_memoria:
+            memoria, error = medir_en_proceso(tamano, True, args.semilla)
+            if memoria is not None:
+                for nombre, m in memoria['etapas'].items():
+                    medida['etapas'][nombre]['mb'] = m['mb']
+        resultados.append({'tamano_pedido': tamano, **medida})
+
+        print(f"{medida['nodos']:>9}{medida['arcos']:>10}"
+              + ''.join(f"{medida['etapas'][e]['s']:>12.3f} s" for e in ETAPAS))
+        if 'mb' in medida['etapas']['carga']:
+            print(f"{'':>19}" + ''.join(f"{medida['etapas'][e]['mb']:>11.1f} MB" for e in ETAPAS))
+
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump({'semilla': args.semilla, 'resultados': resultados}, f, indent=1)
+    if resultados:
+        graficar(resultados, args.grafico)
+        print(f"\n✅ Resultados en {args.salida}, gráfico en {args.grafico}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Latencia de la fiabilidad Monte Carlo (sistema_experto.fiabilidad) por par de rutas.
+
+Para pares origen–destino al azar calcula las rutas rápida y segura y mide lo que
+tarda simular ambas a la vez (con y sin correlación por tipo de vía). Falla si el
+p95 supera el presupuesto por par, el mismo que tiene el cálculo en línea de las
+recomendaciones del mapa.
+
+También mide la ruta a tiempo con un plazo de --holgura × μ de la ruta rápida:
+latencia, etiquetas, fracción exacta y cuánto sube P(llegada ≤ plazo) respecto de
+la mejor de las rutas rápida y segura.
+
+Uso:
+    python benchmarks/bench_fiabilidad.py --instantanea instantanea --pares 200 --presupuesto-ms 50
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_experto.costos import calcular_costos, costo_seguro
+from sistema_experto.fiabilidad import MUESTRAS, fiabilidad_rutas, probabilidad_a_tiempo, ruta_a_tiempo
+from sistema_experto.grafo import GrafoEmpaquetado
+from sistema_experto.ruteo import a_estrella
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instantanea", default="instantanea")
+    parser.add_argument("--pares", type=int, default=100)
+    parser.add_argument("--muestras", type=int, default=MUESTRAS)
+    parser.add_argument("--nivel", default="trafico_alto")
+    parser.add_argument("--clima", default="lluvia")
+    parser.add_argument("--presupuesto-ms", type=float, default=50)
+    parser.add_argument("--holgura", type=float, default=1.1, help="Plazo de la ruta a tiempo / μ de la rápida")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="JSON con los resultados")
+    args = parser.parse_args()
+
+    grafo = GrafoEmpaquetado.cargar(args.instantanea, mapear=True)
+    mu, sigma = calcular_costos(grafo, args.nivel, args.clima)
+    seguros = costo_seguro(mu, sigma, 1.5)
+    rng = np.random.default_rng(args.semilla)
+
+    pares = []
+    while len(pares) < args.pares:
+        origen, destino = (int(n) for n in rng.integers(0, grafo.num_nodos, 2))
+        rapida = a_estrella(grafo, origen, destino, mu)
+        if rapida is not None:
+            pares.append((rapida, a_estrella(grafo, origen, destino, seguros)))
+
+    resultados = {'pares': args.pares, 'muestras': args.muestras, 'presupuesto_ms': args.presupuesto_ms,
+                  'arcos_p50': int(np.median([len(r['arcos']) + len(s['arcos']) for r, s in pares]))}
+    for correlacion in (0.0, 0.5):
+        latencias = []
+        for rapida, segura in pares:
+            inicio = time.perf_counter()
+            fiabilidad_rutas(grafo, [rapida, segura], mu, sigma, muestras=args.muestras, correlacion=correlacion)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        resultados[f"rho_{correlacion}"] = {
+            'p50_ms': round(float(np.percentile(latencias, 50)), 2),
+            'p95_ms': round(float(np.percentile(latencias, 95)), 2),
+            'max_ms': round(max(latencias), 2),
+        }
+        print(f"ρ={correlacion}: p50 {resultados[f'rho_{correlacion}']['p50_ms']:.1f} ms, "
+              f"p95 {resultados[f'rho_{correlacion}']['p95_ms']:.1f} ms, máx {max(latencias):.1f} ms por par")
+
+    # Ruta a tiempo (la primera búsqueda carga SciPy y queda fuera de la medición)
+    ruta_a_tiempo(grafo, pares[0][0]['ruta'][0], pares[0][0]['ruta'][-1], mu, sigma, pares[0][0]['costo'])
+    latencias, etiquetas, exactas, mejoras = [], [], 0, []
+    varianza = sigma ** 2
+    for rapida, segura in pares:
+        plazo_s = args.holgura * rapida['costo']
+        candidatas = [r['arcos'] for r in (rapida, segura) if r is not None]
+        inicio = time.perf_counter()
+        resultado = ruta_a_tiempo(grafo, rapida['ruta'][0], rapida['ruta'][-1], mu, sigma, plazo_s, candidatas)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        etiquetas.append(resultado['etiquetas'])
+        exactas += resultado['exacta']
+        base = max(probabilidad_a_tiempo(mu[arcos].sum(), varianza[arcos].sum(), plazo_s) for arcos in candidatas)
+        mejoras.append(resultado['p_a_tiempo'] - base)
+    resultados['a_tiempo'] = {
+        'p50_ms': round(float(np.percentile(latencias, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencias, 95)), 2),
+        'etiquetas_p95': int(np.percentile(etiquetas, 95)),
+        'exactas': exactas / len(pares),
+        'mejora_media': round(float(np.mean(mejoras)), 4),
+        'mejora_max': round(float(np.max(mejoras)), 4),
+    }
+    print(f"Ruta a tiempo: p50 {resultados['a_tiempo']['p50_ms']:.1f} ms, p95 {resultados['a_tiempo']['p95_ms']:.1f} ms, "
+          f"{exactas}/{len(pares)} exactas; P(a tiempo) +{np.mean(mejoras):.3f} en promedio "
+          f"(hasta +{np.max(mejoras):.3f}) sobre la mejor de rápida y segura")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+    peor = max(resultados[f"rho_{correlacion}"]['p95_ms'] for correlacion in (0.0, 0.5))
+    if peor > args.presupuesto_ms:
+        print(f"❌ p95 de {peor:.1f} ms por par, sobre el presupuesto de {args.presupuesto_ms:.0f} ms")
+        sys.exit(1)
+    print(f"✅ p95 de {peor:.1f} ms por par ({args.muestras} muestras), dentro de {args.presupuesto_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
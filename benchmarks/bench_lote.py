@@ -0,0 +1,73 @@
+"""
+Escalamiento del ruteo por lotes (sistema_experto.lote) con el número de procesos.
+
+Rutea el mismo lote de pares al azar (mitad rápidas, mitad seguras) con cada
+cantidad de procesos, verifica que los resultados sean idénticos y en el mismo
+orden que con un solo proceso, y reporta rutas/s, aceleración y eficiencia.
+
+Uso:
+    python benchmarks/bench_lote.py --instantanea instantanea --consultas 20000 --procesos 1 2 4 8 16 32
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_experto.grafo import GrafoEmpaquetado
+from sistema_experto.lote import CAMPOS, perfil, rutas_en_lote
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instantanea", default="instantanea")
+    parser.add_argument("--consultas", type=int, default=2000)
+    parser.add_argument("--procesos", type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument("--bloque", type=int, default=256)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="JSON con los resultados")
+    args = parser.parse_args()
+
+    grafo = GrafoEmpaquetado.cargar(args.instantanea, mapear=True)
+    rng = np.random.default_rng(args.semilla)
+    origenes = rng.integers(0, grafo.num_nodos, args.consultas)
+    destinos = rng.integers(0, grafo.num_nodos, args.consultas)
+    perfiles = [perfil('trafico_alto', 'despejado'), perfil('trafico_alto', 'lluvia', k=1.5)]
+    perfil_consulta = np.arange(args.consultas) % 2
+    print(f"{args.consultas} rutas sobre {grafo.num_nodos} nodos ({os.cpu_count()} núcleos disponibles)")
+
+    referencia = None
+    filas = []
+    for procesos in args.procesos:
+        inicio = time.perf_counter()
+        bloques = list(rutas_en_lote(args.instantanea, origenes, destinos, perfil_consulta, perfiles,
+                                     procesos=procesos, tam_bloque=args.bloque))
+        segundos = time.perf_counter() - inicio
+        resultado = {campo: np.concatenate([bloque[campo] for bloque in bloques]) for campo in CAMPOS}
+        if [bloque['inicio'] for bloque in bloques] != list(range(0, args.consultas, args.bloque)):
+            raise SystemExit(f"❌ Bloques fuera de orden con {procesos} procesos")
+        if referencia is None:
+            referencia = resultado
+        elif not all(np.array_equal(referencia[campo], resultado[campo], equal_nan=True) for campo in CAMPOS):
+            raise SystemExit(f"❌ Resultados distintos con {procesos} procesos")
+
+        rutas_s = args.consultas / segundos
+        filas.append({'procesos': procesos, 'segundos': round(segundos, 2), 'rutas_s': round(rutas_s, 1)})
+        base = filas[0]['rutas_s'] / filas[0]['procesos']
+        aceleracion = rutas_s / base
+        filas[-1].update(aceleracion=round(aceleracion, 2), eficiencia=round(aceleracion / procesos, 2))
+        print(f"{procesos:>3} procesos: {segundos:7.2f} s, {rutas_s:8.1f} rutas/s, "
+              f"aceleración ×{aceleracion:.2f} (eficiencia {aceleracion / procesos:.0%})")
+
+    print("✅ Mismos resultados y en el mismo orden con todas las cantidades de procesos")
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(filas, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Memoria por proceso al servir el grafo desde la instantánea: copia en el heap de
+cada proceso frente a arreglos mapeados de solo lectura (GrafoEmpaquetado.cargar(..., mapear=True)).
+
+Lanza N procesos a la vez; cada uno abre la instantánea, recorre todos los
+arreglos y los costos precalculados de cada nivel y clima, y reporta cuánto creció
+su memoria privada y su PSS (memoria compartida repartida entre los procesos que
+la usan), leídos de /proc/self/smaps_rollup (solo Linux). Con mapeo, agregar
+procesos no debería agregar memoria privada del grafo.
+
+Uso:
+    python benchmarks/bench_memoria_compartida.py --instantanea instantanea --procesos 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_experto.costos import calcular_costos
+from sistema_experto.grafo import GrafoEmpaquetado
+
+# Fracción del tamaño del grafo que se tolera como memoria privada por proceso con mapeo
+TOLERANCIA_PRIVADA = 0.1
+
+
+def memoria():
+    """
+    {'privada', 'pss'} en bytes del proceso actual.
+    """
+    campos = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) == 3 and partes[2] == 'kB':
+                campos[partes[0].rstrip(':')] = int(partes[1]) * 1024
+    return {'privada': campos['Private_Clean'] + campos['Private_Dirty'], 'pss': campos['Pss']}
+
+
+def trabajador(carpeta, mapear, barrera, cola):
+    antes = memoria()
+    grafo = GrafoEmpaquetado.cargar(carpeta, mapear=mapear)
+    # Recorrer todo: así las páginas mapeadas quedan efectivamente residentes
+    total = sum(float(np.sum(getattr(grafo, nombre))) for nombre in grafo.ARREGLOS)
+    for nivel, clima in grafo.costos_precalculados:
+        mu, sigma = calcular_costos(grafo, nivel, clima)
+        total += float(mu.sum() + sigma.sum())
+    barrera.wait()
+    despues = memoria()
+    cola.put({'privada': despues['privada'] - antes['privada'], 'pss': despues['pss'] - antes['pss']})
+    barrera.wait()
+
+
+def medir(carpeta, mapear, procesos):
+    contexto = multiprocessing.get_context('spawn')
+    barrera = contexto.Barrier(procesos)
+    cola = contexto.Queue()
+    hijos = [contexto.Process(target=trabajador, args=(carpeta, mapear, barrera, cola)) for _ in range(procesos)]
+    for hijo in hijos:
+        hijo.start()
+    resultados = [cola.get() for _ in hijos]
+    for hijo in hijos:
+        hijo.join()
+    return {
+        'privada_mb': round(float(np.mean([r['privada'] for r in resultados])) / 2**20, 2),
+        'pss_mb': round(float(np.mean([r['pss'] for r in resultados])) / 2**20, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instantanea", default="instantanea")
+    parser.add_argument("--procesos", type=int, default=4)
+    parser.add_argument("--salida", help="JSON con los resultados")
+    args = parser.parse_args()
+
+    grafo = GrafoEmpaquetado.cargar(args.instantanea, mapear=True)
+    tamano = sum(getattr(grafo, nombre).nbytes for nombre in grafo.ARREGLOS)
+    tamano += sum(mu.nbytes + sigma.nbytes for mu, sigma in grafo.costos_precalculados.values())
+    print(f"Grafo: {grafo.num_nodos} nodos, {grafo.num_arcos} arcos, "
+          f"{len(grafo.costos_precalculados)} costos precalculados ({tamano / 2**20:.1f} MB)")
+
+    resultados = {'tamano_mb': round(tamano / 2**20, 2), 'procesos': args.procesos}
+    for modo, mapear in (('copia', False), ('mapeo', True)):
+        resultados[modo] = medir(args.instantanea, mapear, args.procesos)
+        print(f"{modo:>6}: +{resultados[modo]['privada_mb']:.1f} MB privados y "
+              f"+{resultados[modo]['pss_mb']:.1f} MB PSS por proceso")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+    if resultados['mapeo']['privada_mb'] > TOLERANCIA_PRIVADA * resultados['tamano_mb']:
+        print("❌ Con mapeo cada proceso sigue reteniendo una copia privada del grafo")
+        sys.exit(1)
+    print("✅ Con mapeo los procesos comparten el grafo sin copia")
+
+
+if __name__ == "__main__":
+    main()
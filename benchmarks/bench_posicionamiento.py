@@ -0,0 +1,84 @@
+"""
+Posiciones de espera (sistema_experto.posicionamiento) frente a patrullas al azar.
+
+Para cada número de unidades resuelve la p-mediana (y la máxima cobertura con
+--radio-min) sobre la matriz zona × zona y compara el tiempo medio de llegada
+ponderado por la demanda y la cobertura dentro del objetivo con el promedio de
+--sorteos ubicaciones al azar. Falla si una reoptimización tarda más que
+--presupuesto-s, el margen para recalcular al quedar ocupada una unidad.
+
+Uso:
+    python benchmarks/bench_posicionamiento.py --instantanea instantanea --matrices matrices --unidades 5 20 60
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_experto.grafo import GrafoEmpaquetado
+from sistema_experto.matriz_zonas import MatrizTiempos
+from sistema_experto.posicionamiento import (RADIO_COBERTURA_S, costos_espera, demanda_zonas, evaluar_posiciones,
+                                             posiciones_espera)
+from sistema_experto.simulador import pesos_espaciales
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instantanea", default="instantanea")
+    parser.add_argument("--matrices", default="matrices")
+    parser.add_argument("--nivel", default="trafico_alto")
+    parser.add_argument("--unidades", type=int, nargs="+", default=[5, 20, 60])
+    parser.add_argument("--radio-min", type=float, default=None, help="También la máxima cobertura en este radio")
+    parser.add_argument("--sorteos", type=int, default=20)
+    parser.add_argument("--presupuesto-s", type=float, default=5.0)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="JSON con los resultados")
+    args = parser.parse_args()
+
+    grafo = GrafoEmpaquetado.cargar(args.instantanea, mapear=True)
+    matriz = MatrizTiempos(args.matrices)
+    if not matriz.corresponde(grafo):
+        sys.exit("❌ La matriz de zonas se calculó sobre otro grafo")
+    tiempos = matriz.matriz(args.nivel)
+    demanda = demanda_zonas(np.asarray(matriz.zona_de_nodo), pesos_espaciales(grafo, semilla=args.semilla),
+                            tiempos.shape[0])
+    radio_s = args.radio_min * 60 if args.radio_min else RADIO_COBERTURA_S
+    rng = np.random.default_rng(args.semilla)
+
+    objetivos = {'p_mediana': None}
+    if args.radio_min:
+        objetivos['cobertura'] = radio_s
+    resultados = {'zonas': tiempos.shape[0], 'nivel': args.nivel, 'radio_s': radio_s, 'casos': []}
+    for nombre, radio in objetivos.items():
+        costos = costos_espera(tiempos, radio)
+        for unidades in args.unidades:
+            inicio = time.perf_counter()
+            zonas, _ = posiciones_espera(costos, demanda, unidades)
+            segundos = time.perf_counter() - inicio
+            medio, cobertura = evaluar_posiciones(tiempos, demanda, zonas, radio_s)
+            azar = np.mean([evaluar_posiciones(tiempos, demanda, rng.choice(tiempos.shape[0], unidades, replace=False),
+                                               radio_s) for _ in range(args.sorteos)], axis=0)
+            caso = {'objetivo': nombre, 'unidades': unidades, 'segundos': round(segundos, 3),
+                    'tiempo_medio_s': round(medio, 1), 'cobertura': round(cobertura, 4),
+                    'azar_tiempo_medio_s': round(float(azar[0]), 1), 'azar_cobertura': round(float(azar[1]), 4)}
+            resultados['casos'].append(caso)
+            print(f"{nombre} {unidades:3d} unidades: {segundos * 1000:6.0f} ms · llegada media {medio:.0f} s "
+                  f"(azar {azar[0]:.0f} s) · cobertura {cobertura:.1%} (azar {azar[1]:.1%})")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+    peor = max(caso['segundos'] for caso in resultados['casos'])
+    if peor > args.presupuesto_s:
+        print(f"❌ Una reoptimización tardó {peor:.1f} s, sobre el presupuesto de {args.presupuesto_s:.1f} s")
+        sys.exit(1)
+    print(f"✅ Reoptimización en {peor:.2f} s como máximo (presupuesto {args.presupuesto_s:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
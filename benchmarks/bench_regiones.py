@@ -0,0 +1,120 @@
+"""
+Registro de regiones bajo un techo de memoria.
+
+Genera una red sintética, la corta en regiones vecinas con franjas solapadas
+(cada una con su instantánea, como las de python -m sistema_experto snapshot) y
+lanza consultas A* entre puntos al azar de toda la red: las que caen en una sola
+región usan su grafo y las que cruzan regiones, la fusión de las vecinas. Después
+de cada consulta se verifica que la memoria de lo cargado no pase del techo (salvo
+que la entrada recién usada sola ya lo supere) y al final se reportan aciertos,
+desalojos y latencias.
+
+Uso:
+    python benchmarks/bench_regiones.py --nodos 40000 --regiones 4 --limite-mb 20 --consultas 300
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_experto.costos import calcular_costos
+from sistema_experto.grafo import empaquetar_grafo, preparar_grafo
+from sistema_experto.regiones import SEPARADOR_FUSION, RegistroRegiones
+from sistema_experto.ruteo import a_estrella
+from sistema_experto.sintetico import red_sintetica
+
+
+def crear_regiones(raiz, num_nodos, num_regiones, solape, semilla):
+    """
+    Corta la red en franjas este-oeste que comparten 'solape' (fracción del ancho)
+    con la vecina y guarda la instantánea de cada una. Retorna la caja de toda la red.
+    """
+    G = red_sintetica(num_nodos, semilla)
+    lon = np.array([data['x'] for _, data in G.nodes(data=True)])
+    lat = np.array([data['y'] for _, data in G.nodes(data=True)])
+    ids = np.array(list(G.nodes))
+    ancho = (lon.max() - lon.min()) / num_regiones
+    for i in range(num_regiones):
+        oeste = lon.min() + (i - solape) * ancho
+        este = lon.min() + (i + 1 + solape) * ancho
+        nodos = ids[(lon >= oeste) & (lon <= este)]
+        grafo = empaquetar_grafo(preparar_grafo(G.subgraph(nodos.tolist()).copy()))
+        grafo.guardar(os.path.join(raiz, f"region_{i + 1}"), lugar=f"Región sintética {i + 1}")
+    return lat.min(), lon.min(), lat.max(), lon.max()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodos", type=int, default=40000)
+    parser.add_argument("--regiones", type=int, default=4)
+    parser.add_argument("--solape", type=float, default=0.1, help="Fracción del ancho compartida con cada vecina")
+    parser.add_argument("--limite-mb", type=float, default=20)
+    parser.add_argument("--consultas", type=int, default=300)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="JSON con el resumen")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.semilla)
+    with tempfile.TemporaryDirectory() as raiz:
+        inicio = time.perf_counter()
+        lat_min, lon_min, lat_max, lon_max = crear_regiones(raiz, args.nodos, args.regiones, args.solape,
+                                                            args.semilla)
+        print(f"{args.regiones} regiones creadas en {time.perf_counter() - inicio:.1f} s")
+
+        registro = RegistroRegiones(raiz, int(args.limite_mb * 2**20), mapa=False)
+        latencias = {'region': [], 'fusion': []}
+        pico = 0
+        excesos = 0
+        for _ in range(args.consultas):
+            # Destino cerca del origen la mayoría de las veces (como un despacho real)
+            origen = (rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max))
+            paso = (lon_max - lon_min) / args.regiones * rng.choice([0.3, 1.2], p=[0.7, 0.3])
+            destino = (rng.uniform(lat_min, lat_max), float(np.clip(origen[1] + rng.uniform(-paso, paso),
+                                                                    lon_min, lon_max)))
+            try:
+                nombre = registro.nombre_para([origen, destino])
+            except ValueError:
+                continue
+            inicio = time.perf_counter()
+            grafo = registro.obtener(nombre)
+            mu, _ = calcular_costos(grafo, 'trafico_medio', 'despejado')
+            a_estrella(grafo, grafo.nodo_mas_cercano(*origen), grafo.nodo_mas_cercano(*destino), mu)
+            latencias['fusion' if SEPARADOR_FUSION in nombre else 'region'].append(
+                (time.perf_counter() - inicio) * 1000)
+
+            estado = registro.estado()
+            pico = max(pico, estado['uso_bytes'])
+            if estado['uso_bytes'] > max(registro.limite_bytes, estado['cargadas'][-1]['bytes']):
+                excesos += 1
+
+    estado = registro.estado()
+    resumen = {
+        'limite_mb': args.limite_mb,
+        'pico_mb': round(pico / 2**20, 2),
+        'aciertos': estado['aciertos'],
+        'fallos': estado['fallos'],
+        'desalojos': estado['desalojos'],
+        'excesos': excesos,
+        'consultas': {tipo: {'n': len(valores),
+                             'p50_ms': round(float(np.percentile(valores, 50)), 2) if valores else None,
+                             'p95_ms': round(float(np.percentile(valores, 95)), 2) if valores else None}
+                      for tipo, valores in latencias.items()},
+    }
+    print(json.dumps(resumen, ensure_ascii=False, indent=1))
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resumen, f, ensure_ascii=False, indent=1)
+    if excesos:
+        print(f"❌ La memoria superó el techo en {excesos} consultas")
+        sys.exit(1)
+    print(f"✅ Pico de {resumen['pico_mb']} MB con un techo de {args.limite_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Suite de benchmarks de ruteo sobre un corpus fijo de consultas origen–destino.
+
+El grafo de Tacna se reconstruye sin conexión desde las respuestas de cache/ y el
+corpus se estratifica por banda de distancia en línea recta y tipo de vía del
+destino. Para cada motor, costo (rápido / seguro con varios k) y nivel de
+tráfico se mide rendimiento, latencia p50/p95/p99, nodos asentados y memoria.
+
+Uso:
+    python benchmarks/bench_ruteo.py --salida resultados_ruteo.json
+    python benchmarks/bench_ruteo.py --salida nuevo.json --comparar resultados_ruteo.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_experto.costos import NIVELES_TRAFICO, TIPOS_VIA, calcular_costos, costo_seguro
+from sistema_experto.grafo import empaquetar_grafo, grafo_desde_cache
+from sistema_experto.ruteo import RADIO_TIERRA_M, a_estrella, matriz_costos
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bandas de distancia en línea recta (m) y valores de k del modelo de costo seguro
+BANDAS_M = [(0, 1000), (1000, 2500), (2500, 5000), (5000, np.inf)]
+VALORES_K = [0.5, 1.0, 1.5, 3.0]
+
+# Consultas por configuración medidas con tracemalloc (más lento) para la memoria pico
+CONSULTAS_MEMORIA = 20
+
+
+def distancias_m(grafo, origenes, destinos):
+    """
+    Distancia haversine (m) entre pares de nodos.
+    """
+    lat1, lat2 = np.radians(grafo.lat[origenes]), np.radians(grafo.lat[destinos])
+    delta_lon = np.radians(grafo.lon[destinos] - grafo.lon[origenes])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(delta_lon / 2) ** 2
+    return 2 * RADIO_TIERRA_M * np.arcsin(np.sqrt(a))
+
+
+def clase_nodo(grafo):
+    """
+    Tipo de vía más importante (menor código de TIPOS_VIA) entre los arcos salientes de cada nodo.
+    """
+    clase = np.full(grafo.num_nodos, len(TIPOS_VIA) - 1, dtype=np.int8)
+    np.minimum.at(clase, grafo.origen, grafo.tipo_via)
+    return clase
+
+
+def generar_corpus(grafo, por_estrato, semilla):
+    """
+    Pares (origen, destino) reproducibles: hasta 'por_estrato' consultas por cada
+    combinación banda de distancia × tipo de vía del destino.
+    """
+    rng = np.random.default_rng(semilla)
+    clase = clase_nodo(grafo)
+    limites = np.array([a for a, _ in BANDAS_M[1:]])
+    cupos = {(b, c): [] for b in range(len(BANDAS_M)) for c in range(len(TIPOS_VIA))}
+    for _ in range(100):
+        origenes = rng.integers(0, grafo.num_nodos, 4096)
+        destinos = rng.integers(0, grafo.num_nodos, 4096)
+        bandas = np.searchsorted(limites, distancias_m(grafo, origenes, destinos), side='right')
+        for o, d, b in zip(origenes.tolist(), destinos.tolist(), bandas.tolist()):
+            estrato = cupos[(b, int(clase[d]))]
+            if o != d and len(estrato) < por_estrato:
+                estrato.append((o, d))
+        if all(len(pares) == por_estrato for pares in cupos.values()):
+            break
+
+    return [{
+        'origen': o, 'destino': d,
+        'osmid_origen': int(grafo.osmid[o]), 'osmid_destino': int(grafo.osmid[d]),
+        'banda_m': [BANDAS_M[b][0], None if np.isinf(BANDAS_M[b][1]) else BANDAS_M[b][1]],
+        'clase': TIPOS_VIA[c],
+    } for (b, c), pares in sorted(cupos.items()) for o, d in pares]
+
+
+def _preparar_a_estrella(grafo, pesos):
+    return pesos.tolist()
+
+
+def _consultar_a_estrella(grafo, preparado, origen, destino):
+    resultado = a_estrella(grafo, origen, destino, preparado)
+    return (resultado['costo'], resultado['nodos_explorados']) if resultado else (np.inf, 0)
+
+
+def _consultar_dijkstra(grafo, matriz, origen, destino):
+    # csgraph no admite parada temprana: asienta todo lo alcanzable desde el origen
+    tiempos = dijkstra(matriz, directed=True, indices=origen)
+    return float(tiempos[destino]), int(np.count_nonzero(np.isfinite(tiempos)))
+
+
+# Motores evaluados: nombre → (preparación por configuración de costo, consulta)
+MOTORES = {
+    'a_estrella': (_preparar_a_estrella, _consultar_a_estrella),
+    'dijkstra_csgraph': (matriz_costos, _consultar_dijkstra),
+}
+
+
+def configuraciones(grafo, clima, semilla):
+    """
+    (nivel, costo, k, pesos) para costo_rapido y costo_seguro con cada k, en los cinco niveles.
+    """
+    for nivel in NIVELES_TRAFICO:
+        mu, sigma = calcular_costos(grafo, nivel, clima, semilla)
+        yield nivel, 'costo_rapido', None, mu
+        for k in VALORES_K:
+            yield nivel, 'costo_seguro', k, costo_seguro(mu, sigma, k)
+
+
+def medir(grafo, motor, pesos, corpus):
+    """
+    Ejecuta el corpus con un motor y resume latencia, rendimiento, nodos asentados y memoria.
+    """
+    preparar, consultar = MOTORES[motor]
+    inicio = time.perf_counter()
+    preparado = preparar(grafo, pesos)
+    preparacion_ms = (time.perf_counter() - inicio) * 1000
+
+    latencias, asentados, costos = [], [], []
+    inicio_total = time.perf_counter()
+    for consulta in corpus:
+        inicio = time.perf_counter()
+        costo, nodos = consultar(grafo, preparado, consulta['origen'], consulta['destino'])
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        asentados.append(nodos)
+        costos.append(costo)
+    total_s = time.perf_counter() - inicio_total
+
+    tracemalloc.start()
+    for consulta in corpus[:CONSULTAS_MEMORIA]:
+        consultar(grafo, preparado, consulta['origen'], consulta['destino'])
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'consultas': len(corpus),
+        'preparacion_ms': preparacion_ms,
+        'consultas_por_s': len(corpus) / total_s if total_s > 0 else None,
+        'p50_ms': float(np.percentile(latencias, 50)),
+        'p95_ms': float(np.percentile(latencias, 95)),
+        'p99_ms': float(np.percentile(latencias, 99)),
+        'asentados_medios': float(np.mean(asentados)),
+        'asentados_p95': float(np.percentile(asentados, 95)),
+        'memoria_pico_kb': pico / 1024,
+    }, np.asarray(costos)
+
+
+def version_git():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, anterior):
+    """
+    Imprime la razón de latencia p50 y de rendimiento frente a una ejecución anterior.
+    """
+    clave = lambda r: (r['motor'], r['nivel'], r['costo'], r['k'])
+    previos = {clave(r): r for r in anterior['resultados']}
+    print(f"\nComparación con {anterior['meta'].get('commit')} ({anterior['meta'].get('fecha')})")
+    print(f"{'Motor':<18}{'Nivel':<17}{'Costo':<14}{'p50 nuevo/ant.':>16}{'q/s nuevo/ant.':>16}")
+    for r in actual['resultados']:
+        previo = previos.get(clave(r))
+        if previo is None:
+            continue
+        costo = r['costo'] if r['k'] is None else f"seguro k={r['k']}"
+        print(f"{r['motor']:<18}{r['nivel']:<17}{costo:<14}{r['p50_ms'] / previo['p50_ms']:>16.2f}"
+              f"{r['consultas_por_s'] / previo['consultas_por_s']:>16.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cache", default=os.path.join(RAIZ, "cache"))
+    parser.add_argument("--por-estrato", type=int, default=8, help="Consultas por banda × tipo de vía")
+    parser.add_argument("--motores", nargs="+", default=list(MOTORES), choices=list(MOTORES))
+    parser.add_argument("--clima", default="despejado", choices=['despejado', 'lluvia', 'neblina'])
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--salida", default="resultados_ruteo.json")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    grafo = empaquetar_grafo(grafo_desde_cache(args.cache))
+    carga_s = time.perf_counter() - inicio
+    corpus = generar_corpus(grafo, args.por_estrato, args.semilla)
+    print(f"Grafo: {grafo.num_nodos} nodos, {grafo.num_arcos} arcos (cargado en {carga_s:.1f} s) — "
+          f"corpus de {len(corpus)} consultas")
+
+    resultados = []
+    print(f"{'Motor':<18}{'Nivel':<17}{'Costo':<14}{'q/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'asent.':>9}{'mem KB':>9}")
+    for nivel, costo, k, pesos in configuraciones(grafo, args.clima, args.semilla):
+        referencia = None
+        for motor in args.motores:
+            metricas, costos = medir(grafo, motor, pesos, corpus)
+            # Todos los motores son exactos: cualquier diferencia de costo es un error
+            if referencia is None:
+                referencia = costos
+            metricas['discrepancias'] = int(np.count_nonzero(~np.isclose(costos, referencia, rtol=1e-6)))
+            resultados.append({'motor': motor, 'nivel': nivel, 'costo': costo, 'k': k, **metricas})
+
+            etiqueta = costo if k is None else f"seguro k={k}"
+            print(f"{motor:<18}{nivel:<17}{etiqueta:<14}{metricas['consultas_por_s']:>9.1f}"
+                  f"{metricas['p50_ms']:>9.2f}{metricas['p95_ms']:>9.2f}{metricas['p99_ms']:>9.2f}"
+                  f"{metricas['asentados_medios']:>9.0f}{metricas['memoria_pico_kb']:>9.0f}")
+
+    informe = {
+        'meta': {
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': version_git(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'nodos': grafo.num_nodos,
+            'arcos': grafo.num_arcos,
+            'carga_grafo_s': carga_s,
+            'clima': args.clima,
+            'semilla': args.semilla,
+            'rss_max_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'corpus': corpus,
+        'resultados': resultados,
+    }
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, ensure_ascii=False, indent=1)
+    print(f"\n✅ Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(informe, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
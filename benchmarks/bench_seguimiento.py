@@ -0,0 +1,179 @@
+"""
+Costo del seguimiento en vivo (sistema_experto.seguimiento) con cientos de unidades.
+
+Despacha --unidades patrullas por rutas A* al azar y simula --pasos segundos de
+operación a 1 Hz, de dos formas:
+
+- reloj: la flota avanza todas las unidades y el mapa pide los cambios por HTTP;
+- gps: cada segundo llega por HTTP un lote con la posición (con ruido) de todas
+  las unidades, y el mapa pide los cambios.
+
+Mide lo que tarda cada segundo (avance o ingreso del lote GPS, más la consulta
+de cambios) y el tamaño de cada respuesta. Falla si el p95 supera el presupuesto
+o si al terminar alguna unidad no quedó disponible en su destino.
+
+Uso:
+    python benchmarks/bench_seguimiento.py --instantanea instantanea --unidades 500 --presupuesto-ms 100
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sistema_experto.costos import calcular_costos
+from sistema_experto.grafo import GrafoEmpaquetado
+from sistema_experto.ruteo import a_estrella
+from sistema_experto.seguimiento import (METROS_POR_GRADO, RADIO_LLEGADA_M, Flota, iniciar_servidor_seguimiento,
+                                         tiempos_ruta)
+
+TOKEN = 'bench'
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def solicitar(conexion, metodo, ruta, datos=None):
+    cuerpo = json.dumps(datos).encode('utf-8') if datos is not None else None
+    conexion.request(metodo, ruta, body=cuerpo, headers={'Content-Type': 'text/plain'} if cuerpo else {})
+    respuesta = conexion.getresponse()
+    contenido = respuesta.read()
+    if respuesta.status >= 400:
+        raise RuntimeError(f"{metodo} {ruta}: {respuesta.status} {contenido!r}")
+    return contenido
+
+
+def posicion(grafo, ruta, tiempos, t):
+    """
+    Posición interpolada en el instante t de la ruta (lo que reportaría el GPS).
+    """
+    k = min(int(np.searchsorted(tiempos, t, side='right')) - 1, len(ruta) - 1)
+    if k == len(ruta) - 1:
+        return float(grafo.lat[ruta[-1]]), float(grafo.lon[ruta[-1]])
+    fraccion = (t - tiempos[k]) / max(tiempos[k + 1] - tiempos[k], 1e-9)
+    a, b = ruta[k], ruta[k + 1]
+    return (float(grafo.lat[a] + fraccion * (grafo.lat[b] - grafo.lat[a])),
+            float(grafo.lon[a] + fraccion * (grafo.lon[b] - grafo.lon[a])))
+
+
+def distancia_m(grafo, a, b):
+    dy = (grafo.lat[a] - grafo.lat[b]) * METROS_POR_GRADO
+    dx = (grafo.lon[a] - grafo.lon[b]) * METROS_POR_GRADO * np.cos(np.radians(grafo.lat[b]))
+    return float(np.hypot(dx, dy))
+
+
+def medir(conexion, clave, reloj, pasos, entrada):
+    """
+    pasos segundos a 1 Hz: entrada(t) alimenta la flota y luego se piden los
+    cambios como lo hace el mapa. Retorna (latencias en ms, bytes por respuesta).
+    """
+    latencias, tamanos, version = [], [], 0
+    for paso in range(1, pasos + 1):
+        reloj.ahora = float(paso)
+        inicio = time.perf_counter()
+        entrada(reloj.ahora)
+        contenido = solicitar(conexion, 'GET', f"/posiciones?flota={clave}&desde={version}&token={TOKEN}")
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        tamanos.append(len(contenido))
+        version = json.loads(contenido)['version']
+    return latencias, tamanos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instantanea", default="instantanea")
+    parser.add_argument("--unidades", type=int, default=500)
+    parser.add_argument("--pasos", type=int, default=120, help="Segundos simulados a 1 Hz")
+    parser.add_argument("--nivel", default="trafico_alto")
+    parser.add_argument("--ruido-m", type=float, default=5.0, help="Error del GPS simulado")
+    parser.add_argument("--presupuesto-ms", type=float, default=100)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="JSON con los resultados")
+    args = parser.parse_args()
+
+    grafo = GrafoEmpaquetado.cargar(args.instantanea, mapear=True)
+    mu, _ = calcular_costos(grafo, args.nivel, "despejado")
+    rng = np.random.default_rng(args.semilla)
+
+    rutas = []
+    while len(rutas) < args.unidades:
+        origen, destino = (int(n) for n in rng.integers(0, grafo.num_nodos, 2))
+        resultado = a_estrella(grafo, origen, destino, mu)
+        if resultado is not None:
+            rutas.append((resultado['ruta'], tiempos_ruta(grafo, resultado['ruta'], mu)))
+    patrullas = [{'id': f"U-{i + 1:03d}", 'nodo_actual': ruta[0], 'status': 'disponible'}
+                 for i, (ruta, _) in enumerate(rutas)]
+    duracion = max(float(tiempos[-1]) for _, tiempos in rutas)
+
+    reloj = Reloj()
+    flotas = {'reloj': Flota(grafo, reloj=reloj), 'gps': Flota(grafo, reloj=reloj)}
+    servidor = iniciar_servidor_seguimiento(flotas, 0, token=TOKEN)
+    conexion = http.client.HTTPConnection('127.0.0.1', servidor.server_address[1], timeout=30)
+    for clave, flota in flotas.items():
+        flota.registrar(patrullas)
+        for p, (ruta, tiempos) in zip(patrullas, rutas):
+            solicitar(conexion, 'POST', f"/despacho?flota={clave}&token={TOKEN}", {'id': p['id'], 'ruta': ruta, 'tiempos': tiempos.tolist()})
+
+    resultados = {'unidades': args.unidades, 'pasos': args.pasos, 'presupuesto_ms': args.presupuesto_ms,
+                  'nodos_ruta_p50': int(np.median([len(ruta) for ruta, _ in rutas]))}
+    fallas = []
+
+    def lote_gps(t):
+        grados = args.ruido_m / METROS_POR_GRADO
+        fijos = []
+        for p, (ruta, tiempos) in zip(patrullas, rutas):
+            lat, lon = posicion(grafo, ruta, tiempos, t)
+            fijos.append([p['id'], lat + rng.normal(0, grados), lon + rng.normal(0, grados)])
+        solicitar(conexion, 'POST', f"/gps?flota=gps&token={TOKEN}", fijos)
+
+    entradas = {'reloj': flotas['reloj'].avanzar, 'gps': lote_gps}
+    for clave, entrada in entradas.items():
+        latencias, tamanos = medir(conexion, clave, reloj, args.pasos, entrada)
+        resultados[clave] = {
+            'p50_ms': round(float(np.percentile(latencias, 50)), 2),
+            'p95_ms': round(float(np.percentile(latencias, 95)), 2),
+            'max_ms': round(max(latencias), 2),
+            'bytes_p50': int(np.median(tamanos)),
+        }
+        print(f"{clave}: p50 {resultados[clave]['p50_ms']:.1f} ms, p95 {resultados[clave]['p95_ms']:.1f} ms "
+              f"por segundo con {args.unidades} unidades; {resultados[clave]['bytes_p50'] / 1024:.1f} KiB por consulta")
+
+        # Al terminar todas las rutas cada unidad queda disponible en su destino (con GPS,
+        # en el nodo más cercano a su posición, dentro del radio de llegada)
+        reloj.ahora = duracion + 1
+        entrada(reloj.ahora)
+        tolerancia_m = RADIO_LLEGADA_M + 4 * args.ruido_m if clave == 'gps' else 0.0
+        finales = {p['id']: p for p in flotas[clave].patrullas()}
+        malas = [p['id'] for p, (ruta, _) in zip(patrullas, rutas)
+                 if finales[p['id']]['status'] != 'disponible'
+                 or distancia_m(grafo, finales[p['id']]['nodo_actual'], ruta[-1]) > tolerancia_m]
+        if malas:
+            fallas.append(f"{clave}: {len(malas)} unidades no llegaron a su destino ({', '.join(malas[:5])})")
+
+    conexion.close()
+    servidor.shutdown()
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+    for falla in fallas:
+        print(f"❌ {falla}")
+    peor = max(resultados[clave]['p95_ms'] for clave in entradas)
+    if peor > args.presupuesto_ms:
+        print(f"❌ p95 de {peor:.1f} ms por segundo, sobre el presupuesto de {args.presupuesto_ms:.0f} ms")
+    if fallas or peor > args.presupuesto_ms:
+        sys.exit(1)
+    print(f"✅ p95 de {peor:.1f} ms por segundo con {args.unidades} unidades, dentro de {args.presupuesto_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Carga concurrente sobre el servicio de ruteo (sistema_experto.servicio).
+
+Levanta el servicio en un subproceso, lanza --clientes hilos que comparten un
+ClienteRuteo (conexiones persistentes) pidiendo rutas entre nodos al azar, y
+reporta solicitudes/s y latencias. Después envía una ráfaga de solicitudes de
+isócronas idénticas y verifica que se resolvieron con un solo cálculo.
+
+Uso:
+    python benchmarks/bench_servicio.py --instantanea instantanea --procesos 4 --clientes 16 --solicitudes 400
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from sistema_experto.cliente import ClienteRuteo
+from sistema_experto.grafo import GrafoEmpaquetado
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def esperar_servicio(cliente, segundos=60):
+    limite = time.perf_counter() + segundos
+    while True:
+        try:
+            return cliente.salud()
+        except ConnectionError:
+            if time.perf_counter() > limite:
+                raise
+            time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instantanea", default="instantanea")
+    parser.add_argument("--procesos", type=int, default=2)
+    parser.add_argument("--clientes", type=int, default=8)
+    parser.add_argument("--solicitudes", type=int, default=200)
+    parser.add_argument("--rafaga", type=int, default=16, help="Solicitudes idénticas simultáneas")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="JSON con los resultados")
+    args = parser.parse_args()
+
+    grafo = GrafoEmpaquetado.cargar(args.instantanea, mapear=True)
+    puerto = puerto_libre()
+    servidor = subprocess.Popen([sys.executable, '-m', 'sistema_experto', 'serve', '--instantanea', args.instantanea,
+                                 '--puerto', str(puerto), '--procesos', str(args.procesos)], cwd=RAIZ)
+    try:
+        cliente = ClienteRuteo(f"http://127.0.0.1:{puerto}", conexiones=max(args.clientes, args.rafaga))
+        esperar_servicio(cliente)
+
+        rng = np.random.default_rng(args.semilla)
+        pares = rng.integers(0, grafo.num_nodos, (args.solicitudes, 2))
+        latencias = []
+        siguiente = iter(range(args.solicitudes))
+        candado = threading.Lock()
+
+        def trabajar():
+            while True:
+                with candado:
+                    i = next(siguiente, None)
+                if i is None:
+                    return
+                origen, destino = pares[i]
+                inicio = time.perf_counter()
+                cliente.solicitar('POST', '/ruta', {'nodo_origen': int(origen), 'nodo_destino': int(destino),
+                                                    'nivel': 'trafico_alto'})
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+        inicio = time.perf_counter()
+        hilos = [threading.Thread(target=trabajar) for _ in range(args.clientes)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        segundos = time.perf_counter() - inicio
+
+        # Ráfaga de isócronas idénticas: deben coalescer en un único cálculo
+        antes = cliente.salud()
+        patrullas = [{'id': f"U-{i + 1:02d}", 'nodo_actual': int(n)}
+                     for i, n in enumerate(rng.choice(grafo.num_nodos, 5, replace=False))]
+        hilos = [threading.Thread(target=cliente.isocronas, args=(patrullas, 'trafico_medio', 'neblina'))
+                 for _ in range(args.rafaga)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        despues = cliente.salud()
+        cliente.cerrar()
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    resultados = {
+        'solicitudes': args.solicitudes,
+        'clientes': args.clientes,
+        'procesos': args.procesos,
+        'solicitudes_s': round(args.solicitudes / segundos, 1),
+        'p50_ms': round(float(np.percentile(latencias, 50)), 1),
+        'p95_ms': round(float(np.percentile(latencias, 95)), 1),
+        'rafaga': args.rafaga,
+        'calculos_rafaga': despues['calculos'] - antes['calculos'],
+        'coalescidas_rafaga': despues['coalescidas'] - antes['coalescidas'],
+    }
+    print(json.dumps(resultados, ensure_ascii=False, indent=1))
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+    if resultados['calculos_rafaga'] + resultados['coalescidas_rafaga'] != args.rafaga:
+        print("❌ La ráfaga no se contabilizó completa")
+        sys.exit(1)
+    print(f"✅ {resultados['solicitudes_s']} solicitudes/s; ráfaga de {args.rafaga} resuelta con "
+          f"{resultados['calculos_rafaga']} cálculo(s)")
+
+
+if __name__ == "__main__":
+    main()
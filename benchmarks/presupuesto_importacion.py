@@ -0,0 +1,93 @@
+"""
+Presupuesto de tiempo de importación del camino de servicio.
+
+Importa en un proceso nuevo (python -X importtime) los módulos que usa la app con
+el grafo ya en instantánea y falla (código 1) si la importación en frío supera el
+umbral o si arrastra alguna dependencia pesada que solo hace falta para descargar
+o reconstruir el grafo.
+
+Uso:
+    python benchmarks/presupuesto_importacion.py --umbral-ms 500
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos del camino de servicio (sin Streamlit, que la app necesita de todos modos)
+CAMINO_SERVICIO = [
+    'sistema_experto.grafo',
+    'sistema_experto.costos',
+    'sistema_experto.ruteo',
+    'sistema_experto.isocronas',
+    'sistema_experto.despacho',
+    'sistema_experto.mapa',
+    'sistema_experto.matriz_zonas',
+    'sistema_experto.rendimiento',
+    'sistema_experto.telemetria',
+    'sistema_experto.cli',
+]
+
+# Paquetes que solo se usan al construir el grafo o en búsquedas uno-a-todos
+PROHIBIDOS = ['osmnx', 'geopandas', 'shapely', 'pyproj', 'matplotlib', 'networkx', 'scipy', 'pandas']
+
+
+def tiempos_importacion(codigo):
+    """
+    Ejecuta 'codigo' con -X importtime. Retorna [(módulo, µs acumulados, nivel de anidamiento)].
+    """
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], cwd=RAIZ,
+                             capture_output=True, text=True, check=True)
+    modulos = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _, acumulado, nombre = linea[len('import time:'):].split('|')
+        modulos.append((nombre.strip(), int(acumulado), (len(nombre) - len(nombre.lstrip()) - 1) // 2))
+    return modulos
+
+
+def medir(modulos):
+    """
+    Tiempo de importación (ms) propio de los módulos, sin lo que ya carga el intérprete al arrancar,
+    y el conjunto de módulos importados.
+    """
+    arranque = {nombre for nombre, _, _ in tiempos_importacion('pass')}
+    importados = tiempos_importacion('import ' + ', '.join(modulos))
+    total_us = sum(acumulado for nombre, acumulado, nivel in importados if nivel == 0 and nombre not in arranque)
+    return total_us / 1000, {nombre for nombre, _, _ in importados}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--umbral-ms", type=float, default=500)
+    parser.add_argument("--repeticiones", type=int, default=5, help="Se toma la mediana")
+    args = parser.parse_args()
+
+    mediciones = []
+    for _ in range(args.repeticiones):
+        ms, importados = medir(CAMINO_SERVICIO)
+        mediciones.append(ms)
+    mediana = float(np.median(mediciones))
+    pesados = sorted({nombre.split('.')[0] for nombre in importados} & set(PROHIBIDOS))
+
+    print(f"Importación en frío del camino de servicio: {mediana:.0f} ms "
+          f"(mín {min(mediciones):.0f}, máx {max(mediciones):.0f}; umbral {args.umbral_ms:.0f} ms)")
+    falla = False
+    if pesados:
+        print(f"❌ Dependencias pesadas importadas: {', '.join(pesados)}")
+        falla = True
+    if mediana > args.umbral_ms:
+        print("❌ Se superó el presupuesto de importación")
+        falla = True
+    if falla:
+        sys.exit(1)
+    print("✅ Dentro del presupuesto")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+"""
+Núcleo del Sistema Experto de Emergencias: grafo, modelo de costo y ruteo.
+"""
@@ -0,0 +1,293 @@
+"""
+Estado compartido de patrullas, incidentes y asignaciones entre consolas de despacho.
+
+Una base SQLite local en modo WAL: los lectores no bloquean al escritor, así que
+decenas de consolas consultan a la vez mientras otra despacha. Cada transacción de
+escritura toma el siguiente número de una secuencia monótona y marca con él las filas
+que cambia. Una consola pide solo lo que cambió después del último número que vio
+(cambios(region, desde)), por índices (region, cambio), sin leer tablas completas.
+
+Los cambios de estado de una patrulla son optimistas: quien despacha envía la versión
+de la fila que vio y la actualización solo se aplica si nadie la cambió antes. Si dos
+consolas asignan la misma patrulla, o dos patrullas al mismo incidente, gana la
+primera y la otra recibe None.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS secuencia (valor INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS patrullas (
+    region TEXT NOT NULL,
+    id TEXT NOT NULL,
+    nodo INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    cambio INTEGER NOT NULL,
+    PRIMARY KEY (region, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS patrullas_cambio ON patrullas (region, cambio);
+CREATE TABLE IF NOT EXISTS incidentes (
+    id INTEGER PRIMARY KEY,
+    region TEXT NOT NULL,
+    nodo INTEGER NOT NULL,
+    lat REAL,
+    lon REAL,
+    estado TEXT NOT NULL,
+    creado REAL NOT NULL,
+    cambio INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS incidentes_cambio ON incidentes (region, cambio);
+CREATE INDEX IF NOT EXISTS incidentes_estado ON incidentes (region, estado);
+CREATE TABLE IF NOT EXISTS asignaciones (
+    id INTEGER PRIMARY KEY,
+    region TEXT NOT NULL,
+    patrulla TEXT NOT NULL,
+    incidente INTEGER REFERENCES incidentes (id),
+    tipo_ruta TEXT,
+    ruta TEXT NOT NULL,
+    tiempos TEXT NOT NULL,
+    inicio REAL NOT NULL,
+    ocupada INTEGER NOT NULL,
+    estado TEXT NOT NULL,
+    cambio INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS asignaciones_cambio ON asignaciones (region, cambio);
+CREATE INDEX IF NOT EXISTS asignaciones_estado ON asignaciones (region, estado, patrulla);
+"""
+
+# Espera máxima por el candado de escritura de otra conexión
+ESPERA_MS = 5000
+
+
+class _Conflicto(Exception):
+    pass
+
+
+class _Escritura:
+    """
+    Transacción de escritura (BEGIN IMMEDIATE) con su número de la secuencia en
+    cambio. Un _Conflicto dentro del bloque la revierte sin propagarse.
+    """
+
+    def __init__(self, conexion, secuencia=True):
+        self.conexion = conexion
+        self.secuencia = secuencia
+        self.cambio = None
+
+    def __enter__(self):
+        self.conexion.execute("BEGIN IMMEDIATE")
+        if self.secuencia:
+            self.cambio = self.execute("UPDATE secuencia SET valor = valor + 1 RETURNING valor").fetchone()[0]
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self.conexion.execute("COMMIT" if tipo is None else "ROLLBACK")
+        return tipo is _Conflicto
+
+    def execute(self, sql, parametros=()):
+        return self.conexion.execute(sql, parametros)
+
+    def executemany(self, sql, filas):
+        return self.conexion.executemany(sql, filas)
+
+
+class AlmacenDespacho:
+    """
+    Una conexión por hilo a la misma base; seguro para usar desde varias sesiones y
+    procesos. Lanza ValueError ante una patrulla desconocida.
+    """
+
+    def __init__(self, ruta):
+        carpeta = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(carpeta, exist_ok=True)
+        self.ruta = ruta
+        self._local = threading.local()
+        conexion = self._conexion()
+        conexion.executescript(ESQUEMA)
+        with self._escritura(secuencia=False) as conexion:
+            if conexion.execute("SELECT COUNT(*) FROM secuencia").fetchone()[0] == 0:
+                conexion.execute("INSERT INTO secuencia VALUES (0)")
+
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            # Transacciones explícitas (BEGIN IMMEDIATE) en lugar de las implícitas del módulo
+            conexion = sqlite3.connect(self.ruta, timeout=ESPERA_MS / 1000, isolation_level=None)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            # En WAL, NORMAL solo arriesga las últimas transacciones ante un corte de energía
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.execute("PRAGMA foreign_keys=ON")
+            self._local.conexion = conexion
+        return conexion
+
+    def _escritura(self, secuencia=True):
+        return _Escritura(self._conexion(), secuencia)
+
+    @property
+    def secuencia(self):
+        return self._conexion().execute("SELECT valor FROM secuencia").fetchone()[0]
+
+    def registrar_patrullas(self, region, patrullas):
+        """
+        Agrega las patrullas [{'id', 'nodo_actual', 'status'}] que la región aún no tiene.
+        """
+        with self._escritura() as conexion:
+            conexion.executemany(
+                "INSERT OR IGNORE INTO patrullas VALUES (?, ?, ?, ?, 1, ?)",
+                [(region, p['id'], int(p['nodo_actual']), p.get('status', 'disponible'), conexion.cambio)
+                 for p in patrullas])
+
+    def patrullas(self, region):
+        """
+        [{'id', 'nodo_actual', 'status', 'version'}] de la región.
+        """
+        filas = self._conexion().execute(
+            "SELECT id, nodo, status, version FROM patrullas WHERE region = ? ORDER BY id", (region,))
+        return [{'id': u, 'nodo_actual': n, 'status': s, 'version': v} for u, n, s, v in filas]
+
+    def asignar(self, region, patrulla, ruta, tiempos, version=None, incidente=None, tipo_ruta=None,
+                ocupada=True, inicio=None):
+        """
+        Asigna a una patrulla disponible la ruta (nodos y tiempos acumulados) hacia un
+        incidente: {'nodo', 'lat', 'lon'} crea uno nuevo y un id toma uno abierto.
+        ocupada=False es un traslado sin incidente (la patrulla sigue disponible).
+        Con version, solo si la fila de la patrulla no cambió desde esa versión.
+        Cancela la asignación activa previa (un traslado en curso). Retorna {'asignacion',
+        'incidente', 'version', 'secuencia'} o None si otra consola ganó la patrulla o
+        el incidente.
+        """
+        inicio = time.time() if inicio is None else inicio
+        with self._escritura() as conexion:
+            condicion = "region = ? AND id = ? AND status = 'disponible'"
+            parametros = [region, patrulla]
+            if version is not None:
+                condicion += " AND version = ?"
+                parametros.append(int(version))
+            fila = conexion.execute(
+                f"UPDATE patrullas SET status = ?, nodo = ?, version = version + 1, cambio = ? "
+                f"WHERE {condicion} RETURNING version",
+                ['en_ruta' if ocupada else 'disponible', int(ruta[0]), conexion.cambio] + parametros).fetchone()
+            if fila is None:
+                self._existe(conexion, region, patrulla)
+                raise _Conflicto()
+            nueva_version = fila[0]
+
+            if isinstance(incidente, dict):
+                incidente = conexion.execute(
+                    "INSERT INTO incidentes (region, nodo, lat, lon, estado, creado, cambio) "
+                    "VALUES (?, ?, ?, ?, 'asignado', ?, ?)",
+                    (region, int(incidente['nodo']), incidente.get('lat'), incidente.get('lon'), time.time(),
+                     conexion.cambio)).lastrowid
+            elif incidente is not None:
+                tomado = conexion.execute(
+                    "UPDATE incidentes SET estado = 'asignado', cambio = ? WHERE id = ? AND region = ? AND estado = 'abierto'",
+                    (conexion.cambio, int(incidente), region)).rowcount
+                if not tomado:
+                    raise _Conflicto()
+
+            self._cerrar_activa(conexion, region, patrulla, 'cancelada')
+            asignacion = conexion.execute(
+                "INSERT INTO asignaciones (region, patrulla, incidente, tipo_ruta, ruta, tiempos, inicio, ocupada, "
+                "estado, cambio) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'activa', ?)",
+                (region, patrulla, incidente, tipo_ruta, json.dumps([int(n) for n in ruta], separators=(',', ':')),
+                 json.dumps([round(float(t), 2) for t in tiempos], separators=(',', ':')), inicio, int(bool(ocupada)),
+                 conexion.cambio)).lastrowid
+            return {'asignacion': asignacion, 'incidente': incidente, 'version': nueva_version,
+                    'secuencia': conexion.cambio}
+        return None
+
+    def _existe(self, conexion, region, patrulla):
+        if conexion.execute("SELECT 1 FROM patrullas WHERE region = ? AND id = ?", (region, patrulla)).fetchone() is None:
+            raise ValueError(f"patrulla desconocida: {patrulla}")
+
+    def _cerrar_activa(self, conexion, region, patrulla, estado):
+        """
+        Cierra la asignación activa de la patrulla; retorna su incidente (o None).
+        """
+        fila = conexion.execute(
+            "UPDATE asignaciones SET estado = ?, cambio = ? WHERE region = ? AND estado = 'activa' AND patrulla = ? "
+            "RETURNING incidente", (estado, conexion.cambio, region, patrulla)).fetchone()
+        return fila[0] if fila else None
+
+    def completar(self, region, llegadas):
+        """
+        Cierra las asignaciones de las patrullas que llegaron [(id, nodo, asignación)]:
+        quedan disponibles en el nodo y su incidente, atendido. Solo si esa asignación
+        sigue activa (con asignación None, la activa que haya): otro proceso que vea la
+        misma llegada, o la de una ruta ya reemplazada, no cambia nada. Retorna las
+        patrullas actualizadas {id: version}.
+        """
+        versiones = {}
+        with self._escritura() as conexion:
+            for patrulla, nodo, asignacion in llegadas:
+                activa = conexion.execute(
+                    "SELECT id, incidente FROM asignaciones WHERE region = ? AND estado = 'activa' AND patrulla = ?",
+                    (region, patrulla)).fetchone()
+                if activa is None or asignacion not in (None, activa[0]):
+                    continue
+                incidente = self._cerrar_activa(conexion, region, patrulla, 'completada')
+                if incidente is not None:
+                    conexion.execute("UPDATE incidentes SET estado = 'atendido', cambio = ? WHERE id = ?",
+                                     (conexion.cambio, incidente))
+                versiones[patrulla] = conexion.execute(
+                    "UPDATE patrullas SET status = 'disponible', nodo = ?, version = version + 1, cambio = ? "
+                    "WHERE region = ? AND id = ? RETURNING version",
+                    (int(nodo), conexion.cambio, region, patrulla)).fetchone()[0]
+        return versiones
+
+    def liberar(self, region, patrulla, nodo=None):
+        """
+        Cancela la asignación activa: la patrulla queda disponible (en nodo, si se da) y
+        su incidente vuelve a abierto. Retorna la nueva versión de la patrulla.
+        """
+        with self._escritura() as conexion:
+            self._existe(conexion, region, patrulla)
+            incidente = self._cerrar_activa(conexion, region, patrulla, 'cancelada')
+            if incidente is not None:
+                conexion.execute("UPDATE incidentes SET estado = 'abierto', cambio = ? WHERE id = ?",
+                                 (conexion.cambio, incidente))
+            return conexion.execute(
+                "UPDATE patrullas SET status = 'disponible', nodo = COALESCE(?, nodo), version = version + 1, "
+                "cambio = ? WHERE region = ? AND id = ? RETURNING version",
+                (nodo, conexion.cambio, region, patrulla)).fetchone()[0]
+
+    def cambios(self, region, desde=0):
+        """
+        Filas de la región que cambiaron después de la secuencia desde, leídas en una
+        sola instantánea: {'secuencia', 'patrullas', 'incidentes', 'asignaciones'}.
+        Con desde=0 retorna el estado vigente: todas las patrullas, los incidentes sin
+        atender y las asignaciones activas.
+        """
+        conexion = self._conexion()
+        conexion.execute("BEGIN")
+        try:
+            secuencia = conexion.execute("SELECT valor FROM secuencia").fetchone()[0]
+            patrullas = conexion.execute(
+                "SELECT id, nodo, status, version FROM patrullas WHERE region = ? AND cambio > ? ORDER BY id",
+                (region, desde))
+            patrullas = [{'id': u, 'nodo_actual': n, 'status': s, 'version': v} for u, n, s, v in patrullas]
+            if desde > 0:
+                incidentes = conexion.execute(
+                    "SELECT id, nodo, lat, lon, estado FROM incidentes WHERE region = ? AND cambio > ?", (region, desde))
+                asignaciones = conexion.execute(
+                    "SELECT id, patrulla, incidente, tipo_ruta, ruta, tiempos, inicio, ocupada, estado "
+                    "FROM asignaciones WHERE region = ? AND cambio > ?", (region, desde))
+            else:
+                incidentes = conexion.execute(
+                    "SELECT id, nodo, lat, lon, estado FROM incidentes WHERE region = ? AND estado IN ('abierto', 'asignado')",
+                    (region,))
+                asignaciones = conexion.execute(
+                    "SELECT id, patrulla, incidente, tipo_ruta, ruta, tiempos, inicio, ocupada, estado "
+                    "FROM asignaciones WHERE region = ? AND estado = 'activa'", (region,))
+            incidentes = [{'id': i, 'nodo': n, 'lat': la, 'lon': lo, 'estado': e} for i, n, la, lo, e in incidentes]
+            asignaciones = [{'id': i, 'patrulla': p, 'incidente': inc, 'tipo_ruta': t, 'ruta': json.loads(r),
+                             'tiempos': json.loads(ts), 'inicio': ini, 'ocupada': bool(o), 'estado': e}
+                            for i, p, inc, t, r, ts, ini, o, e in asignaciones]
+        finally:
+            conexion.execute("COMMIT")
+        return {'secuencia': secuencia, 'patrullas': patrullas, 'incidentes': incidentes,
+                'asignaciones': asignaciones}
@@ -0,0 +1,137 @@
+"""
+Rutas alternativas para el despachador cuando la rápida y la segura coinciden.
+
+Método de mesetas: un árbol de Dijkstra desde el origen y otro hacia el destino,
+ambos acotados a estiramiento × óptimo. Los arcos que están en ambos árboles forman "mesetas", tramos que son camino
+mínimo en los dos sentidos. Cada meseta define una ruta vía origen → meseta →
+destino que es localmente óptima a lo largo de la meseta. Se aceptan las de menor
+costo que cumplan los límites de estiramiento, solape y optimalidad local, con el
+costo de solo dos búsquedas acotadas (la de ida se repite con un límite mayor si
+el primero, estimado desde la distancia en línea recta, no alcanza el destino).
+"""
+import time
+
+import numpy as np
+
+from .ruteo import heuristica, matriz_costos
+
+NUM_ALTERNATIVAS = 3
+# Costo máximo de una alternativa respecto de la óptima
+ESTIRAMIENTO_MAX = 1.25
+# Costo compartido máximo con cada ruta ya elegida, como fracción del óptimo
+SOLAPE_MAX = 0.8
+# Largo mínimo de la meseta (tramo localmente óptimo), como fracción del óptimo
+OPTIMALIDAD_LOCAL = 0.25
+# Primer límite de la búsqueda de ida, en múltiplos de la cota inferior del óptimo
+# (línea recta a velocidad máxima); en Tacna el óptimo ronda 5–6 veces la cota
+FACTOR_COTA = 6.0
+
+
+def _arbol_ida(matriz, origen, destino, limite):
+    """
+    Árbol de Dijkstra desde el origen con un límite que se duplica hasta alcanzar el
+    destino (sin límite si deja de crecer). Retorna (distancias, previos, límite
+    usado), o (None, None, ∞) si el destino no es alcanzable.
+    """
+    from scipy.sparse.csgraph import dijkstra
+
+    alcanzados = 0
+    while True:
+        ida, previo = dijkstra(matriz, directed=True, indices=origen, return_predecessors=True, limit=limite)
+        if np.isfinite(ida[destino]):
+            return ida, previo, limite
+        if not np.isfinite(limite):
+            return None, None, limite
+        explorados = int(np.isfinite(ida).sum())
+        # Sin nodos nuevos, el resto (si lo hay) está tras un arco más largo que el límite
+        limite = np.inf if explorados == alcanzados else 2 * limite
+        alcanzados = explorados
+
+
+def rutas_alternativas(grafo, origen, destino, pesos, k=NUM_ALTERNATIVAS, estiramiento=ESTIRAMIENTO_MAX,
+                       solape=SOLAPE_MAX, optimalidad=OPTIMALIDAD_LOCAL):
+    """
+    Hasta k rutas alternativas a la de menor costo entre origen y destino.
+
+    Cada una cuesta a lo más estiramiento × óptimo, comparte a lo más solape ×
+    óptimo con la óptima y con cada alternativa previa, y contiene un tramo
+    localmente óptimo de al menos optimalidad × óptimo. Retorna una lista (vacía si
+    no hay ruta) de {'ruta', 'arcos', 'costo', 'estiramiento', 'solape', 'meseta',
+    'nodos_explorados', 'tiempo_ms'}, de menor a mayor costo, sin la óptima.
+    """
+    from scipy.sparse.csgraph import dijkstra
+
+    inicio = time.perf_counter()
+    pesos = np.asarray(pesos, dtype=np.float64)
+    matriz, arcos = matriz_costos(grafo, pesos, con_arcos=True)
+    if origen == destino:
+        return []
+    cota = max(float(heuristica(grafo, destino)[origen]), 1.0)
+    ida, previo, alcance = _arbol_ida(matriz, origen, destino, estiramiento * FACTOR_COTA * cota)
+    if ida is None:
+        return []
+    optimo = ida[destino]
+    limite = estiramiento * optimo
+    if limite > alcance:
+        ida, previo = dijkstra(matriz, directed=True, indices=origen, return_predecessors=True, limit=limite)
+    vuelta, siguiente = dijkstra(matriz.T.tocsr(), directed=True, indices=destino, return_predecessors=True,
+                                 limit=limite)
+
+    # Arcos de meseta u→w: w cuelga de u en el árbol de ida y u de w en el de vuelta
+    w = np.flatnonzero((previo >= 0) & (ida + vuelta <= limite))
+    u = previo[w]
+    en_meseta = siguiente[u] == w
+    u, w = u[en_meseta], w[en_meseta]
+    salida = dict(zip(u.tolist(), w.tolist()))
+    # Cada meseta es una cadena: empieza donde no entra ningún arco de meseta
+    comienzos = np.setdiff1d(u, w)
+    finales = comienzos.copy()
+    for i, nodo in enumerate(finales.tolist()):
+        while nodo in salida:
+            nodo = salida[nodo]
+        finales[i] = nodo
+    costo = ida[comienzos] + vuelta[comienzos]
+    meseta = ida[finales] - ida[comienzos]
+    # La óptima es la meseta que va del origen al destino
+    validas = (meseta >= optimalidad * optimo) & (costo <= limite) & (comienzos != origen)
+    orden = np.flatnonzero(validas)[np.argsort(costo[validas], kind='stable')]
+
+    def camino(final):
+        # Origen → final por el árbol de ida y final → destino por el de vuelta
+        ruta = [int(final)]
+        while ruta[-1] != origen:
+            ruta.append(int(previo[ruta[-1]]))
+        ruta.reverse()
+        while ruta[-1] != destino:
+            ruta.append(int(siguiente[ruta[-1]]))
+        return ruta
+
+    def arcos_de(ruta):
+        return (np.asarray(arcos[ruta[:-1], ruta[1:]]).ravel() - 1).astype(np.int64)
+
+    elegidas = [arcos_de(camino(destino))]
+    alternativas = []
+    for i in orden.tolist():
+        if len(alternativas) >= k:
+            break
+        ruta = camino(finales[i])
+        if len(set(ruta)) != len(ruta):
+            continue  # los dos árboles se cruzan: la ruta vía tendría un ciclo
+        arcos_ruta = arcos_de(ruta)
+        compartido = max(pesos[np.intersect1d(arcos_ruta, previa)].sum() for previa in elegidas)
+        if compartido > solape * optimo:
+            continue
+        elegidas.append(arcos_ruta)
+        alternativas.append({
+            'ruta': ruta,
+            'arcos': arcos_ruta.tolist(),
+            'costo': float(costo[i]),
+            'estiramiento': float(costo[i] / optimo),
+            'solape': float(compartido / optimo),
+            'meseta': float(meseta[i]),
+        })
+    explorados = int(np.isfinite(ida).sum() + np.isfinite(vuelta).sum())
+    tiempo_ms = (time.perf_counter() - inicio) * 1000
+    for alternativa in alternativas:
+        alternativa.update(nodos_explorados=explorados, tiempo_ms=tiempo_ms)
+    return alternativas
@@ -0,0 +1,707 @@
+"""
+Interfaz de Streamlit del Sistema Experto de Emergencias. realtime_map.py y
+sistema_experto_emergencias_fixed.py solo llaman a main(); importar este módulo
+no dibuja nada.
+"""
+import datetime
+import os
+import random
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+import streamlit.components.v1 as components
+
+from .almacen import AlmacenDespacho
+from .bitacora import BitacoraDespacho
+from .calentamiento import ETAPAS, Calentamiento
+from .cliente import ClienteRuteo
+from .costos import calcular_costos, nivel_trafico_en
+from .despacho import MARGEN_PRESELECCION_S, MAX_CANDIDATOS_ASTAR, PERCENTIL_ETA
+from .fiabilidad import PLAZO_MIN
+from .isocronas import isocronas_patrullas, UMBRALES_MIN
+from .mapa import CENTRO_MAPA, generar_mapa_html
+from .posicionamiento import planes_espera
+from .regiones import LIMITE_MB, RegistroRegiones
+from .rendimiento import RegistroRendimiento, iniciar_servidor_metricas
+from .seguimiento import iniciar_servidor_seguimiento, obtener_flota
+from .telemetria import RegistroTelemetria, iniciar_colector
+
+# --- Telemetría del Mapa (eventos de despacho enviados por el iframe) ---
+# TELEMETRIA_PUERTO=0 la desactiva; TELEMETRIA_URL es la dirección pública del colector
+# si el navegador no llega directamente al puerto (p. ej. detrás de un proxy).
+TELEMETRIA_PUERTO = int(os.environ.get("TELEMETRIA_PUERTO", "8766"))
+TELEMETRIA_URL = os.environ.get("TELEMETRIA_URL")
+
+# --- Seguimiento en Vivo (flota compartida por todas las sesiones del proceso) ---
+# SEGUIMIENTO_PUERTO=0 lo desactiva; SEGUIMIENTO_URL es la dirección pública del servidor.
+# SEGUIMIENTO_ACELERACION > 1 acelera el avance simulado de las patrullas (demostraciones).
+# SEGUIMIENTO_TOKEN fija el token que exige el servidor (p. ej. para los equipos GPS); vacío,
+# se genera uno al azar por proceso que solo conoce el mapa.
+SEGUIMIENTO_TOKEN = os.environ.get("SEGUIMIENTO_TOKEN")
+SEGUIMIENTO_PUERTO = int(os.environ.get("SEGUIMIENTO_PUERTO", "8767"))
+SEGUIMIENTO_URL = os.environ.get("SEGUIMIENTO_URL")
+SEGUIMIENTO_ACELERACION = float(os.environ.get("SEGUIMIENTO_ACELERACION", "1"))
+# Base SQLite (modo WAL) con patrullas, incidentes y asignaciones, compartida por todas las
+# consolas y procesos y conservada entre recargas; vacía, el estado de la flota vive en memoria.
+ESTADO_DESPACHO = os.environ.get("ESTADO_DESPACHO", os.path.join("estado", "despacho.sqlite3"))
+# Bitácora de solo anexado de las decisiones y cambios de estado (python -m sistema_experto replay
+# la reproduce); vacía, no se registra nada.
+BITACORA_DESPACHO = os.environ.get("BITACORA_DESPACHO", "bitacora")
+
+# Carpeta generada por: python -m sistema_experto precompute
+CARPETA_MATRICES = os.environ.get("MATRICES_ZONAS", "matrices")
+
+# Instantánea del grafo empaquetado; se crea en el primer arranque (o con: python -m sistema_experto snapshot)
+CARPETA_INSTANTANEA = os.environ.get("INSTANTANEA_GRAFO", "instantanea")
+
+# Servicio de ruteo compartido (python -m sistema_experto serve); sin él las isócronas se calculan en la app
+SERVICIO_RUTEO = os.environ.get("SERVICIO_RUTEO")
+
+# Raíz del registro de regiones (una instantánea por subcarpeta); sin ella se sirve solo Tacna
+CARPETA_REGIONES = os.environ.get("REGIONES_GRAFO")
+LIMITE_REGIONES_MB = float(os.environ.get("REGIONES_LIMITE_MB", LIMITE_MB))
+
+try:
+    peru_tz = ZoneInfo("America/Lima")
+except Exception:
+    # Fallback a un offset fijo si ZoneInfo falla
+    peru_tz = datetime.timezone(datetime.timedelta(hours=-5), name='PET')
+
+
+# --- Medición de Rendimiento por Etapa ---
+@st.cache_resource
+def obtener_registro_rendimiento():
+    """
+    Registro de tiempos por etapa compartido por todas las sesiones.
+    Con METRICAS_PUERTO definido también se sirve /metrics para Prometheus.
+    """
+    registro = RegistroRendimiento()
+    puerto = os.environ.get("METRICAS_PUERTO")
+    if puerto:
+        iniciar_servidor_metricas(registro, int(puerto))
+    return registro
+
+
+@st.cache_resource
+def iniciar_telemetria(puerto):
+    """
+    Registro rotativo de telemetría y su colector HTTP, uno por proceso.
+    Retorna None si el puerto no está disponible.
+    """
+    registro = RegistroTelemetria(os.environ.get("TELEMETRIA_CARPETA", "telemetria"))
+    try:
+        iniciar_colector(registro, puerto, os.environ.get("TELEMETRIA_HOST", "127.0.0.1"))
+    except OSError:
+        return None
+    return registro
+
+
+@st.cache_resource
+def iniciar_seguimiento(puerto):
+    """
+    Flotas por región y su servidor HTTP, uno por proceso: (flotas, token del servidor).
+    Retorna None si el puerto no está disponible.
+    """
+    flotas = {}
+    try:
+        servidor = iniciar_servidor_seguimiento(flotas, puerto, os.environ.get("SEGUIMIENTO_HOST", "127.0.0.1"),
+                                                SEGUIMIENTO_TOKEN)
+    except OSError:
+        return None
+    return flotas, servidor.token
+
+
+@st.cache_resource
+def obtener_almacen(ruta):
+    """
+    Almacén del estado de despacho, uno por proceso (cada hilo abre su conexión).
+    """
+    return AlmacenDespacho(ruta)
+
+
+@st.cache_resource
+def obtener_bitacora(carpeta):
+    """
+    Bitácora de despacho del proceso (escribe en su propio segmento de la carpeta).
+    """
+    return BitacoraDespacho(carpeta)
+
+
+# Etiqueta y descripción de cada nivel; las franjas horarias están en costos.HORARIO_TRAFICO
+ETIQUETAS_TRAFICO = {
+    "trafico_minimo": ("🟢 Tráfico Mínimo", "Vías despejadas"),
+    "trafico_bajo": ("🟢 Tráfico Bajo", "Poco tráfico"),
+    "trafico_medio": ("🟡 Tráfico Medio", "Congestión media"),
+    "trafico_alto": ("🟠 Tráfico Alto", "Congestión alta"),
+    "trafico_extremo": ("🔴 Tráfico Extremo", "Máxima congestión"),
+}
+
+
+def obtener_nivel_trafico(hora):
+    """
+    Determina el nivel de tráfico basado en la hora del día con 5 niveles.
+    """
+    nivel = nivel_trafico_en(hora.hour + hora.minute / 60.0)
+    return (nivel, *ETIQUETAS_TRAFICO[nivel])
+
+
+# --- Precarga del Grafo (hilo de fondo compartido por todo el proceso) ---
+@st.cache_resource
+def obtener_calentamiento():
+    """
+    La primera ejecución del proceso lanza la precarga del grafo (instantánea o
+    construcción con osmnx), la matriz zona × zona y la carga del mapa; las
+    sesiones siguientes reutilizan el mismo estado ya cargado.
+    """
+    return Calentamiento(CARPETA_INSTANTANEA, "Tacna, Peru", CARPETA_MATRICES).iniciar()
+
+
+@st.cache_resource
+def obtener_registro_regiones(raiz, limite_mb):
+    """
+    Registro de regiones compartido por todas las sesiones, con un solo techo de
+    memoria para el proceso. Retorna None si la raíz no tiene regiones.
+    """
+    registro = RegistroRegiones(raiz, int(limite_mb * 1024 * 1024))
+    return registro if registro.regiones else None
+
+
+def seleccionar_region(registro):
+    """
+    Selector de regiones del panel lateral. Varias regiones con cajas solapadas se
+    sirven fusionadas (rutas entre distritos vecinos). Retorna el nombre de la entrada.
+    """
+    disponibles = list(registro.regiones)
+    elegidas = st.sidebar.multiselect(
+        "🗺️ Regiones:",
+        options=disponibles,
+        default=disponibles[:1],
+        help="Elija varias regiones vecinas para rutear entre ellas sobre un grafo fusionado"
+    ) or disponibles[:1]
+    try:
+        nombre = registro.nombre_fusion(elegidas)
+    except ValueError as e:
+        st.sidebar.error(f"❌ {e}; se usa {elegidas[0]}")
+        nombre = elegidas[0]
+    estado = registro.estado()
+    st.sidebar.caption(
+        f"💾 Regiones en memoria: {len(estado['cargadas'])} · "
+        f"{estado['uso_bytes'] / 2**20:.0f} / {estado['limite_bytes'] / 2**20:.0f} MB · "
+        f"{estado['desalojos']} desalojos"
+    )
+    return nombre
+
+
+@st.fragment(run_every=1)
+def panel_calentamiento(calentamiento):
+    """
+    Avance de la precarga; se refresca cada segundo y al terminar recarga la página completa.
+    """
+    if calentamiento.terminado:
+        st.rerun()
+    estado = calentamiento.estado()
+    st.progress(estado['progreso'], text=f"⏳ {estado['descripcion'] or 'Iniciando'}… ({estado['segundos']:.0f} s)")
+    hechas = [f"✅ {descripcion} ({estado['duraciones'][nombre]:.1f} s)"
+              for nombre, descripcion in ETAPAS if nombre in estado['duraciones']]
+    if hechas:
+        st.caption(" · ".join(hechas))
+    st.info("🚫 El ruteo y el modo emergencia se habilitan al terminar la carga. El panel lateral ya se puede usar.")
+
+
+@st.cache_resource
+def obtener_cliente_ruteo(url, num_nodos, num_arcos):
+    """
+    Cliente con conexiones persistentes compartido por todas las sesiones. Lanza
+    ConnectionError si el servicio no responde y ValueError si sirve otro grafo
+    (las excepciones no se cachean: se reintenta en la próxima ejecución).
+    """
+    cliente = ClienteRuteo(url)
+    salud = cliente.salud()
+    if (salud['nodos'], salud['arcos']) != (num_nodos, num_arcos):
+        cliente.cerrar()
+        raise ValueError(f"el servicio sirve otro grafo ({salud['nodos']} nodos, {salud['arcos']} arcos)")
+    return cliente
+
+
+@st.cache_data
+def calcular_isocronas(_grafo, region, nivel_trafico, condicion_clima, patrullas):
+    """
+    Isócronas de todas las patrullas con los costos μ vigentes (un Dijkstra acotado por patrulla).
+    Con SERVICIO_RUTEO las calcula el servicio; si no responde, la propia app.
+    """
+    if SERVICIO_RUTEO and region is None:
+        try:
+            cliente = obtener_cliente_ruteo(SERVICIO_RUTEO, _grafo.num_nodos, _grafo.num_arcos)
+            return cliente.isocronas(patrullas, nivel_trafico, condicion_clima)
+        except (ConnectionError, ValueError, RuntimeError):
+            pass
+    mu, _ = calcular_costos(_grafo, nivel_trafico, condicion_clima)
+    return isocronas_patrullas(_grafo, mu, patrullas)
+
+
+@st.cache_data
+def calcular_planes_espera(_grafo, _matriz_zonas, region, nivel_trafico, max_unidades):
+    """
+    Zonas de espera para cada número de patrullas libres (p-mediana sobre la matriz
+    de zonas), con la demanda del modelo espacial de incidentes del simulador.
+    """
+    from .simulador import pesos_espaciales
+
+    return planes_espera(_matriz_zonas, nivel_trafico, pesos_espaciales(_grafo), max_unidades)
+
+
+def main():
+    st.set_page_config(
+        page_title="Sistema Experto de Emergencias",
+        page_icon="🚨",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+
+    registro_regiones = obtener_registro_regiones(CARPETA_REGIONES, LIMITE_REGIONES_MB) if CARPETA_REGIONES else None
+    calentamiento = obtener_calentamiento() if registro_regiones is None else None
+    registro_rendimiento = obtener_registro_rendimiento()
+    ejecucion_actual = registro_rendimiento.nueva_ejecucion()
+    telemetria_activa = TELEMETRIA_PUERTO > 0 and iniciar_telemetria(TELEMETRIA_PUERTO) is not None
+    seguimiento = iniciar_seguimiento(SEGUIMIENTO_PUERTO) if SEGUIMIENTO_PUERTO > 0 else None
+    flotas, token_seguimiento = seguimiento if seguimiento is not None else (None, None)
+
+    hora_actual = datetime.datetime.now(peru_tz)
+    hora_formateada = hora_actual.strftime("%H:%M:%S - %d/%m/%Y")
+
+    nivel_trafico, estado_trafico, descripcion_trafico = obtener_nivel_trafico(hora_actual)
+
+    # Mostrar información de estado de tráfico
+    col_estado1, col_estado2 = st.columns(2)
+    with col_estado1:
+        st.warning(f"{estado_trafico}")
+    with col_estado2:
+        st.markdown(f"**📋 Estado:** {descripcion_trafico}")
+
+    st.markdown("---")
+
+    # --- Interfaz de Usuario (Sidebar) ---
+    st.sidebar.header("⚙️ Panel de Control del Sistema Experto")
+    st.sidebar.markdown("**Configuración de Simulación**")
+
+    region = None
+    if registro_regiones is not None:
+        region = seleccionar_region(registro_regiones)
+        calentamiento = registro_regiones.calentamiento(region)
+
+    # Activación del modo de incidentes
+    modo_incidente_activo = st.sidebar.toggle(
+        "🚨 Activar Modo Emergencia", 
+        value=False,
+        disabled=not calentamiento.listo,
+        help="Permite reportar incidentes haciendo clic en el mapa"
+    )
+
+    modo_lote_activo = st.sidebar.toggle(
+        "📦 Despacho por Lotes", 
+        value=False,
+        disabled=not modo_incidente_activo,
+        help="Registra varios incidentes simultáneos y los asigna de forma óptima (algoritmo húngaro)"
+    )
+
+    # Factores dinámicos según especificaciones
+    st.sidebar.markdown("**Factores Dinámicos**")
+
+    # Mostrar el nivel de tráfico actual calculado automáticamente
+    st.sidebar.markdown(f"**Nivel de Tráfico Actual:**")
+    st.sidebar.markdown(f"{estado_trafico}")
+    st.sidebar.caption(f"{descripcion_trafico}")
+
+    # Opción manual para override del tráfico
+    usar_horario_manual = st.sidebar.checkbox(
+        "🔧 Usar configuración manual de tráfico",
+        value=False,
+        help="Permite sobrescribir el nivel de tráfico automático"
+    )
+
+    if usar_horario_manual:
+        nivel_trafico_manual = st.sidebar.selectbox(
+            "Nivel de Tráfico (Manual):",
+            options=['trafico_minimo', 'trafico_bajo', 'trafico_medio', 'trafico_alto', 'trafico_extremo'],
+            index=2,
+            help="Configuración manual de los 5 niveles de tráfico"
+        )
+        st.sidebar.warning("⚠️ Usando configuración manual")
+        nivel_trafico_usado = nivel_trafico_manual
+    else:
+        st.sidebar.success(f"✅ Usando tráfico automático: **{nivel_trafico}**")
+        nivel_trafico_usado = nivel_trafico
+
+    # Condiciones climáticas incluyendo neblina
+    condicion_clima = st.sidebar.selectbox(
+        "Condiciones Climáticas:",
+        options=['despejado', 'lluvia', 'neblina'],
+        help="Factor climático que afecta la velocidad en toda la red"
+    )
+
+    # Parámetro de riesgo k para el modelo de costo dual
+    st.sidebar.markdown("**Parámetros de Optimización**")
+    factor_riesgo_k = st.sidebar.slider(
+        "Factor de Aversión al Riesgo (k):",
+        min_value=0.0,
+        max_value=3.0,
+        value=1.5,
+        step=0.1,
+        help="Controla la importancia de la incertidumbre en la ruta segura: Costo_Seguro(e) = μ(e) + k×σ(e). k=0: solo tiempo esperado, k=3: muy conservador"
+    )
+    percentil_eta = st.sidebar.slider(
+        "Percentil de ETA para elegir patrulla:",
+        min_value=50,
+        max_value=99,
+        value=PERCENTIL_ETA,
+        help="Las patrullas se ordenan por su ETA en este percentil (Σμ + z·√Σσ² de su ruta). 50 = tiempo esperado; más alto penaliza las rutas por vías volátiles"
+    )
+    plazo_llegada_min = st.sidebar.slider(
+        "Plazo de llegada (min):",
+        min_value=3,
+        max_value=30,
+        value=PLAZO_MIN,
+        help="Las recomendaciones muestran la probabilidad de llegar dentro de este plazo (simulación Monte Carlo)"
+    )
+    correlacion_via = st.sidebar.slider(
+        "Correlación por tipo de vía (ρ):",
+        min_value=0.0,
+        max_value=0.9,
+        value=0.0,
+        step=0.1,
+        help="ρ=0: tiempos de arcos independientes; ρ>0: la congestión afecta a la vez a todas las vías del mismo tipo"
+    )
+    max_candidatos_astar = st.sidebar.slider(
+        "Patrullas preseleccionadas por zona (0 = todas):",
+        min_value=0,
+        max_value=10,
+        value=MAX_CANDIDATOS_ASTAR,
+        help="Con la matriz de zonas, el A* del mapa se calcula solo para las patrullas con menor ETA de zona (y las que quedan dentro del margen). 0 evalúa todas las disponibles"
+    )
+    margen_preseleccion_s = st.sidebar.slider(
+        "Margen de preselección (s):",
+        min_value=0,
+        max_value=600,
+        value=MARGEN_PRESELECCION_S,
+        step=30,
+        help="También se evalúan las patrullas cuya ETA de zona no supera la de la última preseleccionada en más de este margen"
+    )
+
+    # Información del modelo
+    st.sidebar.markdown("**Información del Modelo**")
+    st.sidebar.info(f"""
+    **Funciones de Costo Probabilístico:**
+    - 🏃‍♂️ Rápida: Costo(e) = μ(e)
+    - 🛡️ Segura: Costo(e) = μ(e) + k×σ(e)
+
+    **Donde:**
+    - μ(e) = tiempo esperado con todos los factores dinámicos
+    - σ(e) = incertidumbre/volatilidad dependiente del tipo de vía
+    - k = {factor_riesgo_k} (factor de aversión al riesgo ajustable)
+
+    **Sistema de Tráfico Granular (5 niveles):**
+    - 🟢 Tráfico Mínimo: Avenidas 0.7×, Jirones 0.8×
+    - 🟢 Tráfico Bajo: Avenidas 1.0×, Jirones 1.1×  
+    - 🟡 Tráfico Medio: Avenidas 1.5×, Jirones 1.3×
+    - 🟠 Tráfico Alto: Avenidas 2.2×, Jirones 1.8×
+    - 🔴 Tráfico Extremo: Avenidas 3.0×, Jirones 2.5×
+
+    **Factores de Incertidumbre (σ base):**
+    - Avenidas: 0.4 (MUY VARIABLES)
+    - Jirones comerciales: 0.35 (VARIABLES)
+    - Colectoras: 0.25 (ALGO VARIABLES)
+    - Residenciales: 0.15 (ESTABLES)
+
+    **Multiplicadores de Incertidumbre:**
+    - 🌧️ Lluvia: ×1.8 en σ(e)
+    - 🌫️ Neblina: ×1.6 en σ(e)
+    - 🔴 Tráfico extremo: ×2.0 en σ(e)
+    - 🏪 Zonas especiales: +80% de penalización a σ(e)
+
+    **Zonas Especiales (según proyecto):**
+    - 🏪 Mercados: 1.7× - 2.5× (horas comerciales)
+    - 🚌 Paraderos informales: 1.4× - 1.6× (constante)
+    - 🏛️ Centro histórico: 1.3× - 1.5× (calles angostas)
+    - 🏫 Zonas escolares: 2.0× - 3.5× (horas pico)
+    - 🛣️ Vías en mal estado: 1.8× - 3.0× (permanente)
+    - 🏥 Hospitales: 1.25× - 1.4× (congestión)
+    - ⚠️ Cruces sin semáforo: 1.3× - 1.7× (variable)
+
+    **Nivel Actual:** {estado_trafico}
+    **Clima:** {condicion_clima.title()}
+    **Factor k actual:** {factor_riesgo_k} ({'Conservador' if factor_riesgo_k > 2.0 else 'Moderado' if factor_riesgo_k > 1.0 else 'Agresivo'})
+    """)
+
+    # Grafo principal (precargado en segundo plano)
+    with registro_rendimiento.etapa('cargar_grafo_tacna') as medicion:
+        grafo = calentamiento.grafo if calentamiento.listo else None
+        if grafo is not None:
+            medicion.objetos = grafo.num_nodos + grafo.num_arcos
+
+    if grafo is not None:
+        st.success(f"✅ Grafo de {region or 'Tacna'} cargado: {grafo.num_nodos} nodos, {grafo.num_arcos} arcos")
+
+        # --- INICIO DE LA CORRECCIÓN ---
+        # Usar el estado de la sesión (st.session_state) para que las patrullas
+        # no se reinicien en cada interacción con la UI.
+
+        # Comprobar si las patrullas ya han sido inicializadas en esta sesión.
+        matriz_zonas = calentamiento.matriz_zonas
+        if matriz_zonas is not None and nivel_trafico_usado not in matriz_zonas.niveles:
+            matriz_zonas = None
+        clave_flota = region or 'Tacna'
+        flota = None
+        if flotas is not None:
+            almacen = obtener_almacen(ESTADO_DESPACHO) if ESTADO_DESPACHO else None
+            bitacora = obtener_bitacora(BITACORA_DESPACHO) if BITACORA_DESPACHO else None
+            flota = obtener_flota(flotas, clave_flota, grafo, SEGUIMIENTO_ACELERACION, almacen, bitacora)
+        if flota is not None and flota.num_unidades:
+            # Otra sesión (o una ejecución anterior, con almacén) ya inició la flota: todas
+            # las consolas ven las mismas patrullas
+            st.session_state.patrullas_data = flota.patrullas()
+            st.session_state.region_patrullas = region
+        elif 'patrullas_data' not in st.session_state or st.session_state.get('region_patrullas') != region:
+            num_patrullas = min(5, grafo.num_nodos)
+            # Arrancan en las posiciones de espera (al azar si no hay matriz de zonas)
+            if matriz_zonas is not None:
+                planes = calcular_planes_espera(grafo, matriz_zonas, region, nivel_trafico_usado, num_patrullas)
+                patrol_nodes = [int(matriz_zonas.representantes[z]) for z in planes[num_patrullas]]
+            else:
+                patrol_nodes = random.sample(range(grafo.num_nodos), num_patrullas)
+
+            # Crear la lista inicial de patrullas
+            patrullas_data_inicial = []
+            for i, node in enumerate(patrol_nodes):
+                patrullas_data_inicial.append({
+                    'id': f"U-{i+1:02d}",
+                    'nodo_actual': int(node),
+                    'status': 'disponible'
+                })
+
+            # Guardar la lista en el estado de la sesión para persistirla
+            st.session_state.patrullas_data = patrullas_data_inicial
+            st.session_state.region_patrullas = region
+        if flota is not None:
+            flota.registrar(st.session_state.patrullas_data)
+
+        # En cada recarga, obtener los datos de las patrullas desde el estado de la sesión
+        patrullas_data = st.session_state.patrullas_data
+        # --- FIN DE LA CORRECCIÓN ---
+
+        # ETAs precalculadas desde la zona de cada patrulla (si existe la matriz)
+        with registro_rendimiento.etapa('eta_zonas') as medicion:
+            eta_zonas = None
+            if matriz_zonas is not None:
+                matriz_eta = matriz_zonas.matriz(nivel_trafico_usado)
+                eta_zonas = {}
+                for p in patrullas_data:
+                    fila = matriz_eta[matriz_zonas.zona_de_nodo[p['nodo_actual']]]
+                    eta_zonas[p['id']] = [round(float(t), 1) if np.isfinite(t) else None for t in fila]
+                medicion.objetos = sum(len(fila) for fila in eta_zonas.values())
+
+        # Posiciones de espera por número de patrullas libres; el mapa reposiciona al despachar
+        with registro_rendimiento.etapa('posiciones_espera') as medicion:
+            espera = None
+            if matriz_zonas is not None:
+                planes = calcular_planes_espera(grafo, matriz_zonas, region, nivel_trafico_usado, len(patrullas_data))
+                zonas = sorted({z for plan in planes for z in plan})
+                espera = {
+                    'planes': [[{'nodo': int(matriz_zonas.representantes[z]), 'zona': int(z)} for z in plan]
+                               for plan in planes],
+                    # Filas de ETA de cada zona de espera, para la preselección tras mover una patrulla
+                    'filas': {z: [round(float(t), 1) if np.isfinite(t) else None for t in matriz_eta[z]]
+                              for z in zonas},
+                }
+                medicion.objetos = len(zonas)
+
+        # Datos de nodos y arcos para JavaScript (serializados una sola vez en la precarga)
+        with registro_rendimiento.etapa('nodes_data') as medicion:
+            nodes_json = calentamiento.nodes_json
+            medicion.bytes, medicion.objetos = len(nodes_json), grafo.num_nodos
+
+        with registro_rendimiento.etapa('edges_data') as medicion:
+            edges_json = calentamiento.edges_json
+            medicion.bytes, medicion.objetos = len(edges_json), grafo.num_arcos
+
+        # Estado del sistema
+        st.markdown("### 📊 Estado del Sistema")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("🗺️ Nodos", grafo.num_nodos)
+        with col2:
+            st.metric("🛣️ Arcos", grafo.num_arcos)
+        with col3:
+            st.metric("🚔 Patrullas", len(patrullas_data))
+        with col4:
+            patrullas_disponibles = len([p for p in patrullas_data if p['status'] == 'disponible'])
+            st.metric("✅ Disponibles", patrullas_disponibles)
+
+        # Información del modo actual
+        if modo_incidente_activo:
+            st.success("🚨 **Modo Emergencia Activado:** Haga clic en el mapa para reportar un incidente")
+        else:
+            st.warning("⚠️ **Modo Emergencia Desactivado:** Active el interruptor en el panel lateral")
+
+        # Información del modelo (movida arriba del mapa)
+        st.markdown("### 📈 Información del Modelo")
+        col_info1, col_info2 = st.columns(2)
+
+        with col_info1:
+            st.markdown(f"""
+            **⚡ Modelo Probabilístico de Costo Dual:**
+            - Ruta Rápida: `Costo(e) = μ(e)`
+            - Ruta Segura: `Costo(e) = μ(e) + k×σ(e)`
+            - **μ(e):** Tiempo esperado con factores dinámicos
+            - **σ(e):** Incertidumbre por tipo de vía y condiciones
+            - **k = {factor_riesgo_k}:** Factor de aversión al riesgo
+            - **🕐 Tráfico dinámico:** {estado_trafico}
+            - **🌤️ Condición climática:** {condicion_clima.title()}
+
+            **🛡️ Factores de Incertidumbre (σ base):**
+            - Avenidas: **0.4** (muy variables)
+            - Jirones: **0.35** (variables)  
+            - Colectoras: **0.25** (algo variables)
+            - Residenciales: **0.15** (estables)
+            """)
+
+        with col_info2:
+            st.markdown(f"""
+            **📊 Sistema de Tráfico Granular (5 Niveles):**
+            - 🟢 **Mínimo:** Avenidas 0.7×, Jirones 0.8×
+            - 🟢 **Bajo:** Avenidas 1.0×, Jirones 1.1×
+            - 🟡 **Medio:** Avenidas 1.5×, Jirones 1.3×
+            - 🟠 **Alto:** Avenidas 2.2×, Jirones 1.8×
+            - 🔴 **Extremo:** Avenidas 3.0×, Jirones 2.5×
+
+            **🌦️ Multiplicadores de Incertidumbre:**
+            - ☀️ Despejado: Sin multiplicador
+            - 🌧️ Lluvia: ×1.8 en σ(e)
+            - 🌫️ Neblina: ×1.6 en σ(e)
+            - 🔴 Tráfico extremo: ×2.0 en σ(e)
+
+            **🛡️ Factor k = {factor_riesgo_k}:**
+            {'🔴 Muy Conservador' if factor_riesgo_k > 2.5 else '🟠 Conservador' if factor_riesgo_k > 2.0 else '🟡 Moderado' if factor_riesgo_k > 1.0 else '🟢 Agresivo'}
+            """)
+
+        # Mostrar factores actuales aplicados
+        st.info(f"""
+        **🎯 Factores Actuales Aplicados:**
+        • **Nivel de tráfico:** {nivel_trafico_usado.replace('_', ' ').title()}
+        • **Condición climática:** {condicion_clima.title()}
+        • **Nivel de aversión al riesgo:** k = {factor_riesgo_k} ({'Muy Conservador' if factor_riesgo_k > 2.5 else 'Conservador' if factor_riesgo_k > 2.0 else 'Moderado' if factor_riesgo_k > 1.0 else 'Agresivo'})
+        • **Modelo probabilístico:** μ(e) + k×σ(e) activo para ruta segura
+        • **Todas las zonas especiales:** Activas con simulación probabilística
+        """)
+
+        # Controles del grafo (movidos arriba del mapa)
+        st.markdown("### 🗺️ Controles de Visualización")
+
+        col_control1, col_control2 = st.columns([1, 2])
+
+        with col_control1:
+            mostrar_grafo = st.toggle(
+                "🗺️ Mostrar Red Vial", 
+                value=False,
+                help="Visualiza todas las conexiones de calles en el mapa"
+            )
+            mostrar_isocronas = st.toggle(
+                "⏱️ Mostrar Isócronas", 
+                value=False,
+                help=f"Calles alcanzables por cada patrulla en {', '.join(str(u) for u in UMBRALES_MIN)} minutos con el tráfico y clima actuales"
+            )
+
+        with col_control2:
+            if mostrar_grafo:
+                st.info(f"""
+                **📊 Red Vial Completa:**
+                🛣️ **{grafo.num_arcos}** conexiones viales
+                🏛️ **{grafo.num_nodos}** intersecciones
+
+                **Leyenda de Colores:**
+                🟠 Avenidas principales  
+                🟣 Calles colectoras  
+                🟢 Calles residenciales  
+                🔵 Jirones comerciales  
+                ⚫ Otros tipos
+                """)
+            else:
+                st.markdown("""
+                **Controles disponibles:**
+                - ✅ Activar visualización de red
+                - 🎯 Ver estadísticas de conectividad
+                - 🛣️ Análisis de tipos de vía
+                """)
+
+        isocronas_data = None
+        if mostrar_isocronas:
+            with registro_rendimiento.etapa('isocronas') as medicion:
+                isocronas_data = calcular_isocronas(
+                    grafo, region, nivel_trafico_usado, condicion_clima, patrullas_data
+                )
+                medicion.objetos = sum(len(banda['arcos']) for bandas in isocronas_data.values() for banda in bandas)
+            st.caption("⏱️ Isócronas: 🟢 ≤ 3 min · 🟡 ≤ 5 min · 🟠 ≤ 10 min")
+
+        # Mapa de operaciones
+        st.markdown("### 🗺️ Mapa de Operaciones")
+        st.caption("🚧 Use el botón 🚧 del mapa y haga clic sobre una calle para cerrarla o reabrirla. Los cierres se conservan entre recargas.")
+
+        # Crear HTML del mapa (centrado en la región; cierres guardados por región)
+        centro_mapa, clave_cierres = CENTRO_MAPA, 'cierres_viales_tacna'
+        if region is not None:
+            lat_min, lon_min, lat_max, lon_max = grafo.caja()
+            centro_mapa, clave_cierres = ((lat_min + lat_max) / 2, (lon_min + lon_max) / 2), f"cierres_viales_{region}"
+        medicion_html = registro_rendimiento.iniciar('mapa_html')
+        mapa_html = generar_mapa_html(
+            nodes_json, edges_json, patrullas_data, nivel_trafico_usado, condicion_clima, factor_riesgo_k,
+            hora_formateada, modo_incidente_activo, modo_lote_activo, mostrar_grafo, eta_zonas, isocronas_data,
+            telemetria_url=TELEMETRIA_URL if telemetria_activa else None,
+            telemetria_puerto=TELEMETRIA_PUERTO if telemetria_activa else None,
+            centro=centro_mapa, clave_cierres=clave_cierres,
+            plazo_llegada_min=plazo_llegada_min, correlacion_via=correlacion_via, percentil_eta=percentil_eta,
+            max_candidatos_astar=max_candidatos_astar, margen_preseleccion_s=margen_preseleccion_s,
+            espera=espera,
+            seguimiento={'url': SEGUIMIENTO_URL, 'puerto': SEGUIMIENTO_PUERTO, 'flota': clave_flota,
+                         'token': token_seguimiento} if flota else None,
+        )
+        medicion_html.terminar(bytes=len(mapa_html.encode('utf-8')))
+
+        with registro_rendimiento.etapa('components_html') as medicion:
+            components.html(mapa_html, height=750)
+            medicion.bytes = len(mapa_html.encode('utf-8'))
+
+        # Estado actual del sistema
+        st.markdown("### 🔄 Estado Actual de Patrullas (Persistente)")
+        # El DataFrame se actualiza, pero los datos subyacentes se mantienen
+        estado_df = pd.DataFrame(patrullas_data)
+        st.dataframe(estado_df, use_container_width=True, hide_index=True)
+
+    elif not calentamiento.terminado:
+        st.markdown("### ⏳ Preparando el sistema")
+        panel_calentamiento(calentamiento)
+
+    else:
+        st.error(f"❌ Error al cargar el grafo: {calentamiento.error}")
+        if st.button("🔄 Reintentar carga"):
+            if region is None:
+                obtener_calentamiento.clear()
+            else:
+                registro_regiones.descartar(region)
+            st.rerun()
+        st.error("❌ No se pudo cargar el grafo de Tacna. Verifique la conexión a internet y reinicie la aplicación.")
+        st.info("💡 **Sugerencia:** Asegúrese de tener una conexión estable a internet para descargar los datos de OpenStreetMap.")
+
+    # --- Panel de Rendimiento ---
+    ejecucion_actual.terminar()
+    RUTA_METRICAS = os.environ.get("METRICAS_PROMETHEUS")
+    if RUTA_METRICAS:
+        try:
+            registro_rendimiento.exportar(RUTA_METRICAS)
+        except OSError as e:
+            st.sidebar.warning(f"⚠️ No se pudieron exportar las métricas: {e}")
+
+    with st.sidebar.expander("⏱️ Rendimiento", expanded=False):
+        st.dataframe(pd.DataFrame(registro_rendimiento.resumen()), use_container_width=True, hide_index=True)
+        st.caption(f"Ejecuciones del script: {registro_rendimiento.ejecuciones} · p50/p95 sobre las últimas ejecuciones"
+                   + (f" · métricas en {RUTA_METRICAS}" if RUTA_METRICAS else ""))
@@ -0,0 +1,179 @@
+"""
+Bitácora de despacho: registro de solo anexado de cada decisión (el incidente, las
+patrullas candidatas con su nodo, el ranking por ETA, el perfil de costos y el tipo
+de ruta elegido) y de los cambios de estado de las patrullas, para auditar lo que
+se decidió y reproducirlo con otra versión del motor (sistema_experto.reproduccion).
+
+Es JSON Lines compacto en segmentos. Cada proceso escribe en su propio segmento
+(varias consolas comparten la carpeta sin pisarse); al superar max_bytes o
+max_segundos lo cierra y lo comprime a .jsonl.gz en un hilo de fondo, y abre otro.
+leer_bitacora() recorre todos los segmentos, comprimidos o no, mezclados por instante.
+"""
+import glob
+import gzip
+import heapq
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+PREFIJO = "despacho"
+# Versión del formato de los eventos (encabezado de cada segmento)
+FORMATO = 1
+TIPOS_EVENTO = ('segmento', 'despacho', 'estado')
+MAX_BYTES = 16 * 2 ** 20
+MAX_SEGUNDOS = 3600
+_SEGMENTO = re.compile(rf"{PREFIJO}-\d{{8}}T\d{{6}}-(\d+)-\d+\.jsonl(\.gz)?$")
+# Segmentos en los que escribe este proceso (no se comprimen)
+_ABIERTOS = set()
+
+
+def comprimir(ruta):
+    """
+    Reemplaza un segmento cerrado por su versión .gz. La copia comprimida aparece
+    completa (os.replace) antes de borrar el original: un lector que vea los dos
+    se queda con el .gz. Retorna False si otro hilo o proceso ya lo comprimió.
+    """
+    temporal = f"{ruta}.gz.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(ruta, 'rb') as origen, gzip.open(temporal, 'wb') as destino:
+            shutil.copyfileobj(origen, destino)
+        os.replace(temporal, ruta + '.gz')
+        os.remove(ruta)
+    except FileNotFoundError:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        return False
+    return True
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def compactar(carpeta):
+    """
+    Comprime los segmentos sin comprimir de procesos que ya terminaron y los
+    cerrados del proceso actual. Retorna cuántos comprimió.
+    """
+    comprimidos = 0
+    for ruta in sorted(glob.glob(os.path.join(carpeta, f"{PREFIJO}-*.jsonl"))):
+        coincidencia = _SEGMENTO.search(os.path.basename(ruta))
+        if coincidencia is None or os.path.abspath(ruta) in _ABIERTOS:
+            continue
+        pid = int(coincidencia.group(1))
+        if pid != os.getpid() and _proceso_vivo(pid):
+            continue
+        comprimidos += comprimir(ruta)
+    return comprimidos
+
+
+class BitacoraDespacho:
+    """
+    Escritor de la bitácora de un proceso, seguro para varios hilos. Cada evento
+    es una línea {'t': instante Unix, 'tipo', …} escrita y vaciada al sistema
+    operativo antes de retornar.
+    """
+
+    def __init__(self, carpeta="bitacora", max_bytes=MAX_BYTES, max_segundos=MAX_SEGUNDOS):
+        os.makedirs(carpeta, exist_ok=True)
+        self.carpeta = carpeta
+        self.max_bytes = max_bytes
+        self.max_segundos = max_segundos
+        self._bloqueo = threading.Lock()
+        self._archivo = None
+        self._ruta = None
+        self._bytes = 0
+        self._abierto = 0.0
+        self._segmentos = 0
+        self._compresiones = []
+        # Segmentos que dejaron abiertos procesos que ya terminaron
+        compactar(carpeta)
+
+    def escribir(self, tipo, datos):
+        if tipo not in TIPOS_EVENTO:
+            raise ValueError(f"tipo de evento desconocido: {tipo}")
+        ahora = time.time()
+        linea = (json.dumps({'t': round(ahora, 3), 'tipo': tipo, **datos}, ensure_ascii=False,
+                            separators=(',', ':')) + '\n').encode('utf-8')
+        with self._bloqueo:
+            if (self._archivo is None or self._bytes >= self.max_bytes
+                    or ahora - self._abierto >= self.max_segundos):
+                self._rotar(ahora)
+            self._archivo.write(linea)
+            self._archivo.flush()
+            self._bytes += len(linea)
+
+    def _rotar(self, ahora):
+        anterior = self._ruta
+        if self._archivo is not None:
+            self._archivo.close()
+            _ABIERTOS.discard(os.path.abspath(anterior))
+        self._segmentos += 1
+        nombre = f"{PREFIJO}-{time.strftime('%Y%m%dT%H%M%S', time.gmtime(ahora))}-{os.getpid()}-{self._segmentos:04d}.jsonl"
+        self._ruta = os.path.join(self.carpeta, nombre)
+        _ABIERTOS.add(os.path.abspath(self._ruta))
+        self._archivo = open(self._ruta, 'ab')
+        self._abierto = ahora
+        encabezado = json.dumps({'t': round(ahora, 3), 'tipo': 'segmento', 'formato': FORMATO, 'pid': os.getpid()},
+                                separators=(',', ':')) + '\n'
+        self._archivo.write(encabezado.encode('utf-8'))
+        self._bytes = len(encabezado)
+        if anterior is not None:
+            hilo = threading.Thread(target=comprimir, args=(anterior,), daemon=True, name="compactar-bitacora")
+            hilo.start()
+            self._compresiones = [h for h in self._compresiones if h.is_alive()] + [hilo]
+
+    def cerrar(self):
+        """
+        Cierra y comprime el segmento en curso (el siguiente evento abre otro).
+        """
+        with self._bloqueo:
+            for hilo in self._compresiones:
+                hilo.join()
+            self._compresiones = []
+            if self._archivo is not None:
+                self._archivo.close()
+                _ABIERTOS.discard(os.path.abspath(self._ruta))
+                comprimir(self._ruta)
+                self._archivo, self._ruta = None, None
+
+
+def segmentos(carpeta):
+    """
+    Rutas de los segmentos de la carpeta; si un segmento está a la vez comprimido y
+    sin comprimir (compresión en curso), solo el .gz.
+    """
+    elegidos = {}
+    for ruta in glob.glob(os.path.join(carpeta, f"{PREFIJO}-*.jsonl*")):
+        if _SEGMENTO.search(os.path.basename(ruta)) is None:
+            continue
+        base = ruta[:-3] if ruta.endswith('.gz') else ruta
+        if ruta.endswith('.gz') or base not in elegidos:
+            elegidos[base] = ruta
+    return sorted(elegidos.values())
+
+
+def leer_segmento(ruta):
+    abrir = gzip.open if ruta.endswith('.gz') else open
+    with abrir(ruta, 'rt', encoding='utf-8') as f:
+        for linea in f:
+            # Una línea sin salto final quedó a medio escribir (el proceso se detuvo)
+            if linea.endswith('\n') and linea.strip():
+                yield json.loads(linea)
+
+
+def leer_bitacora(carpeta="bitacora"):
+    """
+    Eventos de todos los segmentos en orden de instante (a igual instante, en el
+    orden de los segmentos y de sus líneas, así que el recorrido es reproducible).
+    """
+    return heapq.merge(*(leer_segmento(ruta) for ruta in segmentos(carpeta)), key=lambda evento: evento['t'])
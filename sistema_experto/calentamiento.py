@@ -0,0 +1,134 @@
+"""
+Precarga del grafo y de lo que el mapa necesita en cada ejecución, en un hilo de
+fondo al arrancar el proceso: la interfaz muestra el avance y sigue respondiendo
+mientras tanto, y todas las sesiones comparten el resultado.
+"""
+import json
+import os
+import threading
+import time
+
+from .grafo import instantanea_o_construir
+from .mapa import datos_arcos, datos_nodos
+from .matriz_zonas import METADATOS, MatrizTiempos
+
+# Etapas en orden de ejecución con su descripción para la interfaz
+ETAPAS = [
+    ('grafo', "Cargando el grafo vial"),
+    ('adyacencia', "Preparando la adyacencia para el ruteo"),
+    ('matriz_zonas', "Abriendo la matriz de tiempos por zona"),
+    ('carga_mapa', "Serializando nodos y arcos del mapa"),
+]
+
+
+class Calentamiento:
+    """
+    Estado compartido y de solo lectura una vez listo: grafo empaquetado, matriz
+    zona × zona (o None) y los JSON de nodos y arcos que se embeben en el mapa.
+    """
+
+    def __init__(self, carpeta_instantanea, lugar="Tacna, Peru", carpeta_matrices=None, mapa=True, fuente=None):
+        self.carpeta_instantanea = carpeta_instantanea
+        self.lugar = lugar
+        self.carpeta_matrices = carpeta_matrices
+        # Sin mapa (línea de comandos) se omite la serialización de nodos y arcos
+        self.mapa = mapa
+        # Función alternativa que arma el grafo (p. ej. la fusión de varias regiones)
+        self.fuente = fuente
+        self.grafo = None
+        self.matriz_zonas = None
+        self.nodes_json = None
+        self.edges_json = None
+        self.error = None
+        self.etapa = None
+        self.duraciones = {}
+        self.inicio = None
+        self._terminado = threading.Event()
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        """
+        Lanza el hilo de precarga (solo la primera vez). Retorna self.
+        """
+        with self._lock:
+            if self._hilo is None:
+                self.inicio = time.perf_counter()
+                self._hilo = threading.Thread(target=self._ejecutar, daemon=True, name="calentamiento")
+                self._hilo.start()
+        return self
+
+    def _ejecutar(self):
+        try:
+            for nombre, _ in ETAPAS:
+                self.etapa = nombre
+                inicio = time.perf_counter()
+                getattr(self, f"_{nombre}")()
+                self.duraciones[nombre] = time.perf_counter() - inicio
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.etapa = None
+            self._terminado.set()
+
+    def _grafo(self):
+        if self.fuente is not None:
+            self.grafo = self.fuente()
+        else:
+            self.grafo = instantanea_o_construir(self.carpeta_instantanea, self.lugar)
+
+    def _adyacencia(self):
+        self.grafo.listas_adyacencia()
+
+    def _matriz_zonas(self):
+        if self.carpeta_matrices is None or not os.path.exists(os.path.join(self.carpeta_matrices, METADATOS)):
+            return
+        matriz = MatrizTiempos(self.carpeta_matrices)
+        # Una matriz calculada sobre otro grafo (o sin huella) no sirve
+        if matriz.corresponde(self.grafo):
+            self.matriz_zonas = matriz
+
+    def _carga_mapa(self):
+        if not self.mapa:
+            return
+        zona_de_nodo = self.matriz_zonas.zona_de_nodo if self.matriz_zonas is not None else None
+        self.nodes_json = json.dumps(datos_nodos(self.grafo, zona_de_nodo))
+        self.edges_json = json.dumps(datos_arcos(self.grafo))
+
+    @property
+    def listo(self):
+        return self._terminado.is_set() and self.error is None
+
+    @property
+    def terminado(self):
+        return self._terminado.is_set()
+
+    def bytes_memoria(self):
+        """
+        Memoria aproximada de lo precargado (la matriz zona × zona está mapeada y no se cuenta).
+        """
+        total = self.grafo.bytes_memoria() if self.grafo is not None else 0
+        return total + sum(len(carga) for carga in (self.nodes_json, self.edges_json) if carga is not None)
+
+    def esperar(self, timeout=None):
+        """
+        Bloquea hasta que termine la precarga. Retorna True si quedó lista.
+        """
+        self._terminado.wait(timeout)
+        return self.listo
+
+    def estado(self):
+        """
+        Avance para la interfaz: {'listo', 'error', 'etapa', 'descripcion', 'progreso', 'segundos', 'duraciones'}.
+        """
+        etapa = self.etapa
+        descripciones = dict(ETAPAS)
+        return {
+            'listo': self.listo,
+            'error': self.error,
+            'etapa': etapa,
+            'descripcion': descripciones.get(etapa),
+            'progreso': len(self.duraciones) / len(ETAPAS),
+            'segundos': time.perf_counter() - self.inicio if self.inicio is not None else 0.0,
+            'duraciones': dict(self.duraciones),
+        }
@@ -0,0 +1,103 @@
+import numpy as np
+
+from .ruteo import a_estrella
+
+
+class CierresViales:
+    """
+    Calles bloqueadas por el despachador. Cerrar una calle pone costo infinito en
+    los arreglos de costo (en el lugar, sin reconstruir la adyacencia) y reabrirla
+    restaura los valores originales.
+    """
+
+    def __init__(self, grafo, costos):
+        # costos: {nombre: arreglo por arco}, p. ej. {'costo_rapido': mu, 'costo_seguro': ...}
+        self.grafo = grafo
+        self.costos = costos
+        self._originales = {}
+        self._calles = set()
+
+    @property
+    def calles_cerradas(self):
+        return sorted(self._calles)
+
+    def arcos_calle(self, u, v, ambos_sentidos=True):
+        arcos = self.grafo.arcos_entre(u, v)
+        if ambos_sentidos:
+            arcos += self.grafo.arcos_entre(v, u)
+        return arcos
+
+    def cerrar(self, u, v, ambos_sentidos=True):
+        """
+        Bloquea la calle u–v. Retorna los índices de arcos cerrados.
+        """
+        arcos = self.arcos_calle(u, v, ambos_sentidos)
+        for e in arcos:
+            if e not in self._originales:
+                self._originales[e] = {nombre: float(arreglo[e]) for nombre, arreglo in self.costos.items()}
+            for arreglo in self.costos.values():
+                arreglo[e] = np.inf
+        if arcos:
+            self._calles.add((min(u, v), max(u, v)) if ambos_sentidos else (u, v))
+        return arcos
+
+    def reabrir(self, u, v, ambos_sentidos=True):
+        """
+        Restaura los costos originales de la calle u–v.
+        """
+        arcos = self.arcos_calle(u, v, ambos_sentidos)
+        for e in arcos:
+            originales = self._originales.pop(e, None)
+            if originales is not None:
+                for nombre, valor in originales.items():
+                    self.costos[nombre][e] = valor
+        self._calles.discard((min(u, v), max(u, v)) if ambos_sentidos else (u, v))
+        return arcos
+
+    def esta_cerrado(self, e):
+        return e in self._originales
+
+    def reemplazar_costos(self, costos):
+        """
+        Adopta nuevos arreglos de costo (p. ej. al cambiar el tráfico) conservando los cierres.
+        """
+        self.costos = costos
+        self._originales = {
+            e: {nombre: float(arreglo[e]) for nombre, arreglo in costos.items()} for e in self._originales
+        }
+        for e in self._originales:
+            for arreglo in costos.values():
+                arreglo[e] = np.inf
+
+    def to_json(self):
+        return [list(calle) for calle in self.calles_cerradas]
+
+    def cargar_json(self, calles):
+        for u, v in calles:
+            self.cerrar(int(u), int(v))
+
+
+def reparar_ruta(grafo, resultado, pesos, cierres):
+    """
+    Repara una ruta activa que cruza un arco cerrado: conserva el tramo hasta el
+    primer nodo afectado y solo vuelve a buscar desde ahí hasta el destino.
+    Retorna el resultado sin cambios si la ruta no está afectada, o None si ya no
+    hay camino.
+    """
+    arcos = resultado['arcos']
+    afectado = next((i for i, e in enumerate(arcos) if cierres.esta_cerrado(e)), None)
+    if afectado is None:
+        return resultado
+
+    tramo = a_estrella(grafo, resultado['ruta'][afectado], resultado['ruta'][-1], pesos)
+    if tramo is None:
+        return None
+    prefijo = arcos[:afectado]
+    return {
+        'ruta': resultado['ruta'][:afectado] + tramo['ruta'],
+        'arcos': prefijo + tramo['arcos'],
+        'costo': float(np.sum(pesos[prefijo])) + tramo['costo'],
+        'nodos_explorados': tramo['nodos_explorados'],
+        'tiempo_ms': tramo['tiempo_ms'],
+        'reparada_desde': resultado['ruta'][afectado],
+    }
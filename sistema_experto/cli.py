@@ -0,0 +1,399 @@
+"""
+Línea de comandos del motor de ruteo y despacho, sin Streamlit.
+
+    python -m sistema_experto route --origen -18.0066 -70.2463 --destino -18.0240 -70.2550
+    python -m sistema_experto dispatch --incidente -18.0100 -70.2500 --incidente -18.0300 -70.2400 --patrullas 10
+    python -m sistema_experto standby --instantanea instantanea --matrices matrices --patrullas 10
+    python -m sistema_experto precompute --instantanea instantanea --salida matrices
+    python -m sistema_experto snapshot --salida instantanea
+    python -m sistema_experto regions --regiones regiones
+    python -m sistema_experto batch --instantanea instantanea --consultas consultas.csv --salida rutas.csv
+    python -m sistema_experto serve --instantanea instantanea --puerto 8770
+    python -m sistema_experto replay --bitacora bitacora --instantanea instantanea
+    python -m sistema_experto bench ruteo --salida resultados_ruteo.json
+
+route, dispatch y standby imprimen JSON. Con --instantanea el grafo se lee de una instantánea
+(solo NumPy); con --regiones se usa la región (o la fusión de regiones vecinas)
+que cubre los puntos; con --cache se arma sin conexión desde las respuestas
+guardadas de Overpass; si no, se descarga de OpenStreetMap.
+"""
+import argparse
+import csv
+import json
+import os
+import runpy
+import sys
+import time
+
+import numpy as np
+
+from .costos import NIVELES_TRAFICO, calcular_costos, costo_seguro, nivel_vigente
+from .ruteo import resumen_ruta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIMAS = ['despejado', 'lluvia', 'neblina']
+
+# Suites de benchmarks/ que se pueden lanzar con 'bench'
+BENCHMARKS = {
+    'ruteo': 'bench_ruteo.py',
+    'escala': 'bench_escala.py',
+    'dependiente_tiempo': 'bench_dependiente_tiempo.py',
+    'importacion': 'presupuesto_importacion.py',
+    'regiones': 'bench_regiones.py',
+    'memoria': 'bench_memoria_compartida.py',
+    'lote': 'bench_lote.py',
+    'servicio': 'bench_servicio.py',
+    'fiabilidad': 'bench_fiabilidad.py',
+    'alternativas': 'bench_alternativas.py',
+    'posicionamiento': 'bench_posicionamiento.py',
+    'seguimiento': 'bench_seguimiento.py',
+    'almacen': 'bench_almacen.py',
+    'bitacora': 'bench_bitacora.py',
+    'bitacora_mapa': 'bench_bitacora_mapa.py',
+}
+
+
+def cargar_grafo(lugar="Tacna, Peru", cache=None, instantanea=None):
+    """
+    Grafo empaquetado desde una instantánea, desde la carpeta de respuestas de
+    Overpass o, sin ninguna, desde OpenStreetMap.
+    """
+    from .grafo import GrafoEmpaquetado, construir_grafo, empaquetar_grafo, grafo_desde_cache
+
+    if instantanea:
+        return GrafoEmpaquetado.cargar(instantanea, mapear=True)
+    return empaquetar_grafo(grafo_desde_cache(cache) if cache else construir_grafo(lugar))
+
+
+def grafo_para_puntos(args, puntos):
+    """
+    (grafo, región) para los puntos de la consulta: con --regiones, la región o
+    fusión que los cubre; si no, cargar_grafo() y región None.
+    """
+    if not args.regiones:
+        return cargar_grafo(args.lugar, args.cache, args.instantanea), None
+    from .regiones import RegistroRegiones
+
+    try:
+        return RegistroRegiones(args.regiones, mapa=False).grafo_para(puntos)
+    except (KeyError, ValueError) as e:
+        raise SystemExit(f"❌ {e}")
+
+
+def comando_route(args):
+    from .fiabilidad import fiabilidad_rutas, ruta_a_tiempo
+    from .ruteo import a_estrella
+
+    grafo, region = grafo_para_puntos(args, [args.origen, args.destino])
+    nivel = nivel_vigente(args.nivel)
+    mu, sigma = calcular_costos(grafo, nivel, args.clima, args.semilla)
+    origen = grafo.nodo_mas_cercano(*args.origen)
+    destino = grafo.nodo_mas_cercano(*args.destino)
+    plazo_s = args.plazo_min * 60
+    rutas = {
+        'rapida': a_estrella(grafo, origen, destino, mu),
+        'segura': a_estrella(grafo, origen, destino, costo_seguro(mu, sigma, args.k)),
+    }
+    rutas['a_tiempo'] = ruta_a_tiempo(grafo, origen, destino, mu, sigma, plazo_s,
+                                      [ruta['arcos'] for ruta in rutas.values() if ruta is not None])
+    fiabilidad = fiabilidad_rutas(grafo, list(rutas.values()), mu, sigma, plazo_s, args.muestras,
+                                  args.correlacion, args.semilla)
+    resumenes = {}
+    for (tipo, ruta), fiabilidad_ruta in zip(rutas.items(), fiabilidad):
+        resumenes[tipo] = resumen_ruta(grafo, ruta, mu, sigma)
+        if resumenes[tipo] is not None:
+            resumenes[tipo]['fiabilidad'] = fiabilidad_ruta
+    if rutas['a_tiempo'] is not None:
+        resumenes['a_tiempo'].update(p_a_tiempo_gaussiana=round(rutas['a_tiempo']['p_a_tiempo'], 4),
+                                     etiquetas=rutas['a_tiempo']['etiquetas'], exacta=rutas['a_tiempo']['exacta'])
+    if args.alternativas > 0:
+        from .alternativas import rutas_alternativas
+
+        resumenes['alternativas'] = []
+        for alternativa in rutas_alternativas(grafo, origen, destino, mu, args.alternativas):
+            resumen = resumen_ruta(grafo, alternativa, mu, sigma)
+            resumen.update(estiramiento=round(alternativa['estiramiento'], 3), solape=round(alternativa['solape'], 3))
+            resumenes['alternativas'].append(resumen)
+    return {
+        'region': region,
+        'nivel_trafico': nivel,
+        'clima': args.clima,
+        'k': args.k,
+        'nodo_origen': origen,
+        'nodo_destino': destino,
+        **resumenes,
+    }
+
+
+def comando_dispatch(args):
+    from .despacho import despachar_lote
+
+    grafo, region = grafo_para_puntos(args, args.incidente + (args.patrulla or []))
+    nivel = nivel_vigente(args.nivel)
+    mu, sigma = calcular_costos(grafo, nivel, args.clima, args.semilla)
+    pesos = mu if args.k is None else costo_seguro(mu, sigma, args.k)
+
+    if args.patrulla:
+        nodos_patrullas = [grafo.nodo_mas_cercano(*p) for p in args.patrulla]
+    else:
+        # Ubicaciones al azar, reproducibles con la semilla
+        rng = np.random.default_rng(args.semilla)
+        nodos_patrullas = rng.choice(grafo.num_nodos, size=min(args.patrullas, grafo.num_nodos), replace=False).tolist()
+    patrullas = [{'id': f"U-{i + 1:02d}", 'nodo_actual': int(n), 'status': 'disponible'}
+                 for i, n in enumerate(nodos_patrullas)]
+    nodos_incidentes = [grafo.nodo_mas_cercano(*p) for p in args.incidente]
+
+    asignaciones = despachar_lote(grafo, pesos, patrullas, nodos_incidentes)
+    for asignacion, (lat, lon) in zip(asignaciones, args.incidente):
+        asignacion['lat'], asignacion['lon'] = lat, lon
+        if asignacion['eta'] is not None:
+            asignacion['eta'] = round(asignacion['eta'], 1)
+    return {
+        'region': region,
+        'nivel_trafico': nivel,
+        'clima': args.clima,
+        'costo': 'costo_rapido' if args.k is None else f"costo_seguro k={args.k}",
+        'patrullas': patrullas,
+        'asignaciones': asignaciones,
+    }
+
+
+def comando_standby(args):
+    from .grafo import GrafoEmpaquetado
+    from .matriz_zonas import MatrizTiempos
+    from .posicionamiento import reposicionar
+    from .simulador import pesos_espaciales
+
+    grafo = GrafoEmpaquetado.cargar(args.instantanea, mapear=True)
+    matriz = MatrizTiempos(args.matrices)
+    nivel = nivel_vigente(args.nivel)
+    if not matriz.corresponde(grafo):
+        raise SystemExit("❌ La matriz de zonas se calculó sobre otro grafo")
+    if nivel not in matriz.niveles:
+        raise SystemExit(f"❌ La matriz de zonas no tiene el nivel {nivel}")
+
+    if args.patrulla:
+        nodos_patrullas = [grafo.nodo_mas_cercano(*p) for p in args.patrulla]
+    else:
+        rng = np.random.default_rng(args.semilla)
+        nodos_patrullas = rng.choice(grafo.num_nodos, size=min(args.patrullas, grafo.num_nodos), replace=False).tolist()
+    patrullas = [{'id': f"U-{i + 1:02d}", 'nodo_actual': int(n), 'status': 'disponible'}
+                 for i, n in enumerate(nodos_patrullas)]
+
+    # Demanda por nodo: el modelo espacial de incidentes del simulador
+    radio_s = args.radio_min * 60 if args.radio_min else None
+    resultado = reposicionar(matriz, nivel, pesos_espaciales(grafo, semilla=args.semilla), patrullas, radio_s)
+    for posicion in resultado['posiciones']:
+        posicion['lat'], posicion['lon'] = float(grafo.lat[posicion['nodo_espera']]), float(grafo.lon[posicion['nodo_espera']])
+    return {
+        'nivel_trafico': nivel,
+        'objetivo': f"cobertura ≤ {args.radio_min:g} min" if radio_s else 'p-mediana',
+        'patrullas': patrullas,
+        **resultado,
+    }
+
+
+def comando_snapshot(args):
+    grafo = cargar_grafo(args.lugar, args.cache)
+    grafo.guardar(args.salida, lugar=args.lugar)
+    return {'salida': args.salida, 'nodos': grafo.num_nodos, 'arcos': grafo.num_arcos}
+
+
+def leer_consultas(ruta, nivel, clima, k):
+    """
+    Consultas de un CSV con columnas origen_lat, origen_lon, destino_lat, destino_lon
+    y, opcionales por fila, nivel, clima y k (si faltan se usan los de la línea de comandos).
+    Retorna (coordenadas n×4, perfiles distintos, índice de perfil de cada consulta).
+    """
+    from .lote import perfil
+
+    coordenadas, perfiles, indices = [], [], {}
+    perfil_consulta = []
+    with open(ruta, newline='', encoding='utf-8') as f:
+        for fila in csv.DictReader(f):
+            coordenadas.append([float(fila[campo]) for campo in
+                                ('origen_lat', 'origen_lon', 'destino_lat', 'destino_lon')])
+            k_fila = fila.get('k') or k
+            clave = (fila.get('nivel') or nivel, fila.get('clima') or clima, float(k_fila) if k_fila else None)
+            if clave not in indices:
+                indices[clave] = len(perfiles)
+                perfiles.append(perfil(*clave))
+            perfil_consulta.append(indices[clave])
+    return np.array(coordenadas, dtype=np.float64).reshape(-1, 4), perfiles, np.array(perfil_consulta)
+
+
+def comando_batch(args):
+    from .grafo import GrafoEmpaquetado
+    from .lote import CAMPOS, nodos_mas_cercanos, rutas_en_lote
+
+    coordenadas, perfiles, perfil_consulta = leer_consultas(args.consultas, nivel_vigente(args.nivel),
+                                                            args.clima, args.k)
+    grafo = GrafoEmpaquetado.cargar(args.instantanea, mapear=True)
+    origenes = nodos_mas_cercanos(grafo, coordenadas[:, 0], coordenadas[:, 1])
+    destinos = nodos_mas_cercanos(grafo, coordenadas[:, 2], coordenadas[:, 3])
+
+    inicio = time.perf_counter()
+    salida = open(args.salida, 'w', newline='', encoding='utf-8') if args.salida else sys.stdout
+    try:
+        escritor = csv.writer(salida)
+        escritor.writerow(['consulta', 'nodo_origen', 'nodo_destino', 'nivel', 'clima', 'k'] + CAMPOS)
+        for bloque in rutas_en_lote(args.instantanea, origenes, destinos, perfil_consulta, perfiles,
+                                    procesos=args.procesos, tam_bloque=args.bloque):
+            for j, i in enumerate(range(bloque['inicio'], bloque['fin'])):
+                datos = perfiles[perfil_consulta[i]]
+                escritor.writerow([i, origenes[i], destinos[i], datos['nivel'], datos['clima'], datos['k']]
+                                  + [bloque[campo][j].item() for campo in CAMPOS])
+            print(f"{bloque['fin']}/{len(origenes)} rutas", file=sys.stderr)
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+    segundos = time.perf_counter() - inicio
+    print(f"✅ {len(origenes)} rutas en {segundos:.1f} s ({len(origenes) / segundos:.0f} rutas/s)", file=sys.stderr)
+
+
+def comando_regions(args):
+    from .regiones import descubrir_regiones
+
+    return list(descubrir_regiones(args.regiones).values())
+
+
+def comando_precompute(args):
+    from . import matriz_zonas
+
+    matriz_zonas.main(args.argumentos)
+
+
+def comando_serve(args):
+    from . import servicio
+
+    servicio.main(args.argumentos)
+
+
+def comando_replay(args):
+    from . import reproduccion
+
+    reproduccion.main(args.argumentos)
+
+
+def comando_bench(args):
+    ruta = os.path.join(RAIZ, 'benchmarks', BENCHMARKS[args.suite])
+    if not os.path.exists(ruta):
+        raise SystemExit(f"❌ No se encontró {ruta} (los benchmarks se ejecutan desde el repositorio)")
+    argv = sys.argv
+    sys.argv = [ruta] + args.argumentos
+    try:
+        runpy.run_path(ruta, run_name='__main__')
+    finally:
+        sys.argv = argv
+
+
+def _opciones_grafo(parser):
+    parser.add_argument("--lugar", default="Tacna, Peru")
+    parser.add_argument("--cache", help="Carpeta con respuestas de Overpass (sin conexión)")
+
+
+def _opciones_motor(parser):
+    _opciones_grafo(parser)
+    parser.add_argument("--instantanea", help="Carpeta de una instantánea del grafo (python -m sistema_experto snapshot)")
+    parser.add_argument("--regiones", help="Raíz del registro de regiones (una instantánea por subcarpeta)")
+    parser.add_argument("--nivel", choices=NIVELES_TRAFICO, help="Por defecto, el de la hora actual")
+    parser.add_argument("--clima", default="despejado", choices=CLIMAS)
+    parser.add_argument("--semilla", type=int, default=0)
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="python -m sistema_experto", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    route = comandos.add_parser("route", help="Rutas rápida, segura y a tiempo entre dos puntos")
+    route.add_argument("--origen", type=float, nargs=2, required=True, metavar=("LAT", "LON"))
+    route.add_argument("--destino", type=float, nargs=2, required=True, metavar=("LAT", "LON"))
+    route.add_argument("--k", type=float, default=1.5, help="Aversión al riesgo de la ruta segura")
+    route.add_argument("--plazo-min", type=float, default=10,
+                       help="Plazo de llegada: P(llegada ≤ plazo) y ruta que la maximiza")
+    route.add_argument("--muestras", type=int, default=4000, help="Muestras Monte Carlo de la fiabilidad")
+    route.add_argument("--correlacion", type=float, default=0.0,
+                       help="Correlación de los tiempos entre arcos del mismo tipo de vía")
+    route.add_argument("--alternativas", type=int, default=0,
+                       help="Cuántas rutas alternativas a la rápida agregar (método de mesetas)")
+    _opciones_motor(route)
+    route.set_defaults(funcion=comando_route)
+
+    dispatch = comandos.add_parser("dispatch", help="Asignación óptima de patrullas a incidentes simultáneos")
+    dispatch.add_argument("--incidente", type=float, nargs=2, action="append", required=True,
+                          metavar=("LAT", "LON"))
+    dispatch.add_argument("--patrulla", type=float, nargs=2, action="append", metavar=("LAT", "LON"),
+                          help="Ubicación de cada patrulla disponible (se repite)")
+    dispatch.add_argument("--patrullas", type=int, default=5, help="Patrullas al azar si no se indica --patrulla")
+    dispatch.add_argument("--k", type=float, default=None, help="Despacha con costo seguro μ + kσ")
+    _opciones_motor(dispatch)
+    dispatch.set_defaults(funcion=comando_dispatch)
+
+    standby = comandos.add_parser("standby", help="Posiciones de espera de las patrullas disponibles (p-mediana)")
+    standby.add_argument("--instantanea", required=True)
+    standby.add_argument("--matrices", default="matrices", help="Matriz zona × zona (python -m sistema_experto precompute)")
+    standby.add_argument("--patrulla", type=float, nargs=2, action="append", metavar=("LAT", "LON"),
+                         help="Ubicación de cada patrulla disponible (se repite)")
+    standby.add_argument("--patrullas", type=int, default=5, help="Patrullas al azar si no se indica --patrulla")
+    standby.add_argument("--radio-min", type=float, default=None,
+                         help="Maximiza la demanda cubierta en este radio en lugar del tiempo medio")
+    standby.add_argument("--nivel", choices=NIVELES_TRAFICO, help="Por defecto, el de la hora actual")
+    standby.add_argument("--semilla", type=int, default=0)
+    standby.set_defaults(funcion=comando_standby)
+
+    snapshot = comandos.add_parser("snapshot", help="Guarda la instantánea del grafo empaquetado que usa la app")
+    snapshot.add_argument("--salida", default="instantanea")
+    _opciones_grafo(snapshot)
+    snapshot.set_defaults(funcion=comando_snapshot)
+
+    regions = comandos.add_parser("regions", help="Regiones del registro con su caja y tamaño")
+    regions.add_argument("--regiones", default="regiones")
+    regions.set_defaults(funcion=comando_regions)
+
+    batch = comandos.add_parser("batch", help="Miles de rutas en paralelo desde un CSV (análisis fuera de línea)")
+    batch.add_argument("--instantanea", required=True, help="Instantánea que comparten los procesos")
+    batch.add_argument("--consultas", required=True,
+                       help="CSV con origen_lat, origen_lon, destino_lat, destino_lon y, opcionales, nivel, clima, k")
+    batch.add_argument("--salida", help="CSV de resultados (por defecto, la salida estándar)")
+    batch.add_argument("--nivel", choices=NIVELES_TRAFICO, help="Por defecto, el de la hora actual")
+    batch.add_argument("--clima", default="despejado", choices=CLIMAS)
+    batch.add_argument("--k", type=float, default=None, help="Rutas seguras μ + kσ (si no, rápidas)")
+    batch.add_argument("--procesos", type=int, default=None, help="Por defecto, uno por núcleo")
+    batch.add_argument("--bloque", type=int, default=256, help="Consultas por bloque de trabajo")
+    batch.set_defaults(funcion=comando_batch)
+
+    precompute = comandos.add_parser("precompute", add_help=False, help="Matriz de tiempos zona × zona (sistema_experto.matriz_zonas)")
+    precompute.set_defaults(funcion=comando_precompute)
+
+    serve = comandos.add_parser("serve", add_help=False, help="Servicio de ruteo JSON sobre HTTP (sistema_experto.servicio)")
+    serve.set_defaults(funcion=comando_serve)
+
+    replay = comandos.add_parser("replay", add_help=False,
+                                 help="Reproduce la bitácora de despacho con el motor actual (sistema_experto.reproduccion)")
+    replay.set_defaults(funcion=comando_replay)
+
+    bench = comandos.add_parser("bench", add_help=False, help="Suites de benchmarks/")
+    bench.add_argument("suite", choices=list(BENCHMARKS))
+    bench.set_defaults(funcion=comando_bench)
+    return parser
+
+
+# Comandos que pasan el resto de los argumentos al script que delegan
+DELEGADOS = {'precompute', 'serve', 'replay', 'bench'}
+
+
+def main(argv=None):
+    parser = crear_parser()
+    args, resto = parser.parse_known_args(argv)
+    if args.comando in DELEGADOS:
+        args.argumentos = resto
+    elif resto:
+        parser.error(f"argumentos no reconocidos: {' '.join(resto)}")
+    resultado = args.funcion(args)
+    if resultado is not None:
+        print(json.dumps(resultado, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main()
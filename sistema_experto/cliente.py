@@ -0,0 +1,93 @@
+"""
+Cliente del servicio de ruteo (sistema_experto.servicio) con un pool de conexiones
+HTTP/1.1 persistentes, seguro para usar desde varios hilos (sesiones de Streamlit).
+"""
+import http.client
+import json
+import queue
+import threading
+import urllib.parse
+
+
+class ClienteRuteo:
+    """
+    Cada solicitud toma una conexión libre del pool (o abre una nueva, hasta
+    'conexiones' a la vez) y la devuelve abierta si el servidor la mantiene.
+    Lanza ConnectionError si el servicio no responde, ValueError si rechaza la
+    solicitud (4xx) y RuntimeError ante un error interno (5xx).
+    """
+
+    def __init__(self, url, conexiones=4, timeout=30):
+        partes = urllib.parse.urlsplit(url)
+        self.host = partes.hostname
+        self.puerto = partes.port or 80
+        self.timeout = timeout
+        self._libres = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(conexiones)
+
+    def _conexion(self):
+        try:
+            return self._libres.get_nowait(), True
+        except queue.Empty:
+            return http.client.HTTPConnection(self.host, self.puerto, timeout=self.timeout), False
+
+    def solicitar(self, metodo, ruta, datos=None):
+        cuerpo = json.dumps(datos).encode('utf-8') if datos is not None else None
+        cabeceras = {'Content-Type': 'application/json'} if cuerpo is not None else {}
+        with self._cupos:
+            while True:
+                conexion, reutilizada = self._conexion()
+                try:
+                    conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+                    respuesta = conexion.getresponse()
+                    contenido = respuesta.read()
+                except (http.client.HTTPException, OSError) as e:
+                    conexion.close()
+                    # El servidor cierra las conexiones inactivas: se reintenta con otra
+                    if reutilizada:
+                        continue
+                    raise ConnectionError(f"servicio de ruteo en {self.host}:{self.puerto}: {e}") from e
+                if respuesta.will_close:
+                    conexion.close()
+                else:
+                    self._libres.put(conexion)
+                break
+
+        resultado = json.loads(contenido)
+        if 400 <= respuesta.status < 500:
+            raise ValueError(resultado.get('error'))
+        if respuesta.status != 200:
+            raise RuntimeError(resultado.get('error'))
+        return resultado
+
+    def cerrar(self):
+        while True:
+            try:
+                self._libres.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def salud(self):
+        return self.solicitar('GET', '/salud')
+
+    def nodo_cercano(self, lat, lon):
+        return self.solicitar('POST', '/nodo_cercano', {'lat': lat, 'lon': lon})
+
+    def ruta(self, origen, destino, nivel=None, clima="despejado", k=1.5, plazo_min=None, correlacion=None):
+        """
+        Rutas rápida, segura y a tiempo entre dos puntos (lat, lon), con su fiabilidad.
+        """
+        return self.solicitar('POST', '/ruta', {'origen': list(origen), 'destino': list(destino),
+                                                'nivel': nivel, 'clima': clima, 'k': k,
+                                                'plazo_min': plazo_min, 'correlacion': correlacion})
+
+    def ranking(self, incidente, patrullas, nivel=None, clima="despejado", k=None, percentil=None):
+        """
+        Patrullas disponibles ordenadas por ETA al incidente (lat, lon), o por su percentil.
+        """
+        return self.solicitar('POST', '/ranking', {'incidente': list(incidente), 'patrullas': patrullas,
+                                                   'nivel': nivel, 'clima': clima, 'k': k, 'percentil': percentil})
+
+    def isocronas(self, patrullas, nivel=None, clima="despejado", umbrales_min=None):
+        return self.solicitar('POST', '/isocronas', {'patrullas': patrullas, 'nivel': nivel, 'clima': clima,
+                                                     'umbrales_min': umbrales_min})
@@ -0,0 +1,143 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+# Orden fijo de los tipos de vía: el código de cada arco es su índice en esta lista
+TIPOS_VIA = ['avenida_principal', 'calle_colectora', 'calle_residencial', 'jiron_comercial']
+
+ZONA_HORARIA = ZoneInfo("America/Lima")
+
+NIVELES_TRAFICO = ['trafico_minimo', 'trafico_bajo', 'trafico_medio', 'trafico_alto', 'trafico_extremo']
+
+# --- Factores de Tráfico Granulares (5 Niveles) ---
+FACTORES_TRAFICO = {
+    "trafico_minimo": {
+        "avenida_principal": 0.7, "jiron_comercial": 0.8, "calle_colectora": 0.9, "calle_residencial": 1.0
+    },
+    "trafico_bajo": {
+        "avenida_principal": 1.0, "jiron_comercial": 1.1, "calle_colectora": 1.0, "calle_residencial": 1.0
+    },
+    "trafico_medio": {
+        "avenida_principal": 1.5, "jiron_comercial": 1.3, "calle_colectora": 1.2, "calle_residencial": 1.1
+    },
+    "trafico_alto": {
+        "avenida_principal": 2.2, "jiron_comercial": 1.8, "calle_colectora": 1.5, "calle_residencial": 1.2
+    },
+    "trafico_extremo": {
+        "avenida_principal": 3.0, "jiron_comercial": 2.5, "calle_colectora": 2.0, "calle_residencial": 1.3
+    }
+}
+
+# Inicio (hora decimal) de cada franja horaria y su nivel de tráfico
+HORARIO_TRAFICO = [
+    (0.0, "trafico_minimo"),    # Madrugada - vías despejadas
+    (6.5, "trafico_extremo"),   # Hora pico escolar
+    (8.0, "trafico_alto"),      # Mañana laboral
+    (11.0, "trafico_extremo"),  # Mediodía
+    (13.0, "trafico_medio"),    # Tarde laboral
+    (17.0, "trafico_alto"),     # Hora pico vespertina
+    (20.0, "trafico_bajo"),     # Noche temprana
+    (23.0, "trafico_minimo"),   # Madrugada
+]
+
+FACTORES_CLIMA = {"despejado": 1.0, "lluvia": 1.4, "neblina": 1.3}
+
+# σ relativa al tiempo esperado según tipo de vía
+SIGMA_RELATIVA = {
+    "avenida_principal": 0.4, "jiron_comercial": 0.35, "calle_colectora": 0.25, "calle_residencial": 0.15
+}
+
+INCERTIDUMBRE_CLIMA = {"despejado": 1.0, "lluvia": 1.8, "neblina": 1.6}
+
+INCERTIDUMBRE_TRAFICO = {
+    "trafico_minimo": 0.7, "trafico_bajo": 0.9, "trafico_medio": 1.2, "trafico_alto": 1.5, "trafico_extremo": 2.0
+}
+
+FACTORES_ZONA_ESPECIAL = {
+    "mercado": {"min": 1.70, "max": 2.50},
+    "paradero": {"min": 1.40, "max": 1.60},
+}
+
+
+def nivel_trafico_en(hora_num):
+    """
+    Nivel de tráfico vigente a una hora decimal del día (p. ej. 7.5 = 07:30).
+    """
+    nivel = HORARIO_TRAFICO[0][1]
+    for inicio, nivel_franja in HORARIO_TRAFICO:
+        if hora_num >= inicio:
+            nivel = nivel_franja
+    return nivel
+
+
+def nivel_vigente(nivel=None):
+    """
+    Nivel pedido o, si no se indica, el que corresponde a la hora actual de Tacna.
+    """
+    if nivel:
+        return nivel
+    ahora = datetime.datetime.now(ZONA_HORARIA)
+    return nivel_trafico_en(ahora.hour + ahora.minute / 60)
+
+
+def _por_tipo(tabla, grafo):
+    """
+    Convierte una tabla {tipo_via: valor} en un arreglo por arco.
+    """
+    valores = np.array([tabla[tipo] for tipo in TIPOS_VIA])
+    return valores[grafo.tipo_via]
+
+
+def factores_zona_especial(grafo, semilla=0):
+    """
+    Simula las zonas especiales (mercados y paraderos informales) de forma reproducible.
+    """
+    rng = np.random.default_rng(semilla)
+    sorteo = rng.random(grafo.num_arcos)
+    intensidad = rng.random(grafo.num_arcos)
+
+    factor = np.ones(grafo.num_arcos)
+    mercado = (grafo.tipo_via == TIPOS_VIA.index("jiron_comercial")) & (sorteo < 0.3)
+    paradero = (grafo.tipo_via == TIPOS_VIA.index("avenida_principal")) & (sorteo < 0.2)
+    for mascara, zona in ((mercado, "mercado"), (paradero, "paradero")):
+        rango = FACTORES_ZONA_ESPECIAL[zona]
+        factor[mascara] = rango["min"] + (rango["max"] - rango["min"]) * intensidad[mascara]
+    return factor
+
+
+def tiempo_sin_trafico(grafo, condicion_clima="despejado", factor_zona=None, semilla=0):
+    """
+    Tiempo de cada arco (s) con todos los factores salvo el de tráfico.
+    """
+    if factor_zona is None:
+        factor_zona = factores_zona_especial(grafo, semilla)
+    tiempo_base = grafo.longitud / (grafo.velocidad_base * 1000 / 3600)
+    return tiempo_base * grafo.factor_calidad * FACTORES_CLIMA.get(condicion_clima, 1.0) * factor_zona
+
+
+def calcular_costos(grafo, nivel_trafico, condicion_clima="despejado", semilla=0):
+    """
+    Calcula μ(e) y σ(e) en segundos para todos los arcos del grafo empaquetado.
+    Si la instantánea los trae precalculados (semilla 0) se retornan esos arreglos,
+    de solo lectura: cópielos antes de modificarlos en el lugar (p. ej. CierresViales).
+    """
+    precalculados = grafo.costos_precalculados.get((nivel_trafico, condicion_clima)) if semilla == 0 else None
+    if precalculados is not None:
+        return precalculados
+
+    factor_zona = factores_zona_especial(grafo, semilla)
+    mu = tiempo_sin_trafico(grafo, condicion_clima, factor_zona) * _por_tipo(FACTORES_TRAFICO[nivel_trafico], grafo)
+
+    factor_incertidumbre = (INCERTIDUMBRE_CLIMA.get(condicion_clima, 1.0)
+                            * INCERTIDUMBRE_TRAFICO[nivel_trafico]
+                            * (1.0 + (factor_zona - 1.0) * 0.8))
+    sigma = _por_tipo(SIGMA_RELATIVA, grafo) * mu * factor_incertidumbre
+    return mu, sigma
+
+
+def costo_seguro(mu, sigma, k):
+    """
+    Costo_Seguro(e) = μ(e) + k×σ(e)
+    """
+    return mu + k * sigma
@@ -0,0 +1,114 @@
+import bisect
+import heapq
+import time
+
+import numpy as np
+
+from .costos import FACTORES_TRAFICO, HORARIO_TRAFICO, TIPOS_VIA
+from .ruteo import heuristica, reconstruir_ruta
+
+SEGUNDOS_DIA = 86400
+
+
+def perfil_trafico(horario=HORARIO_TRAFICO):
+    """
+    Perfil constante por tramos de cada tipo de vía.
+    Retorna (inicios de franja en segundos del día + fin del día, factores[franja][tipo_via]).
+    """
+    inicios = [hora * 3600 for hora, _ in horario] + [SEGUNDOS_DIA]
+    factores = [[FACTORES_TRAFICO[nivel][tipo] for tipo in TIPOS_VIA] for _, nivel in horario]
+    return inicios, factores
+
+
+def tiempo_recorrido(trabajo, tipo, salida, inicios, factores):
+    """
+    Tiempo (s) para recorrer un arco entrando en 'salida' (s desde medianoche).
+
+    'trabajo' es el tiempo del arco sin tráfico; el factor de la franja escala la
+    velocidad y, si el recorrido cruza un cambio de franja, el resto del arco se
+    recorre con el nuevo factor (modelo de Ichoua-Gendreau-Potvin). Así la llegada
+    nunca disminuye al salir más tarde: se cumple la propiedad FIFO.
+    """
+    if trabajo == np.inf:
+        return np.inf
+    dia, t = divmod(salida, SEGUNDOS_DIA)
+    franja = bisect.bisect_right(inicios, t) - 1
+    restante = trabajo
+    while True:
+        factor = factores[franja][tipo]
+        fin = inicios[franja + 1]
+        if t + restante * factor <= fin:
+            return dia * SEGUNDOS_DIA + t + restante * factor - salida
+        restante -= (fin - t) / factor
+        t = fin
+        franja += 1
+        if franja == len(factores):
+            dia, franja, t = dia + 1, 0, 0.0
+
+
+def velocidad_maxima(grafo, trabajo, perfil):
+    """
+    Mayor velocidad (m/s) alcanzable en cualquier arco y franja: cota para una heurística admisible.
+    """
+    _, factores = perfil
+    factor_min = np.min(np.asarray(factores), axis=0)[grafo.tipo_via]
+    return float(np.max(grafo.longitud / np.maximum(trabajo * factor_min, 1e-9)))
+
+
+def a_estrella_dependiente(grafo, origen, destino, salida, trabajo, perfil=None):
+    """
+    A* dependiente del tiempo: el costo de cada arco se evalúa a la hora prevista
+    de llegada a su nodo inicial. Con tiempos FIFO la primera etiqueta cerrada de
+    cada nodo es su llegada más temprana, igual que en el caso estático.
+    Retorna {'ruta', 'arcos', 'salida', 'llegada', 'costo', 'nodos_explorados', 'tiempo_ms'} o None.
+    """
+    inicio = time.perf_counter()
+    perfil = perfil or perfil_trafico()
+    inicios, factores = perfil
+    indptr, origenes, vecinos = grafo.listas_adyacencia()
+    trabajo_l = trabajo.tolist()
+    tipos = grafo.tipo_via.tolist()
+    h = heuristica(grafo, destino, velocidad_maxima(grafo, trabajo, perfil)).tolist()
+
+    llegada = {origen: float(salida)}
+    arco_previo = {origen: -1}
+    cerrados = set()
+    abiertos = [(salida + h[origen], origen)]
+    while abiertos:
+        _, u = heapq.heappop(abiertos)
+        if u in cerrados:
+            continue
+        cerrados.add(u)
+        if u == destino:
+            ruta, arcos = reconstruir_ruta(arco_previo, origenes, destino)
+            return {
+                'ruta': ruta,
+                'arcos': arcos,
+                'salida': float(salida),
+                'llegada': llegada[destino],
+                'costo': llegada[destino] - salida,
+                'nodos_explorados': len(cerrados),
+                'tiempo_ms': (time.perf_counter() - inicio) * 1000,
+            }
+        tu = llegada[u]
+        for e in range(indptr[u], indptr[u + 1]):
+            v = vecinos[e]
+            if v in cerrados:
+                continue
+            tentativo = tu + tiempo_recorrido(trabajo_l[e], tipos[e], tu, inicios, factores)
+            if tentativo < llegada.get(v, np.inf):
+                llegada[v] = tentativo
+                arco_previo[v] = e
+                heapq.heappush(abiertos, (tentativo + h[v], v))
+    return None
+
+
+def evaluar_ruta_dependiente(grafo, arcos, salida, trabajo, perfil=None):
+    """
+    Hora de llegada (s) al recorrer una ruta dada (lista de arcos) saliendo en 'salida'.
+    """
+    inicios, factores = perfil or perfil_trafico()
+    t = float(salida)
+    for e in arcos:
+        t += tiempo_recorrido(float(trabajo[e]), int(grafo.tipo_via[e]), t, inicios, factores)
+    return t
@@ -0,0 +1,154 @@
+from statistics import NormalDist
+
+import numpy as np
+
+from .ruteo import matriz_costos, uno_a_todos
+
+# Costo que reemplaza a ∞ en el problema de asignación (parejas imposibles)
+COSTO_INALCANZABLE = 1e12
+
+# Percentil de la ETA con que se ordenan las patrullas (50 = tiempo esperado)
+PERCENTIL_ETA = 90
+
+# Preselección por matriz de zonas: se evalúan las MAX_CANDIDATOS_ASTAR patrullas con menor
+# ETA de zona y toda otra cuya ETA de zona no supere la de la última en más de
+# MARGEN_PRESELECCION_S (la ETA entre representantes de celdas de 250 m es gruesa)
+MAX_CANDIDATOS_ASTAR = 3
+MARGEN_PRESELECCION_S = 120
+
+
+def matriz_eta(grafo, pesos, nodos_patrullas, nodos_incidentes, matriz=None):
+    """
+    Matriz patrulla × incidente de tiempos de llegada, con una búsqueda inversa
+    (todos los nodos → incidente) por incidente en lugar de una por pareja.
+    """
+    if matriz is None:
+        matriz = matriz_costos(grafo, pesos)
+    hacia_incidente = uno_a_todos(matriz, np.asarray(nodos_incidentes), inverso=True)
+    return hacia_incidente[:, np.asarray(nodos_patrullas)].T
+
+
+def eta_percentil(grafo, mu, sigma, nodos_patrullas, nodo_incidente, percentil=PERCENTIL_ETA, pesos=None,
+                  matrices=None):
+    """
+    ETA de cada patrulla en un percentil con el modelo gaussiano: Σμ y Σσ² a lo
+    largo de su ruta (la de menor costo según pesos, μ por defecto), obtenidos en
+    la misma búsqueda inversa desde el incidente. matrices es el par que retorna
+    matriz_costos(..., con_arcos=True), para reutilizarlo entre incidentes.
+    Retorna (eta, media, desviacion) por patrulla, con inf si no hay ruta.
+    """
+    from scipy.sparse.csgraph import dijkstra
+
+    if not 0 < percentil < 100:
+        raise ValueError(f"percentil debe estar entre 0 y 100, no {percentil}")
+    matriz, arcos = matrices or matriz_costos(grafo, mu if pesos is None else pesos, con_arcos=True)
+    # En la búsqueda inversa el predecesor de un nodo es su siguiente nodo hacia el incidente
+    _, siguiente = dijkstra(matriz.T.tocsr(), indices=nodo_incidente, return_predecessors=True)
+
+    nodos = np.arange(grafo.num_nodos)
+    alcanzables = siguiente >= 0
+    arco = np.asarray(arcos[nodos[alcanzables], siguiente[alcanzables]]).ravel().astype(np.int64) - 1
+    suma = np.zeros((grafo.num_nodos, 2))
+    suma[alcanzables, 0] = np.asarray(mu)[arco]
+    suma[alcanzables, 1] = np.asarray(sigma)[arco] ** 2
+    suma = sumar_hacia_raiz(siguiente, suma)
+
+    nodos_patrullas = np.asarray(nodos_patrullas)
+    llega = alcanzables[nodos_patrullas] | (nodos_patrullas == nodo_incidente)
+    media = np.where(llega, suma[nodos_patrullas, 0], np.inf)
+    desviacion = np.sqrt(suma[nodos_patrullas, 1])
+    return media + NormalDist().inv_cdf(percentil / 100) * desviacion, media, desviacion
+
+
+def sumar_hacia_raiz(siguiente, valores):
+    """
+    Suma de 'valores' (uno o varios por nodo, el del arco hacia su siguiente nodo)
+    desde cada nodo hasta la raíz del árbol 'siguiente' (-9999 en la raíz y en los
+    nodos fuera del árbol).
+    """
+    nodos = np.arange(len(siguiente))
+    suma = np.array(valores, dtype=float)
+    # Saltos de puntero: en log2(profundidad) pasos cada nodo suma hasta la raíz
+    salto = np.where(siguiente >= 0, siguiente, nodos)
+    while True:
+        doble = salto[salto]
+        if np.array_equal(doble, salto):
+            break
+        suma += suma[salto]
+        salto = doble
+    return suma
+
+
+def preseleccion_zonas(eta_zona, disponibles, max_candidatos=MAX_CANDIDATOS_ASTAR,
+                       margen_s=MARGEN_PRESELECCION_S):
+    """
+    Preselección de procesarEmergencia con la matriz de zonas: de las patrullas
+    disponibles, las max_candidatos con menor ETA de zona y las que empatan con la
+    última dentro de margen_s. max_candidatos = 0 la desactiva. Retorna una máscara.
+    """
+    disponibles = np.asarray(disponibles, dtype=bool)
+    indices = np.flatnonzero(disponibles)
+    if max_candidatos <= 0 or len(indices) <= max_candidatos:
+        return disponibles.copy()
+    eta_zona = np.asarray(eta_zona, dtype=float)
+    orden = indices[np.argsort(eta_zona[indices], kind='stable')]
+    evaluadas = np.zeros(len(disponibles), dtype=bool)
+    evaluadas[orden[:max_candidatos]] = True
+    evaluadas |= disponibles & (eta_zona <= eta_zona[orden[max_candidatos - 1]] + margen_s)
+    return evaluadas
+
+
+def asignar_voraz(eta, libres=None):
+    """
+    Política de procesarEmergencia: cada incidente, en orden de llegada, toma la
+    patrulla libre con menor tiempo. Retorna asignacion[i] = índice de patrulla o -1.
+    """
+    libres = np.ones(eta.shape[0], dtype=bool) if libres is None else libres.copy()
+    asignacion = np.full(eta.shape[1], -1)
+    for i in range(eta.shape[1]):
+        tiempos = np.where(libres, eta[:, i], np.inf)
+        mejor = int(np.argmin(tiempos))
+        if np.isfinite(tiempos[mejor]):
+            asignacion[i] = mejor
+            libres[mejor] = False
+    return asignacion
+
+
+def asignar_lote(eta):
+    """
+    Asignación óptima patrulla ↔ incidente que minimiza el tiempo total de llegada
+    (algoritmo húngaro; admite matrices rectangulares). Los incidentes que no
+    reciben patrulla alcanzable se completan con la política voraz sobre las
+    patrullas restantes. Retorna asignacion[i] = índice de patrulla o -1.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    asignacion = np.full(eta.shape[1], -1)
+    filas, columnas = linear_sum_assignment(np.where(np.isfinite(eta), eta, COSTO_INALCANZABLE))
+    validas = np.isfinite(eta[filas, columnas])
+    asignacion[columnas[validas]] = filas[validas]
+
+    pendientes = np.flatnonzero(asignacion < 0)
+    if len(pendientes) > 0:
+        libres = np.ones(eta.shape[0], dtype=bool)
+        libres[asignacion[asignacion >= 0]] = False
+        asignacion[pendientes] = asignar_voraz(eta[:, pendientes], libres)
+    return asignacion
+
+
+def despachar_lote(grafo, pesos, patrullas, nodos_incidentes, matriz=None):
+    """
+    Despacho por lotes de incidentes simultáneos con las patrullas disponibles.
+    Retorna una lista por incidente con {'incidente', 'patrulla', 'eta'} (patrulla None si queda en espera).
+    """
+    disponibles = [p for p in patrullas if p['status'] == 'disponible']
+    if not disponibles:
+        return [{'incidente': int(n), 'patrulla': None, 'eta': None} for n in nodos_incidentes]
+
+    eta = matriz_eta(grafo, pesos, [p['nodo_actual'] for p in disponibles], nodos_incidentes, matriz)
+    asignacion = asignar_lote(eta)
+    return [{
+        'incidente': int(nodo),
+        'patrulla': disponibles[j]['id'] if j >= 0 else None,
+        'eta': float(eta[j, i]) if j >= 0 else None,
+    } for i, (nodo, j) in enumerate(zip(nodos_incidentes, asignacion))]
@@ -0,0 +1,200 @@
+"""
+Fiabilidad de las rutas recomendadas por Monte Carlo: en lugar de justificar la
+ruta segura solo con μ + k·σ, se muestrean los tiempos de sus arcos y se estima
+la probabilidad de llegar dentro del plazo y los percentiles de la ETA.
+
+También la ruta "a tiempo", que maximiza directamente P(llegada ≤ plazo) con el
+modelo gaussiano por arco (tiempo de la ruta ~ N(Σμ, Σσ²)).
+"""
+import heapq
+import math
+import time
+
+import numpy as np
+
+from .costos import TIPOS_VIA
+from .ruteo import a_estrella, matriz_costos, uno_a_todos
+
+MUESTRAS = 4000
+PLAZO_MIN = 10
+PERCENTILES = (50, 90, 95)
+
+# Tope de etiquetas de la ruta a tiempo: al alcanzarlo se retorna la mejor conocida
+MAX_ETIQUETAS = 10000
+PASOS_TANGENTE = 3
+# Diferencia de probabilidad que no vale la pena seguir buscando
+TOLERANCIA = 1e-3
+
+
+def simular_tiempos(mu, sigma, tipo_via, rutas, muestras=MUESTRAS, correlacion=0.0, semilla=0):
+    """
+    Tiempos totales simulados de varias rutas (listas de arcos), matriz muestras × rutas.
+
+    Cada arco sigue N(μ, σ) truncada en 0. Con correlacion=ρ > 0 los arcos de un
+    mismo tipo de vía comparten un factor común en cada muestra (ρ es la
+    correlación entre dos arcos del mismo tipo). Las rutas se simulan sobre las
+    mismas muestras, así que los arcos que comparten reciben el mismo tiempo.
+    """
+    if not 0.0 <= correlacion <= 1.0:
+        raise ValueError(f"correlacion debe estar en [0, 1], no {correlacion}")
+    rutas = [np.asarray(ruta, dtype=np.int64) for ruta in rutas]
+    arcos = np.unique(np.concatenate(rutas))
+    rng = np.random.default_rng(semilla)
+
+    ruido = rng.standard_normal((muestras, len(arcos)), dtype=np.float32)
+    if correlacion > 0:
+        comun = rng.standard_normal((muestras, len(TIPOS_VIA)), dtype=np.float32)
+        ruido *= np.float32(np.sqrt(1.0 - correlacion))
+        ruido += np.float32(np.sqrt(correlacion)) * comun[:, tipo_via[arcos]]
+    ruido *= np.asarray(sigma[arcos], dtype=np.float32)
+    ruido += np.asarray(mu[arcos], dtype=np.float32)
+    np.maximum(ruido, 0, out=ruido)
+
+    # Incidencia arcos × rutas: el tiempo de cada ruta es un producto matricial
+    incidencia = np.zeros((len(arcos), len(rutas)), dtype=np.float32)
+    for j, ruta in enumerate(rutas):
+        np.add.at(incidencia[:, j], np.searchsorted(arcos, ruta), 1)
+    return ruido @ incidencia
+
+
+def resumen_fiabilidad(tiempos, plazo_s, percentiles=PERCENTILES):
+    """
+    P(llegada ≤ plazo) y percentiles de la ETA (s) de cada columna de tiempos simulados.
+    """
+    etas = np.percentile(tiempos, percentiles, axis=0)
+    a_tiempo = (tiempos <= plazo_s).mean(axis=0)
+    return [{
+        'plazo_s': round(float(plazo_s), 1),
+        'p_a_tiempo': round(float(a_tiempo[j]), 4),
+        **{f"eta_p{p}_s": round(float(etas[i, j]), 1) for i, p in enumerate(percentiles)},
+    } for j in range(tiempos.shape[1])]
+
+
+def fiabilidad_rutas(grafo, resultados, mu, sigma, plazo_s=PLAZO_MIN * 60, muestras=MUESTRAS,
+                     correlacion=0.0, semilla=0):
+    """
+    Fiabilidad de varios resultados de a_estrella a la vez (None si no hay ruta).
+    """
+    con_ruta = [i for i, resultado in enumerate(resultados) if resultado is not None]
+    fiabilidad = [None] * len(resultados)
+    if not con_ruta:
+        return fiabilidad
+    tiempos = simular_tiempos(mu, sigma, grafo.tipo_via, [resultados[i]['arcos'] for i in con_ruta],
+                              muestras, correlacion, semilla)
+    for i, resumen in zip(con_ruta, resumen_fiabilidad(tiempos, plazo_s)):
+        fiabilidad[i] = resumen
+    return fiabilidad
+
+
+def probabilidad_a_tiempo(mu, varianza, plazo_s):
+    """
+    P(T ≤ plazo) con T ~ N(mu, varianza).
+    """
+    if varianza <= 0:
+        return 1.0 if mu <= plazo_s else 0.0
+    return 0.5 * (1.0 + math.erf((plazo_s - mu) / math.sqrt(2.0 * varianza)))
+
+
+def ruta_a_tiempo(grafo, origen, destino, mu, sigma, plazo_s, candidatas=(), tolerancia=TOLERANCIA,
+                  max_etiquetas=MAX_ETIQUETAS):
+    """
+    Ruta que maximiza P(llegada ≤ plazo) con arcos N(μ, σ²) independientes.
+
+    Búsqueda por etiquetas (Σμ, Σσ²) de mejor cota primero. Se descartan las
+    etiquetas dominadas en su nodo (más μ y más σ² que otra) y las que, aun
+    completadas con las cotas inferiores de μ y σ² hasta el destino, no superan a
+    la mejor ruta conocida; candidatas (listas de arcos, p. ej. las rutas rápida y
+    segura) dan esa primera cota. La ruta retornada queda a menos de tolerancia
+    de la probabilidad óptima. Si se agotan las etiquetas, o si ninguna ruta
+    llega en promedio dentro del plazo (ahí solo ayudaría apostar por más
+    varianza), se retorna la mejor conocida con 'exacta' en False.
+    Retorna {'ruta', 'arcos', 'mu', 'varianza', 'p_a_tiempo', 'etiquetas', 'nodos_explorados',
+    'exacta', 'tiempo_ms'} o None.
+    """
+    inicio = time.perf_counter()
+    indptr, origenes, vecinos = grafo.listas_adyacencia()
+    varianza = np.asarray(sigma, dtype=np.float64) ** 2
+    cota_mu = uno_a_todos(matriz_costos(grafo, mu), [destino], inverso=True)[0]
+    cota_var = uno_a_todos(matriz_costos(grafo, varianza), [destino], inverso=True)[0]
+    cota_mu[destino] = cota_var[destino] = 0.0
+    mu_arco, var_arco = np.asarray(mu, dtype=np.float64).tolist(), varianza.tolist()
+    cota_mu, cota_var = cota_mu.tolist(), cota_var.tolist()
+
+    def cota(nodo, m, v):
+        # Con el plazo ya perdido más varianza ayuda: 0.5 es una cota segura
+        m, v = m + cota_mu[nodo], v + cota_var[nodo]
+        return 0.5 if m > plazo_s and v > 0 else probabilidad_a_tiempo(m, v, plazo_s)
+
+    def evaluar(arcos):
+        m, v = sum(mu_arco[e] for e in arcos), sum(var_arco[e] for e in arcos)
+        return (probabilidad_a_tiempo(m, v, plazo_s), m, v, list(arcos))
+
+    mejor = max((evaluar(arcos) for arcos in candidatas), default=None, key=lambda r: r[0])
+    # Pasos por la tangente: con λ = (plazo − μ) / 2σ² la ruta de menor μ + λσ²
+    # mejora la probabilidad mientras haya margen (la ruta óptima está en la
+    # envolvente convexa de los pares (μ, σ²))
+    for _ in range(PASOS_TANGENTE if mejor is not None else 0):
+        _, m, v, _ = mejor
+        if m >= plazo_s or v <= 0:
+            break
+        tangente = a_estrella(grafo, origen, destino, mu + (plazo_s - m) / (2 * v) * varianza)
+        if tangente is None:
+            break
+        candidata = evaluar(tangente['arcos'])
+        if candidata[0] <= mejor[0]:
+            break
+        mejor = candidata
+
+    def resultado(p, m, v, arcos, exacta):
+        ruta = [origen] + [int(vecinos[e]) for e in arcos]
+        return {'ruta': ruta, 'arcos': arcos, 'mu': m, 'varianza': v, 'p_a_tiempo': p,
+                'etiquetas': len(etiqueta_mu), 'nodos_explorados': expandidas, 'exacta': exacta,
+                'tiempo_ms': (time.perf_counter() - inicio) * 1000}
+
+    # Etiquetas: (μ, σ², etiqueta previa, arco) por índice; vivas por nodo para la dominancia
+    etiqueta_mu, etiqueta_var, previa, arco_previo, viva = [0.0], [0.0], [-1], [-1], [True]
+    en_nodo = {origen: [0]}
+    abiertas = [(-cota(origen, 0.0, 0.0), 0.0, 0, origen)]
+    expandidas = 0
+    if cota_mu[origen] > plazo_s:
+        return resultado(*mejor, False) if mejor is not None else None
+    while abiertas:
+        negativa, m, i, u = heapq.heappop(abiertas)
+        if not viva[i]:
+            continue
+        if mejor is not None and -negativa <= mejor[0] + tolerancia:
+            break
+        if u == destino:
+            v, arcos = etiqueta_var[i], []
+            while previa[i] >= 0:
+                arcos.append(arco_previo[i])
+                i = previa[i]
+            arcos.reverse()
+            return resultado(-negativa, m, v, arcos, True)
+        if len(etiqueta_mu) >= max_etiquetas:
+            return resultado(*mejor, False) if mejor is not None else None
+        expandidas += 1
+        v = etiqueta_var[i]
+        for e in range(indptr[u], indptr[u + 1]):
+            w = vecinos[e]
+            nm, nv = m + mu_arco[e], v + var_arco[e]
+            if not math.isfinite(nm):
+                continue
+            c = cota(w, nm, nv)
+            if mejor is not None and c <= mejor[0] + tolerancia:
+                continue
+            etiquetas = en_nodo.setdefault(w, [])
+            if any(etiqueta_mu[j] <= nm and etiqueta_var[j] <= nv for j in etiquetas):
+                continue
+            for j in etiquetas:
+                if nm <= etiqueta_mu[j] and nv <= etiqueta_var[j]:
+                    viva[j] = False
+            etiquetas[:] = [j for j in etiquetas if viva[j]]
+            etiquetas.append(len(etiqueta_mu))
+            heapq.heappush(abiertas, (-c, nm, len(etiqueta_mu), w))
+            etiqueta_mu.append(nm)
+            etiqueta_var.append(nv)
+            previa.append(i)
+            arco_previo.append(e)
+            viva.append(True)
+    return resultado(*mejor, True) if mejor is not None else None
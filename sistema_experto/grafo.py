@@ -0,0 +1,361 @@
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .costos import FACTORES_CLIMA, NIVELES_TRAFICO, TIPOS_VIA, calcular_costos
+
+# networkx y osmnx (que arrastra geopandas, shapely, pyproj y matplotlib) se importan
+# solo al descargar o reconstruir el grafo: servir desde la instantánea usa solo NumPy.
+INSTANTANEA = "instantanea.json"
+VERSION_INSTANTANEA = 1
+
+# Costos μ y σ precalculados en la instantánea: arreglos (nivel, clima, arco)
+COSTOS_PRECALCULADOS = ('costos_mu', 'costos_sigma')
+
+
+def clasificar_via(highway):
+    """
+    Clasifica un arco según su etiqueta OSM 'highway'.
+    Retorna (tipo_via, velocidad_base, sigma_base, factor_calidad).
+    """
+    if isinstance(highway, list):
+        highway = highway[0]
+
+    if highway in ['primary', 'trunk', 'motorway']:
+        return 'avenida_principal', 50, 20, 1.2
+    elif highway in ['secondary', 'tertiary']:
+        return 'calle_colectora', 40, 18, 1.3
+    elif highway in ['residential', 'living_street']:
+        return 'calle_residencial', 30, 12, 1.1
+    else:
+        return 'jiron_comercial', 35, 15, 1.4
+
+
+def enriquecer_grafo(G):
+    """
+    Añade los atributos estáticos del modelo de costo a cada arco del grafo.
+    """
+    for u, v, key, data in G.edges(data=True, keys=True):
+        tipo_via, velocidad_base, sigma_base, factor_calidad = clasificar_via(data.get('highway', 'residential'))
+        data['tipo_via'] = tipo_via
+        data['velocidad_base'] = velocidad_base
+        data['sigma_base'] = sigma_base
+        data['factor_calidad'] = factor_calidad
+        data['length'] = data.get('length', 100)
+    return G
+
+
+def construir_grafo(place="Tacna, Peru"):
+    """
+    Descarga la red vial, conserva la componente fuertemente conexa más grande,
+    renumera los nodos con enteros y enriquece los arcos.
+    """
+    import osmnx as ox
+
+    G = ox.graph_from_place(place, network_type='drive', simplify=True)
+    return preparar_grafo(G)
+
+
+def preparar_grafo(G):
+    """
+    Componente fuertemente conexa más grande, nodos enteros y arcos enriquecidos.
+    """
+    import networkx as nx
+
+    # Se asegura conectividad fuerte para evitar islas
+    if not nx.is_strongly_connected(G):
+        largest_scc = max(nx.strongly_connected_components(G), key=len)
+        G = G.subgraph(largest_scc).copy()
+
+    # Conversion a enteros para compatibilidad con JavaScript
+    G = nx.convert_node_labels_to_integers(G, label_attribute='osmid')
+    return enriquecer_grafo(G)
+
+
+# Etiquetas OSM que osmnx conserva en nodos y arcos
+ETIQUETAS_NODO = ['highway', 'junction', 'railway', 'ref']
+ETIQUETAS_VIA = ['bridge', 'tunnel', 'oneway', 'lanes', 'ref', 'name', 'highway', 'maxspeed', 'service',
+                 'access', 'area', 'landuse', 'width', 'est_width', 'junction']
+VALORES_SENTIDO_UNICO = {'yes', 'true', '1', '-1', 'reverse', 'T', 'F'}
+VALORES_SENTIDO_INVERSO = {'-1', 'reverse', 'T'}
+
+
+def grafo_desde_cache(carpeta="cache"):
+    """
+    Reconstruye sin conexión el grafo de graph_from_place a partir de las respuestas
+    guardadas por osmnx en 'carpeta' (geocodificación de Nominatim + Overpass):
+    mismas reglas de sentido único, simplificación y recorte al polígono del lugar.
+    """
+    import networkx as nx
+    import osmnx as ox
+
+    respuestas = [json.load(open(ruta, encoding='utf-8')) for ruta in sorted(glob.glob(os.path.join(carpeta, '*.json')))]
+    poligono = next((r['geojson'] for respuesta in respuestas if isinstance(respuesta, list)
+                     for r in respuesta if r.get('geojson', {}).get('type') in ('Polygon', 'MultiPolygon')), None)
+
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    for respuesta in respuestas:
+        if not isinstance(respuesta, dict):
+            continue
+        elementos = respuesta.get('elements', [])
+        vias = [e for e in elementos if e['type'] == 'way']
+        # Solo las consultas de red vial (todas sus vías tienen 'highway'); las de puntos de interés se ignoran
+        if not vias or any('highway' not in v.get('tags', {}) for v in vias):
+            continue
+        for e in elementos:
+            if e['type'] == 'node':
+                etiquetas = {k: v for k, v in e.get('tags', {}).items() if k in ETIQUETAS_NODO}
+                G.add_node(e['id'], y=e['lat'], x=e['lon'], **etiquetas)
+        for via in vias:
+            _agregar_via(G, via)
+
+    G.remove_nodes_from([n for n, data in G.nodes(data=True) if 'x' not in data])
+    G = ox.distance.add_edge_lengths(G)
+    G = ox.simplify_graph(G)
+    if poligono is not None:
+        from shapely.geometry import shape
+        G = ox.truncate.truncate_graph_polygon(G, shape(poligono))
+    return preparar_grafo(G)
+
+
+def _agregar_via(G, via):
+    """
+    Añade los arcos de una vía OSM respetando oneway/junction como lo hace osmnx.
+    """
+    etiquetas = {k: v for k, v in via.get('tags', {}).items() if k in ETIQUETAS_VIA}
+    nodos = via['nodes']
+    sentido_unico = (etiquetas.get('oneway') in VALORES_SENTIDO_UNICO
+                     or etiquetas.get('junction') == 'roundabout')
+    if etiquetas.get('oneway') in VALORES_SENTIDO_INVERSO:
+        nodos = nodos[::-1]
+
+    etiquetas['osmid'] = via['id']
+    etiquetas['oneway'] = sentido_unico
+    pares = list(zip(nodos[:-1], nodos[1:]))
+    G.add_edges_from(pares, reversed=False, **etiquetas)
+    if not sentido_unico:
+        G.add_edges_from([(v, u) for u, v in pares], reversed=True, **etiquetas)
+
+
+class GrafoEmpaquetado:
+    """
+    Representación compacta (CSR) del grafo enriquecido para ruteo con NumPy.
+    Los arcos están ordenados por nodo de origen: los salientes de u son
+    indptr[u]:indptr[u + 1].
+    """
+
+    # Arreglos que forman el grafo (y los archivos .npy de la instantánea)
+    ARREGLOS = ('lat', 'lon', 'osmid', 'indptr', 'origen', 'destino', 'longitud', 'tipo_via',
+                'velocidad_base', 'sigma_base', 'factor_calidad')
+
+    def __init__(self, lat, lon, osmid, indptr, origen, destino, longitud, tipo_via, velocidad_base, sigma_base,
+                 factor_calidad):
+        self.lat = lat
+        self.lon = lon
+        self.osmid = osmid
+        self.indptr = indptr
+        self.origen = origen
+        self.destino = destino
+        self.longitud = longitud
+        self.tipo_via = tipo_via
+        self.velocidad_base = velocidad_base
+        self.sigma_base = sigma_base
+        self.factor_calidad = factor_calidad
+        # {(nivel, clima): (μ, σ)} de solo lectura, si la instantánea los trae (semilla 0)
+        self.costos_precalculados = {}
+        self._listas = None
+
+    def guardar(self, carpeta, costos=True, **metadatos):
+        """
+        Escribe la instantánea: un .npy por arreglo, los costos μ y σ de cada nivel
+        de tráfico y clima (semilla 0) e instantanea.json al final (su presencia
+        indica que la instantánea está completa).
+        """
+        os.makedirs(carpeta, exist_ok=True)
+        for nombre in self.ARREGLOS:
+            np.save(os.path.join(carpeta, f"{nombre}.npy"), getattr(self, nombre))
+        if costos:
+            climas = list(FACTORES_CLIMA)
+            tabla = [[calcular_costos(self, nivel, clima) for clima in climas] for nivel in NIVELES_TRAFICO]
+            for i, nombre in enumerate(COSTOS_PRECALCULADOS):
+                np.save(os.path.join(carpeta, f"{nombre}.npy"),
+                        np.array([[par[i] for par in fila] for fila in tabla]))
+            metadatos['costos'] = {'niveles': NIVELES_TRAFICO, 'climas': climas}
+        temporal = os.path.join(carpeta, f"{INSTANTANEA}.{os.getpid()}.tmp")
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({'version': VERSION_INSTANTANEA, 'nodos': self.num_nodos, 'arcos': self.num_arcos,
+                       'caja': self.caja(), **metadatos}, f, ensure_ascii=False, indent=1)
+        os.replace(temporal, os.path.join(carpeta, INSTANTANEA))
+
+    @classmethod
+    def cargar(cls, carpeta, mapear=False):
+        """
+        Lee una instantánea escrita con guardar(). Con mapear=True los arreglos se
+        mapean en memoria de solo lectura: los procesos que abren la misma instantánea
+        comparten las páginas (sin copia). Los costos precalculados se mapean siempre.
+        Lanza ValueError si es de otra versión.
+        """
+        metadatos = leer_metadatos(carpeta)
+        grafo = cls(**{nombre: np.load(os.path.join(carpeta, f"{nombre}.npy"), mmap_mode='r' if mapear else None)
+                       for nombre in cls.ARREGLOS})
+        costos = metadatos.get('costos')
+        if costos:
+            mu, sigma = (np.load(os.path.join(carpeta, f"{nombre}.npy"), mmap_mode='r')
+                         for nombre in COSTOS_PRECALCULADOS)
+            grafo.costos_precalculados = {
+                (nivel, clima): (mu[i, j], sigma[i, j])
+                for i, nivel in enumerate(costos['niveles']) for j, clima in enumerate(costos['climas'])
+            }
+        return grafo
+
+    @property
+    def num_nodos(self):
+        return len(self.lat)
+
+    @property
+    def num_arcos(self):
+        return len(self.destino)
+
+    def huella(self):
+        """
+        Resumen SHA-256 de la topología y el orden de los nodos (indptr, destino y
+        osmid): dos grafos con la misma huella numeran igual nodos y arcos.
+        """
+        resumen = hashlib.sha256()
+        for nombre in ('indptr', 'destino', 'osmid'):
+            resumen.update(np.ascontiguousarray(getattr(self, nombre), dtype=np.int64).tobytes())
+        return resumen.hexdigest()
+
+    def caja(self):
+        """
+        Caja que contiene todos los nodos: [lat_min, lon_min, lat_max, lon_max].
+        """
+        return [float(self.lat.min()), float(self.lon.min()), float(self.lat.max()), float(self.lon.max())]
+
+    def bytes_memoria(self):
+        """
+        Memoria aproximada del grafo: los arreglos más, si ya se armaron, las listas
+        de adyacencia (8 bytes por posición y 28 por entero de Python).
+        """
+        total = sum(getattr(self, nombre).nbytes for nombre in self.ARREGLOS)
+        if self._listas is not None:
+            total += sum(len(lista) for lista in self._listas) * (8 + 28)
+        return total
+
+    def listas_adyacencia(self):
+        """
+        indptr, origen y destino como listas de Python (más rápidas en bucles de búsqueda).
+        """
+        if self._listas is None:
+            self._listas = (self.indptr.tolist(), self.origen.tolist(), self.destino.tolist())
+        return self._listas
+
+    def arcos_entre(self, u, v):
+        """
+        Índices de los arcos u→v (puede haber paralelos).
+        """
+        inicio, fin = self.indptr[u], self.indptr[u + 1]
+        return (inicio + np.flatnonzero(self.destino[inicio:fin] == v)).tolist()
+
+    def nodo_mas_cercano(self, lat, lon):
+        """
+        Nodo más cercano a un punto (aproximación equirectangular).
+        """
+        dx = (self.lon - lon) * np.cos(np.radians(lat))
+        dy = self.lat - lat
+        return int(np.argmin(dx * dx + dy * dy))
+
+
+def leer_metadatos(carpeta):
+    """
+    Metadatos de la instantánea de 'carpeta' sin leer los arreglos.
+    Lanza FileNotFoundError si no hay instantánea y ValueError si es de otra versión.
+    """
+    with open(os.path.join(carpeta, INSTANTANEA), encoding='utf-8') as f:
+        metadatos = json.load(f)
+    if metadatos.get('version') != VERSION_INSTANTANEA:
+        raise ValueError(f"instantánea versión {metadatos.get('version')}, se esperaba {VERSION_INSTANTANEA}")
+    return metadatos
+
+
+def fusionar_grafos(grafos):
+    """
+    Une grafos de regiones vecinas en uno solo. Los nodos se identifican por su
+    osmid (el mismo cruce en las dos regiones queda como un único nodo) y los arcos
+    repetidos en la zona compartida se conservan una sola vez.
+    """
+    osmid, posicion = np.unique(np.concatenate([g.osmid for g in grafos]), return_index=True)
+    lat = np.concatenate([g.lat for g in grafos])[posicion]
+    lon = np.concatenate([g.lon for g in grafos])[posicion]
+
+    # Extremos de cada arco traducidos a los índices del grafo fusionado
+    origen = np.concatenate([np.searchsorted(osmid, g.osmid[g.origen]) for g in grafos])
+    destino = np.concatenate([np.searchsorted(osmid, g.osmid[g.destino]) for g in grafos])
+    atributos = {nombre: np.concatenate([getattr(g, nombre) for g in grafos])
+                 for nombre in ('longitud', 'tipo_via', 'velocidad_base', 'sigma_base', 'factor_calidad')}
+
+    # Un arco repetido tiene los mismos extremos y la misma longitud (al decímetro)
+    clave = np.stack([origen, destino, np.round(atributos['longitud'] * 10).astype(np.int64)], axis=1)
+    _, unicos = np.unique(clave, axis=0, return_index=True)
+    unicos.sort()
+    orden = unicos[np.argsort(origen[unicos], kind='stable')]
+
+    n = len(osmid)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(origen[orden], minlength=n), out=indptr[1:])
+    return GrafoEmpaquetado(
+        lat, lon, osmid, indptr, origen[orden].astype(np.int32), destino[orden].astype(np.int32),
+        **{nombre: valores[orden] for nombre, valores in atributos.items()}
+    )
+
+
+def empaquetar_grafo(G):
+    """
+    Convierte el MultiDiGraph enriquecido (nodos 0..n-1) en un GrafoEmpaquetado.
+    """
+    n = G.number_of_nodes()
+    lat = np.zeros(n)
+    lon = np.zeros(n)
+    osmid = np.zeros(n, dtype=np.int64)
+    for node, data in G.nodes(data=True):
+        lat[node] = data['y']
+        lon[node] = data['x']
+        osmid[node] = data.get('osmid', node)
+
+    codigos = {tipo: i for i, tipo in enumerate(TIPOS_VIA)}
+    arcos = list(G.edges(data=True))
+    origen = np.fromiter((u for u, _, _ in arcos), dtype=np.int32, count=len(arcos))
+    destino = np.fromiter((v for _, v, _ in arcos), dtype=np.int32, count=len(arcos))
+    longitud = np.fromiter((d.get('length', 100) for _, _, d in arcos), dtype=np.float64, count=len(arcos))
+    tipo_via = np.fromiter((codigos.get(d.get('tipo_via'), codigos['jiron_comercial']) for _, _, d in arcos),
+                           dtype=np.int8, count=len(arcos))
+    velocidad_base = np.fromiter((d.get('velocidad_base', 30) for _, _, d in arcos), dtype=np.float64, count=len(arcos))
+    sigma_base = np.fromiter((d.get('sigma_base', 15) for _, _, d in arcos), dtype=np.float64, count=len(arcos))
+    factor_calidad = np.fromiter((d.get('factor_calidad', 1.4) for _, _, d in arcos), dtype=np.float64, count=len(arcos))
+
+    orden = np.argsort(origen, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(origen, minlength=n), out=indptr[1:])
+
+    return GrafoEmpaquetado(
+        lat, lon, osmid, indptr,
+        origen[orden], destino[orden], longitud[orden], tipo_via[orden],
+        velocidad_base[orden], sigma_base[orden], factor_calidad[orden]
+    )
+
+
+def instantanea_o_construir(carpeta, place="Tacna, Peru"):
+    """
+    Grafo empaquetado y mapeado desde la instantánea de 'carpeta'. Si no existe o es
+    de otra versión, lo descarga y construye (osmnx), guarda la instantánea y la
+    mapea, así también el primer proceso comparte las páginas con los demás.
+    """
+    try:
+        return GrafoEmpaquetado.cargar(carpeta, mapear=True)
+    except (FileNotFoundError, ValueError):
+        pass
+    empaquetar_grafo(construir_grafo(place)).guardar(carpeta, lugar=place)
+    return GrafoEmpaquetado.cargar(carpeta, mapear=True)
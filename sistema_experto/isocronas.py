@@ -0,0 +1,43 @@
+import numpy as np
+
+from .ruteo import matriz_costos, uno_a_todos
+
+UMBRALES_MIN = (3, 5, 10)
+COLORES_UMBRAL = {3: '#2ECC71', 5: '#F1C40F', 10: '#E67E22'}
+
+
+def isocronas(grafo, mu, origenes, umbrales_min=UMBRALES_MIN):
+    """
+    Isócronas de tiempo de respuesta desde varios orígenes a la vez: una llamada
+    a SciPy que corre un Dijkstra por origen (cada patrulla necesita sus propios
+    tiempos), acotado por el mayor umbral.
+    Retorna, por origen, la lista de índices de arcos alcanzados en cada banda
+    (banda i: llegada al final del arco en (umbral[i-1], umbral[i]]).
+    """
+    umbrales = np.sort(np.asarray(umbrales_min, dtype=np.float64)) * 60
+    tiempos = uno_a_todos(matriz_costos(grafo, mu), np.asarray(origenes), limite=umbrales[-1])
+    banda = np.searchsorted(umbrales, tiempos[:, grafo.origen] + mu, side='left')
+    return [[np.flatnonzero(fila == i) for i in range(len(umbrales))] for fila in banda]
+
+
+def isocronas_patrullas(grafo, mu, patrullas, umbrales_min=UMBRALES_MIN):
+    """
+    Isócronas de cada patrulla como conjuntos de arcos coloreados para Leaflet:
+    {id_patrulla: [{"umbral": min, "color": hex, "arcos": [[u, v], ...]}, ...]}
+    """
+    umbrales_min = sorted(umbrales_min)
+    bandas = isocronas(grafo, mu, [p['nodo_actual'] for p in patrullas], umbrales_min)
+
+    resultado = {}
+    for patrulla, bandas_patrulla in zip(patrullas, bandas):
+        resultado[patrulla['id']] = []
+        for umbral, arcos in zip(umbrales_min, bandas_patrulla):
+            # Un solo segmento por calle aunque tenga arcos en ambos sentidos
+            pares = np.sort(np.column_stack((grafo.origen[arcos], grafo.destino[arcos])), axis=1)
+            pares = np.unique(pares, axis=0) if len(pares) else pares
+            resultado[patrulla['id']].append({
+                "umbral": umbral,
+                "color": COLORES_UMBRAL.get(umbral, '#E74C3C'),
+                "arcos": pares.tolist(),
+            })
+    return resultado
@@ -0,0 +1,131 @@
+"""
+Ruteo por lotes para análisis fuera de línea: réplicas de incidentes históricos,
+estudios de cobertura y comparación de escenarios.
+
+Las consultas llegan como arreglos (origen, destino, perfil de costo) y se reparten
+en bloques entre un pool de procesos. Cada trabajador abre la instantánea del grafo
+mapeada en memoria (todos comparten las mismas páginas) y los resultados vuelven por
+bloques, en el orden de las consultas, a medida que se completan.
+
+Uso:
+    python -m sistema_experto batch --instantanea instantanea --consultas consultas.csv --salida rutas.csv --procesos 32
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .costos import calcular_costos, costo_seguro
+from .grafo import GrafoEmpaquetado
+from .ruteo import a_estrella
+
+# Campos numéricos de cada bloque de resultados (NaN / -1 si no hay ruta)
+CAMPOS = ['costo', 'tiempo_esperado_s', 'desviacion_s', 'distancia_m', 'nodos_explorados']
+
+
+def perfil(nivel="trafico_medio", clima="despejado", k=None):
+    """
+    Perfil de costo: μ (ruta rápida) o, con k, μ + kσ (ruta segura).
+    """
+    return {'nivel': nivel, 'clima': clima, 'k': k}
+
+
+def nodos_mas_cercanos(grafo, lat, lon):
+    """
+    Nodo más cercano a cada punto, con un árbol k-d sobre coordenadas equirectangulares
+    (la misma aproximación que GrafoEmpaquetado.nodo_mas_cercano, con el coseno de la latitud media).
+    """
+    from scipy.spatial import cKDTree
+
+    escala = np.cos(np.radians(float(np.mean(grafo.lat))))
+    arbol = cKDTree(np.column_stack([grafo.lat, grafo.lon * escala]))
+    _, nodos = arbol.query(np.column_stack([lat, np.asarray(lon) * escala]))
+    return nodos.astype(np.int64)
+
+
+# --- Trabajadores del pool de procesos ---
+_GRAFO = None
+_PERFILES = []
+_PESOS = {}
+
+
+def _iniciar_trabajador(carpeta, perfiles):
+    global _GRAFO, _PERFILES, _PESOS
+    _GRAFO = GrafoEmpaquetado.cargar(carpeta, mapear=True)
+    _GRAFO.listas_adyacencia()
+    _PERFILES = perfiles
+    _PESOS = {}
+
+
+def _pesos(indice):
+    """
+    (pesos como lista para A*, μ, σ) de un perfil, calculados una vez por trabajador.
+    """
+    if indice not in _PESOS:
+        datos = _PERFILES[indice]
+        mu, sigma = calcular_costos(_GRAFO, datos['nivel'], datos['clima'])
+        pesos = mu if datos['k'] is None else costo_seguro(mu, sigma, datos['k'])
+        _PESOS[indice] = (np.asarray(pesos).tolist(), mu, sigma)
+    return _PESOS[indice]
+
+
+def _rutear_bloque(tarea):
+    inicio, origenes, destinos, perfiles, con_rutas = tarea
+    n = len(origenes)
+    bloque = {campo: np.full(n, np.nan) for campo in CAMPOS}
+    bloque['nodos_explorados'] = np.full(n, -1, dtype=np.int64)
+    rutas = [None] * n
+    for i in range(n):
+        pesos, mu, sigma = _pesos(int(perfiles[i]))
+        resultado = a_estrella(_GRAFO, int(origenes[i]), int(destinos[i]), pesos)
+        if resultado is None:
+            continue
+        arcos = np.asarray(resultado['arcos'], dtype=np.int64)
+        bloque['costo'][i] = resultado['costo']
+        bloque['tiempo_esperado_s'][i] = mu[arcos].sum()
+        bloque['desviacion_s'][i] = np.sqrt(np.sum(sigma[arcos] ** 2))
+        bloque['distancia_m'][i] = _GRAFO.longitud[arcos].sum()
+        bloque['nodos_explorados'][i] = resultado['nodos_explorados']
+        if con_rutas:
+            rutas[i] = resultado['ruta']
+    bloque['inicio'] = inicio
+    bloque['fin'] = inicio + n
+    if con_rutas:
+        bloque['rutas'] = rutas
+    return bloque
+
+
+def rutas_en_lote(carpeta_instantanea, origenes, destinos, perfiles_consulta=None, perfiles=None,
+                  procesos=None, tam_bloque=256, con_rutas=False):
+    """
+    Rutea cada consulta i de origenes[i] a destinos[i] (índices de nodo) con el perfil
+    perfiles[perfiles_consulta[i]] (por defecto un único perfil rápido). Genera bloques
+    {'inicio', 'fin', 'costo', 'tiempo_esperado_s', 'desviacion_s', 'distancia_m',
+    'nodos_explorados', 'rutas'?} en el orden de las consultas. Con procesos=1 no se
+    crea pool (útil para depurar).
+    """
+    origenes = np.asarray(origenes, dtype=np.int64)
+    destinos = np.asarray(destinos, dtype=np.int64)
+    perfiles = list(perfiles) if perfiles is not None else [perfil()]
+    if perfiles_consulta is None:
+        perfiles_consulta = np.zeros(len(origenes), dtype=np.int64)
+    perfiles_consulta = np.asarray(perfiles_consulta, dtype=np.int64)
+    if not len(origenes) == len(destinos) == len(perfiles_consulta):
+        raise ValueError("origenes, destinos y perfiles_consulta deben tener el mismo largo")
+
+    tareas = ((inicio, origenes[inicio:inicio + tam_bloque], destinos[inicio:inicio + tam_bloque],
+               perfiles_consulta[inicio:inicio + tam_bloque], con_rutas)
+              for inicio in range(0, len(origenes), tam_bloque))
+
+    if procesos == 1:
+        _iniciar_trabajador(carpeta_instantanea, perfiles)
+        yield from map(_rutear_bloque, tareas)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=procesos or os.cpu_count(), initializer=_iniciar_trabajador,
+                               initargs=(carpeta_instantanea, perfiles))
+    try:
+        # map() entrega los bloques en orden, cada uno apenas está listo (y los anteriores también)
+        yield from pool.map(_rutear_bloque, tareas)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,2367 @@
+"""
+Mapa de operaciones: datos de nodos y arcos que se embeben en el iframe y la
+página HTML (Leaflet + ruteo en JavaScript) que se entrega a components.html.
+"""
+import json
+from statistics import NormalDist
+
+from .costos import TIPOS_VIA, factores_zona_especial
+from .alternativas import ESTIRAMIENTO_MAX, NUM_ALTERNATIVAS, OPTIMALIDAD_LOCAL, SOLAPE_MAX
+from .despacho import MARGEN_PRESELECCION_S, MAX_CANDIDATOS_ASTAR, PERCENTIL_ETA
+from .fiabilidad import MAX_ETIQUETAS, MUESTRAS, PASOS_TANGENTE, PLAZO_MIN, TOLERANCIA
+from .seguimiento import INTERVALO_S
+
+# Vista inicial del mapa (centro de Tacna)
+CENTRO_MAPA = (-18.0137, -70.2500)
+
+# Cuantiles equiespaciados de N(0, 1): el Monte Carlo en JavaScript muestrea un índice
+# al azar en lugar de calcular log y cos por cada arco y muestra (Box-Muller)
+NIVELES_NORMAL = 2048
+CUANTILES_NORMAL = json.dumps([round(NormalDist().inv_cdf((i + 0.5) / NIVELES_NORMAL), 4)
+                               for i in range(NIVELES_NORMAL)])
+
+
+def datos_nodos(grafo, zona_de_nodo=None):
+    """
+    Coordenadas de cada nodo del grafo empaquetado para JavaScript: {nodo: {'lat', 'lon', 'zona'?}}.
+    """
+    coordenadas = zip(grafo.lat.tolist(), grafo.lon.tolist())
+    if zona_de_nodo is None:
+        return {nodo: {'lat': lat, 'lon': lon} for nodo, (lat, lon) in enumerate(coordenadas)}
+    return {nodo: {'lat': lat, 'lon': lon, 'zona': zona}
+            for nodo, ((lat, lon), zona) in enumerate(zip(coordenadas, zona_de_nodo.tolist()))}
+
+
+def datos_arcos(grafo, semilla=0):
+    """
+    Arcos del grafo empaquetado con los atributos estáticos del modelo de costo,
+    incluido el factor de zona especial sorteado con la semilla de calcular_costos().
+    """
+    return [{
+        'source': u,
+        'target': v,
+        'length': longitud,
+        'tipo_via': TIPOS_VIA[tipo],
+        'velocidad_base': velocidad,
+        'sigma_base': sigma,
+        'factor_calidad': calidad,
+        'factor_zona': zona,
+    } for u, v, longitud, tipo, velocidad, sigma, calidad, zona in zip(
+        grafo.origen.tolist(), grafo.destino.tolist(), grafo.longitud.tolist(), grafo.tipo_via.tolist(),
+        grafo.velocidad_base.tolist(), grafo.sigma_base.tolist(), grafo.factor_calidad.tolist(),
+        factores_zona_especial(grafo, semilla).tolist())]
+
+
+def generar_mapa_html(nodes_json, edges_json, patrullas_data, nivel_trafico_usado, condicion_clima,
+                      factor_riesgo_k, hora_formateada, modo_incidente_activo=False, modo_lote_activo=False,
+                      mostrar_grafo=False, eta_zonas=None, isocronas_data=None, telemetria_url=None,
+                      telemetria_puerto=None, centro=CENTRO_MAPA, clave_cierres='cierres_viales_tacna',
+                      plazo_llegada_min=PLAZO_MIN, correlacion_via=0.0, percentil_eta=PERCENTIL_ETA, espera=None,
+                      seguimiento=None, semilla_costos=0, max_candidatos_astar=MAX_CANDIDATOS_ASTAR,
+                      margen_preseleccion_s=MARGEN_PRESELECCION_S):
+    """
+    Página completa del mapa. nodes_json y edges_json son los JSON de datos_nodos()
+    y datos_arcos(); sin telemetria_url ni telemetria_puerto no se envía telemetría.
+    clave_cierres separa en localStorage los cierres de cada región (usan índices de nodo).
+    plazo_llegada_min y correlacion_via parametrizan la fiabilidad Monte Carlo de las rutas;
+    percentil_eta es el percentil de la ETA con que se elige la patrulla.
+    espera = {'planes', 'filas'}: zonas de espera por número de patrullas libres
+    (sistema_experto.posicionamiento) y la fila de ETAs de cada zona; sin él no se
+    sugiere reposicionar.
+    seguimiento = {'url', 'puerto', 'flota', 'token'}: servidor de sistema_experto.seguimiento
+    (y su token) al que el mapa informa cada despacho y del que recibe las posiciones;
+    sin él las patrullas no se mueven.
+    semilla_costos es la semilla con que datos_arcos() sorteó los factores de zona
+    especial; viaja en el perfil de cada decisión para reproducirla con los mismos costos.
+    max_candidatos_astar y margen_preseleccion_s ajustan la preselección por zonas
+    (max_candidatos_astar=0 la desactiva: A* para todas las disponibles).
+    """
+    mapa_html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Sistema Experto de Emergencias</title>
+        <meta charset="utf-8" />
+        <link rel="stylesheet" href="https://unpkg.com/leaflet@1.7.1/dist/leaflet.css" />
+        <script src="https://unpkg.com/leaflet@1.7.1/dist/leaflet.js"></script>
+        <style>
+            #map {{ 
+                height: 700px; 
+                width: 100%; 
+                cursor: {"crosshair" if modo_incidente_activo else "default"}; 
+            }}
+            .panel-recomendaciones {{
+                position: absolute; 
+                bottom: 10px; 
+                right: 10px; 
+                z-index: 1000;
+                background: rgba(255, 255, 255, 0.98); 
+                padding: 15px; 
+                border-radius: 10px;
+                box-shadow: 0 6px 20px rgba(0,0,0,0.25); 
+                max-width: 480px; 
+                max-height: 550px; 
+                overflow-y: auto;
+                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+                border: 2px solid #3498db;
+                transition: all 0.3s ease;
+            }}
+            .panel-header {{
+                display: flex;
+                justify-content: space-between;
+                align-items: center;
+                margin-bottom: 10px;
+                padding-bottom: 8px;
+                border-bottom: 2px solid #e8f4f8;
+            }}
+            .panel-title {{
+                font-size: 16px;
+                font-weight: bold;
+                color: #2c3e50;
+                margin: 0;
+            }}
+            .panel-time {{
+                font-size: 11px;
+                color: #7f8c8d;
+                font-family: 'Courier New', monospace;
+                background: #ecf0f1;
+                padding: 3px 6px;
+                border-radius: 4px;
+                margin-left: 8px;
+            }}
+            .btn-minimize {{
+                background: #e74c3c;
+                color: white;
+                border: none;
+                border-radius: 50%;
+                width: 25px;
+                height: 25px;
+                font-size: 12px;
+                cursor: pointer;
+                display: flex;
+                align-items: center;
+                justify-content: center;
+                transition: all 0.2s ease;
+                font-weight: bold;
+            }}
+            .btn-minimize:hover {{
+                background: #c0392b;
+                transform: scale(1.1);
+            }}
+            .panel-minimized {{
+                max-height: 60px;
+                overflow: hidden;
+            }}
+            .panel-content {{
+                transition: opacity 0.3s ease;
+            }}
+            .panel-content.hidden {{
+                opacity: 0;
+                height: 0;
+                overflow: hidden;
+            }}
+            .patrol-disponible {{
+                background: linear-gradient(135deg, #28a745, #20c997); 
+                color: white; 
+                border-radius: 50%;
+                width: 32px; 
+                height: 32px; 
+                display: flex; 
+                align-items: center; 
+                justify-content: center;
+                font-size: 11px; 
+                font-weight: bold; 
+                border: 2px solid white; 
+                box-shadow: 0 2px 8px rgba(0,0,0,0.3);
+            }}
+            .patrol-ocupado {{
+                background: linear-gradient(135deg, #6c757d, #495057); 
+                color: white; 
+                border-radius: 50%;
+                width: 32px; 
+                height: 32px; 
+                display: flex; 
+                align-items: center; 
+                justify-content: center;
+                font-size: 11px; 
+                font-weight: bold; 
+                border: 2px solid #adb5bd; 
+                box-shadow: 0 2px 8px rgba(0,0,0,0.3);
+                opacity: 0.8;
+            }}
+            .btn-cierres {{
+                background: white;
+                border: 2px solid rgba(0,0,0,0.2);
+                border-radius: 4px;
+                width: 34px;
+                height: 34px;
+                font-size: 18px;
+                cursor: pointer;
+            }}
+            .btn-cierres.activo {{
+                background: #f39c12;
+                border-color: #d35400;
+            }}
+        </style>
+    </head>
+    <body>
+        <div id="map"></div>
+        
+        <div class="panel-recomendaciones" id="panel-recomendaciones">
+            <div class="panel-header">
+                <div style="display: flex; align-items: center;">
+                    <h4 class="panel-title">🎯 Sistema Experto de Decisión</h4>
+                    <span class="panel-time" id="panel-time">{hora_formateada}</span>
+                </div>
+                <button class="btn-minimize" onclick="togglePanel()" title="Minimizar/Maximizar Panel">
+                    <span id="minimize-icon">−</span>
+                </button>
+            </div>
+            <div class="panel-content" id="panel-content">
+                <div id="contenido-recomendaciones">
+                    <p style="color: #6c757d; font-style: italic;">
+                        Esperando reporte de emergencia...
+                    </p>
+                    <small>Active el modo emergencia y haga clic en el mapa para comenzar.</small>
+                </div>
+            </div>
+        </div>
+        
+        <script>
+            // --- Configuración y Datos ---
+            const MODO_EMERGENCIA = {str(modo_incidente_activo).lower()};
+            const MODO_LOTE = {str(modo_incidente_activo and modo_lote_activo).lower()};
+            const NIVEL_TRAFICO = "{nivel_trafico_usado}";
+            const CONDICION_CLIMA = "{condicion_clima}";
+            const FACTOR_RIESGO_K = {factor_riesgo_k};
+            const SEMILLA_COSTOS = {semilla_costos};
+            const PLAZO_LLEGADA_S = {plazo_llegada_min * 60};
+            const CORRELACION_VIA = {correlacion_via};
+            const MUESTRAS_FIABILIDAD = {MUESTRAS};
+            const PERCENTIL_ETA = {percentil_eta};
+            const Z_PERCENTIL_ETA = {NormalDist().inv_cdf(percentil_eta / 100)};
+            const MOSTRAR_GRAFO = {str(mostrar_grafo).lower()};
+            const HORA_ACTUAL = "{hora_formateada}";
+            const TELEMETRIA_URL = {json.dumps(telemetria_url)};
+            const TELEMETRIA_PUERTO = {telemetria_puerto or 'null'};
+            const inicioScriptMs = performance.now();
+
+            // JSON.parse de una cadena es más rápido que evaluar un literal de objeto gigante
+            const inicioParseo = performance.now();
+            const nodes = JSON.parse({json.dumps(nodes_json)});
+            const edges = JSON.parse({json.dumps(edges_json)});
+            const parseoPayloadMs = performance.now() - inicioParseo;
+            const patrullas = {json.dumps(patrullas_data)};
+            const ETA_ZONAS = {json.dumps(eta_zonas)};
+            const PLANES_ESPERA = {json.dumps(espera['planes'] if espera else None)};
+            const FILAS_ESPERA = {json.dumps(espera['filas'] if espera else None)};
+            const SEGUIMIENTO = {json.dumps(seguimiento)};
+            const INTERVALO_SEGUIMIENTO_MS = {round(INTERVALO_S * 1000)};
+            const MAX_CANDIDATOS_ASTAR = {int(max_candidatos_astar)};
+            const MARGEN_PRESELECCION_S = {float(margen_preseleccion_s)};
+            const ISOCRONAS = {json.dumps(isocronas_data)};
+
+            console.log(`Sistema inicializado: ${{Object.keys(nodes).length}} nodos, ${{edges.length}} arcos, ${{patrullas.length}} patrullas`);
+            console.log(`Nivel de tráfico actual: ${{NIVEL_TRAFICO}} - Clima: ${{CONDICION_CLIMA}} a las ${{HORA_ACTUAL}}`);
+
+            // --- Variables para el Panel ---
+            let panelMinimized = false;
+
+            // --- Función para Actualizar la Hora en el Panel ---
+            function actualizarHoraPanel() {{
+                const ahora = new Date();
+                const horaFormateada = ahora.toLocaleString('es-PE', {{
+                    hour: '2-digit',
+                    minute: '2-digit',
+                    second: '2-digit',
+                    day: '2-digit',
+                    month: '2-digit',
+                    year: 'numeric'
+                }});
+                document.getElementById('panel-time').textContent = horaFormateada;
+            }}
+
+            // --- Función para Minimizar/Maximizar Panel ---
+            window.togglePanel = function() {{
+                const panel = document.getElementById('panel-recomendaciones');
+                const content = document.getElementById('panel-content');
+                const icon = document.getElementById('minimize-icon');
+                
+                panelMinimized = !panelMinimized;
+                
+                if (panelMinimized) {{
+                    panel.classList.add('panel-minimized');
+                    content.classList.add('hidden');
+                    icon.textContent = '+';
+                    console.log('📦 Panel minimizado');
+                }} else {{
+                    panel.classList.remove('panel-minimized');
+                    content.classList.remove('hidden');
+                    icon.textContent = '−';
+                    console.log('📤 Panel maximizado');
+                }}
+            }}
+
+            // --- Actualizar hora cada segundo ---
+            setInterval(actualizarHoraPanel, 1000);
+            
+            // Actualizar hora inicial
+            actualizarHoraPanel();
+
+            // --- Inicialización del Mapa ---
+            const map = L.map('map').setView([{centro[0]:.4f}, {centro[1]:.4f}], 14);
+            L.tileLayer('https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png', {{ 
+                attribution: '© OpenStreetMap contributors',
+                maxZoom: 18
+            }}).addTo(map);
+
+            // --- Visualización de Patrullas ---
+            function iconoPatrulla(p) {{
+                return L.divIcon({{ 
+                    html: `<div class="patrol-${{p.status === 'disponible' ? 'disponible' : 'ocupado'}}">${{p.id}}</div>`, 
+                    iconSize: [32, 32], 
+                    className: '' 
+                }});
+            }}
+
+            patrullas.forEach(p => {{
+                const nodePos = nodes[p.nodo_actual];
+                if (nodePos) {{
+                    p.marker = L.marker([nodePos.lat, nodePos.lon], {{
+                        icon: iconoPatrulla(p)
+                    }}).addTo(map).bindPopup(
+                        `<b>Patrulla ${{p.id}}</b><br>
+                         Estado: <span id="status-${{p.id}}">${{p.status}}</span><br>
+                         <small>Nodo: ${{p.nodo_actual}}</small>`
+                    );
+                }}
+            }});
+
+            // Variables globales para visualización
+            let marcadorIncidente, rutaRapidaLayer, rutaSeguraLayer, rutaATiempoLayer, grafoLayer, isocronasLayer;
+            let mostrarGrafo = MOSTRAR_GRAFO;
+
+            // --- Visualización automática del grafo según el toggle de Streamlit ---
+            if (MOSTRAR_GRAFO) {{
+                setTimeout(() => {{
+                    mostrarGrafoCompleto();
+                }}, 500); // Pequeño delay para asegurar que el mapa esté cargado
+            }}
+
+            // --- Visualización de Isócronas por Patrulla ---
+            if (ISOCRONAS) {{
+                mostrarIsocronas();
+            }}
+
+            function mostrarIsocronas() {{
+                isocronasLayer = L.layerGroup();
+                
+                Object.keys(ISOCRONAS).forEach(idPatrulla => {{
+                    // Bandas exteriores primero para que las interiores queden encima
+                    [...ISOCRONAS[idPatrulla]].reverse().forEach(banda => {{
+                        const segmentos = banda.arcos.map(([u, v]) => [
+                            [nodes[u].lat, nodes[u].lon],
+                            [nodes[v].lat, nodes[v].lon]
+                        ]);
+                        if (segmentos.length > 0) {{
+                            L.polyline(segmentos, {{
+                                color: banda.color,
+                                weight: 5,
+                                opacity: 0.55
+                            }}).bindPopup(`<b>⏱️ ${{idPatrulla}}</b><br>Alcanzable en ≤ ${{banda.umbral}} min`).addTo(isocronasLayer);
+                        }}
+                    }});
+                }});
+                
+                isocronasLayer.addTo(map);
+                console.log(`⏱️ Isócronas visualizadas para ${{Object.keys(ISOCRONAS).length}} patrullas`);
+            }}
+
+            // --- Visualización del Grafo de Red (Completa) ---
+            function mostrarGrafoCompleto() {{
+                // grupo de capas para el grafo
+                grafoLayer = L.layerGroup();
+                
+                console.log(`🗺️ Visualizando grafo completo: ${{edges.length}} aristas disponibles`);
+                
+                // set para evitar aristas duplicadas en visualización
+                const aristasVisualizadas = new Set();
+                let aristasVisibles = 0;
+                
+                // TODAS las aristas del grafo sin límite
+                edges.forEach(edge => {{
+                    const sourceNode = nodes[edge.source];
+                    const targetNode = nodes[edge.target];
+                    
+                    if (sourceNode && targetNode) {{
+                        // ID único para la arista (bidireccional)
+                        const aristaId = `${{Math.min(edge.source, edge.target)}}-${{Math.max(edge.source, edge.target)}}`;
+                        
+                        // Solo agregar si no ha sido visualizada
+                        if (!aristasVisualizadas.has(aristaId)) {{
+                            aristasVisualizadas.add(aristaId);
+                            
+                            // Color y grosor según tipo de vía
+                            let color, weight, opacity;
+                            
+                            switch(edge.tipo_via) {{
+                                case 'avenida_principal':
+                                    color = '#FF6B35'; // Naranja para avenidas
+                                    weight = 4;
+                                    opacity = 0.8;
+                                    break;
+                                case 'calle_colectora':
+                                    color = '#7209B7'; // Morado para colectoras
+                                    weight = 3;
+                                    opacity = 0.7;
+                                    break;
+                                case 'calle_residencial':
+                                    color = '#2ECC71'; // Verde para residenciales
+                                    weight = 2;
+                                    opacity = 0.6;
+                                    break;
+                                case 'jiron_comercial':
+                                    color = '#3498DB'; // Azul para jirones
+                                    weight = 2;
+                                    opacity = 0.6;
+                                    break;
+                                default:
+                                    color = '#95A5A6'; // Gris para otros
+                                    weight = 1;
+                                    opacity = 0.5;
+                            }}
+                            
+                            // línea de grafo
+                            L.polyline([
+                                [sourceNode.lat, sourceNode.lon],
+                                [targetNode.lat, targetNode.lon]
+                            ], {{
+                                color: color,
+                                weight: weight,
+                                opacity: opacity,
+                                interactive: true
+                            }}).bindPopup(`
+                                <b>🛣️ Conexión Vial</b><br>
+                                <b>Nodos:</b> ${{edge.source}} ↔ ${{edge.target}}<br>
+                                <b>Tipo:</b> ${{edge.tipo_via}}<br>
+                                <b>Longitud:</b> ${{edge.length.toFixed(1)}}m<br>
+                                <b>Velocidad base:</b> ${{edge.velocidad_base}} km/h<br>
+                                <b>Factor calidad:</b> ${{edge.factor_calidad}}<br>
+                                <small><i>Conexión bidireccional</i></small><br>
+                                <button onclick="cerrarCalle(${{edge.source}}, ${{edge.target}})">🚧 Cerrar calle</button>
+                            `).addTo(grafoLayer);
+                            
+                            aristasVisibles++;
+                        }}
+                    }}
+                }});
+                
+                // Agregar algunos nodos importantes como puntos de referencia
+                let nodosImportantes = 0;
+                Object.keys(nodes).forEach(nodeId => {{
+                    const node = nodes[nodeId];
+                    if (node && nodosImportantes < 100) {{ // Aumentar límite de nodos importantes
+                        // Calcular conectividad del nodo
+                        const conexionesEntrada = edges.filter(e => e.target == nodeId).length;
+                        const conexionesSalida = edges.filter(e => e.source == nodeId).length;
+                        const totalConexiones = conexionesEntrada + conexionesSalida;
+                        
+                        // Mostrar solo nodos con muchas conexiones (intersecciones importantes)
+                        if (totalConexiones >= 4) {{
+                            let color, radius;
+                            if (totalConexiones >= 10) {{
+                                color = '#E74C3C'; radius = 8; // Rojo para super hubs
+                            }} else if (totalConexiones >= 6) {{
+                                color = '#F39C12'; radius = 6; // Naranja para hubs importantes
+                            }} else {{
+                                color = '#3498DB'; radius = 4; // Azul para intersecciones normales
+                            }}
+                            
+                            L.circleMarker([node.lat, node.lon], {{
+                                radius: radius,
+                                fillColor: color,
+                                color: '#ffffff',
+                                weight: 2,
+                                opacity: 1,
+                                fillOpacity: 0.8
+                            }}).bindPopup(`
+                                <b>🏛️ Intersección Importante</b><br>
+                                <b>Nodo:</b> ${{nodeId}}<br>
+                                <b>Conexiones:</b> ${{totalConexiones}}<br>
+                                <b>Entrada:</b> ${{conexionesEntrada}}<br>
+                                <b>Salida:</b> ${{conexionesSalida}}<br>
+                                <b>Coordenadas:</b> [${{node.lat.toFixed(4)}}, ${{node.lon.toFixed(4)}}]
+                            `).addTo(grafoLayer);
+                            
+                            nodosImportantes++;
+                        }}
+                    }}
+                }});
+                
+                // Agregar al mapa
+                grafoLayer.addTo(map);
+                
+                console.log(`✅ Grafo completo visualizado: ${{aristasVisibles}} aristas únicas, ${{nodosImportantes}} intersecciones importantes`);
+            }}
+
+            function ocultarGrafoCompleto() {{
+                if (grafoLayer) {{
+                    map.removeLayer(grafoLayer);
+                    grafoLayer = null;
+                }}
+            }}
+
+            // --- Construcción de Lista de Adyacencia con Modelo de Costo Mejorado ---
+            
+            // --- Factores de Tráfico Granulares (5 Niveles) ---
+            const FACTORES_TRAFICO = {{
+                "trafico_minimo": {{
+                    "avenida_principal": 0.7,
+                    "jiron_comercial": 0.8,
+                    "calle_colectora": 0.9,
+                    "calle_residencial": 1.0
+                }},
+                "trafico_bajo": {{
+                    "avenida_principal": 1.0,
+                    "jiron_comercial": 1.1,
+                    "calle_colectora": 1.0,
+                    "calle_residencial": 1.0
+                }},
+                "trafico_medio": {{
+                    "avenida_principal": 1.5,
+                    "jiron_comercial": 1.3,
+                    "calle_colectora": 1.2,
+                    "calle_residencial": 1.1
+                }},
+                "trafico_alto": {{
+                    "avenida_principal": 2.2,
+                    "jiron_comercial": 1.8,
+                    "calle_colectora": 1.5,
+                    "calle_residencial": 1.2
+                }},
+                "trafico_extremo": {{
+                    "avenida_principal": 3.0,
+                    "jiron_comercial": 2.5,
+                    "calle_colectora": 2.0,
+                    "calle_residencial": 1.3
+                }}
+            }};
+            
+            const inicioAdyacencia = performance.now();
+            const listaAdyacencia = {{}};
+            Object.keys(nodes).forEach(nodeId => {{
+                listaAdyacencia[nodeId] = [];
+            }});
+
+            edges.forEach(edge => {{
+                // 1. Factor de Tráfico según nivel y tipo de vía
+                let factorTrafico = 1.0;
+                const factoresNivel = FACTORES_TRAFICO[NIVEL_TRAFICO];
+                if (factoresNivel && factoresNivel[edge.tipo_via]) {{
+                    factorTrafico = factoresNivel[edge.tipo_via];
+                }} else {{
+                    // Fallback para tipos de vía no definidos
+                    switch(edge.tipo_via) {{
+                        case "avenida_principal": factorTrafico = 1.5; break;
+                        case "jiron_comercial": factorTrafico = 1.3; break;
+                        case "calle_colectora": factorTrafico = 1.2; break;
+                        case "calle_residencial": factorTrafico = 1.0; break;
+                        default: factorTrafico = 1.2;
+                    }}
+                }}
+                
+                // 2. Factor Climático
+                let factorClima = 1.0;
+                switch(CONDICION_CLIMA) {{
+                    case "lluvia": factorClima = 1.4; break;  // +40% tiempo
+                    case "neblina": factorClima = 1.3; break; // +30% tiempo
+                    case "despejado": factorClima = 1.0; break;
+                    default: factorClima = 1.0;
+                }}
+                
+                // 3. Factor de Zona Especial: el mismo sorteo con semilla que usa Python
+                // (costos.factores_zona_especial), para que el A* del mapa y el servidor coincidan
+                const factorZonaEspecial = edge.factor_zona;
+                
+                // 4. Tiempo base
+                const tiempoBase = edge.length / (edge.velocidad_base * 1000 / 3600);
+                
+                // 5. Costo para RUTA RÁPIDA (incluye todos los factores)
+                const muDinamico = tiempoBase * edge.factor_calidad * factorTrafico * factorClima * factorZonaEspecial;
+                
+                // 6. Cálculo de σ (sigma) - Incertidumbre según tipo de vía y factores
+                let sigmaBase = 0;
+                switch(edge.tipo_via) {{
+                    case "avenida_principal": sigmaBase = 0.4; break; // Alta incertidumbre
+                    case "jiron_comercial": sigmaBase = 0.35; break;  // Alta incertidumbre comercial
+                    case "calle_colectora": sigmaBase = 0.25; break;  // Incertidumbre media
+                    case "calle_residencial": sigmaBase = 0.15; break; // Baja incertidumbre
+                    default: sigmaBase = 0.3; break;
+                }}
+                
+                //  factores de incertidumbre adicionales
+                let factorIncertidumbre = 1.0;
+                if (CONDICION_CLIMA === "lluvia") {{
+                    factorIncertidumbre *= 1.8; // Mucha más incertidumbre en lluvia
+                }} else if (CONDICION_CLIMA === "neblina") {{
+                    factorIncertidumbre *= 1.6; // Alta incertidumbre en neblina
+                }}
+                
+                // Incertidumbre por tráfico
+                switch(NIVEL_TRAFICO) {{
+                    case "trafico_extremo": factorIncertidumbre *= 2.0; break;
+                    case "trafico_alto": factorIncertidumbre *= 1.5; break;
+                    case "trafico_medio": factorIncertidumbre *= 1.2; break;
+                    case "trafico_bajo": factorIncertidumbre *= 0.9; break;
+                    case "trafico_minimo": factorIncertidumbre *= 0.7; break;
+                }}
+                
+                // Incertidumbre por zonas especiales
+                if (factorZonaEspecial > 1.0) {{
+                    factorIncertidumbre *= (1.0 + (factorZonaEspecial - 1.0) * 0.8); // 80% de la penalización se convierte en incertidumbre
+                }}
+                
+                const sigmaDinamico = sigmaBase * muDinamico * factorIncertidumbre;
+                
+                // 7. Costos finales usando el modelo probabilístico correcto
+                const costoRapido = muDinamico; // Ruta rápida: solo tiempo esperado μ(e)
+                const costoSeguro = muDinamico + (FACTOR_RIESGO_K * sigmaDinamico); // Ruta segura: μ(e) + k×σ(e)
+
+                // Un arco por sentido, como en el grafo de Python: las calles de doble
+                // sentido ya traen los dos arcos y las de sentido único solo uno
+                listaAdyacencia[edge.source].push({{
+                    node: edge.target,
+                    length: edge.length,
+                    costo_rapido: costoRapido,
+                    costo_seguro: costoSeguro,
+                    sigma: sigmaDinamico,
+                    varianza: sigmaDinamico * sigmaDinamico,
+                    tipo_via: edge.tipo_via
+                }});
+            }});
+
+            const adyacenciaMs = performance.now() - inicioAdyacencia;
+            console.log(`✅ Grafo con modelo mejorado construido: ${{Object.keys(listaAdyacencia).length}} nodos en ${{adyacenciaMs.toFixed(0)}}ms`);
+
+            // --- Telemetría hacia Python ---
+            const SESION_TELEMETRIA = Math.random().toString(36).slice(2, 10);
+            let telemetriaDespacho = null;
+            let decisionDespacho = null;
+
+            function urlTelemetria() {{
+                if (TELEMETRIA_URL) return TELEMETRIA_URL;
+                if (!TELEMETRIA_PUERTO) return null;
+                let host = 'localhost';
+                try {{ host = window.parent.location.hostname || host; }} catch (e) {{}}
+                return `http://${{host}}:${{TELEMETRIA_PUERTO}}/telemetria`;
+            }}
+
+            function enviarTelemetria(tipo, datos) {{
+                const url = urlTelemetria();
+                if (!url) return;
+                const cuerpo = JSON.stringify({{
+                    tipo: tipo,
+                    sesion: SESION_TELEMETRIA,
+                    instante: new Date().toISOString(),
+                    nivel_trafico: NIVEL_TRAFICO,
+                    clima: CONDICION_CLIMA,
+                    k: FACTOR_RIESGO_K,
+                    num_nodos: Object.keys(nodes).length,
+                    num_arcos: edges.length,
+                    carga: {{ inicio_script_ms: inicioScriptMs, parseo_payload_ms: parseoPayloadMs, adyacencia_ms: adyacenciaMs }},
+                    ...datos
+                }});
+                try {{
+                    // text/plain evita la verificación previa CORS; sendBeacon sobrevive a la recarga del iframe
+                    const enviado = navigator.sendBeacon && navigator.sendBeacon(url, new Blob([cuerpo], {{ type: 'text/plain' }}));
+                    if (!enviado) {{
+                        fetch(url, {{ method: 'POST', body: cuerpo, mode: 'no-cors', keepalive: true }}).catch(() => {{}});
+                    }}
+                }} catch (e) {{
+                    console.warn('⚠️ Telemetría no enviada:', e);
+                }}
+            }}
+
+            function medidaBusqueda(resultado) {{
+                return resultado ? {{ ms: resultado.timeMs || 0, nodos: resultado.nodesExplored, costo: resultado.cost }} : null;
+            }}
+
+            enviarTelemetria('carga', {{}});
+            console.log(`📊 Factores aplicados - Tráfico: ${{NIVEL_TRAFICO}}, Clima: ${{CONDICION_CLIMA}}`);
+
+            // --- Cierres de Calles (costo infinito, persistentes en localStorage) ---
+            const CLAVE_CIERRES = '{clave_cierres}';
+            const cierresActivos = new Map(); // clave de calle -> aristas con sus costos originales
+            const cierresLayer = L.layerGroup().addTo(map);
+            const rutasActivas = {{}}; // tipo de ruta -> {{ path, destino, tipoCosto, estilo, layer }}
+            let modoCierre = false;
+
+            function claveCalle(u, v) {{
+                return `${{Math.min(u, v)}}-${{Math.max(u, v)}}`;
+            }}
+
+            function guardarCierres() {{
+                try {{
+                    localStorage.setItem(CLAVE_CIERRES, JSON.stringify([...cierresActivos.keys()]));
+                }} catch (error) {{
+                    console.warn('⚠️ No se pudieron guardar los cierres:', error);
+                }}
+            }}
+
+            function cerrarCalle(u, v, reparar = true) {{
+                const clave = claveCalle(u, v);
+                if (cierresActivos.has(clave)) return;
+                
+                // Actualizar los costos en el lugar, sin reconstruir la lista de adyacencia
+                const afectadas = [];
+                [[u, v], [v, u]].forEach(([a, b]) => {{
+                    (listaAdyacencia[a] || []).forEach(arista => {{
+                        if (arista.node === b) {{
+                            afectadas.push({{ arista, costo_rapido: arista.costo_rapido, costo_seguro: arista.costo_seguro }});
+                            arista.costo_rapido = Infinity;
+                            arista.costo_seguro = Infinity;
+                        }}
+                    }});
+                }});
+                if (afectadas.length === 0) return;
+                
+                cierresActivos.set(clave, {{ afectadas, layer: dibujarCierre(u, v) }});
+                guardarCierres();
+                console.log(`🚧 Calle cerrada: ${{clave}}`);
+                if (reparar) repararRutasActivas();
+            }}
+
+            function reabrirCalle(u, v) {{
+                const clave = claveCalle(u, v);
+                const cierre = cierresActivos.get(clave);
+                if (!cierre) return;
+                
+                cierre.afectadas.forEach(({{ arista, costo_rapido, costo_seguro }}) => {{
+                    arista.costo_rapido = costo_rapido;
+                    arista.costo_seguro = costo_seguro;
+                }});
+                cierresLayer.removeLayer(cierre.layer);
+                cierresActivos.delete(clave);
+                guardarCierres();
+                console.log(`✅ Calle reabierta: ${{clave}}`);
+            }}
+
+            function dibujarCierre(u, v) {{
+                return L.polyline([
+                    [nodes[u].lat, nodes[u].lon],
+                    [nodes[v].lat, nodes[v].lon]
+                ], {{
+                    color: '#c0392b',
+                    weight: 7,
+                    opacity: 0.9,
+                    dashArray: '4, 6'
+                }}).bindPopup(`
+                    <b>🚧 Calle cerrada</b><br>
+                    <b>Nodos:</b> ${{u}} ↔ ${{v}}<br>
+                    <button onclick="reabrirCalle(${{u}}, ${{v}})">✅ Reabrir calle</button>
+                `).addTo(cierresLayer);
+            }}
+
+            window.cerrarCalle = cerrarCalle;
+            window.reabrirCalle = reabrirCalle;
+
+            // --- Reparación Incremental de Rutas Activas ---
+            function repararRutasActivas() {{
+                const avisos = [];
+                
+                Object.keys(rutasActivas).forEach(tipo => {{
+                    const activa = rutasActivas[tipo];
+                    const path = activa.path;
+                    
+                    // Primer tramo de la ruta sin arista transitable
+                    let afectado = -1;
+                    for (let i = 0; i < path.length - 1; i++) {{
+                        const transitable = (listaAdyacencia[path[i]] || [])
+                            .some(a => a.node === path[i + 1] && isFinite(a[activa.tipoCosto]));
+                        if (!transitable) {{
+                            afectado = i;
+                            break;
+                        }}
+                    }}
+                    if (afectado < 0) return;
+                    
+                    // Solo se busca de nuevo desde el primer nodo afectado
+                    const tramo = aStar(path[afectado], activa.destino, activa.tipoCosto);
+                    map.removeLayer(activa.layer);
+                    if (!tramo) {{
+                        delete rutasActivas[tipo];
+                        avisos.push(`❌ Ruta ${{tipo}} sin alternativa tras el cierre`);
+                        return;
+                    }}
+                    
+                    activa.path = path.slice(0, afectado).concat(tramo.path);
+                    activa.layer = L.polyline(activa.path.map(n => [nodes[n].lat, nodes[n].lon]), activa.estilo).addTo(map);
+                    if (tipo === 'rapida') rutaRapidaLayer = activa.layer;
+                    if (tipo === 'segura') rutaSeguraLayer = activa.layer;
+                    if (tipo === 'a_tiempo') rutaATiempoLayer = activa.layer;
+                    avisos.push(`🔧 Ruta ${{tipo}} reparada desde el nodo ${{path[afectado]}} (${{tramo.nodesExplored}} nodos explorados)`);
+                }});
+                
+                if (avisos.length > 0) {{
+                    console.log(avisos.join(' | '));
+                    document.getElementById('contenido-recomendaciones').insertAdjacentHTML('afterbegin', `
+                        <div style="background: #fff3cd; border: 1px solid #ffeeba; padding: 8px; border-radius: 5px; margin-bottom: 8px; font-size: 0.85em;">
+                            ${{avisos.join('<br>')}}
+                        </div>`);
+                }}
+            }}
+
+            // --- Selección de Calle más Cercana a un Clic ---
+            function calleMasCercana(latlng) {{
+                const cosLat = Math.cos(latlng.lat * Math.PI / 180);
+                let mejor = null;
+                let menor = Infinity;
+                
+                edges.forEach(edge => {{
+                    const a = nodes[edge.source];
+                    const b = nodes[edge.target];
+                    if (!a || !b) return;
+                    
+                    // Distancia punto-segmento en coordenadas locales
+                    const ax = (a.lon - latlng.lng) * cosLat, ay = a.lat - latlng.lat;
+                    const dx = (b.lon - a.lon) * cosLat, dy = b.lat - a.lat;
+                    const largo2 = dx * dx + dy * dy;
+                    const t = largo2 > 0 ? Math.max(0, Math.min(1, -(ax * dx + ay * dy) / largo2)) : 0;
+                    const px = ax + t * dx, py = ay + t * dy;
+                    const d = px * px + py * py;
+                    if (d < menor) {{
+                        menor = d;
+                        mejor = edge;
+                    }}
+                }});
+                
+                const metros = Math.sqrt(menor) * 111320;
+                return metros <= 60 ? mejor : null;
+            }}
+
+            // --- Control del Mapa para Cerrar/Reabrir Calles ---
+            const ControlCierres = L.Control.extend({{
+                options: {{ position: 'topleft' }},
+                onAdd: function() {{
+                    const boton = L.DomUtil.create('button', 'btn-cierres');
+                    boton.innerHTML = '🚧';
+                    boton.title = 'Cerrar/reabrir calles: active y haga clic sobre una calle';
+                    L.DomEvent.disableClickPropagation(boton);
+                    L.DomEvent.on(boton, 'click', () => {{
+                        modoCierre = !modoCierre;
+                        boton.classList.toggle('activo', modoCierre);
+                        document.getElementById('map').style.cursor = modoCierre ? 'pointer' : (MODO_EMERGENCIA ? 'crosshair' : 'default');
+                    }});
+                    return boton;
+                }}
+            }});
+            map.addControl(new ControlCierres());
+
+            // Restaurar los cierres guardados antes de cualquier cálculo de ruta
+            try {{
+                JSON.parse(localStorage.getItem(CLAVE_CIERRES) || '[]').forEach(clave => {{
+                    const [u, v] = clave.split('-').map(Number);
+                    if (nodes[u] && nodes[v]) cerrarCalle(u, v, false);
+                }});
+                if (cierresActivos.size > 0) console.log(`🚧 ${{cierresActivos.size}} cierres restaurados`);
+            }} catch (error) {{
+                console.warn('⚠️ No se pudieron restaurar los cierres:', error);
+            }}
+
+            // --- Función para Recalcular Tiempo Real de una Ruta ---
+            function calcularTiempoRealRuta(rutaPath, tipoCosto) {{
+                if (!rutaPath || rutaPath.length < 2) return 0;
+                
+                let tiempoTotal = 0;
+                let distanciaTotal = 0;
+                let detallesAristas = [];
+                
+                // Recorrer cada segmento de la ruta
+                for (let i = 0; i < rutaPath.length - 1; i++) {{
+                    const nodoOrigen = rutaPath[i];
+                    const nodoDestino = rutaPath[i + 1];
+                    
+                    // Buscar la arista entre estos nodos
+                    const aristasOrigen = listaAdyacencia[nodoOrigen] || [];
+                    const arista = aristasOrigen.find(a => a.node === nodoDestino);
+                    
+                    if (arista) {{
+                        const costoArista = arista[tipoCosto];
+                        tiempoTotal += costoArista;
+                        distanciaTotal += arista.length;
+                        
+                        detallesAristas.push({{
+                            desde: nodoOrigen,
+                            hasta: nodoDestino,
+                            tipo_via: arista.tipo_via,
+                            longitud: arista.length,
+                            tiempo: costoArista
+                        }});
+                    }}
+                }}
+                
+                return {{
+                    tiempoTotal: tiempoTotal,
+                    distanciaTotal: distanciaTotal,
+                    velocidadPromedio: distanciaTotal > 0 ? (distanciaTotal / tiempoTotal) * 3.6 : 0, // km/h
+                    detallesAristas: detallesAristas,
+                    numSegmentos: detallesAristas.length
+                }};
+            }}
+
+            // --- Fiabilidad por Monte Carlo (como sistema_experto.fiabilidad) ---
+            const TIPOS_VIA = {json.dumps(TIPOS_VIA)};
+            const CUANTILES_NORMAL = Float64Array.from({CUANTILES_NORMAL});
+
+            function normalEstandar() {{
+                return CUANTILES_NORMAL[(Math.random() * CUANTILES_NORMAL.length) | 0];
+            }}
+
+            function simularFiabilidad(rutasPath, plazo = PLAZO_LLEGADA_S) {{
+                // Arcos distintos de todas las rutas: los compartidos reciben el mismo tiempo en cada muestra
+                const usos = new Map(); // arista -> máscara de rutas que la recorren
+                rutasPath.forEach((path, j) => {{
+                    for (let i = 0; i < path.length - 1; i++) {{
+                        const arista = (listaAdyacencia[path[i]] || []).find(a => a.node === path[i + 1]);
+                        if (arista) usos.set(arista, (usos.get(arista) || 0) | (1 << j));
+                    }}
+                }});
+                const aristas = [...usos.keys()];
+                const mu = Float64Array.from(aristas, a => a.costo_rapido);
+                const sigma = Float64Array.from(aristas, a => a.sigma);
+                const tipo = Int8Array.from(aristas, a => Math.max(TIPOS_VIA.indexOf(a.tipo_via), 0));
+                const mascara = Int32Array.from(usos.values());
+
+                // Tiempo de cada arco ~ N(μ, σ) truncada en 0, con un factor común por tipo de vía
+                const propio = Math.sqrt(1 - CORRELACION_VIA);
+                const compartido = Math.sqrt(CORRELACION_VIA);
+                const comun = new Float64Array(TIPOS_VIA.length);
+                const tiempos = rutasPath.map(() => new Float64Array(MUESTRAS_FIABILIDAD));
+                const subtotal = new Float64Array(1 << rutasPath.length); // por máscara de rutas
+                for (let m = 0; m < MUESTRAS_FIABILIDAD; m++) {{
+                    if (CORRELACION_VIA > 0) {{
+                        for (let c = 0; c < comun.length; c++) comun[c] = normalEstandar();
+                    }}
+                    subtotal.fill(0);
+                    for (let e = 0; e < aristas.length; e++) {{
+                        const t = mu[e] + sigma[e] * (propio * normalEstandar() + compartido * comun[tipo[e]]);
+                        if (t > 0) subtotal[mascara[e]] += t;
+                    }}
+                    for (let k = 1; k < subtotal.length; k++) {{
+                        for (let j = 0; j < tiempos.length; j++) {{
+                            if (k & (1 << j)) tiempos[j][m] += subtotal[k];
+                        }}
+                    }}
+                }}
+
+                return tiempos.map(t => {{
+                    t.sort();
+                    let aTiempo = 0;
+                    while (aTiempo < t.length && t[aTiempo] <= plazo) aTiempo++;
+                    const percentil = p => t[Math.min(t.length - 1, Math.floor(p / 100 * t.length))];
+                    return {{
+                        plazo_s: plazo,
+                        p_a_tiempo: aTiempo / t.length,
+                        eta_p50_s: percentil(50),
+                        eta_p90_s: percentil(90),
+                        eta_p95_s: percentil(95)
+                    }};
+                }});
+            }}
+
+            // --- Ruta a tiempo: máxima P(llegada ≤ plazo) (como sistema_experto.fiabilidad.ruta_a_tiempo) ---
+            const MAX_ETIQUETAS = {MAX_ETIQUETAS};
+            const PASOS_TANGENTE = {PASOS_TANGENTE};
+            const TOLERANCIA_A_TIEMPO = {TOLERANCIA};
+
+            function erf(x) {{
+                // Abramowitz y Stegun 7.1.26 (error < 1.5e-7)
+                const signo = x < 0 ? -1 : 1;
+                const t = 1 / (1 + 0.3275911 * Math.abs(x));
+                const y = ((((1.061405429 * t - 1.453152027) * t + 1.421413741) * t - 0.284496736) * t + 0.254829592) * t;
+                return signo * (1 - y * Math.exp(-x * x));
+            }}
+
+            function probabilidadATiempo(mu, varianza, plazo) {{
+                if (varianza <= 0) return mu <= plazo ? 1 : 0;
+                return 0.5 * (1 + erf((plazo - mu) / Math.sqrt(2 * varianza)));
+            }}
+
+            function evaluarATiempo(path, plazo) {{
+                let mu = 0, varianza = 0;
+                for (let i = 0; i < path.length - 1; i++) {{
+                    const arista = (listaAdyacencia[path[i]] || []).find(a => a.node === path[i + 1]);
+                    if (!arista) return null;
+                    mu += arista.costo_rapido;
+                    varianza += arista.varianza;
+                }}
+                return isFinite(mu) ? {{ path, mu, varianza, p: probabilidadATiempo(mu, varianza, plazo) }} : null;
+            }}
+
+            function rutaATiempo(inicio, destino, plazo, candidatas) {{
+                const tiempoInicio = performance.now();
+                // Cotas inferiores de μ y σ² de cada nodo al destino
+                const cotaMu = dijkstraInverso(destino, construirAdyacenciaInversa('costo_rapido')).dist;
+                const cotaVar = dijkstraInverso(destino, construirAdyacenciaInversa('varianza')).dist;
+                
+                let mejor = null;
+                candidatas.forEach(path => {{
+                    const candidata = path && evaluarATiempo(path, plazo);
+                    if (candidata && (!mejor || candidata.p > mejor.p)) mejor = candidata;
+                }});
+                // Pasos por la tangente: la ruta de menor μ + λσ², λ = (plazo − μ) / 2σ²
+                for (let paso = 0; mejor && paso < PASOS_TANGENTE; paso++) {{
+                    if (mejor.mu >= plazo || mejor.varianza <= 0) break;
+                    const lambda = (plazo - mejor.mu) / (2 * mejor.varianza);
+                    const {{ siguiente }} = dijkstraInverso(destino, construirAdyacenciaInversa(a => a.costo_rapido + lambda * a.varianza));
+                    if (inicio !== destino && siguiente[inicio] < 0) break;
+                    const path = [inicio];
+                    while (path[path.length - 1] !== destino) path.push(siguiente[path[path.length - 1]]);
+                    const candidata = evaluarATiempo(path, plazo);
+                    if (!candidata || candidata.p <= mejor.p) break;
+                    mejor = candidata;
+                }}
+                
+                // Etiquetas (Σμ, Σσ²) de mejor cota primero, con dominancia por nodo
+                const cota = (nodo, m, v) => {{
+                    m += cotaMu[nodo];
+                    v += cotaVar[nodo];
+                    return m > plazo && v > 0 ? 0.5 : probabilidadATiempo(m, v, plazo);
+                }};
+                const etiquetaMu = [0], etiquetaVar = [0], previa = [-1], nodoEtiqueta = [inicio], viva = [true];
+                const enNodo = new Map([[inicio, [0]]]);
+                const abiertas = new MonticuloMin();
+                abiertas.push(-cota(inicio, 0, 0), 0);
+                const terminar = (resultado, exacta) => resultado && {{
+                    ...resultado, etiquetas: etiquetaMu.length, exacta, timeMs: performance.now() - tiempoInicio
+                }};
+                // Ninguna ruta llega en promedio dentro del plazo: la mejor conocida
+                if (cotaMu[inicio] > plazo) return terminar(mejor, false);
+                
+                while (abiertas.size > 0) {{
+                    const [negativa, i] = abiertas.pop();
+                    if (!viva[i]) continue;
+                    if (mejor && -negativa <= mejor.p + TOLERANCIA_A_TIEMPO) break;
+                    const u = nodoEtiqueta[i];
+                    if (u === destino) {{
+                        const path = [];
+                        for (let j = i; j >= 0; j = previa[j]) path.push(nodoEtiqueta[j]);
+                        return terminar({{ path: path.reverse(), mu: etiquetaMu[i], varianza: etiquetaVar[i], p: -negativa }}, true);
+                    }}
+                    if (etiquetaMu.length >= MAX_ETIQUETAS) return terminar(mejor, false);
+                    
+                    for (const arista of listaAdyacencia[u] || []) {{
+                        if (!isFinite(arista.costo_rapido)) continue; // calle cerrada
+                        const w = arista.node;
+                        const nm = etiquetaMu[i] + arista.costo_rapido;
+                        const nv = etiquetaVar[i] + arista.varianza;
+                        const c = cota(w, nm, nv);
+                        if (mejor && c <= mejor.p + TOLERANCIA_A_TIEMPO) continue;
+                        const etiquetas = enNodo.get(w) || [];
+                        if (etiquetas.some(j => etiquetaMu[j] <= nm && etiquetaVar[j] <= nv)) continue;
+                        const vigentes = etiquetas.filter(j => {{
+                            viva[j] = !(nm <= etiquetaMu[j] && nv <= etiquetaVar[j]);
+                            return viva[j];
+                        }});
+                        vigentes.push(etiquetaMu.length);
+                        enNodo.set(w, vigentes);
+                        abiertas.push(-c, etiquetaMu.length);
+                        etiquetaMu.push(nm);
+                        etiquetaVar.push(nv);
+                        previa.push(i);
+                        nodoEtiqueta.push(w);
+                        viva.push(true);
+                    }}
+                }}
+                return terminar(mejor, true);
+            }}
+
+            // --- Rutas alternativas por mesetas (como sistema_experto.alternativas) ---
+            const NUM_ALTERNATIVAS = {NUM_ALTERNATIVAS};
+            const ESTIRAMIENTO_MAX = {ESTIRAMIENTO_MAX};
+            const SOLAPE_MAX = {SOLAPE_MAX};
+            const OPTIMALIDAD_LOCAL = {OPTIMALIDAD_LOCAL};
+
+            // Dijkstra desde el origen que se detiene en estiramiento × costo hasta el destino
+            function dijkstraDirecto(origen, destino, tipoCosto, estiramiento) {{
+                const dist = new Float64Array(NUM_NODOS).fill(Infinity);
+                const previo = new Int32Array(NUM_NODOS).fill(-1);
+                const monticulo = new MonticuloMin();
+                let limite = Infinity;
+                dist[origen] = 0;
+                monticulo.push(0, origen);
+                
+                while (monticulo.size > 0) {{
+                    const [d, u] = monticulo.pop();
+                    if (d > dist[u]) continue;
+                    if (d > limite) break;
+                    if (u === destino) limite = estiramiento * d;
+                    for (const arista of listaAdyacencia[u] || []) {{
+                        const nd = d + arista[tipoCosto];
+                        if (nd < dist[arista.node]) {{
+                            dist[arista.node] = nd;
+                            previo[arista.node] = u;
+                            monticulo.push(nd, arista.node);
+                        }}
+                    }}
+                }}
+                return {{ dist, previo }};
+            }}
+
+            function costosAristas(path, tipoCosto) {{
+                const costos = new Map();
+                for (let i = 0; i < path.length - 1; i++) {{
+                    const costo = Math.min(...(listaAdyacencia[path[i]] || [])
+                        .filter(a => a.node === path[i + 1]).map(a => a[tipoCosto]));
+                    costos.set(`${{path[i]}}-${{path[i + 1]}}`, costo);
+                }}
+                return costos;
+            }}
+
+            // Mesetas: arcos que están en el árbol desde el origen y en el árbol hacia el destino.
+            // Cada una da una ruta vía localmente óptima a lo largo de la meseta.
+            function rutasAlternativas(inicio, destino, tipoCosto, k = NUM_ALTERNATIVAS) {{
+                const tiempoInicio = performance.now();
+                const {{ dist: ida, previo }} = dijkstraDirecto(inicio, destino, tipoCosto, ESTIRAMIENTO_MAX);
+                const optimo = ida[destino];
+                if (!isFinite(optimo) || inicio === destino) return [];
+                const limite = ESTIRAMIENTO_MAX * optimo;
+                const {{ dist: vuelta, siguiente }} = dijkstraInverso(destino, construirAdyacenciaInversa(tipoCosto), limite);
+                
+                const salida = new Map();
+                const conEntrada = new Set();
+                let explorados = 0;
+                for (let w = 0; w < NUM_NODOS; w++) {{
+                    if (isFinite(ida[w])) explorados++;
+                    if (isFinite(vuelta[w])) explorados++;
+                    const u = previo[w];
+                    if (u >= 0 && siguiente[u] === w && ida[w] + vuelta[w] <= limite) {{
+                        salida.set(u, w);
+                        conEntrada.add(w);
+                    }}
+                }}
+                
+                // La óptima es la meseta que va del origen al destino
+                const candidatas = [];
+                for (const comienzo of salida.keys()) {{
+                    if (conEntrada.has(comienzo) || comienzo === inicio) continue;
+                    let final = comienzo;
+                    while (salida.has(final)) final = salida.get(final);
+                    const costo = ida[comienzo] + vuelta[comienzo];
+                    const meseta = ida[final] - ida[comienzo];
+                    if (meseta >= OPTIMALIDAD_LOCAL * optimo && costo <= limite) candidatas.push({{ costo, meseta, final }});
+                }}
+                candidatas.sort((a, b) => a.costo - b.costo);
+                
+                const camino = final => {{
+                    const path = [final];
+                    while (path[path.length - 1] !== inicio) path.push(previo[path[path.length - 1]]);
+                    path.reverse();
+                    while (path[path.length - 1] !== destino) path.push(siguiente[path[path.length - 1]]);
+                    return path;
+                }};
+                const elegidas = [costosAristas(camino(destino), tipoCosto)];
+                const alternativas = [];
+                for (const {{ costo, meseta, final }} of candidatas) {{
+                    if (alternativas.length >= k) break;
+                    const path = camino(final);
+                    if (new Set(path).size !== path.length) continue; // los árboles se cruzan: ciclo
+                    const costos = costosAristas(path, tipoCosto);
+                    let compartido = 0;
+                    elegidas.forEach(previa => {{
+                        let suma = 0;
+                        costos.forEach((c, clave) => {{ if (previa.has(clave)) suma += c; }});
+                        compartido = Math.max(compartido, suma);
+                    }});
+                    if (compartido > SOLAPE_MAX * optimo) continue;
+                    elegidas.push(costos);
+                    alternativas.push({{
+                        path, cost: costo, estiramiento: costo / optimo, solape: compartido / optimo, meseta,
+                        nodesExplored: explorados
+                    }});
+                }}
+                const tiempoTotal = performance.now() - tiempoInicio;
+                alternativas.forEach(a => a.timeMs = tiempoTotal);
+                return alternativas;
+            }}
+
+            // --- Función para Analizar Composición de Ruta ---
+            function analizarComposicionRuta(rutaPath) {{
+                if (!rutaPath || rutaPath.length < 2) return {{}};
+                
+                const composicion = {{
+                    avenida_principal: {{ count: 0, distancia: 0 }},
+                    calle_colectora: {{ count: 0, distancia: 0 }},
+                    calle_residencial: {{ count: 0, distancia: 0 }},
+                    jiron_comercial: {{ count: 0, distancia: 0 }},
+                    otros: {{ count: 0, distancia: 0 }}
+                }};
+                
+                for (let i = 0; i < rutaPath.length - 1; i++) {{
+                    const nodoOrigen = rutaPath[i];
+                    const nodoDestino = rutaPath[i + 1];
+                    
+                    const aristasOrigen = listaAdyacencia[nodoOrigen] || [];
+                    const arista = aristasOrigen.find(a => a.node === nodoDestino);
+                    
+                    if (arista) {{
+                        const tipo = arista.tipo_via || 'otros';
+                        if (composicion[tipo]) {{
+                            composicion[tipo].count++;
+                            composicion[tipo].distancia += arista.length;
+                        }} else {{
+                            composicion.otros.count++;
+                            composicion.otros.distancia += arista.length;
+                        }}
+                    }}
+                }}
+                
+                return composicion;
+            }}
+
+            // --- Algoritmo A* ---
+            function aStar(inicio, destino, tipoCosto) {{
+                const tiempoInicio = performance.now();
+                console.log(`🔍 A* iniciado: ${{inicio}} → ${{destino}} [${{tipoCosto}}]`);
+                
+                if (!nodes[inicio] || !nodes[destino]) {{
+                    console.error(`❌ Nodos inválidos`);
+                    return null;
+                }}
+                
+                if (inicio === destino) {{
+                    return {{ path: [inicio], cost: 0, varianza: 0, nodesExplored: 1 }};
+                }}
+                
+                // Heurística
+                function heuristica(nodoA, nodoB) {{
+                    const pA = nodes[nodoA];
+                    const pB = nodes[nodoB];
+                    if (!pA || !pB) return Infinity;
+                    
+                    const lat1 = pA.lat * Math.PI / 180;
+                    const lat2 = pB.lat * Math.PI / 180;
+                    const deltaLat = lat2 - lat1;
+                    const deltaLon = (pB.lon - pA.lon) * Math.PI / 180;
+                    
+                    const a = Math.sin(deltaLat/2) * Math.sin(deltaLat/2) +
+                            Math.cos(lat1) * Math.cos(lat2) *
+                            Math.sin(deltaLon/2) * Math.sin(deltaLon/2);
+                    const c = 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1-a));
+                    const distancia = 6371000 * c; // 6371000 es el radio de la Tierra en metros aprox.
+                    
+                    const velocidadMaxMs = 20; // 20 m/s = 72 km/h
+                    return distancia / velocidadMaxMs; //heurística final.
+                }}
+                
+                const openSet = new Set([inicio]);
+                const closedSet = new Set();
+                const cameFrom = new Map();
+                const gScore = new Map([[inicio, 0]]);
+                const varianzaG = new Map([[inicio, 0]]); // Σσ² a lo largo de la mejor ruta conocida
+                const fScore = new Map([[inicio, heuristica(inicio, destino)]]);
+                
+                let nodosExplorados = 0;
+                const maxIteraciones = 5000;
+                const maxTiempo = 6000;
+                
+                while (openSet.size > 0 && nodosExplorados < maxIteraciones) {{
+                    if (performance.now() - tiempoInicio > maxTiempo) {{
+                        console.warn(`⏰ Timeout alcanzado`);
+                        break;
+                    }}
+                    
+                    let actual = null;
+                    let menorF = Infinity;
+                    for (let nodo of openSet) {{
+                        const f = fScore.get(nodo) || Infinity;
+                        if (f < menorF) {{
+                            menorF = f;
+                            actual = nodo;
+                        }}
+                    }}
+                    
+                    if (!actual) break;
+                    
+                    nodosExplorados++;
+                    
+                    if (actual === destino) {{
+                        const ruta = [];
+                        let temp = actual;
+                        while (temp !== undefined) {{
+                            ruta.unshift(temp);
+                            temp = cameFrom.get(temp);
+                        }}
+                        const tiempoTotal = performance.now() - tiempoInicio;
+                        console.log(`✅ Ruta encontrada en ${{tiempoTotal.toFixed(0)}}ms: ${{ruta.length}} nodos`);
+                        return {{ 
+                            path: ruta, 
+                            cost: gScore.get(destino), 
+                            varianza: varianzaG.get(destino),
+                            nodesExplored: nodosExplorados,
+                            timeMs: tiempoTotal
+                        }};
+                    }}
+                    
+                    openSet.delete(actual);
+                    closedSet.add(actual);
+                    
+                    const vecinos = listaAdyacencia[actual] || [];
+                    for (let vecino of vecinos) {{
+                        const nodoVecino = vecino.node;
+                        
+                        if (closedSet.has(nodoVecino)) continue;
+                        if (!isFinite(vecino[tipoCosto])) continue; // calle cerrada
+                        
+                        const costoTentativo = gScore.get(actual) + vecino[tipoCosto];
+                        
+                        const costoActual = gScore.get(nodoVecino);
+                        if (costoActual === undefined || costoTentativo < costoActual) {{
+                            cameFrom.set(nodoVecino, actual);
+                            gScore.set(nodoVecino, costoTentativo);
+                            varianzaG.set(nodoVecino, varianzaG.get(actual) + vecino.varianza);
+                            fScore.set(nodoVecino, costoTentativo + heuristica(nodoVecino, destino));
+                            
+                            if (!openSet.has(nodoVecino)) {{
+                                openSet.add(nodoVecino);
+                            }}
+                        }}
+                    }}
+                }}
+                
+                console.log(`❌ No se encontró ruta después de ${{nodosExplorados}} nodos`);
+                return null;
+            }}
+
+            // --- Manejo de Eventos de Emergencia ---
+            map.on('click', function(e) {{
+                if (modoCierre) {{
+                    const calle = calleMasCercana(e.latlng);
+                    if (!calle) return;
+                    if (cierresActivos.has(claveCalle(calle.source, calle.target))) {{
+                        reabrirCalle(calle.source, calle.target);
+                    }} else {{
+                        cerrarCalle(calle.source, calle.target);
+                    }}
+                    return;
+                }}
+                if (!MODO_EMERGENCIA) return;
+                if (MODO_LOTE) {{
+                    agregarIncidenteLote(e.latlng);
+                    return;
+                }}
+                
+                const coordsIncidente = e.latlng;
+                console.log(`🚨 Emergencia reportada en: [${{coordsIncidente.lat.toFixed(6)}}, ${{coordsIncidente.lng.toFixed(6)}}]`);
+                
+                // Mostrar indicador de carga
+                document.getElementById('contenido-recomendaciones').innerHTML = `
+                    <div style="text-align: center; padding: 20px;">
+                        <h5>🚨 Procesando Emergencia</h5>
+                        <div style="margin: 15px 0;">
+                            <div style="display: inline-block; width: 20px; height: 20px; border: 3px solid #f3f3f3; border-top: 3px solid #3498db; border-radius: 50%; animation: spin 1s linear infinite;"></div>
+                        </div>
+                        <p>Calculando rutas óptimas...</p>
+                        <p style="font-size: 0.8em; color: #666;">⏰ <span id="processing-time">${{HORA_ACTUAL}}</span></p>
+                        <style>
+                            @keyframes spin {{ 0% {{ transform: rotate(0deg); }} 100% {{ transform: rotate(360deg); }} }}
+                        </style>
+                    </div>`;
+                
+                // Aseguramos que el panel esté visible durante el procesamiento
+                if (panelMinimized) {{
+                    togglePanel();
+                }}
+                
+                // Limpiar marcadores anteriores
+                if (marcadorIncidente) map.removeLayer(marcadorIncidente);
+                if (rutaRapidaLayer) map.removeLayer(rutaRapidaLayer);
+                if (rutaSeguraLayer) map.removeLayer(rutaSeguraLayer);
+                if (rutaATiempoLayer) map.removeLayer(rutaATiempoLayer);
+                Object.keys(rutasActivas).forEach(tipo => {{
+                    map.removeLayer(rutasActivas[tipo].layer);
+                    delete rutasActivas[tipo];
+                }});
+                
+                // Crear marcador de emergencia
+                marcadorIncidente = L.marker(coordsIncidente, {{ 
+                    icon: L.divIcon({{ 
+                        html: '🚨', 
+                        className: 'incident-marker', 
+                        iconSize: [40, 40],
+                        iconAnchor: [20, 20]
+                    }}) 
+                }}).addTo(map).bindPopup("<b>🚨 EMERGENCIA</b><br>Calculando respuesta óptima...").openPopup();
+                
+                setTimeout(() => {{
+                    procesarEmergencia(coordsIncidente);
+                }}, 100);
+            }});
+            
+            // --- función de Procesamiento de Emergencia ---
+            function procesarEmergencia(coordsIncidente) {{
+                const inicioSeleccion = performance.now();
+                const inicioReporte = Date.now();
+                try {{
+                    // Encontrar nodo más cercano
+                    let nodoDestino = null;
+                    let distanciaMinima = Infinity;
+                    
+                    Object.keys(nodes).forEach(nodeId => {{
+                        const posNodo = L.latLng(nodes[nodeId].lat, nodes[nodeId].lon);
+                        const distancia = posNodo.distanceTo(coordsIncidente);
+                        if (distancia < distanciaMinima) {{
+                            distanciaMinima = distancia;
+                            nodoDestino = parseInt(nodeId);
+                        }}
+                    }});
+                    
+                    if (!nodoDestino) {{
+                        document.getElementById('contenido-recomendaciones').innerHTML = 
+                            "<div style='color: #dc3545; font-weight: bold; padding: 15px;'>❌ Error: Ubicación no accesible</div>";
+                        return;
+                    }}
+                    
+                    console.log(`📍 Nodo destino: ${{nodoDestino}}, distancia: ${{distanciaMinima.toFixed(1)}}m`);
+                    
+                    // evaluamos las patrullas disponibles
+                    const patrullasDisponibles = patrullas.filter(p => p.status === 'disponible');
+                    
+                    if (patrullasDisponibles.length === 0) {{
+                        document.getElementById('contenido-recomendaciones').innerHTML = 
+                            "<div style='color: #dc3545; font-weight: bold; padding: 15px;'>⚠️ No hay patrullas disponibles</div>";
+                        return;
+                    }}
+                    
+                    // Preselección O(1) con la matriz de zonas: A* solo para las más cercanas
+                    let patrullasEvaluadas = patrullasDisponibles;
+                    const zonaDestino = nodes[nodoDestino].zona;
+                    if (ETA_ZONAS && zonaDestino !== undefined && MAX_CANDIDATOS_ASTAR > 0) {{
+                        const etaZona = p => {{
+                            const eta = ETA_ZONAS[p.id] ? ETA_ZONAS[p.id][zonaDestino] : null;
+                            return eta === null || eta === undefined ? Infinity : eta;
+                        }};
+                        const conFila = patrullasDisponibles.filter(p => ETA_ZONAS[p.id])
+                            .sort((a, b) => etaZona(a) - etaZona(b));
+                        // Las que empatan con la última dentro del margen también: la ETA de
+                        // zona es gruesa y no debe descartar a la más rápida por segundos
+                        const corte = conFila.length > MAX_CANDIDATOS_ASTAR
+                            ? etaZona(conFila[MAX_CANDIDATOS_ASTAR - 1]) + MARGEN_PRESELECCION_S : Infinity;
+                        // Las que se movieron a una zona sin fila conocida se evalúan siempre
+                        patrullasEvaluadas = conFila.filter((p, i) => i < MAX_CANDIDATOS_ASTAR || etaZona(p) <= corte)
+                            .concat(patrullasDisponibles.filter(p => !ETA_ZONAS[p.id]));
+                        console.log(`⚡ Preselección por matriz de zonas: ${{patrullasEvaluadas.map(p => p.id).join(', ')}}`);
+                    }}
+                    
+                    let candidatos = [];
+                    const busquedas = [];
+                    
+                    for (let p of patrullasEvaluadas) {{
+                        const resultado = aStar(p.nodo_actual, nodoDestino, 'costo_rapido');
+                        busquedas.push({{ patrulla: p.id, ...medidaBusqueda(resultado) }});
+                        
+                        if (resultado && resultado.path && resultado.path.length > 0) {{
+                            // ETA en el percentil elegido: Σμ + z·√Σσ² (modelo gaussiano)
+                            const desviacion = Math.sqrt(resultado.varianza);
+                            candidatos.push({{ 
+                                patrulla: p, 
+                                tiempo: resultado.cost + Z_PERCENTIL_ETA * desviacion,
+                                media: resultado.cost,
+                                desviacion: desviacion,
+                                nodosExplorados: resultado.nodesExplored
+                            }});
+                            console.log(`✅ Ruta para ${{p.id}}: ${{resultado.cost.toFixed(2)}}s ± ${{desviacion.toFixed(2)}}s`);
+                        }} else {{
+                            console.log(`❌ Sin ruta válida para ${{p.id}}`);
+                        }}
+                    }}
+                    
+                    if (candidatos.length === 0) {{
+                        document.getElementById('contenido-recomendaciones').innerHTML = 
+                            "<div style='color: #dc3545; font-weight: bold; padding: 15px;'>❌ No se encontró una ruta válida</div>";
+                        return;
+                    }}
+                    
+                    // seleccionamos la mejor patrulla
+                    candidatos.sort((a, b) => a.tiempo - b.tiempo);
+                    const mejorPatrulla = candidatos[0].patrulla;
+                    
+                    console.log(`🏆 Mejor patrulla: ${{mejorPatrulla.id}} con ETA p${{PERCENTIL_ETA}}: ${{candidatos[0].tiempo.toFixed(2)}}s`);
+                    
+                    const ranking = candidatos.map(c => ({{
+                        patrulla: c.patrulla.id, eta: c.tiempo, media: c.media, desviacion: c.desviacion
+                    }}));
+                    // Entradas de la decisión para la bitácora de despacho (se envían al asignar)
+                    decisionDespacho = {{
+                        reportado: inicioReporte / 1000,
+                        candidatas: patrullasDisponibles.map(p => [p.id, p.nodo_actual]),
+                        // Las que pasaron la preselección por zonas: solo ellas entraron al ranking
+                        evaluadas: patrullasEvaluadas.map(p => p.id),
+                        ranking: candidatos.map(c => [c.patrulla.id, ...[c.tiempo, c.media, c.desviacion].map(s => Math.round(s * 10) / 10)])
+                    }};
+                    telemetriaDespacho = {{
+                        nodo_destino: nodoDestino,
+                        patrullas_disponibles: patrullasDisponibles.length,
+                        patrullas_evaluadas: patrullasEvaluadas.length,
+                        busquedas: busquedas,
+                        percentil_eta: PERCENTIL_ETA,
+                        ranking: ranking,
+                        seleccion_ms: performance.now() - inicioSeleccion
+                    }};
+                    
+                    setTimeout(() => {{
+                        calcularRutasDuales(mejorPatrulla, nodoDestino, ranking);
+                    }}, 100);
+                    
+                }} catch (error) {{
+                    console.error('❌ Error en procesarEmergencia:', error);
+                    document.getElementById('contenido-recomendaciones').innerHTML = 
+                        `<div style='color: #dc3545; font-weight: bold; padding: 15px;'>❌ Error: ${{error.message}}</div>`;
+                }}
+            }}
+            
+            // --- Función para Calcular Rutas Duales ---
+            function calcularRutasDuales(mejorPatrulla, nodoDestino, ranking = []) {{
+                try {{
+                    document.getElementById('contenido-recomendaciones').innerHTML = `
+                        <div style="text-align: center; padding: 15px;">
+                            <h5>🎯 Calculando rutas para ${{mejorPatrulla.id}}</h5>
+                            <p>Generando recomendaciones...</p>
+                        </div>`;
+                    
+                    // Calcular ambas rutas
+                    const rutaRapida = aStar(mejorPatrulla.nodo_actual, nodoDestino, 'costo_rapido');
+                    const rutaSegura = aStar(mejorPatrulla.nodo_actual, nodoDestino, 'costo_seguro');
+                    
+                    if (!rutaRapida) {{
+                        document.getElementById('contenido-recomendaciones').innerHTML = 
+                            "<div style='color: #dc3545; font-weight: bold; padding: 15px;'>❌ Error: No se pudo calcular la ruta</div>";
+                        return;
+                    }}
+                    
+                    // Recalcular tiempos reales usando los atributos de las aristas
+                    const tiempoRealRapida = calcularTiempoRealRuta(rutaRapida.path, 'costo_rapido');
+                    const tiempoRealSegura = rutaSegura ? calcularTiempoRealRuta(rutaSegura.path, 'costo_seguro') : null;
+                    
+                    // Tercera recomendación: la que maximiza P(llegada ≤ plazo)
+                    const rutaPlazo = rutaATiempo(mejorPatrulla.nodo_actual, nodoDestino, PLAZO_LLEGADA_S,
+                                                  [rutaRapida.path, rutaSegura && rutaSegura.path]);
+                    
+                    // Alternativas a la rápida, para cuando las recomendaciones coinciden
+                    const alternativas = rutasAlternativas(mejorPatrulla.nodo_actual, nodoDestino, 'costo_rapido');
+                    
+                    // Probabilidad de llegar dentro del plazo (todas las rutas sobre las mismas muestras)
+                    const inicioFiabilidad = performance.now();
+                    const [fiabilidadRapida, fiabilidadSegura, fiabilidadPlazo, ...fiabilidadAlternativas] = simularFiabilidad(
+                        [rutaRapida.path, rutaSegura ? rutaSegura.path : [], rutaPlazo ? rutaPlazo.path : [],
+                         ...alternativas.map(a => a.path)]);
+                    const fiabilidadMs = performance.now() - inicioFiabilidad;
+                    
+                    // Analizar composición de rutas
+                    const composicionRapida = analizarComposicionRuta(rutaRapida.path);
+                    const composicionSegura = rutaSegura ? analizarComposicionRuta(rutaSegura.path) : null;
+                    
+                    function formatearTiempo(segundos) {{
+                        if (!isFinite(segundos)) return "∞";
+                        const mins = Math.floor(segundos / 60);
+                        const segs = Math.round(segundos % 60);
+                        return `${{mins}}:${{segs.toString().padStart(2, '0')}}`;
+                    }}
+                    
+                    function formatearDistancia(metros) {{
+                        if (metros >= 1000) {{
+                            return `${{(metros / 1000).toFixed(1)}} km`;
+                        }}
+                        return `${{metros.toFixed(0)}} m`;
+                    }}
+                    
+                    function generarFiabilidadHTML(fiabilidad) {{
+                        const probabilidad = fiabilidad.p_a_tiempo * 100;
+                        const color = probabilidad >= 90 ? '#28a745' : probabilidad >= 60 ? '#fd7e14' : '#dc3545';
+                        return `🎲 <b>P(llegada ≤ ${{formatearTiempo(fiabilidad.plazo_s)}}):</b> <span style="color: ${{color}}; font-weight: bold;">${{probabilidad.toFixed(1)}}%</span><br>
+                            📈 <b>ETA p50 / p90 / p95:</b> ${{formatearTiempo(fiabilidad.eta_p50_s)}} / ${{formatearTiempo(fiabilidad.eta_p90_s)}} / ${{formatearTiempo(fiabilidad.eta_p95_s)}}<br>`;
+                    }}
+                    
+                    function generarComposicionHTML(composicion) {{
+                        let html = '<div style="font-size: 0.8em; margin-top: 8px;">';
+                        html += '<b>Composición de vías:</b><br>';
+                        
+                        Object.keys(composicion).forEach(tipo => {{
+                            const data = composicion[tipo];
+                            if (data.count > 0) {{
+                                const emoji = {{
+                                    'avenida_principal': '🟠',
+                                    'calle_colectora': '🟣', 
+                                    'calle_residencial': '🟢',
+                                    'jiron_comercial': '🔵',
+                                    'otros': '⚫'
+                                }}[tipo] || '⚪';
+                                
+                                const nombre = {{
+                                    'avenida_principal': 'Avenidas',
+                                    'calle_colectora': 'Colectoras',
+                                    'calle_residencial': 'Residenciales', 
+                                    'jiron_comercial': 'Jirones',
+                                    'otros': 'Otros'
+                                }}[tipo] || tipo;
+                                
+                                html += `${{emoji}} ${{nombre}}: ${{data.count}} (${{formatearDistancia(data.distancia)}})<br>`;
+                            }}
+                        }});
+                        
+                        html += '</div>';
+                        return html;
+                    }}
+                    
+                    let htmlRecomendaciones = `<h5>🎯 Análisis Detallado para ${{mejorPatrulla.id}}</h5>`;
+                    
+                    if (ranking.length > 1) {{
+                        htmlRecomendaciones += `
+                        <div style="font-size: 0.85em; margin-bottom: 8px;">
+                            <b>🏁 Patrullas por ETA p${{PERCENTIL_ETA}}:</b><br>
+                            ${{ranking.map((r, i) => `${{i + 1}}. ${{r.patrulla}}: ${{formatearTiempo(r.eta)}} (μ ${{formatearTiempo(r.media)}}, σ ${{formatearTiempo(r.desviacion)}})`).join('<br>')}}
+                        </div>`;
+                    }}
+                    
+                    // visualización ruta rápida
+                    if (rutaRapida && rutaRapida.path) {{
+                        const coordsRuta = rutaRapida.path.map(n => [nodes[n].lat, nodes[n].lon]);
+                        const estiloRapida = {{ 
+                            color: '#e74c3c', 
+                            weight: 6, 
+                            opacity: 0.9 
+                        }};
+                        rutaRapidaLayer = L.polyline(coordsRuta, estiloRapida).addTo(map);
+                        rutasActivas.rapida = {{ path: rutaRapida.path, destino: nodoDestino, tipoCosto: 'costo_rapido', estilo: estiloRapida, layer: rutaRapidaLayer }};
+                        
+                        htmlRecomendaciones += `
+                        <div style="border-left: 5px solid #e74c3c; padding: 12px; margin: 8px 0; background: #fff5f5; border-radius: 5px;">
+                            <b>1. 🏃‍♂️ Ruta Rápida</b><br>
+                            ⏱️ <b>Tiempo estimado:</b> ${{formatearTiempo(tiempoRealRapida.tiempoTotal)}}<br>
+                            📏 <b>Distancia:</b> ${{formatearDistancia(tiempoRealRapida.distanciaTotal)}}<br>
+                            🚗 <b>Velocidad promedio:</b> ${{tiempoRealRapida.velocidadPromedio.toFixed(1)}} km/h<br>
+                            📍 <b>Segmentos:</b> ${{tiempoRealRapida.numSegmentos}} tramos<br>
+                            🔍 <b>Nodos explorados:</b> ${{rutaRapida.nodesExplored}}<br>
+                            ${{generarFiabilidadHTML(fiabilidadRapida)}}
+                            🧮 <b>Función:</b> μ(e)
+                            ${{generarComposicionHTML(composicionRapida)}}
+                        </div>`;
+                    }}
+                    
+                    // Visualización ruta segura
+                    if (rutaSegura && rutaSegura.path && tiempoRealSegura) {{
+                        const coordsRuta = rutaSegura.path.map(n => [nodes[n].lat, nodes[n].lon]);
+                        const estiloSegura = {{ 
+                            color: '#3498db', 
+                            weight: 6, 
+                            opacity: 0.9,
+                            dashArray: '15, 8'
+                        }};
+                        rutaSeguraLayer = L.polyline(coordsRuta, estiloSegura).addTo(map);
+                        rutasActivas.segura = {{ path: rutaSegura.path, destino: nodoDestino, tipoCosto: 'costo_seguro', estilo: estiloSegura, layer: rutaSeguraLayer }};
+                        
+                        const diferenciaTiempo = tiempoRealSegura.tiempoTotal - tiempoRealRapida.tiempoTotal;
+                        const diferenciaPorcentaje = ((diferenciaTiempo / tiempoRealRapida.tiempoTotal) * 100).toFixed(1);
+                        const diferenciaDist = tiempoRealSegura.distanciaTotal - tiempoRealRapida.distanciaTotal;
+                        
+                        htmlRecomendaciones += `
+                        <div style="border-left: 5px solid #3498db; padding: 12px; margin: 8px 0; background: #f0f8ff; border-radius: 5px;">
+                            <b>2. 🛡️ Ruta Segura</b><br>
+                            ⏱️ <b>Tiempo estimado:</b> ${{formatearTiempo(tiempoRealSegura.tiempoTotal)}}<br>
+                            📏 <b>Distancia:</b> ${{formatearDistancia(tiempoRealSegura.distanciaTotal)}}<br>
+                            🚗 <b>Velocidad promedio:</b> ${{tiempoRealSegura.velocidadPromedio.toFixed(1)}} km/h<br>
+                            📍 <b>Segmentos:</b> ${{tiempoRealSegura.numSegmentos}} tramos<br>
+                            🔍 <b>Nodos explorados:</b> ${{rutaSegura.nodesExplored}}<br>
+                            📊 <b>Diferencia tiempo:</b> +${{formatearTiempo(diferenciaTiempo)}} (+${{diferenciaPorcentaje}}%)<br>
+                            📊 <b>Diferencia distancia:</b> ${{diferenciaDist >= 0 ? '+' : ''}}${{formatearDistancia(Math.abs(diferenciaDist))}}<br>
+                            ${{generarFiabilidadHTML(fiabilidadSegura)}}
+                            🧮 <b>Función:</b> μ(e) + k×σ(e) [k=${{FACTOR_RIESGO_K}}]
+                            ${{generarComposicionHTML(composicionSegura)}}
+                        </div>`;
+                        
+                        // Comparación de rutas
+                        const rutasSonDiferentes = JSON.stringify(rutaRapida.path) !== JSON.stringify(rutaSegura.path);
+                        const recomendacion = rutasSonDiferentes ? 
+                            (diferenciaTiempo / tiempoRealRapida.tiempoTotal < 0.5 ? 
+                                "🛡️ Se recomienda la ruta segura (buena relación tiempo/seguridad)" : 
+                                "⚡ Se recomienda la ruta rápida (diferencia de tiempo significativa)") :
+                            alternativas.length > 0 ?
+                                `⚠️ Ambas rutas son idénticas - comparar con las ${{alternativas.length}} alternativas` :
+                                "⚠️ Ambas rutas son idénticas - revisar factores de seguridad";
+                        
+                        htmlRecomendaciones += `
+                        <div style="background: #f8f9fa; padding: 12px; border-radius: 5px; margin: 10px 0;">
+                            <h6>🤖 Análisis de Recomendación:</h6>
+                            <p style="font-size: 0.9em; margin: 5px 0;">
+                                <b>Estado de rutas:</b> ${{rutasSonDiferentes ? '✅ Rutas diferentes encontradas' : '⚠️ Rutas idénticas'}}
+                            </p>
+                            <p style="font-size: 0.9em; margin: 5px 0;">
+                                <b>Recomendación:</b> ${{recomendacion}}
+                            </p>
+                            <p style="font-size: 0.8em; margin: 5px 0; color: #6c757d;">
+                                🎲 ${{MUESTRAS_FIABILIDAD}} simulaciones Monte Carlo en ${{fiabilidadMs.toFixed(0)}} ms
+                            </p>
+                        </div>`;
+                    }} else {{
+                        htmlRecomendaciones += `
+                        <div style="border-left: 5px solid #ffc107; padding: 12px; margin: 8px 0; background: #fff9e6; border-radius: 5px;">
+                            <b>⚠️ Ruta Segura</b><br>
+                            No se pudo calcular una ruta segura alternativa.
+                        </div>`;
+                    }}
+                    
+                    // Visualización ruta a tiempo
+                    if (rutaPlazo) {{
+                        const coordsRuta = rutaPlazo.path.map(n => [nodes[n].lat, nodes[n].lon]);
+                        const estiloPlazo = {{
+                            color: '#27ae60',
+                            weight: 5,
+                            opacity: 0.9,
+                            dashArray: '4, 8'
+                        }};
+                        rutaATiempoLayer = L.polyline(coordsRuta, estiloPlazo).addTo(map);
+                        // Tras un cierre el tramo se repara con el costo seguro, el más cercano a este criterio
+                        rutasActivas.a_tiempo = {{ path: rutaPlazo.path, destino: nodoDestino, tipoCosto: 'costo_seguro', estilo: estiloPlazo, layer: rutaATiempoLayer }};
+                        const tiempoRealPlazo = calcularTiempoRealRuta(rutaPlazo.path, 'costo_rapido');
+                        const igualA = rutaPlazo.path.join() === rutaRapida.path.join() ? 'la ruta rápida' :
+                            rutaSegura && rutaPlazo.path.join() === rutaSegura.path.join() ? 'la ruta segura' : null;
+                        
+                        htmlRecomendaciones += `
+                        <div style="border-left: 5px solid #27ae60; padding: 12px; margin: 8px 0; background: #f0fff4; border-radius: 5px;">
+                            <b>3. ⏱️ Ruta a Tiempo</b> (plazo ${{formatearTiempo(PLAZO_LLEGADA_S)}})<br>
+                            ⏱️ <b>Tiempo estimado:</b> ${{formatearTiempo(rutaPlazo.mu)}} ± ${{formatearTiempo(Math.sqrt(rutaPlazo.varianza))}}<br>
+                            📏 <b>Distancia:</b> ${{formatearDistancia(tiempoRealPlazo.distanciaTotal)}}<br>
+                            🎯 <b>P(llegada ≤ plazo), modelo gaussiano:</b> ${{(rutaPlazo.p * 100).toFixed(1)}}%<br>
+                            ${{generarFiabilidadHTML(fiabilidadPlazo)}}
+                            🔍 <b>Etiquetas:</b> ${{rutaPlazo.etiquetas}}${{rutaPlazo.exacta ? '' : ' (tope alcanzado: mejor ruta conocida)'}} en ${{rutaPlazo.timeMs.toFixed(0)}} ms<br>
+                            ${{igualA ? `ℹ️ Coincide con ${{igualA}}<br>` : ''}}
+                            🧮 <b>Función:</b> max P(Σμ + Z·√Σσ² ≤ plazo)
+                        </div>`;
+                    }}
+                    
+                    // Visualización de alternativas
+                    if (alternativas.length > 0) {{
+                        htmlRecomendaciones += `
+                        <div style="border-left: 5px solid #8e44ad; padding: 12px; margin: 8px 0; background: #f8f0fc; border-radius: 5px;">
+                            <b>🔀 Alternativas a la ruta rápida</b> (≤ +${{((ESTIRAMIENTO_MAX - 1) * 100).toFixed(0)}}%, solape ≤ ${{(SOLAPE_MAX * 100).toFixed(0)}}%)<br>`;
+                        alternativas.forEach((alternativa, i) => {{
+                            const tipo = `alternativa_${{i + 1}}`;
+                            const estiloAlternativa = {{
+                                color: '#8e44ad',
+                                weight: 4,
+                                opacity: 0.75,
+                                dashArray: '2, 6'
+                            }};
+                            const layer = L.polyline(alternativa.path.map(n => [nodes[n].lat, nodes[n].lon]), estiloAlternativa)
+                                .bindTooltip(`Alternativa ${{i + 1}}`).addTo(map);
+                            rutasActivas[tipo] = {{ path: alternativa.path, destino: nodoDestino, tipoCosto: 'costo_rapido', estilo: estiloAlternativa, layer }};
+                            const tiempoRealAlternativa = calcularTiempoRealRuta(alternativa.path, 'costo_rapido');
+                            htmlRecomendaciones += `
+                            <div style="margin-top: 6px; font-size: 0.9em;">
+                                <b>${{i + 1}}.</b> ⏱️ ${{formatearTiempo(tiempoRealAlternativa.tiempoTotal)}} (+${{((alternativa.estiramiento - 1) * 100).toFixed(1)}}%),
+                                📏 ${{formatearDistancia(tiempoRealAlternativa.distanciaTotal)}}, 🔗 solape ${{(alternativa.solape * 100).toFixed(0)}}%<br>
+                                ${{generarFiabilidadHTML(fiabilidadAlternativas[i])}}
+                            </div>`;
+                        }});
+                        htmlRecomendaciones += `
+                            <span style="font-size: 0.8em; color: #6c757d;">🔍 ${{alternativas[0].nodesExplored}} nodos en ${{alternativas[0].timeMs.toFixed(0)}} ms (dos búsquedas)</span>
+                        </div>`;
+                    }}
+                    
+                    // Botones de asignación
+                    htmlRecomendaciones += `
+                    <div style="text-align: center; margin-top: 15px;">
+                        <button onclick="asignarPatrulla('${{mejorPatrulla.id}}', 'rapida')" 
+                                style="background: #e74c3c; color: white; border: none; padding: 10px 16px; margin: 5px; border-radius: 5px; cursor: pointer; font-weight: bold;">
+                            🏃‍♂️ Asignar Ruta Rápida
+                        </button>
+                        ${{rutaSegura ? `<button onclick="asignarPatrulla('${{mejorPatrulla.id}}', 'segura')" 
+                                style="background: #3498db; color: white; border: none; padding: 10px 16px; margin: 5px; border-radius: 5px; cursor: pointer; font-weight: bold;">
+                            🛡️ Asignar Ruta Segura
+                        </button>` : ''}}
+                        ${{rutaPlazo ? `<button onclick="asignarPatrulla('${{mejorPatrulla.id}}', 'a_tiempo')" 
+                                style="background: #27ae60; color: white; border: none; padding: 10px 16px; margin: 5px; border-radius: 5px; cursor: pointer; font-weight: bold;">
+                            ⏱️ Asignar Ruta a Tiempo
+                        </button>` : ''}}
+                        ${{alternativas.map((a, i) => `<button onclick="asignarPatrulla('${{mejorPatrulla.id}}', 'alternativa_${{i + 1}}')" 
+                                style="background: #8e44ad; color: white; border: none; padding: 10px 16px; margin: 5px; border-radius: 5px; cursor: pointer; font-weight: bold;">
+                            🔀 Asignar Alternativa ${{i + 1}}
+                        </button>`).join('')}}
+                    </div>`;
+                    
+                    document.getElementById('contenido-recomendaciones').innerHTML = htmlRecomendaciones;
+                    
+                    if (telemetriaDespacho) {{
+                        telemetriaDespacho.rutas = {{ rapida: medidaBusqueda(rutaRapida), segura: medidaBusqueda(rutaSegura) }};
+                        telemetriaDespacho.rutas.a_tiempo = rutaPlazo ? {{ ms: rutaPlazo.timeMs, etiquetas: rutaPlazo.etiquetas, exacta: rutaPlazo.exacta, p: rutaPlazo.p }} : null;
+                        telemetriaDespacho.rutas.alternativas = alternativas.length > 0 ? {{
+                            ms: alternativas[0].timeMs, nodos: alternativas[0].nodesExplored,
+                            estiramiento: alternativas.map(a => a.estiramiento), solape: alternativas.map(a => a.solape)
+                        }} : null;
+                        telemetriaDespacho.fiabilidad = {{
+                            rapida: fiabilidadRapida, segura: rutaSegura ? fiabilidadSegura : null,
+                            a_tiempo: rutaPlazo ? fiabilidadPlazo : null, alternativas: fiabilidadAlternativas, ms: fiabilidadMs
+                        }};
+                        telemetriaDespacho.recomendacion_mostrada = performance.now();
+                    }}
+                    
+                }} catch (error) {{
+                    console.error('❌ Error en calcularRutasDuales:', error);
+                    document.getElementById('contenido-recomendaciones').innerHTML = 
+                        `<div style='color: #dc3545; font-weight: bold; padding: 15px;'>❌ Error: ${{error.message}}</div>`;
+                }}
+            }}
+
+            // --- Despacho por Lotes (incidentes simultáneos) ---
+            const incidentesLote = [];
+            const capasLote = L.layerGroup().addTo(map);
+            let resultadoLote = null;
+            let telemetriaLote = null;
+            let decisionLote = null;
+
+            function nodoMasCercano(latlng) {{
+                let nodoCercano = null;
+                let distanciaMinima = Infinity;
+                Object.keys(nodes).forEach(nodeId => {{
+                    const distancia = L.latLng(nodes[nodeId].lat, nodes[nodeId].lon).distanceTo(latlng);
+                    if (distancia < distanciaMinima) {{
+                        distanciaMinima = distancia;
+                        nodoCercano = parseInt(nodeId);
+                    }}
+                }});
+                return nodoCercano;
+            }}
+
+            function agregarIncidenteLote(latlng) {{
+                const nodo = nodoMasCercano(latlng);
+                if (nodo === null) return;
+                
+                incidentesLote.push({{ id: incidentesLote.length + 1, nodo: nodo, latlng: latlng }});
+                L.marker(latlng, {{
+                    icon: L.divIcon({{
+                        html: `<div style="font-size: 22px;">🚨<sub>${{incidentesLote.length}}</sub></div>`,
+                        className: '',
+                        iconSize: [36, 36],
+                        iconAnchor: [18, 18]
+                    }})
+                }}).addTo(capasLote).bindPopup(`<b>🚨 Incidente #${{incidentesLote.length}}</b><br>Nodo: ${{nodo}}`);
+                
+                if (panelMinimized) togglePanel();
+                document.getElementById('contenido-recomendaciones').innerHTML = `
+                    <h5>📦 Despacho por Lotes</h5>
+                    <p><b>${{incidentesLote.length}}</b> incidentes registrados. Siga marcando o despache el lote.</p>
+                    <div style="text-align: center;">
+                        <button onclick="despacharLote()" style="background: #8e44ad; color: white; border: none; padding: 10px 16px; margin: 5px; border-radius: 5px; cursor: pointer; font-weight: bold;">
+                            🚀 Despachar Lote
+                        </button>
+                        <button onclick="limpiarLote()" style="background: #95a5a6; color: white; border: none; padding: 10px 16px; margin: 5px; border-radius: 5px; cursor: pointer;">
+                            🗑️ Limpiar
+                        </button>
+                    </div>`;
+            }}
+
+            window.limpiarLote = function() {{
+                incidentesLote.length = 0;
+                resultadoLote = null;
+                capasLote.clearLayers();
+                document.getElementById('contenido-recomendaciones').innerHTML =
+                    "<p style='color: #6c757d; font-style: italic;'>Lote vacío. Haga clic en el mapa para registrar incidentes.</p>";
+            }}
+
+            // Montículo binario mínimo para Dijkstra
+            class MonticuloMin {{
+                constructor() {{ this.datos = []; }}
+                get size() {{ return this.datos.length; }}
+                push(prioridad, valor) {{
+                    const d = this.datos;
+                    d.push([prioridad, valor]);
+                    let i = d.length - 1;
+                    while (i > 0) {{
+                        const padre = (i - 1) >> 1;
+                        if (d[padre][0] <= d[i][0]) break;
+                        [d[padre], d[i]] = [d[i], d[padre]];
+                        i = padre;
+                    }}
+                }}
+                pop() {{
+                    const d = this.datos;
+                    const tope = d[0];
+                    const ultimo = d.pop();
+                    if (d.length > 0) {{
+                        d[0] = ultimo;
+                        let i = 0;
+                        while (true) {{
+                            const izq = 2 * i + 1, der = izq + 1;
+                            let menor = i;
+                            if (izq < d.length && d[izq][0] < d[menor][0]) menor = izq;
+                            if (der < d.length && d[der][0] < d[menor][0]) menor = der;
+                            if (menor === i) break;
+                            [d[menor], d[i]] = [d[i], d[menor]];
+                            i = menor;
+                        }}
+                    }}
+                    return tope;
+                }}
+            }}
+
+            const NUM_NODOS = Object.keys(nodes).reduce((max, id) => Math.max(max, Number(id)), 0) + 1;
+
+            // tipoCosto: atributo de la arista o función de la arista
+            function construirAdyacenciaInversa(tipoCosto) {{
+                const inversa = Array.from({{ length: NUM_NODOS }}, () => []);
+                const costoDe = typeof tipoCosto === 'function' ? tipoCosto : arista => arista[tipoCosto];
+                Object.keys(listaAdyacencia).forEach(u => {{
+                    const origen = Number(u);
+                    listaAdyacencia[u].forEach(arista => {{
+                        const costo = costoDe(arista);
+                        if (!isFinite(costo)) return; // calle cerrada
+                        inversa[arista.node].push({{ node: origen, costo }});
+                    }});
+                }});
+                return inversa;
+            }}
+
+            // Tiempos de todos los nodos hacia el destino (una búsqueda por incidente), hasta limite
+            function dijkstraInverso(destino, inversa, limite = Infinity) {{
+                const dist = new Float64Array(NUM_NODOS).fill(Infinity);
+                const siguiente = new Int32Array(NUM_NODOS).fill(-1);
+                const monticulo = new MonticuloMin();
+                dist[destino] = 0;
+                monticulo.push(0, destino);
+                
+                while (monticulo.size > 0) {{
+                    const [d, v] = monticulo.pop();
+                    if (d > dist[v]) continue;
+                    if (d > limite) break;
+                    for (const {{ node: u, costo }} of inversa[v]) {{
+                        const nd = d + costo;
+                        if (nd < dist[u]) {{
+                            dist[u] = nd;
+                            siguiente[u] = v;
+                            monticulo.push(nd, u);
+                        }}
+                    }}
+                }}
+                return {{ dist, siguiente }};
+            }}
+
+            // Algoritmo húngaro para n filas ≤ m columnas. Retorna asignacion[fila] = columna
+            function hungaro(costos) {{
+                const n = costos.length, m = costos[0].length;
+                const u = new Float64Array(n + 1), v = new Float64Array(m + 1);
+                const p = new Int32Array(m + 1), camino = new Int32Array(m + 1);
+                
+                for (let i = 1; i <= n; i++) {{
+                    p[0] = i;
+                    let j0 = 0;
+                    const minv = new Float64Array(m + 1).fill(Infinity);
+                    const usado = new Uint8Array(m + 1);
+                    do {{
+                        usado[j0] = 1;
+                        const i0 = p[j0];
+                        let delta = Infinity, j1 = 0;
+                        for (let j = 1; j <= m; j++) {{
+                            if (usado[j]) continue;
+                            const actual = costos[i0 - 1][j - 1] - u[i0] - v[j];
+                            if (actual < minv[j]) {{
+                                minv[j] = actual;
+                                camino[j] = j0;
+                            }}
+                            if (minv[j] < delta) {{
+                                delta = minv[j];
+                                j1 = j;
+                            }}
+                        }}
+                        for (let j = 0; j <= m; j++) {{
+                            if (usado[j]) {{
+                                u[p[j]] += delta;
+                                v[j] -= delta;
+                            }} else {{
+                                minv[j] -= delta;
+                            }}
+                        }}
+                        j0 = j1;
+                    }} while (p[j0] !== 0);
+                    do {{
+                        const j1 = camino[j0];
+                        p[j0] = p[j1];
+                        j0 = j1;
+                    }} while (j0);
+                }}
+                
+                const asignacion = new Array(n).fill(-1);
+                for (let j = 1; j <= m; j++) {{
+                    if (p[j] > 0) asignacion[p[j] - 1] = j - 1;
+                }}
+                return asignacion;
+            }}
+
+            // eta[incidente][patrulla]; retorna la patrulla de cada incidente o -1
+            function asignarLoteOptimo(eta) {{
+                const n = eta.length, m = eta[0].length;
+                const INALCANZABLE = 1e12;
+                const finito = x => isFinite(x) ? x : INALCANZABLE;
+                const asignacion = new Array(n).fill(-1);
+                
+                if (n <= m) {{
+                    hungaro(eta.map(fila => fila.map(finito))).forEach((j, i) => {{
+                        if (j >= 0 && isFinite(eta[i][j])) asignacion[i] = j;
+                    }});
+                }} else {{
+                    // Más incidentes que patrullas: se resuelve la transpuesta
+                    const transpuesta = eta[0].map((_, j) => eta.map(fila => finito(fila[j])));
+                    hungaro(transpuesta).forEach((i, j) => {{
+                        if (i >= 0 && isFinite(eta[i][j])) asignacion[i] = j;
+                    }});
+                }}
+                
+                // Lo que no pudo asignarse de forma óptima se completa con la política voraz
+                const usadas = new Set(asignacion.filter(j => j >= 0));
+                asignacion.forEach((j, i) => {{
+                    if (j >= 0) return;
+                    let mejor = -1, menor = Infinity;
+                    for (let k = 0; k < m; k++) {{
+                        if (!usadas.has(k) && eta[i][k] < menor) {{
+                            menor = eta[i][k];
+                            mejor = k;
+                        }}
+                    }}
+                    if (mejor >= 0) {{
+                        asignacion[i] = mejor;
+                        usadas.add(mejor);
+                    }}
+                }});
+                return asignacion;
+            }}
+
+            window.despacharLote = function() {{
+                const tiempoInicio = performance.now();
+                const disponibles = patrullas.filter(p => p.status === 'disponible');
+                if (incidentesLote.length === 0 || disponibles.length === 0) {{
+                    document.getElementById('contenido-recomendaciones').innerHTML =
+                        "<div style='color: #dc3545; font-weight: bold; padding: 15px;'>⚠️ No hay incidentes o patrullas disponibles</div>";
+                    return;
+                }}
+                
+                const inversa = construirAdyacenciaInversa('costo_rapido');
+                const arboles = incidentesLote.map(inc => dijkstraInverso(inc.nodo, inversa));
+                const eta = arboles.map(arbol => disponibles.map(p => arbol.dist[p.nodo_actual]));
+                const asignacion = asignarLoteOptimo(eta);
+                const tiempoTotal = performance.now() - tiempoInicio;
+                
+                let filas = '';
+                let etaTotal = 0;
+                resultadoLote = incidentesLote.map((inc, i) => {{
+                    const j = asignacion[i];
+                    if (j < 0) {{
+                        filas += `<tr><td>#${{inc.id}}</td><td colspan="2">⏳ En espera</td></tr>`;
+                        return {{ incidente: inc, patrulla: null }};
+                    }}
+                    const patrulla = disponibles[j];
+                    
+                    // Ruta patrulla → incidente siguiendo el árbol de la búsqueda inversa
+                    const path = [patrulla.nodo_actual];
+                    while (path[path.length - 1] !== inc.nodo) {{
+                        path.push(arboles[i].siguiente[path[path.length - 1]]);
+                    }}
+                    L.polyline(path.map(n => [nodes[n].lat, nodes[n].lon]), {{
+                        color: '#8e44ad',
+                        weight: 5,
+                        opacity: 0.8
+                    }}).addTo(capasLote).bindPopup(`<b>${{patrulla.id}}</b> → Incidente #${{inc.id}}`);
+                    
+                    etaTotal += eta[i][j];
+                    const mins = Math.floor(eta[i][j] / 60), segs = Math.round(eta[i][j] % 60);
+                    filas += `<tr><td>#${{inc.id}}</td><td>${{patrulla.id}}</td><td>${{mins}}:${{segs.toString().padStart(2, '0')}}</td></tr>`;
+                    return {{ incidente: inc, patrulla: patrulla, path: path, eta: eta[i][j] }};
+                }});
+                
+                console.log(`📦 Lote de ${{incidentesLote.length}} incidentes × ${{disponibles.length}} patrullas resuelto en ${{tiempoTotal.toFixed(0)}}ms`);
+                
+                document.getElementById('contenido-recomendaciones').innerHTML = `
+                    <h5>📦 Asignación Óptima del Lote</h5>
+                    <table style="width: 100%; font-size: 0.9em; border-collapse: collapse;">
+                        <tr style="background: #f3e5f5;"><th>Incidente</th><th>Patrulla</th><th>ETA</th></tr>
+                        ${{filas}}
+                    </table>
+                    <p style="font-size: 0.8em; color: #666; margin-top: 8px;">
+                        🧮 Algoritmo húngaro · tiempo total ${{Math.round(etaTotal / 60)}} min · calculado en ${{tiempoTotal.toFixed(0)}} ms
+                    </p>
+                    <div style="text-align: center;">
+                        <button onclick="asignarLote()" style="background: #8e44ad; color: white; border: none; padding: 10px 16px; margin: 5px; border-radius: 5px; cursor: pointer; font-weight: bold;">
+                            ✅ Asignar Todo
+                        </button>
+                    </div>`;
+                
+                decisionLote = {{
+                    lote: `${{SESION_TELEMETRIA}}-${{Date.now()}}`,
+                    incidentes: incidentesLote.map(inc => inc.nodo),
+                    candidatas: disponibles.map(p => [p.id, p.nodo_actual])
+                }};
+                telemetriaLote = {{
+                    incidentes: incidentesLote.length,
+                    patrullas_disponibles: disponibles.length,
+                    calculo_ms: tiempoTotal,
+                    recomendacion_mostrada: performance.now()
+                }};
+            }}
+
+            window.asignarLote = function() {{
+                if (!resultadoLote) return;
+                const despachadas = [];
+                resultadoLote.forEach(({{ incidente, patrulla, path, eta }}, indice) => {{
+                    if (!patrulla) return;
+                    patrulla.status = 'en_ruta';
+                    patrulla.marker.setIcon(L.divIcon({{ 
+                        html: `<div class="patrol-ocupado">${{patrulla.id}}</div>`, 
+                        iconSize: [32, 32], 
+                        className: '' 
+                    }}));
+                    informarRuta(patrulla, path, true, incidente.nodo, 'lote',
+                        decisionLote && {{ ...decisionLote, indice, ranking: [[patrulla.id, eta, null, null]] }});
+                    despachadas.push(`${{patrulla.id}} → #${{incidente.id}}`);
+                }});
+                if (telemetriaLote) {{
+                    const {{ recomendacion_mostrada, ...datos }} = telemetriaLote;
+                    enviarTelemetria('despacho_lote', {{
+                        ...datos,
+                        asignadas: despachadas.length,
+                        decision_ms: performance.now() - recomendacion_mostrada
+                    }});
+                    telemetriaLote = null;
+                }}
+                incidentesLote.length = 0;
+                resultadoLote = null;
+                
+                document.getElementById('contenido-recomendaciones').innerHTML = `
+                    <div style="color: #28a745; font-weight: bold; padding: 20px; background: #d4edda; border-radius: 8px; border: 2px solid #c3e6cb; text-align: center;">
+                        ✅ Lote despachado<br>${{despachadas.join('<br>')}}
+                    </div>` + sugerirEspera();
+            }}
+
+            // --- Posiciones de Espera ---
+            const capasEspera = L.layerGroup().addTo(map);
+            let movimientosEspera = [];
+
+            // Al quedar menos patrullas libres, reasigna las libres al plan de su número (húngaro sobre el traslado)
+            function sugerirEspera() {{
+                capasEspera.clearLayers();
+                movimientosEspera = [];
+                if (!PLANES_ESPERA) return '';
+                const disponibles = patrullas.filter(p => p.status === 'disponible');
+                const plan = PLANES_ESPERA[disponibles.length];
+                if (!plan || plan.length === 0) return '';
+                
+                const inicio = performance.now();
+                const inversa = construirAdyacenciaInversa('costo_rapido');
+                const arboles = plan.map(posicion => dijkstraInverso(posicion.nodo, inversa));
+                const eta = arboles.map(arbol => disponibles.map(p => arbol.dist[p.nodo_actual]));
+                asignarLoteOptimo(eta).forEach((j, i) => {{
+                    if (j < 0 || disponibles[j].nodo_actual === plan[i].nodo) return;
+                    const path = [disponibles[j].nodo_actual];
+                    while (path[path.length - 1] !== plan[i].nodo) path.push(arboles[i].siguiente[path[path.length - 1]]);
+                    movimientosEspera.push({{ patrulla: disponibles[j], destino: plan[i], eta: eta[i][j], path }});
+                }});
+                const reposicionMs = performance.now() - inicio;
+                if (movimientosEspera.length === 0) return '';
+                
+                movimientosEspera.forEach(({{ patrulla, destino, path }}) => {{
+                    L.polyline(path.map(n => [nodes[n].lat, nodes[n].lon]), {{
+                        color: '#16a085',
+                        weight: 3,
+                        opacity: 0.8,
+                        dashArray: '6, 6'
+                    }}).addTo(capasEspera);
+                    L.marker([nodes[destino.nodo].lat, nodes[destino.nodo].lon], {{
+                        icon: L.divIcon({{ html: '🅿️', className: 'standby-marker', iconSize: [24, 24], iconAnchor: [12, 12] }})
+                    }}).bindTooltip(`Espera de ${{patrulla.id}}`).addTo(capasEspera);
+                }});
+                const formatear = s => `${{Math.floor(s / 60)}}:${{Math.round(s % 60).toString().padStart(2, '0')}}`;
+                return `
+                    <div style="border-left: 5px solid #16a085; padding: 12px; margin: 10px 0; background: #e8f8f5; border-radius: 5px;">
+                        <b>🅿️ Reposicionamiento para cubrir la demanda</b> (${{disponibles.length}} libres)<br>
+                        ${{movimientosEspera.map(m => `${{m.patrulla.id}} → zona ${{m.destino.zona}} (${{formatear(m.eta)}})`).join('<br>')}}<br>
+                        <span style="font-size: 0.8em; color: #6c757d;">🔍 ${{plan.length}} búsquedas y asignación en ${{reposicionMs.toFixed(0)}} ms</span><br>
+                        <button onclick="aplicarEspera()" 
+                                style="background: #16a085; color: white; border: none; padding: 8px 14px; margin-top: 6px; border-radius: 5px; cursor: pointer; font-weight: bold;">
+                            🅿️ Mover a posiciones de espera
+                        </button>
+                    </div>`;
+            }}
+
+            window.aplicarEspera = function() {{
+                const movidas = [];
+                movimientosEspera.forEach(({{ patrulla, destino, path }}) => {{
+                    if (patrulla.status !== 'disponible') return;
+                    movidas.push(patrulla.id);
+                    // Con seguimiento la patrulla recorre el trayecto (sigue disponible)
+                    if (informarRuta(patrulla, path, false, null, 'espera')) return;
+                    patrulla.nodo_actual = destino.nodo;
+                    patrulla.marker.setLatLng([nodes[destino.nodo].lat, nodes[destino.nodo].lon]);
+                    // La preselección por matriz de zonas sigue a la patrulla
+                    if (ETA_ZONAS) ETA_ZONAS[patrulla.id] = FILAS_ESPERA[destino.zona];
+                }});
+                capasEspera.clearLayers();
+                movimientosEspera = [];
+                const texto = SEGUIMIENTO ? 'en camino a su posición de espera' : 'en posición de espera';
+                console.log(`🅿️ Patrullas ${{texto}}: ${{movidas.join(', ')}}`);
+                document.getElementById('contenido-recomendaciones').insertAdjacentHTML('beforeend', `
+                    <div style="color: #16a085; font-weight: bold; padding: 8px;">🅿️ ${{movidas.join(', ')}} ${{texto}}</div>`);
+            }}
+
+            // --- Seguimiento en Vivo ---
+            // Cada despacho se informa al servidor de la flota, que avanza las unidades por su
+            // ruta; el mapa consulta solo los cambios desde la última versión recibida.
+            const patrullaPorId = Object.fromEntries(patrullas.map(p => [p.id, p]));
+            let versionSeguimiento = 0;
+            let consultaEnCurso = false;
+
+            function urlSeguimiento(ruta) {{
+                let base = SEGUIMIENTO.url;
+                if (!base) {{
+                    let host = 'localhost';
+                    try {{ host = window.parent.location.hostname || host; }} catch (e) {{}}
+                    base = `http://${{host}}:${{SEGUIMIENTO.puerto}}`;
+                }}
+                return `${{base}}${{ruta}}?flota=${{encodeURIComponent(SEGUIMIENTO.flota)}}&token=${{encodeURIComponent(SEGUIMIENTO.token)}}`;
+            }}
+
+            // Tiempo esperado acumulado en cada nodo (μ del arco más rápido entre nodos consecutivos)
+            function tiemposRuta(path) {{
+                const tiempos = [0];
+                for (let i = 1; i < path.length; i++) {{
+                    let tramo = Infinity;
+                    listaAdyacencia[path[i - 1]].forEach(arista => {{
+                        if (arista.node === path[i]) tramo = Math.min(tramo, arista.costo_rapido);
+                    }});
+                    tiempos.push(tiempos[i - 1] + tramo);
+                }}
+                return tiempos;
+            }}
+
+            // Perfil de costos con que se decidió: lo que la reproducción necesita para repetirlo
+            function perfilDecision() {{
+                return {{
+                    nivel: NIVEL_TRAFICO, clima: CONDICION_CLIMA, semilla: SEMILLA_COSTOS, k: FACTOR_RIESGO_K,
+                    percentil: PERCENTIL_ETA, plazo_s: PLAZO_LLEGADA_S, cierres: [...cierresActivos.keys()].map(clave => clave.split('-').map(Number))
+                }};
+            }}
+
+            // Retorna false si no hay seguimiento (la patrulla no se moverá). El servidor
+            // rechaza (409) el despacho si otra consola cambió la patrulla o el incidente desde
+            // la versión que vio este mapa. decision (candidatas, evaluadas, ranking, perfil) va
+            // a la bitácora.
+            function informarRuta(patrulla, path, ocupada, incidente = null, tipoRuta = null, decision = null) {{
+                if (!SEGUIMIENTO || !path || path.length === 0) return false;
+                const cuerpo = JSON.stringify({{
+                    id: patrulla.id, ruta: path, tiempos: tiemposRuta(path), ocupada,
+                    version: patrulla.version, tipo_ruta: tipoRuta,
+                    incidente: incidente === null ? null : {{ nodo: incidente, lat: nodes[incidente].lat, lon: nodes[incidente].lon }},
+                    decision: decision === null ? null : {{ ...decision, perfil: perfilDecision() }}
+                }});
+                // text/plain evita la verificación previa CORS
+                fetch(urlSeguimiento('/despacho'), {{ method: 'POST', body: cuerpo, keepalive: true }})
+                    .then(async respuesta => {{
+                        if (respuesta.status === 409) {{
+                            avisarConflicto(patrulla);
+                        }} else if (respuesta.status === 200) {{
+                            patrulla.version = (await respuesta.json()).version;
+                        }}
+                    }})
+                    .catch(e => console.warn('⚠️ Despacho no informado al seguimiento:', e));
+                return true;
+            }}
+
+            function avisarConflicto(patrulla) {{
+                // La próxima consulta trae el estado completo y corrige el marcador
+                versionSeguimiento = 0;
+                document.getElementById('contenido-recomendaciones').insertAdjacentHTML('afterbegin', `
+                    <div style="color: #856404; font-weight: bold; padding: 12px; background: #fff3cd; border-radius: 8px; border: 2px solid #ffeeba; margin-bottom: 8px;">
+                        ⚠️ ${{patrulla.id}} cambió desde otra consola antes de este despacho; no se asignó
+                    </div>`);
+            }}
+
+            function aplicarCambios(cambios) {{
+                cambios.patrullas.forEach(([id, lat, lon, nodo, estado, version]) => {{
+                    const p = patrullaPorId[id];
+                    if (!p || !p.marker) return;
+                    p.version = version;
+                    p.marker.setLatLng([lat, lon]);
+                    if (p.nodo_actual !== nodo) {{
+                        p.nodo_actual = nodo;
+                        // Solo se conoce la fila de ETAs de las zonas de espera
+                        if (ETA_ZONAS) ETA_ZONAS[p.id] = (FILAS_ESPERA && FILAS_ESPERA[nodes[nodo].zona]) || null;
+                    }}
+                    if (p.status !== estado) {{
+                        p.status = estado;
+                        p.marker.setIcon(iconoPatrulla(p));
+                        const etiqueta = document.getElementById(`status-${{p.id}}`);
+                        if (etiqueta) etiqueta.textContent = estado;
+                    }}
+                }});
+                versionSeguimiento = cambios.version;
+            }}
+
+            async function consultarPosiciones() {{
+                if (consultaEnCurso) return;
+                consultaEnCurso = true;
+                try {{
+                    const respuesta = await fetch(`${{urlSeguimiento('/posiciones')}}&desde=${{versionSeguimiento}}`, {{ cache: 'no-store' }});
+                    if (respuesta.ok) aplicarCambios(await respuesta.json());
+                }} catch (e) {{
+                    // El servidor puede no estar disponible todavía: se reintenta en el próximo intervalo
+                }} finally {{
+                    consultaEnCurso = false;
+                }}
+            }}
+
+            if (SEGUIMIENTO) {{
+                consultarPosiciones();
+                setInterval(consultarPosiciones, INTERVALO_SEGUIMIENTO_MS);
+            }}
+
+            // --- función de Asignación de Patrulla ---
+            window.asignarPatrulla = function(idPatrulla, tipoRuta) {{
+                console.log(`Asignando ${{idPatrulla}} con ruta ${{tipoRuta}}`);
+                
+                const patrulla = patrullas.find(p => p.id === idPatrulla);
+                if (patrulla) {{
+                    patrulla.status = 'en_ruta';
+                    patrulla.marker.setIcon(L.divIcon({{ 
+                        html: `<div class="patrol-ocupado">${{patrulla.id}}</div>`, 
+                        iconSize: [32, 32], 
+                        className: '' 
+                    }}));
+                    const ruta = rutasActivas[tipoRuta];
+                    if (ruta) informarRuta(patrulla, ruta.path, true, ruta.destino, tipoRuta, decisionDespacho);
+                    decisionDespacho = null;
+                    
+                    if (telemetriaDespacho) {{
+                        const {{ recomendacion_mostrada, ...datos }} = telemetriaDespacho;
+                        enviarTelemetria('despacho', {{
+                            ...datos,
+                            patrulla: patrulla.id,
+                            tipo_ruta: tipoRuta,
+                            decision_ms: recomendacion_mostrada ? performance.now() - recomendacion_mostrada : null
+                        }});
+                        telemetriaDespacho = null;
+                    }}
+                    
+                    const tipoTexto = {{ rapida: 'Rápida ⚡', segura: 'Segura 🛡️', a_tiempo: 'A tiempo ⏱️' }}[tipoRuta] ||
+                        `Alternativa ${{tipoRuta.split('_')[1]}} 🔀`;
+                    const mensaje = `✅ ${{patrulla.id}} despachada<br>📍 Ruta: ${{tipoTexto}}<br>🚀 Estado: En camino`;
+                    
+                    document.getElementById('contenido-recomendaciones').innerHTML = `
+                        <div style="color: #28a745; font-weight: bold; padding: 20px; background: #d4edda; border-radius: 8px; border: 2px solid #c3e6cb; text-align: center;">
+                            ${{mensaje}}
+                        </div>` + sugerirEspera();
+                }}
+            }}
+
+            // --- Hacer función global ---
+            window.asignarPatrulla = asignarPatrulla;
+        </script>
+    </body>
+    </html>
+    """
+    return mapa_html
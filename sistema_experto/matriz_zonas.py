@@ -0,0 +1,206 @@
+"""
+Matriz de tiempos de viaje zona × zona precalculada por nivel de tráfico.
+
+Uso (trabajo por lotes):
+    python -m sistema_experto.matriz_zonas --instantanea instantanea --salida matrices --celda 250 --procesos 8
+
+zonas.json guarda la huella del grafo: una matriz solo se usa con el grafo sobre
+el que se calculó (una descarga nueva puede numerar distinto los mismos nodos).
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .costos import NIVELES_TRAFICO, calcular_costos
+from .ruteo import matriz_costos, uno_a_todos
+
+METADATOS = "zonas.json"
+ZONA_DE_NODO = "zona_de_nodo.npy"
+REPRESENTANTES = "representantes.npy"
+METROS_POR_GRADO = 111320.0
+
+
+def zonas_rejilla(grafo, tam_celda_m=250):
+    """
+    Asigna cada nodo a una celda de una rejilla regular de tam_celda_m metros.
+    Solo se conservan las celdas que contienen nodos.
+    """
+    lat0, lon0 = grafo.lat.min(), grafo.lon.min()
+    dlat = tam_celda_m / METROS_POR_GRADO
+    dlon = tam_celda_m / (METROS_POR_GRADO * np.cos(np.radians(grafo.lat.mean())))
+    ncols = int((grafo.lon.max() - lon0) // dlon) + 1
+
+    filas = ((grafo.lat - lat0) // dlat).astype(np.int64)
+    cols = ((grafo.lon - lon0) // dlon).astype(np.int64)
+    celdas, zona_de_nodo = np.unique(filas * ncols + cols, return_inverse=True)
+
+    rejilla = {"lat0": float(lat0), "lon0": float(lon0), "dlat": float(dlat), "dlon": float(dlon),
+               "ncols": ncols, "celdas": celdas.tolist()}
+    return zona_de_nodo.astype(np.int32), rejilla
+
+
+def representantes_zonas(grafo, zona_de_nodo):
+    """
+    Nodo representativo de cada zona: el más cercano al centroide de sus nodos.
+    Sirve para cualquier zonificación (rejilla, manzanas censales, distritos...).
+    """
+    num_zonas = int(zona_de_nodo.max()) + 1
+    cuenta = np.bincount(zona_de_nodo, minlength=num_zonas)
+    lat_c = np.bincount(zona_de_nodo, weights=grafo.lat, minlength=num_zonas) / cuenta
+    lon_c = np.bincount(zona_de_nodo, weights=grafo.lon, minlength=num_zonas) / cuenta
+
+    distancia = (grafo.lat - lat_c[zona_de_nodo]) ** 2 + (grafo.lon - lon_c[zona_de_nodo]) ** 2
+    orden = np.lexsort((distancia, zona_de_nodo))
+    primero = np.ones(len(orden), dtype=bool)
+    primero[1:] = zona_de_nodo[orden][1:] != zona_de_nodo[orden][:-1]
+    return orden[primero].astype(np.int32)
+
+
+# --- Trabajadores del pool de procesos ---
+_MATRICES = {}
+_REPRESENTANTES = None
+
+
+def _iniciar_trabajador(matrices, representantes):
+    global _MATRICES, _REPRESENTANTES
+    _MATRICES = matrices
+    _REPRESENTANTES = representantes
+
+
+def _calcular_filas(tarea):
+    nivel, inicio, fin = tarea
+    tiempos = uno_a_todos(_MATRICES[nivel], _REPRESENTANTES[inicio:fin])
+    return nivel, inicio, tiempos[:, _REPRESENTANTES].astype(np.float32)
+
+
+def precalcular_matriz(grafo, carpeta, zona_de_nodo, rejilla=None, niveles=NIVELES_TRAFICO,
+                       condicion_clima="despejado", semilla=0, procesos=None, tam_bloque=32):
+    """
+    Construye la matriz zona × zona de tiempos esperados μ para cada nivel de tráfico
+    y la guarda como archivos float32 mapeables en memoria (eta_<nivel>.npy).
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    representantes = representantes_zonas(grafo, zona_de_nodo)
+    num_zonas = len(representantes)
+
+    matrices = {}
+    salidas = {}
+    for nivel in niveles:
+        mu, _ = calcular_costos(grafo, nivel, condicion_clima, semilla)
+        matrices[nivel] = matriz_costos(grafo, mu)
+        salidas[nivel] = np.lib.format.open_memmap(
+            os.path.join(carpeta, f"eta_{nivel}.npy"), mode='w+', dtype=np.float32, shape=(num_zonas, num_zonas)
+        )
+
+    tareas = [(nivel, inicio, min(inicio + tam_bloque, num_zonas))
+              for nivel in niveles for inicio in range(0, num_zonas, tam_bloque)]
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_trabajador,
+                             initargs=(matrices, representantes)) as pool:
+        for nivel, inicio, filas in pool.map(_calcular_filas, tareas):
+            salidas[nivel][inicio:inicio + len(filas)] = filas
+
+    for salida in salidas.values():
+        salida.flush()
+    np.save(os.path.join(carpeta, ZONA_DE_NODO), zona_de_nodo.astype(np.int32))
+    np.save(os.path.join(carpeta, REPRESENTANTES), representantes)
+    with open(os.path.join(carpeta, METADATOS), 'w') as f:
+        json.dump({
+            "num_nodos": grafo.num_nodos,
+            "huella": grafo.huella(),
+            "num_zonas": num_zonas,
+            "niveles": list(niveles),
+            "condicion_clima": condicion_clima,
+            "semilla": semilla,
+            "rejilla": rejilla,
+        }, f)
+
+
+class MatrizTiempos:
+    """
+    Acceso perezoso a las matrices precalculadas: cada nivel se mapea en memoria
+    la primera vez que se consulta, y una ETA es una lectura O(1).
+    """
+
+    def __init__(self, carpeta):
+        self.carpeta = carpeta
+        with open(os.path.join(carpeta, METADATOS)) as f:
+            self.metadatos = json.load(f)
+        self._zona_de_nodo = None
+        self._representantes = None
+        self._matrices = {}
+
+    @property
+    def num_nodos(self):
+        return self.metadatos["num_nodos"]
+
+    def corresponde(self, grafo):
+        """
+        Indica si la matriz se calculó sobre este grafo (misma huella).
+        """
+        return self.num_nodos == grafo.num_nodos and self.metadatos.get("huella") == grafo.huella()
+
+    @property
+    def niveles(self):
+        return self.metadatos["niveles"]
+
+    @property
+    def zona_de_nodo(self):
+        if self._zona_de_nodo is None:
+            self._zona_de_nodo = np.load(os.path.join(self.carpeta, ZONA_DE_NODO), mmap_mode='r')
+        return self._zona_de_nodo
+
+    @property
+    def representantes(self):
+        if self._representantes is None:
+            self._representantes = np.load(os.path.join(self.carpeta, REPRESENTANTES), mmap_mode='r')
+        return self._representantes
+
+    def matriz(self, nivel_trafico):
+        if nivel_trafico not in self._matrices:
+            self._matrices[nivel_trafico] = np.load(
+                os.path.join(self.carpeta, f"eta_{nivel_trafico}.npy"), mmap_mode='r'
+            )
+        return self._matrices[nivel_trafico]
+
+    def eta(self, nivel_trafico, zona_origen, zona_destino):
+        """
+        Tiempo esperado (s) entre dos zonas.
+        """
+        return float(self.matriz(nivel_trafico)[zona_origen, zona_destino])
+
+    def eta_nodos(self, nivel_trafico, nodo_origen, nodo_destino):
+        """
+        Tiempo esperado (s) entre las zonas de dos nodos del grafo.
+        """
+        return self.eta(nivel_trafico, self.zona_de_nodo[nodo_origen], self.zona_de_nodo[nodo_destino])
+
+
+def main(argv=None):
+    from .grafo import GrafoEmpaquetado, construir_grafo, empaquetar_grafo
+
+    parser = argparse.ArgumentParser(description="Precalcula la matriz de tiempos zona × zona")
+    parser.add_argument("--lugar", default="Tacna, Peru")
+    parser.add_argument("--instantanea", help="Instantánea del grafo (python -m sistema_experto snapshot); "
+                                              "sin ella se descarga de OpenStreetMap")
+    parser.add_argument("--salida", default="matrices")
+    parser.add_argument("--celda", type=float, default=250, help="Tamaño de celda de la rejilla en metros")
+    parser.add_argument("--clima", default="despejado", choices=['despejado', 'lluvia', 'neblina'])
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--procesos", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.instantanea:
+        grafo = GrafoEmpaquetado.cargar(args.instantanea, mapear=True)
+    else:
+        grafo = empaquetar_grafo(construir_grafo(args.lugar))
+    zona_de_nodo, rejilla = zonas_rejilla(grafo, args.celda)
+    precalcular_matriz(grafo, args.salida, zona_de_nodo, rejilla, condicion_clima=args.clima,
+                       semilla=args.semilla, procesos=args.procesos)
+    print(f"✅ Matriz guardada en {args.salida}: {zona_de_nodo.max() + 1} zonas × {len(NIVELES_TRAFICO)} niveles")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Posiciones de espera de las patrullas disponibles.
+
+Con la matriz de tiempos zona × zona precalculada y una demanda por nodo se eligen
+las zonas de espera que minimizan el tiempo de llegada ponderado por la demanda
+(p-mediana) o que maximizan la demanda cubierta dentro de un radio (máxima
+cobertura). Se arranca con una solución voraz y se mejora por intercambios. Cada
+candidata es una fila de costos, así que todos los intercambios de una unidad se
+evalúan con un solo producto matricial.
+
+Las unidades ocupadas no cubren, así que el mejor despliegue depende solo de
+cuántas quedan libres: planes_espera() resuelve uno por cada número de unidades y
+el mapa reasigna las libres al plan que corresponde cada vez que despacha una.
+
+Uso:
+    python -m sistema_experto standby --instantanea instantanea --matrices matrices --unidades 10
+"""
+import time
+
+import numpy as np
+
+from .despacho import COSTO_INALCANZABLE, asignar_lote
+
+# El mismo objetivo de llegada del simulador (10 min)
+RADIO_COBERTURA_S = 600
+MAX_INTERCAMBIOS = 100
+# Peso del tiempo como desempate en la máxima cobertura
+DESEMPATE = 1e-6
+# Mejora relativa mínima de un intercambio (los costos se evalúan en float32)
+MEJORA_MINIMA = 1e-5
+
+
+def demanda_zonas(zona_de_nodo, demanda_nodos, num_zonas):
+    """
+    Demanda de cada zona: la suma de la de sus nodos.
+    """
+    return np.bincount(zona_de_nodo, weights=demanda_nodos, minlength=num_zonas)
+
+
+def costos_espera(tiempos, radio_s=None):
+    """
+    Costo de atender cada zona de demanda (columnas) desde cada candidata (filas):
+    el tiempo de viaje (p-mediana) o, con radio_s, 1 si queda fuera del radio
+    (máxima cobertura, con el tiempo como desempate). En float32: la búsqueda local
+    recorre la matriz completa por cada intercambio.
+    """
+    tiempos = np.asarray(tiempos, dtype=np.float32)
+    finitos = np.isfinite(tiempos)
+    if radio_s is None:
+        return np.where(finitos, tiempos, np.float32(COSTO_INALCANZABLE))
+    tope = tiempos[finitos].max() if finitos.any() else np.float32(1.0)
+    return ((~(tiempos <= radio_s)) + DESEMPATE * np.where(finitos, tiempos, tope) / tope).astype(np.float32)
+
+
+def posiciones_espera(costos, demanda, p, fijas=(), max_intercambios=MAX_INTERCAMBIOS):
+    """
+    p filas de costos (zonas de espera) que minimizan Σ demanda × costo de la más
+    cercana, sumadas a las fijas (posiciones que cubren pero no se mueven).
+    Voraz y luego intercambio de mejor mejora (una elegida por una candidata)
+    hasta que ninguno mejore. Retorna (filas elegidas, valor del objetivo).
+    """
+    columnas = np.flatnonzero(np.asarray(demanda) > 0)
+    costos = np.ascontiguousarray(costos[:, columnas])
+    demanda = np.asarray(demanda, dtype=np.float32)[columnas]
+    fijas = list(fijas)
+    p = min(p, costos.shape[0] - len(fijas))
+    cerca = costos[fijas].min(axis=0) if fijas else np.full(len(columnas), np.inf, dtype=np.float32)
+    temporal = np.empty_like(costos)
+
+    def objetivo(filas):
+        return float(costos[filas].min(axis=0).astype(np.float64) @ demanda)
+
+    elegidas = []
+    for _ in range(p):
+        valores = np.minimum(costos, cerca, out=temporal) @ demanda
+        valores[elegidas + fijas] = np.inf
+        elegida = int(np.argmin(valores))
+        elegidas.append(elegida)
+        cerca = np.minimum(cerca, costos[elegida])
+    if p == 0:
+        return [], objetivo(fijas) if fijas else 0.0
+
+    for _ in range(max_intercambios):
+        abiertas = costos[elegidas + fijas]
+        primera = abiertas.argmin(axis=0)
+        d1 = abiertas[primera, np.arange(len(columnas))]
+        if len(abiertas) > 1:
+            d2 = np.partition(abiertas, 1, axis=0)[1]
+        else:
+            d2 = np.full(len(columnas), np.inf, dtype=np.float32)
+        actual = mejor = float(d1 @ demanda)
+        cambio = None
+        for j in range(len(elegidas)):
+            # Sin la elegida j cada zona queda con la primera o la segunda más cercana
+            base = np.where(primera == j, d2, d1)
+            valores = np.minimum(costos, base, out=temporal) @ demanda
+            valores[elegidas + fijas] = np.inf
+            candidata = int(np.argmin(valores))
+            if valores[candidata] < mejor - MEJORA_MINIMA * abs(actual):
+                mejor, cambio = float(valores[candidata]), (j, candidata)
+        if cambio is None:
+            break
+        elegidas[cambio[0]] = cambio[1]
+    return elegidas, objetivo(elegidas + fijas)
+
+
+def evaluar_posiciones(tiempos, demanda, zonas, radio_s=RADIO_COBERTURA_S):
+    """
+    (tiempo medio de llegada ponderado por la demanda, fracción de la demanda
+    dentro de radio_s) desde las zonas dadas. Las zonas inalcanzables no cuentan
+    en el promedio.
+    """
+    demanda = np.asarray(demanda, dtype=np.float64)
+    llegada = np.asarray(tiempos, dtype=np.float64)[list(zonas)].min(axis=0)
+    alcanzables = np.isfinite(llegada)
+    peso = demanda[alcanzables].sum()
+    medio = float(llegada[alcanzables] @ demanda[alcanzables] / peso) if peso > 0 else float('nan')
+    return medio, float(demanda[llegada <= radio_s].sum() / demanda.sum())
+
+
+def planes_espera(matriz_tiempos, nivel_trafico, demanda_nodos, max_unidades, radio_s=None):
+    """
+    Zonas de espera para 0, 1, …, max_unidades unidades libres: planes[p] es la lista
+    de p zonas.
+    """
+    tiempos = matriz_tiempos.matriz(nivel_trafico)
+    demanda = demanda_zonas(np.asarray(matriz_tiempos.zona_de_nodo), demanda_nodos, tiempos.shape[0])
+    costos = costos_espera(tiempos, radio_s)
+    return [posiciones_espera(costos, demanda, p)[0] for p in range(max_unidades + 1)]
+
+
+def reposicionar(matriz_tiempos, nivel_trafico, demanda_nodos, patrullas, radio_s=None):
+    """
+    Posiciones de espera de las patrullas disponibles y qué unidad va a cada una
+    (la asignación que minimiza el tiempo total de traslado). Retorna {'posiciones':
+    [{'id', 'nodo_espera', 'zona_espera', 'eta_s'}], 'tiempo_medio_s', 'cobertura',
+    'tiempo_ms'}; las unidades sin posición alcanzable no aparecen.
+    """
+    inicio = time.perf_counter()
+    disponibles = [p for p in patrullas if p['status'] == 'disponible']
+    tiempos = matriz_tiempos.matriz(nivel_trafico)
+    zona_de_nodo = np.asarray(matriz_tiempos.zona_de_nodo)
+    demanda = demanda_zonas(zona_de_nodo, demanda_nodos, tiempos.shape[0])
+    zonas, _ = posiciones_espera(costos_espera(tiempos, radio_s), demanda, len(disponibles))
+
+    posiciones = []
+    if zonas:
+        zonas_patrullas = zona_de_nodo[[p['nodo_actual'] for p in disponibles]]
+        eta = np.asarray(tiempos[np.ix_(zonas_patrullas, zonas)], dtype=np.float64)
+        for destino, j in enumerate(asignar_lote(eta)):
+            if j >= 0:
+                posiciones.append({
+                    'id': disponibles[j]['id'],
+                    'nodo_espera': int(matriz_tiempos.representantes[zonas[destino]]),
+                    'zona_espera': int(zonas[destino]),
+                    'eta_s': round(float(eta[j, destino]), 1),
+                })
+    medio, cobertura = evaluar_posiciones(tiempos, demanda, zonas, radio_s or RADIO_COBERTURA_S) if zonas else (None, 0.0)
+    return {
+        'posiciones': posiciones,
+        'tiempo_medio_s': round(medio, 1) if medio is not None else None,
+        'cobertura': round(cobertura, 4),
+        'tiempo_ms': round((time.perf_counter() - inicio) * 1000, 1),
+    }
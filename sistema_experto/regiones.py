@@ -0,0 +1,208 @@
+"""
+Registro de regiones (provincias o distritos) servidas desde un mismo proceso.
+
+Cada región es una subcarpeta de la raíz con la instantánea de su grafo
+(python -m sistema_experto snapshot --salida regiones/<nombre> --lugar "...") y,
+opcionalmente, su matriz zona × zona en <nombre>/matrices. Los grafos se cargan
+al pedirlos y quedan en un LRU con un techo de memoria. Una consulta cuyos puntos
+caen en regiones distintas con cajas solapadas se resuelve sobre la fusión de esas
+regiones ('a+b'), que se cachea como una entrada más.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .calentamiento import Calentamiento
+from .grafo import fusionar_grafos, leer_metadatos
+
+# Techo de memoria por defecto de las regiones cargadas
+LIMITE_MB = 1024
+SEPARADOR_FUSION = '+'
+
+
+def descubrir_regiones(raiz):
+    """
+    Regiones con instantánea bajo 'raiz': {nombre: {'nombre', 'lugar', 'carpeta', 'caja', 'nodos', 'arcos'}}.
+    A las instantáneas sin caja en sus metadatos se les calcula leyendo lat/lon mapeados.
+    """
+    regiones = {}
+    if not os.path.isdir(raiz):
+        return regiones
+    for nombre in sorted(os.listdir(raiz)):
+        carpeta = os.path.join(raiz, nombre)
+        try:
+            metadatos = leer_metadatos(carpeta)
+        except (FileNotFoundError, NotADirectoryError, ValueError):
+            continue
+        caja = metadatos.get('caja')
+        if caja is None:
+            lat = np.load(os.path.join(carpeta, "lat.npy"), mmap_mode='r')
+            lon = np.load(os.path.join(carpeta, "lon.npy"), mmap_mode='r')
+            caja = [float(lat.min()), float(lon.min()), float(lat.max()), float(lon.max())]
+        regiones[nombre] = {
+            'nombre': nombre,
+            'lugar': metadatos.get('lugar', nombre),
+            'carpeta': carpeta,
+            'caja': caja,
+            'nodos': metadatos['nodos'],
+            'arcos': metadatos['arcos'],
+        }
+    return regiones
+
+
+def contiene(caja, lat, lon):
+    return caja[0] <= lat <= caja[2] and caja[1] <= lon <= caja[3]
+
+
+def se_solapan(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class RegistroRegiones:
+    """
+    Regiones disponibles y LRU de las cargadas (cada entrada es un Calentamiento).
+    Al superar limite_bytes se desalojan las menos usadas; nunca la más reciente
+    ni las que aún se están cargando.
+    """
+
+    def __init__(self, raiz, limite_bytes=LIMITE_MB * 1024 * 1024, mapa=True):
+        self.raiz = raiz
+        self.limite_bytes = limite_bytes
+        self.mapa = mapa
+        self.regiones = descubrir_regiones(raiz)
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self._cargadas = OrderedDict()
+        self._lock = threading.RLock()
+
+    def regiones_en(self, lat, lon):
+        """
+        Regiones cuya caja contiene el punto.
+        """
+        return [nombre for nombre, region in self.regiones.items() if contiene(region['caja'], lat, lon)]
+
+    def nombre_fusion(self, nombres):
+        """
+        Nombre de la entrada que sirve a varias regiones ('a+b'). Lanza KeyError si
+        alguna no existe y ValueError si sus cajas no forman una cadena solapada.
+        """
+        nombres = sorted(set(nombres))
+        desconocidas = [nombre for nombre in nombres if nombre not in self.regiones]
+        if desconocidas:
+            raise KeyError(f"región desconocida: {', '.join(desconocidas)}")
+        conectadas, pendientes = {nombres[0]}, set(nombres[1:])
+        while pendientes:
+            vecinas = {nombre for nombre in pendientes
+                       if any(se_solapan(self.regiones[nombre]['caja'], self.regiones[otra]['caja'])
+                              for otra in conectadas)}
+            if not vecinas:
+                raise ValueError(f"las regiones {', '.join(nombres)} no se solapan")
+            conectadas |= vecinas
+            pendientes -= vecinas
+        return SEPARADOR_FUSION.join(nombres)
+
+    def nombre_para(self, puntos):
+        """
+        Entrada que cubre todos los puntos (lat, lon): la región más pequeña que los
+        contenga a todos o, si no hay, la fusión de una región por punto.
+        Lanza ValueError si algún punto queda fuera de todas las regiones.
+        """
+        candidatas = []
+        for lat, lon in puntos:
+            nombres = self.regiones_en(lat, lon)
+            if not nombres:
+                raise ValueError(f"el punto ({lat}, {lon}) no está en ninguna región")
+            candidatas.append(nombres)
+
+        comunes = set.intersection(*(set(nombres) for nombres in candidatas))
+        if comunes:
+            return min(comunes, key=lambda nombre: self.regiones[nombre]['nodos'])
+        elegidas = set()
+        for nombres in candidatas:
+            if not elegidas.intersection(nombres):
+                elegidas.add(min(nombres, key=lambda nombre: self.regiones[nombre]['nodos']))
+        return self.nombre_fusion(elegidas)
+
+    def calentamiento(self, nombre):
+        """
+        Precarga de una región o fusión, lanzándola en segundo plano si no está en memoria.
+        """
+        with self._lock:
+            entrada = self._cargadas.get(nombre)
+            if entrada is None:
+                self.fallos += 1
+                entrada = self._crear(nombre).iniciar()
+                self._cargadas[nombre] = entrada
+            else:
+                self.aciertos += 1
+            self._cargadas.move_to_end(nombre)
+            self._recortar()
+            return entrada
+
+    def _crear(self, nombre):
+        partes = nombre.split(SEPARADOR_FUSION)
+        if len(partes) > 1:
+            self.nombre_fusion(partes)
+            return Calentamiento(None, nombre, mapa=self.mapa,
+                                 fuente=lambda: fusionar_grafos([self.obtener(parte) for parte in partes]))
+        if nombre not in self.regiones:
+            raise KeyError(f"región desconocida: {nombre}")
+        region = self.regiones[nombre]
+        return Calentamiento(region['carpeta'], region['lugar'], os.path.join(region['carpeta'], "matrices"),
+                             mapa=self.mapa)
+
+    def obtener(self, nombre):
+        """
+        Grafo de una región o fusión, esperando a que termine de cargarse.
+        """
+        calentamiento = self.calentamiento(nombre)
+        if not calentamiento.esperar():
+            self.descartar(nombre)
+            raise RuntimeError(f"no se pudo cargar {nombre}: {calentamiento.error}")
+        with self._lock:
+            self._recortar()
+        return calentamiento.grafo
+
+    def grafo_para(self, puntos):
+        """
+        (grafo, nombre) de la región o fusión que cubre todos los puntos.
+        """
+        nombre = self.nombre_para(puntos)
+        return self.obtener(nombre), nombre
+
+    def descartar(self, nombre):
+        """
+        Saca una entrada del LRU (p. ej. tras un error, para reintentar la carga).
+        """
+        with self._lock:
+            self._cargadas.pop(nombre, None)
+
+    def uso_bytes(self):
+        with self._lock:
+            return sum(entrada.bytes_memoria() for entrada in self._cargadas.values())
+
+    def _recortar(self):
+        for nombre in list(self._cargadas)[:-1]:
+            if self.uso_bytes() <= self.limite_bytes:
+                break
+            if self._cargadas[nombre].terminado:
+                del self._cargadas[nombre]
+                self.desalojos += 1
+
+    def estado(self):
+        """
+        Resumen para la interfaz: uso y techo de memoria, contadores y entradas cargadas (más reciente al final).
+        """
+        with self._lock:
+            return {
+                'limite_bytes': self.limite_bytes,
+                'uso_bytes': self.uso_bytes(),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'cargadas': [{'nombre': nombre, 'bytes': entrada.bytes_memoria(), 'listo': entrada.listo}
+                             for nombre, entrada in self._cargadas.items()],
+            }
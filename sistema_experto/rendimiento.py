@@ -0,0 +1,179 @@
+"""
+Medición ligera por etapa (tiempo de pared, bytes producidos y número de objetos)
+con exportación en formato de texto de Prometheus, a archivo o por HTTP.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+PREFIJO_METRICAS = "sistema_experto"
+CUANTILES = (0.5, 0.95)
+
+
+class MedicionEtapa:
+    """
+    Una ejecución de una etapa. 'bytes' y 'objetos' los completa quien la mide.
+    """
+
+    def __init__(self, registro, nombre):
+        self.registro = registro
+        self.nombre = nombre
+        self.inicio = time.perf_counter()
+        self.segundos = None
+        self.bytes = None
+        self.objetos = None
+
+    def terminar(self, bytes=None, objetos=None):
+        self.segundos = time.perf_counter() - self.inicio
+        if bytes is not None:
+            self.bytes = bytes
+        if objetos is not None:
+            self.objetos = objetos
+        self.registro.registrar(self)
+        return self
+
+
+class RegistroRendimiento:
+    """
+    Mediciones de la última ejecución del script y un historial acotado por
+    etapa (para cuantiles). Compartido entre sesiones: protegido con un lock.
+    """
+
+    def __init__(self, historial=200):
+        self._lock = threading.Lock()
+        self._historial = historial
+        self.ejecuciones = 0
+        self.ultima = {}
+        self._recientes = {}
+        self._totales = {}
+
+    def nueva_ejecucion(self):
+        """
+        Empieza una ejecución del script. Retorna la medición 'ejecucion_total' (cerrar con .terminar()).
+        """
+        with self._lock:
+            self.ejecuciones += 1
+            self.ultima = {}
+        return self.iniciar('ejecucion_total')
+
+    def iniciar(self, nombre):
+        """
+        Abre una medición para etapas que no caben en un bloque 'with'; se cierra con .terminar().
+        """
+        return MedicionEtapa(self, nombre)
+
+    @contextmanager
+    def etapa(self, nombre):
+        medicion = self.iniciar(nombre)
+        try:
+            yield medicion
+        finally:
+            medicion.terminar()
+
+    def registrar(self, medicion):
+        with self._lock:
+            self.ultima[medicion.nombre] = medicion
+            self._recientes.setdefault(medicion.nombre, deque(maxlen=self._historial)).append(medicion.segundos)
+            total = self._totales.setdefault(medicion.nombre, {'segundos': 0.0, 'cuenta': 0, 'bytes': 0})
+            total['segundos'] += medicion.segundos
+            total['cuenta'] += 1
+            total['bytes'] += medicion.bytes or 0
+
+    def resumen(self):
+        """
+        Filas por etapa de la última ejecución: ms, p50/p95 del historial, bytes y objetos.
+        """
+        with self._lock:
+            filas = []
+            for nombre, medicion in self.ultima.items():
+                recientes = np.asarray(self._recientes[nombre]) * 1000
+                filas.append({
+                    'etapa': nombre,
+                    'ms': round(medicion.segundos * 1000, 1),
+                    'p50_ms': round(float(np.percentile(recientes, 50)), 1),
+                    'p95_ms': round(float(np.percentile(recientes, 95)), 1),
+                    'bytes': medicion.bytes,
+                    'objetos': medicion.objetos,
+                    'ejecuciones': self._totales[nombre]['cuenta'],
+                })
+            return filas
+
+    def prometheus(self):
+        """
+        Métricas en formato de exposición de texto de Prometheus.
+        """
+        p = PREFIJO_METRICAS
+        lineas = [
+            f"# HELP {p}_ejecuciones_total Ejecuciones del script de Streamlit.",
+            f"# TYPE {p}_ejecuciones_total counter",
+            f"{p}_ejecuciones_total {self.ejecuciones}",
+            f"# HELP {p}_etapa_duracion_segundos Duración de cada etapa (cuantiles sobre las últimas ejecuciones).",
+            f"# TYPE {p}_etapa_duracion_segundos summary",
+        ]
+        with self._lock:
+            for nombre, total in sorted(self._totales.items()):
+                etiqueta = _etiqueta(nombre)
+                recientes = np.asarray(self._recientes[nombre])
+                for q in CUANTILES:
+                    lineas.append(f'{p}_etapa_duracion_segundos{{etapa="{etiqueta}",quantile="{q}"}} '
+                                  f'{float(np.quantile(recientes, q)):.6f}')
+                lineas.append(f'{p}_etapa_duracion_segundos_sum{{etapa="{etiqueta}"}} {total["segundos"]:.6f}')
+                lineas.append(f'{p}_etapa_duracion_segundos_count{{etapa="{etiqueta}"}} {total["cuenta"]}')
+
+            for metrica, ayuda, atributo in (("etapa_bytes", "Bytes producidos en la última ejecución de la etapa.", 'bytes'),
+                                             ("etapa_objetos", "Objetos producidos en la última ejecución de la etapa.", 'objetos')):
+                lineas.append(f"# HELP {p}_{metrica} {ayuda}")
+                lineas.append(f"# TYPE {p}_{metrica} gauge")
+                for nombre, medicion in sorted(self.ultima.items()):
+                    valor = getattr(medicion, atributo)
+                    if valor is not None:
+                        lineas.append(f'{p}_{metrica}{{etapa="{_etiqueta(nombre)}"}} {valor}')
+
+            lineas.append(f"# HELP {p}_etapa_bytes_total Bytes producidos por la etapa desde el arranque.")
+            lineas.append(f"# TYPE {p}_etapa_bytes_total counter")
+            for nombre, total in sorted(self._totales.items()):
+                if total['bytes']:
+                    lineas.append(f'{p}_etapa_bytes_total{{etapa="{_etiqueta(nombre)}"}} {total["bytes"]}')
+        return "\n".join(lineas) + "\n"
+
+    def exportar(self, ruta):
+        """
+        Escribe las métricas de forma atómica (apto para el textfile collector de node_exporter).
+        """
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus())
+        os.replace(temporal, ruta)
+
+
+def _etiqueta(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def iniciar_servidor_metricas(registro, puerto, host="127.0.0.1"):
+    """
+    Sirve GET /metrics en un hilo de fondo. Retorna el servidor (server.shutdown() lo detiene).
+    """
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            cuerpo = registro.prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, puerto), Manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True, name="metricas-prometheus").start()
+    return servidor
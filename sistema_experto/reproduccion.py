@@ -0,0 +1,366 @@
+"""
+Reproducción de una bitácora de despacho (sistema_experto.bitacora) con el motor
+actual, a máxima velocidad y sin reloj. Cada decisión registrada se vuelve a tomar
+con sus mismas entradas (las patrullas candidatas en sus nodos, el incidente, el
+nivel de tráfico, el clima, la semilla de los factores de zona, k, el percentil y
+los cierres) y se compara con lo que se decidió entonces:
+
+- despacho individual: ranking por ETA en el percentil (despacho.eta_percentil) de
+  las patrullas que evaluó la consola (las que pasaron su preselección por zonas),
+  patrulla elegida y ruta del tipo registrado desde la patrulla hasta el incidente;
+- lote: asignación óptima del lote completo (despacho.despachar_lote).
+
+Los traslados a posiciones de espera y los cambios de estado solo se cuentan, y las
+decisiones sin semilla en el perfil (de mapas que sorteaban los factores de zona al
+azar) quedan como incompletas: no hay forma de saber con qué costos se tomaron. El
+recorrido es determinista: dos reproducciones con el mismo motor dan la misma huella.
+
+Uso:
+    python -m sistema_experto replay --bitacora bitacora --instantanea instantanea
+    python -m sistema_experto replay --bitacora bitacora --regiones regiones --percentil 80 --decisiones nuevas.jsonl
+"""
+import argparse
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .costos import calcular_costos, costo_seguro
+from .despacho import PERCENTIL_ETA, despachar_lote, eta_percentil
+from .ruteo import a_estrella, matriz_costos
+
+# Tipos de diferencia entre la decisión registrada y la reproducida
+DIFERENCIAS = ('patrulla', 'orden', 'eta', 'ruta')
+# Diferencia de ETA o de costo de ruta (s) que cuenta como cambio de decisión: entre
+# patrullas o rutas empatadas dentro de ella, elegir otra no es una diferencia
+TOLERANCIA_S = 1.0
+# Perfiles de costo (región, nivel, clima, semilla, cierres) que se conservan armados
+MAX_PERFILES = 8
+MAX_EJEMPLOS = 20
+
+
+class Motor:
+    """
+    Motor de ruteo y despacho que reproduce las decisiones. Arma los costos de cada
+    perfil una sola vez (μ, σ, costo seguro y la matriz de μ); percentil y k, si se
+    dan, reemplazan a los registrados (para medir el efecto de cambiarlos).
+    """
+
+    def __init__(self, grafo_de, percentil=None, k=None):
+        self.grafo_de = grafo_de
+        self.percentil = percentil
+        self.k = k
+        self._grafos = {}
+        self._perfiles = OrderedDict()
+
+    def grafo(self, region):
+        if region not in self._grafos:
+            self._grafos[region] = self.grafo_de(region)
+        return self._grafos[region]
+
+    def costos(self, region, perfil):
+        from .cierres import CierresViales
+
+        cierres = tuple(sorted((min(u, v), max(u, v)) for u, v in perfil.get('cierres') or []))
+        clave = (region, perfil['nivel'], perfil['clima'], int(perfil['semilla']), cierres)
+        if clave in self._perfiles:
+            self._perfiles.move_to_end(clave)
+            return self._perfiles[clave]
+        grafo = self.grafo(region)
+        mu, sigma = calcular_costos(grafo, perfil['nivel'], perfil['clima'], int(perfil['semilla']))
+        # Las calles cerradas desde el mapa tienen costo infinito (en una copia)
+        mu = np.array(mu, dtype=np.float64)
+        CierresViales(grafo, {'mu': mu}).cargar_json(cierres)
+        costos = {'grafo': grafo, 'mu': mu, 'sigma': sigma, 'matrices': matriz_costos(grafo, mu, con_arcos=True)}
+        self._perfiles[clave] = costos
+        if len(self._perfiles) > MAX_PERFILES:
+            self._perfiles.popitem(last=False)
+        return costos
+
+    def ruta(self, costos, tipo, origen, destino, perfil):
+        """
+        Ruta (nodos) del tipo registrado, o None si no hay o el tipo no se reproduce.
+        """
+        grafo, mu, sigma = costos['grafo'], costos['mu'], costos['sigma']
+        k = self.k if self.k is not None else perfil.get('k', 1.5)
+        if tipo in (None, 'rapida'):
+            resultado = a_estrella(grafo, origen, destino, mu)
+        elif tipo == 'segura':
+            resultado = a_estrella(grafo, origen, destino, costo_seguro(mu, sigma, k))
+        elif tipo == 'a_tiempo':
+            from .fiabilidad import ruta_a_tiempo
+
+            previas = [a_estrella(grafo, origen, destino, pesos) for pesos in (mu, costo_seguro(mu, sigma, k))]
+            resultado = ruta_a_tiempo(grafo, origen, destino, mu, sigma, perfil['plazo_s'],
+                                      [r['arcos'] for r in previas if r is not None])
+        elif tipo.startswith('alternativa_'):
+            from .alternativas import rutas_alternativas
+
+            n = int(tipo.split('_')[1])
+            alternativas = rutas_alternativas(grafo, origen, destino, mu, n)
+            resultado = alternativas[n - 1] if len(alternativas) >= n else None
+        else:
+            return None
+        return None if resultado is None else [int(nodo) for nodo in resultado['ruta']]
+
+
+def costo_ruta(matriz, ruta):
+    """
+    Σμ de una ruta (nodos) con el menor arco entre nodos consecutivos; inf si algún
+    tramo ya no existe (p. ej. por un cierre).
+    """
+    ruta = np.asarray(ruta)
+    if len(ruta) < 2:
+        return 0.0
+    tramos = np.asarray(matriz[ruta[:-1], ruta[1:]]).ravel()
+    return float(tramos.sum()) if (tramos > 0).all() else np.inf
+
+
+def _eta_de(ranking, patrulla):
+    for fila in ranking or []:
+        if fila[0] == patrulla:
+            return fila[1]
+    return None
+
+
+def _distinta(a, b, tolerancia_s):
+    if a is None or b is None:
+        return False
+    if not (np.isfinite(a) and np.isfinite(b)):
+        return np.isfinite(a) != np.isfinite(b)
+    return abs(a - b) > tolerancia_s
+
+
+def _validar(decision, num_nodos, nodos):
+    candidatas = decision.get('candidatas')
+    if not candidatas or not decision.get('perfil'):
+        raise ValueError("decisión sin candidatas o sin perfil")
+    if decision['perfil'].get('semilla') is None:
+        raise ValueError("decisión sin la semilla de los costos")
+    if any(not 0 <= int(n) < num_nodos for _, n in candidatas) or any(not 0 <= int(n) < num_nodos for n in nodos):
+        raise ValueError("nodos fuera del grafo")
+    return [c[0] for c in candidatas], np.array([int(c[1]) for c in candidatas], dtype=np.int64)
+
+
+def reproducir_individual(motor, evento, tolerancia_s=TOLERANCIA_S):
+    """
+    Vuelve a tomar un despacho individual. Retorna {'patrulla', 'ranking',
+    'eta', 'ruta', 'diferencias'} con la decisión reproducida.
+    """
+    decision, incidente = evento['decision'], evento['incidente']
+    grafo = motor.grafo(evento['region'])
+    ids, nodos = _validar(decision, grafo.num_nodos, [incidente['nodo']] + evento['ruta'])
+    if decision.get('evaluadas') is not None:
+        # Solo las que pasaron la preselección de la consola entraron a su ranking
+        evaluadas = set(decision['evaluadas'])
+        indices = [j for j, id_patrulla in enumerate(ids) if id_patrulla in evaluadas]
+        if not indices:
+            raise ValueError("ninguna patrulla evaluada está entre las candidatas")
+        ids, nodos = [ids[j] for j in indices], nodos[indices]
+    perfil = decision['perfil']
+    costos = motor.costos(evento['region'], perfil)
+    percentil = motor.percentil or perfil.get('percentil') or PERCENTIL_ETA
+    eta, _, _ = eta_percentil(grafo, costos['mu'], costos['sigma'], nodos, int(incidente['nodo']), percentil,
+                              matrices=costos['matrices'])
+    orden = [int(j) for j in np.argsort(eta, kind='stable') if np.isfinite(eta[j])]
+    ranking = [[ids[j], round(float(eta[j]), 1)] for j in orden]
+
+    diferencias = []
+    nuevas = dict(ranking)
+    elegida = ranking[0][0] if ranking else None
+    eta_nueva = nuevas.get(evento['patrulla'], np.inf)
+    if elegida != evento['patrulla'] and (elegida is None or eta_nueva > ranking[0][1] + tolerancia_s):
+        diferencias.append('patrulla')
+    # El orden registrado (de las que evaluó la consola) contradice al nuevo
+    registrado = [nuevas.get(fila[0], np.inf) for fila in decision.get('ranking') or []]
+    if any(a > b + tolerancia_s for a, b in zip(registrado, registrado[1:])):
+        diferencias.append('orden')
+    if _distinta(_eta_de(decision.get('ranking'), evento['patrulla']), eta_nueva, tolerancia_s):
+        diferencias.append('eta')
+
+    ruta = motor.ruta(costos, evento.get('tipo_ruta'), int(evento['ruta'][0]), int(evento['ruta'][-1]), perfil)
+    if ruta is not None and ruta != evento['ruta']:
+        # Otra ruta del mismo costo (un empate) no es un cambio de decisión
+        matriz = costos['matrices'][0]
+        if _distinta(costo_ruta(matriz, evento['ruta']), costo_ruta(matriz, ruta), tolerancia_s):
+            diferencias.append('ruta')
+    return {'patrulla': elegida, 'ranking': ranking, 'eta': round(float(eta_nueva), 1), 'ruta': ruta,
+            'diferencias': diferencias}
+
+
+def reproducir_lote(motor, eventos, tolerancia_s=TOLERANCIA_S):
+    """
+    Vuelve a asignar un lote completo con las candidatas y los incidentes que vio la
+    consola. Retorna {'asignacion': [patrulla o None por incidente], 'eta', 'diferencias'}.
+    """
+    decision, region = eventos[0]['decision'], eventos[0]['region']
+    grafo = motor.grafo(region)
+    incidentes = [int(n) for n in decision['incidentes']]
+    ids, nodos = _validar(decision, grafo.num_nodos, incidentes)
+    costos = motor.costos(region, decision['perfil'])
+    patrullas = [{'id': u, 'nodo_actual': int(n), 'status': 'disponible'} for u, n in zip(ids, nodos)]
+    resultado = despachar_lote(grafo, costos['mu'], patrullas, incidentes, costos['matrices'][0])
+
+    diferencias = set()
+    for evento in eventos:
+        nuevo = resultado[evento['decision']['indice']]
+        if nuevo['patrulla'] != evento['patrulla']:
+            diferencias.add('patrulla')
+        elif _distinta(_eta_de(evento['decision'].get('ranking'), evento['patrulla']),
+                     np.inf if nuevo['eta'] is None else nuevo['eta'], tolerancia_s):
+            diferencias.add('eta')
+    return {'asignacion': [r['patrulla'] for r in resultado],
+            'eta': [None if r['eta'] is None else round(r['eta'], 1) for r in resultado],
+            'diferencias': [d for d in DIFERENCIAS if d in diferencias]}
+
+
+def reproducir(eventos, motor, tolerancia_s=TOLERANCIA_S, salida=None):
+    """
+    Reproduce las decisiones de los eventos (en orden) y retorna el resumen: conteos,
+    decisiones por segundo, latencia por decisión, diferencias por tipo, ejemplos y
+    la huella (SHA-256 de las decisiones reproducidas). salida, si se da, recibe
+    cada decisión reproducida como un diccionario.
+    """
+    conteos = {'eventos': 0, 'estados': 0, 'traslados': 0, 'incompletas': 0}
+    diferencias = {d: 0 for d in DIFERENCIAS}
+    latencias, ejemplos, lotes = [], [], OrderedDict()
+    con_diferencias = 0
+    huella = hashlib.sha256()
+
+    def anotar(registro):
+        nonlocal con_diferencias
+        latencias.append(registro['ms'])
+        con_diferencias += bool(registro['diferencias'])
+        for d in registro['diferencias']:
+            diferencias[d] += 1
+        if registro['diferencias'] and len(ejemplos) < MAX_EJEMPLOS:
+            ejemplos.append(registro)
+        sin_tiempo = {clave: valor for clave, valor in registro.items() if clave != 'ms'}
+        huella.update(json.dumps(sin_tiempo, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+        if salida is not None:
+            salida(registro)
+
+    def decidir(funcion, entrada):
+        # Los costos del perfil se arman fuera de la medición de latencia
+        evento = entrada[0] if isinstance(entrada, list) else entrada
+        motor.costos(evento['region'], evento['decision']['perfil'])
+        inicio = time.perf_counter()
+        resultado = funcion(motor, entrada, tolerancia_s)
+        resultado['ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+        return resultado
+
+    inicio = time.perf_counter()
+    for evento in eventos:
+        conteos['eventos'] += 1
+        if evento['tipo'] == 'estado':
+            conteos['estados'] += 1
+        if evento['tipo'] != 'despacho':
+            continue
+        if evento.get('incidente') is None:
+            conteos['traslados'] += 1
+            continue
+        decision = evento.get('decision') or {}
+        try:
+            if decision.get('lote') is not None:
+                _validar(decision, motor.grafo(evento['region']).num_nodos, decision.get('incidentes') or [])
+                lotes.setdefault((evento['region'], decision['lote']), []).append(evento)
+                continue
+            resultado = decidir(reproducir_individual, evento)
+        except (KeyError, TypeError, ValueError):
+            conteos['incompletas'] += 1
+            continue
+        anotar({'t': evento['t'], 'region': evento['region'], 'incidente': evento['incidente'].get('nodo'),
+                'tipo_ruta': evento.get('tipo_ruta'), 'registrada': evento['patrulla'], **resultado})
+
+    # Un lote se reproduce completo, con todas las asignaciones que se registraron de él
+    for (region, lote), grupo in lotes.items():
+        try:
+            resultado = decidir(reproducir_lote, grupo)
+        except (KeyError, TypeError, ValueError, IndexError):
+            conteos['incompletas'] += len(grupo)
+            continue
+        anotar({'t': grupo[0]['t'], 'region': region, 'lote': lote,
+                'registrada': {str(e['decision']['indice']): e['patrulla'] for e in grupo}, **resultado})
+    segundos = time.perf_counter() - inicio
+
+    decisiones = len(latencias)
+    return {
+        **conteos,
+        'decisiones': decisiones,
+        'lotes': len(lotes),
+        'segundos': round(segundos, 3),
+        'decisiones_por_s': round(decisiones / segundos, 1) if segundos > 0 else None,
+        'latencia_p50_ms': round(float(np.percentile(latencias, 50)), 2) if latencias else None,
+        'latencia_p95_ms': round(float(np.percentile(latencias, 95)), 2) if latencias else None,
+        'latencia_max_ms': round(max(latencias), 2) if latencias else None,
+        'diferencias': diferencias,
+        'con_diferencias': con_diferencias,
+        'huella': huella.hexdigest(),
+        'ejemplos': ejemplos,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sistema_experto replay", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bitacora", default="bitacora", help="Carpeta de la bitácora de despacho")
+    parser.add_argument("--instantanea", help="Grafo de las decisiones (o de las regiones que no estén en --regiones)")
+    parser.add_argument("--regiones", help="Raíz del registro de regiones: cada decisión usa el grafo de su región")
+    parser.add_argument("--percentil", type=float, default=None, help="Reemplaza el percentil de ETA registrado")
+    parser.add_argument("--k", type=float, default=None, help="Reemplaza la aversión al riesgo registrada")
+    parser.add_argument("--tolerancia-s", type=float, default=TOLERANCIA_S,
+                        help="Diferencia de ETA o de costo de ruta que cuenta como cambio")
+    parser.add_argument("--decisiones", help="JSONL con cada decisión reproducida (para comparar dos motores)")
+    parser.add_argument("--salida", help="JSON con el resumen")
+    args = parser.parse_args(argv)
+    if not args.instantanea and not args.regiones:
+        parser.error("se necesita --instantanea o --regiones")
+
+    from .bitacora import leer_bitacora
+    from .grafo import GrafoEmpaquetado
+
+    registro = None
+    if args.regiones:
+        from .regiones import SEPARADOR_FUSION, RegistroRegiones
+
+        registro = RegistroRegiones(args.regiones, mapa=False)
+    instantanea = GrafoEmpaquetado.cargar(args.instantanea, mapear=True) if args.instantanea else None
+
+    def grafo_de(region):
+        if registro is not None and region and all(parte in registro.regiones for parte in region.split(SEPARADOR_FUSION)):
+            return registro.obtener(region)
+        if instantanea is None:
+            raise ValueError(f"la región {region} no está en el registro y no se dio --instantanea")
+        return instantanea
+
+    archivo = open(args.decisiones, 'w', encoding='utf-8') if args.decisiones else None
+    try:
+        escribir = None
+        if archivo is not None:
+            def escribir(registro_decision):
+                archivo.write(json.dumps(registro_decision, ensure_ascii=False, separators=(',', ':')) + '\n')
+        resumen = reproducir(leer_bitacora(args.bitacora), Motor(grafo_de, args.percentil, args.k),
+                             args.tolerancia_s, escribir)
+    finally:
+        if archivo is not None:
+            archivo.close()
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resumen, f, ensure_ascii=False, indent=1)
+    print(f"{resumen['eventos']} eventos: {resumen['decisiones']} decisiones ({resumen['lotes']} lotes), "
+          f"{resumen['traslados']} traslados, {resumen['estados']} cambios de estado, "
+          f"{resumen['incompletas']} sin datos para reproducir")
+    if resumen['decisiones']:
+        print(f"⚡ {resumen['decisiones_por_s']:.0f} decisiones/s; latencia p50 {resumen['latencia_p50_ms']:.1f} ms, "
+              f"p95 {resumen['latencia_p95_ms']:.1f} ms, máx. {resumen['latencia_max_ms']:.1f} ms")
+    cambios = ', '.join(f"{d} {n}" for d, n in resumen['diferencias'].items() if n)
+    print(f"{'⚠️ Diferencias: ' + cambios if cambios else '✅ Sin diferencias con lo registrado'}")
+    print(f"Huella: {resumen['huella']}")
+    return resumen
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import heapq
+import time
+
+import numpy as np
+
+# Costo mínimo de un arco: csgraph ignora los pesos cero en matrices dispersas
+COSTO_MINIMO = 1e-6
+
+# Heurística admisible del proyecto: h(n) = distancia geodésica / velocidad máxima global
+VELOCIDAD_MAX_MS = 20  # 20 m/s = 72 km/h
+RADIO_TIERRA_M = 6371000
+
+
+def matriz_costos(grafo, pesos, con_arcos=False):
+    """
+    Matriz dispersa n×n con el menor costo entre arcos paralelos u→v.
+    Con con_arcos=True retorna además la matriz con el índice + 1 del arco elegido.
+    """
+    # SciPy solo se importa en las búsquedas uno-a-todos; A* usa solo NumPy
+    from scipy.sparse import csr_matrix
+
+    pesos = np.maximum(np.asarray(pesos, dtype=np.float64), COSTO_MINIMO)
+    finitos = np.flatnonzero(np.isfinite(pesos))
+    origen, destino, pesos = grafo.origen[finitos], grafo.destino[finitos], pesos[finitos]
+
+    # Ordenar por (u, v, costo) y quedarse con el primero de cada par
+    orden = np.lexsort((pesos, destino, origen))
+    origen, destino, pesos = origen[orden], destino[orden], pesos[orden]
+    primero = np.ones(len(origen), dtype=bool)
+    primero[1:] = (origen[1:] != origen[:-1]) | (destino[1:] != destino[:-1])
+
+    n = grafo.num_nodos
+    matriz = csr_matrix((pesos[primero], (origen[primero], destino[primero])), shape=(n, n))
+    if not con_arcos:
+        return matriz
+    arcos = finitos[orden][primero] + 1.0
+    return matriz, csr_matrix((arcos, (origen[primero], destino[primero])), shape=(n, n))
+
+
+def uno_a_todos(matriz, origenes, limite=np.inf, inverso=False):
+    """
+    Tiempos mínimos desde cada origen a todos los nodos (Dijkstra).
+    Con inverso=True calcula los tiempos de todos los nodos hacia cada origen.
+    """
+    from scipy.sparse.csgraph import dijkstra
+
+    if inverso:
+        matriz = matriz.T.tocsr()
+    return dijkstra(matriz, directed=True, indices=origenes, limit=limite)
+
+
+def heuristica(grafo, destino, velocidad_max=VELOCIDAD_MAX_MS):
+    """
+    Cota inferior del tiempo (s) desde cada nodo hasta el destino (haversine).
+    """
+    lat1 = np.radians(grafo.lat)
+    lat2 = np.radians(grafo.lat[destino])
+    delta_lon = np.radians(grafo.lon[destino] - grafo.lon)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(delta_lon / 2) ** 2
+    return 2 * RADIO_TIERRA_M * np.arcsin(np.sqrt(a)) / velocidad_max
+
+
+def reconstruir_ruta(arco_previo, origenes, destino):
+    """
+    Recorre los arcos previos desde el destino. Retorna (nodos, arcos) de la ruta.
+    """
+    ruta = [destino]
+    arcos = []
+    e = arco_previo[destino]
+    while e >= 0:
+        arcos.append(e)
+        ruta.append(origenes[e])
+        e = arco_previo[ruta[-1]]
+    ruta.reverse()
+    arcos.reverse()
+    return ruta, arcos
+
+
+def a_estrella(grafo, origen, destino, pesos):
+    """
+    A* estático sobre el grafo empaquetado con un costo fijo por arco.
+    Retorna {'ruta', 'arcos', 'costo', 'nodos_explorados', 'tiempo_ms'} o None.
+    """
+    inicio = time.perf_counter()
+    indptr, origenes, vecinos = grafo.listas_adyacencia()
+    pesos = pesos.tolist() if isinstance(pesos, np.ndarray) else pesos
+    h = heuristica(grafo, destino).tolist()
+
+    g = {origen: 0.0}
+    arco_previo = {origen: -1}
+    cerrados = set()
+    abiertos = [(h[origen], origen)]
+    while abiertos:
+        _, u = heapq.heappop(abiertos)
+        if u in cerrados:
+            continue
+        cerrados.add(u)
+        if u == destino:
+            ruta, arcos = reconstruir_ruta(arco_previo, origenes, destino)
+            return {
+                'ruta': ruta,
+                'arcos': arcos,
+                'costo': g[destino],
+                'nodos_explorados': len(cerrados),
+                'tiempo_ms': (time.perf_counter() - inicio) * 1000,
+            }
+        gu = g[u]
+        for e in range(indptr[u], indptr[u + 1]):
+            v = vecinos[e]
+            tentativo = gu + pesos[e]
+            if tentativo < g.get(v, np.inf):
+                g[v] = tentativo
+                arco_previo[v] = e
+                heapq.heappush(abiertos, (tentativo + h[v], v))
+    return None
+
+
+def resumen_ruta(grafo, resultado, mu, sigma):
+    """
+    Tiempo esperado, desviación (arcos independientes), distancia y recorrido de una ruta.
+    """
+    if resultado is None:
+        return None
+    arcos = np.asarray(resultado['arcos'], dtype=np.int64)
+    tiempo = float(mu[arcos].sum())
+    distancia = float(grafo.longitud[arcos].sum())
+    return {
+        'tiempo_esperado_s': round(tiempo, 1),
+        'desviacion_s': round(float(np.sqrt(np.sum(sigma[arcos] ** 2))), 1),
+        'distancia_m': round(distancia, 1),
+        'velocidad_promedio_kmh': round(distancia / tiempo * 3.6, 1) if tiempo > 0 else 0.0,
+        'nodos_explorados': resultado['nodos_explorados'],
+        'tiempo_ms': round(resultado['tiempo_ms'], 2),
+        'ruta': [[float(grafo.lat[n]), float(grafo.lon[n])] for n in resultado['ruta']],
+    }
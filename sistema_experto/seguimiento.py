@@ -0,0 +1,592 @@
+"""
+Seguimiento en vivo de las patrullas despachadas.
+
+La flota es un estado compartido por todas las sesiones del proceso. Cada unidad
+despachada avanza por su ruta con el reloj (o según las posiciones que envía un
+GPS) y vuelve a 'disponible' al llegar. Cada cambio lleva un número de versión: el
+mapa pide solo lo que cambió desde su última consulta (GET /posiciones?desde=N) y
+mueve esos marcadores, sin reconstruir la página.
+
+El servidor responde a cualquier origen (el mapa vive en un iframe), así que cada
+solicitud debe traer el token del servidor (?token=…), que la app inserta en el HTML
+del mapa: otra página abierta en el navegador no puede despachar, liberar ni enviar
+posiciones GPS.
+
+El avance es vectorizado: las rutas en curso se empaquetan en un solo arreglo
+ordenado por (unidad, tiempo) y una búsqueda binaria ubica a todas las unidades a
+la vez, así que un paso con cientos de unidades en ruta cuesta milisegundos.
+"""
+import hmac
+import json
+import logging
+import secrets
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from .ruteo import matriz_costos
+
+ESTADOS = ('disponible', 'en_ruta')
+INTERVALO_S = 1.0
+# Decimales de lat/lon en los cambios (~0,1 m): un desplazamiento menor no es un cambio
+DECIMALES = 6
+# Una unidad seguida por GPS llega cuando reporta a menos de esta distancia del destino
+RADIO_LLEGADA_M = 30
+MAX_BYTES_SOLICITUD = 1024 * 1024
+METROS_POR_GRADO = 111320.0
+
+
+def tiempos_ruta(grafo, ruta, pesos):
+    """
+    Tiempo acumulado en cada nodo de la ruta, con el menor peso entre arcos paralelos.
+    Lanza ValueError si dos nodos consecutivos no están unidos por un arco.
+    """
+    if len(ruta) < 2:
+        return np.zeros(len(ruta))
+    matriz = matriz_costos(grafo, pesos)
+    tramos = np.asarray(matriz[ruta[:-1], ruta[1:]]).ravel()
+    if (tramos <= 0).any():
+        raise ValueError("la ruta tiene nodos consecutivos sin arco transitable")
+    return np.concatenate([[0.0], np.cumsum(tramos)])
+
+
+class Flota:
+    """
+    Posición y estado de las unidades, seguro para varios hilos. Los métodos que
+    cambian el estado incrementan la versión de la flota y marcan con ella a las
+    unidades afectadas; cambios(desde) retorna solo esas.
+
+    Con un almacen (sistema_experto.almacen.AlmacenDespacho) la flota es una vista
+    del estado persistente de la región: los despachos pasan por él (con concurrencia
+    optimista), las llegadas se registran en él y sincronizar() aplica lo que otros
+    procesos cambiaron. Sin almacen el estado vive solo en memoria.
+
+    Con una bitacora (sistema_experto.bitacora.BitacoraDespacho) se anotan los
+    despachos de esta flota con la decisión que los originó y los cambios de estado
+    que ella causa (altas, llegadas, cancelaciones); no los que llegan de otros procesos.
+    """
+
+    def __init__(self, grafo, aceleracion=1.0, reloj=time.time, almacen=None, region=None, bitacora=None):
+        self.grafo = grafo
+        self.aceleracion = aceleracion
+        self.almacen = almacen
+        self.region = region
+        self.bitacora = bitacora
+        self.version = 0
+        self._reloj = reloj
+        self._bloqueo = threading.Lock()
+        self._bloqueo_sincronizacion = threading.Lock()
+        self._secuencia = 0
+        self._ids = []
+        self._indice = {}
+        self._nodo = np.empty(0, dtype=np.int64)
+        self._lat = np.empty(0)
+        self._lon = np.empty(0)
+        self._estado = np.empty(0, dtype=np.int8)
+        # Versión de la fila de cada unidad (la que envía quien despacha) y versión de la flota en que cambió
+        self._fila = np.empty(0, dtype=np.int64)
+        self._version = np.empty(0, dtype=np.int64)
+        # índice de unidad -> {'nodos', 'tiempos', 'inicio', 'ocupada', 'asignacion'}
+        self._rutas = {}
+        self._gps = set()
+        self._paquete = None
+        self._arbol = None
+        self._detener = None
+        if almacen is not None:
+            self.sincronizar()
+
+    @property
+    def num_unidades(self):
+        return len(self._ids)
+
+    def registrar(self, patrullas):
+        """
+        Agrega las unidades [{'id', 'nodo_actual', 'status'}] que la flota aún no conoce.
+        """
+        # Sin escribir en cada recarga de la app si ya las conoce
+        nuevas = [p for p in patrullas if p['id'] not in self._indice]
+        if not nuevas:
+            return
+        if self.almacen is not None:
+            self.almacen.registrar_patrullas(self.region, nuevas)
+            self.sincronizar()
+        else:
+            with self._bloqueo:
+                self._agregar(nuevas)
+        for p in nuevas:
+            self._anotar_estado(p['id'], p.get('status', 'disponible'), p['nodo_actual'], 'alta')
+
+    def _agregar(self, patrullas):
+        nuevas = [p for p in patrullas if p['id'] not in self._indice]
+        if not nuevas:
+            return
+        self.version += 1
+        nodos = np.array([int(p['nodo_actual']) for p in nuevas], dtype=np.int64)
+        for p in nuevas:
+            self._indice[p['id']] = len(self._ids)
+            self._ids.append(p['id'])
+        self._nodo = np.concatenate([self._nodo, nodos])
+        self._lat = np.concatenate([self._lat, np.round(self.grafo.lat[nodos], DECIMALES)])
+        self._lon = np.concatenate([self._lon, np.round(self.grafo.lon[nodos], DECIMALES)])
+        estados = [ESTADOS.index(p.get('status', 'disponible')) for p in nuevas]
+        self._estado = np.concatenate([self._estado, np.array(estados, dtype=np.int8)])
+        self._fila = np.concatenate([self._fila, np.array([p.get('version', 1) for p in nuevas], dtype=np.int64)])
+        self._version = np.concatenate([self._version, np.full(len(nuevas), self.version, dtype=np.int64)])
+
+    def _unidad(self, id_patrulla):
+        if id_patrulla not in self._indice:
+            raise ValueError(f"unidad desconocida: {id_patrulla}")
+        return self._indice[id_patrulla]
+
+    def _ubicar(self, i, nodo):
+        self._nodo[i] = nodo
+        self._lat[i] = round(float(self.grafo.lat[nodo]), DECIMALES)
+        self._lon[i] = round(float(self.grafo.lon[nodo]), DECIMALES)
+
+    def despachar(self, id_patrulla, ruta, tiempos, ocupada=True, inicio=None, version=None, incidente=None,
+                  tipo_ruta=None, decision=None):
+        """
+        La unidad recorre la ruta (nodos) con los tiempos acumulados dados (segundos,
+        desde 0), a partir de inicio (por defecto, ahora). ocupada=False es un
+        traslado (p. ej. a su posición de espera): la unidad sigue disponible.
+        Reemplaza la ruta en curso. Con version (la de la fila que vio quien despacha)
+        solo despacha una unidad disponible que nadie cambió desde entonces; incidente
+        y tipo_ruta se registran en el almacén, y con ellos decision (las entradas de
+        la elección: candidatas, ranking, perfil de costos) en la bitácora. Retorna la
+        nueva versión de la fila o None ante un conflicto. Lanza ValueError si la ruta
+        no es válida.
+        """
+        nodos = np.asarray(ruta, dtype=np.int64)
+        tiempos = np.asarray(tiempos, dtype=np.float64)
+        if nodos.ndim != 1 or len(nodos) == 0 or tiempos.shape != nodos.shape:
+            raise ValueError("la ruta y sus tiempos deben ser listas no vacías del mismo largo")
+        if nodos.min() < 0 or nodos.max() >= self.grafo.num_nodos:
+            raise ValueError("la ruta tiene nodos fuera del grafo")
+        if not np.isfinite(tiempos).all() or tiempos[0] != 0 or (np.diff(tiempos) < 0).any():
+            raise ValueError("los tiempos deben empezar en 0 y no decrecer")
+        inicio = self._reloj() if inicio is None else inicio
+
+        if self.almacen is not None:
+            resultado = self.almacen.asignar(self.region, id_patrulla, nodos.tolist(), tiempos.tolist(), version,
+                                             incidente, tipo_ruta, ocupada, inicio)
+            if resultado is None:
+                return None
+            self.sincronizar()
+            nueva, asignacion = resultado['version'], resultado['asignacion']
+            if incidente is not None:
+                # Un incidente nuevo ({'nodo', 'lat', 'lon'}) o el id de uno abierto
+                incidente = dict(incidente if isinstance(incidente, dict) else {}, id=resultado['incidente'])
+        else:
+            with self._bloqueo:
+                i = self._unidad(id_patrulla)
+                if version is not None and (self._fila[i] != version or ESTADOS[self._estado[i]] != 'disponible'):
+                    return None
+                self.version += 1
+                self._rutas[i] = {'nodos': nodos, 'tiempos': tiempos, 'ocupada': bool(ocupada), 'inicio': inicio,
+                                  'asignacion': None}
+                self._gps.discard(i)
+                self._paquete = None
+                self._ubicar(i, nodos[0])
+                self._estado[i] = ESTADOS.index('en_ruta') if ocupada else ESTADOS.index('disponible')
+                self._fila[i] += 1
+                self._version[i] = self.version
+                nueva, asignacion = int(self._fila[i]), None
+
+        if self.bitacora is not None:
+            self.bitacora.escribir('despacho', {
+                'region': self.region, 'patrulla': id_patrulla, 'ocupada': bool(ocupada), 'tipo_ruta': tipo_ruta,
+                'ruta': nodos.tolist(), 'eta': round(float(tiempos[-1]), 1), 'version': nueva,
+                'asignacion': asignacion, 'incidente': incidente, 'decision': decision,
+            })
+        return nueva
+
+    def liberar(self, id_patrulla):
+        """
+        Cancela la ruta en curso: la unidad queda disponible donde está.
+        """
+        if self.almacen is not None:
+            with self._bloqueo:
+                nodo = int(self._nodo[self._unidad(id_patrulla)])
+            self.almacen.liberar(self.region, id_patrulla, nodo)
+            self.sincronizar()
+        else:
+            with self._bloqueo:
+                i = self._unidad(id_patrulla)
+                self.version += 1
+                if self._rutas.pop(i, None) is not None and i not in self._gps:
+                    self._paquete = None
+                self._gps.discard(i)
+                self._estado[i] = ESTADOS.index('disponible')
+                self._fila[i] += 1
+                self._version[i] = self.version
+                nodo = int(self._nodo[i])
+        self._anotar_estado(id_patrulla, 'disponible', nodo, 'liberada')
+
+    def sincronizar(self):
+        """
+        Aplica lo que cambió en el almacén desde la última sincronización (despachos de
+        otras consolas o procesos, llegadas, cancelaciones). Retorna cuántas unidades
+        cambiaron.
+        """
+        if self.almacen is None:
+            return 0
+        with self._bloqueo_sincronizacion:
+            cambios = self.almacen.cambios(self.region, self._secuencia)
+            with self._bloqueo:
+                self._agregar(cambios['patrullas'])
+                marcadas = set()
+                for asignacion in cambios['asignaciones']:
+                    i = self._indice.get(asignacion['patrulla'])
+                    if i is None:
+                        continue
+                    actual = self._rutas.get(i)
+                    if asignacion['estado'] == 'activa':
+                        if actual is None or actual['asignacion'] != asignacion['id']:
+                            self._rutas[i] = {'nodos': np.asarray(asignacion['ruta'], dtype=np.int64),
+                                              'tiempos': np.asarray(asignacion['tiempos'], dtype=np.float64),
+                                              'inicio': asignacion['inicio'], 'ocupada': asignacion['ocupada'],
+                                              'asignacion': asignacion['id']}
+                            self._gps.discard(i)
+                            self._paquete = None
+                            self._ubicar(i, self._rutas[i]['nodos'][0])
+                            marcadas.add(i)
+                    elif actual is not None and actual['asignacion'] == asignacion['id']:
+                        del self._rutas[i]
+                        self._paquete = None
+                        marcadas.add(i)
+                for patrulla in cambios['patrullas']:
+                    i = self._indice[patrulla['id']]
+                    estado = ESTADOS.index(patrulla['status'])
+                    if patrulla['version'] < self._fila[i]:
+                        continue
+                    if self._fila[i] != patrulla['version'] or self._estado[i] != estado:
+                        self._fila[i], self._estado[i] = patrulla['version'], estado
+                        marcadas.add(i)
+                    if i not in self._rutas and i not in self._gps and self._nodo[i] != patrulla['nodo_actual']:
+                        self._ubicar(i, patrulla['nodo_actual'])
+                        marcadas.add(i)
+                self._secuencia = max(self._secuencia, cambios['secuencia'])
+                if marcadas:
+                    self.version += 1
+                    self._version[list(marcadas)] = self.version
+                return len(marcadas)
+
+    def _empaquetar(self):
+        """
+        Rutas en curso (sin las seguidas por GPS) concatenadas, con clave
+        rango × escala + tiempo creciente en todo el arreglo.
+        """
+        moviles = np.array(sorted(i for i in self._rutas if i not in self._gps), dtype=np.int64)
+        if len(moviles) == 0:
+            return {'moviles': moviles}
+        rutas = [self._rutas[i] for i in moviles.tolist()]
+        largos = np.array([len(r['nodos']) for r in rutas])
+        fin = np.cumsum(largos) - 1
+        tiempos = np.concatenate([r['tiempos'] for r in rutas])
+        escala = float(tiempos[fin].max()) + 1.0
+        rango = np.arange(len(rutas), dtype=np.float64)
+        return {
+            'moviles': moviles,
+            'nodos': np.concatenate([r['nodos'] for r in rutas]),
+            'tiempos': tiempos,
+            'claves': np.repeat(rango, largos) * escala + tiempos,
+            'base': rango * escala,
+            'comienzo': fin - largos + 1,
+            'fin': fin,
+            'total': tiempos[fin],
+            'inicio': np.array([r['inicio'] for r in rutas], dtype=np.float64),
+        }
+
+    def avanzar(self, ahora=None):
+        """
+        Lleva cada unidad en ruta a su posición en el instante ahora, interpolando
+        entre los dos nodos del arco que recorre; las que terminan su ruta quedan
+        disponibles en el destino. Retorna cuántas unidades cambiaron.
+        """
+        with self._bloqueo:
+            ahora = self._reloj() if ahora is None else ahora
+            if self._paquete is None:
+                self._paquete = self._empaquetar()
+            p = self._paquete
+            moviles = p['moviles']
+            if len(moviles) == 0:
+                return 0
+
+            transcurrido = np.clip((ahora - p['inicio']) * self.aceleracion, 0.0, p['total'])
+            # Último nodo alcanzado y el siguiente de la ruta
+            k = np.searchsorted(p['claves'], p['base'] + transcurrido, side='right') - 1
+            k = np.clip(k, p['comienzo'], p['fin'])
+            siguiente = np.minimum(k + 1, p['fin'])
+            tramo = p['tiempos'][siguiente] - p['tiempos'][k]
+            fraccion = np.where(tramo > 0, (transcurrido - p['tiempos'][k]) / np.where(tramo > 0, tramo, 1.0), 0.0)
+            a, b = p['nodos'][k], p['nodos'][siguiente]
+            lat = np.round(self.grafo.lat[a] + fraccion * (self.grafo.lat[b] - self.grafo.lat[a]), DECIMALES)
+            lon = np.round(self.grafo.lon[a] + fraccion * (self.grafo.lon[b] - self.grafo.lon[a]), DECIMALES)
+            llegadas = transcurrido >= p['total']
+
+            cambio = (lat != self._lat[moviles]) | (lon != self._lon[moviles]) | (a != self._nodo[moviles]) | llegadas
+            if not cambio.any():
+                return 0
+            self.version += 1
+            self._lat[moviles], self._lon[moviles], self._nodo[moviles] = lat, lon, a
+            self._version[moviles[cambio]] = self.version
+            llegaron = []
+            if llegadas.any():
+                for i in moviles[llegadas].tolist():
+                    llegaron.append((self._ids[i], int(self._nodo[i]), self._rutas.pop(i)['asignacion']))
+                self._estado[moviles[llegadas]] = ESTADOS.index('disponible')
+                self._fila[moviles[llegadas]] += 1
+                self._paquete = None
+        self._registrar_llegadas(llegaron)
+        return int(cambio.sum())
+
+    def _registrar_llegadas(self, llegaron):
+        # Fuera del candado de la flota: la escritura espera a las de otros procesos
+        if llegaron and self.almacen is not None:
+            # Solo las que cerró este proceso (otro puede haber visto la misma llegada)
+            versiones = self.almacen.completar(self.region, llegaron)
+            llegaron = [llegada for llegada in llegaron if llegada[0] in versiones]
+        for id_patrulla, nodo, asignacion in llegaron:
+            self._anotar_estado(id_patrulla, 'disponible', nodo, 'llegada', asignacion)
+
+    def _anotar_estado(self, id_patrulla, estado, nodo, motivo, asignacion=None):
+        if self.bitacora is not None:
+            self.bitacora.escribir('estado', {'region': self.region, 'patrulla': id_patrulla, 'estado': estado,
+                                              'nodo': int(nodo), 'motivo': motivo, 'asignacion': asignacion})
+
+    def reportar_gps(self, fijos):
+        """
+        Posiciones [(id, lat, lon)] de un GPS. Cada unidad reportada deja de avanzar
+        con el reloj; su nodo es el más cercano a la posición y llega al quedar a menos
+        de RADIO_LLEGADA_M del destino de su ruta. Lanza ValueError ante una unidad
+        desconocida.
+        """
+        if not fijos:
+            return
+        ids, lat, lon = zip(*fijos)
+        lat = np.round(np.asarray(lat, dtype=np.float64), DECIMALES)
+        lon = np.round(np.asarray(lon, dtype=np.float64), DECIMALES)
+        if not (np.isfinite(lat).all() and np.isfinite(lon).all()):
+            raise ValueError("posición GPS no válida")
+        nodos = self._nodos_cercanos(lat, lon)
+        llegaron = []
+        with self._bloqueo:
+            unidades = np.array([self._unidad(u) for u in ids], dtype=np.int64)
+            self.version += 1
+            self._paquete = None
+            self._gps.update(unidades.tolist())
+            self._lat[unidades], self._lon[unidades], self._nodo[unidades] = lat, lon, nodos
+            self._version[unidades] = self.version
+            for j, i in enumerate(unidades.tolist()):
+                ruta = self._rutas.get(i)
+                if ruta is None:
+                    continue
+                destino = ruta['nodos'][-1]
+                dy = (lat[j] - self.grafo.lat[destino]) * METROS_POR_GRADO
+                dx = (lon[j] - self.grafo.lon[destino]) * METROS_POR_GRADO * np.cos(np.radians(lat[j]))
+                if nodos[j] == destino or dx * dx + dy * dy <= RADIO_LLEGADA_M ** 2:
+                    del self._rutas[i]
+                    self._nodo[i] = destino
+                    self._estado[i] = ESTADOS.index('disponible')
+                    self._fila[i] += 1
+                    llegaron.append((self._ids[i], int(destino), ruta['asignacion']))
+        self._registrar_llegadas(llegaron)
+
+    def _nodos_cercanos(self, lat, lon):
+        # El mismo árbol k-d de lote.nodos_mas_cercanos, construido una sola vez
+        if self._arbol is None:
+            from scipy.spatial import cKDTree
+
+            escala = np.cos(np.radians(float(np.mean(self.grafo.lat))))
+            self._arbol = (cKDTree(np.column_stack([self.grafo.lat, self.grafo.lon * escala])), escala)
+        arbol, escala = self._arbol
+        _, nodos = arbol.query(np.column_stack([lat, lon * escala]))
+        return nodos.astype(np.int64)
+
+    def cambios(self, desde=0):
+        """
+        Unidades que cambiaron después de la versión desde: {'version', 'patrullas':
+        [[id, lat, lon, nodo, estado, versión de la fila], …]}. Una versión posterior a
+        la actual (la flota se reinició) retorna todas.
+        """
+        with self._bloqueo:
+            if desde > self.version:
+                desde = 0
+            indices = np.flatnonzero(self._version > desde)
+            filas = zip([self._ids[i] for i in indices.tolist()], self._lat[indices].tolist(),
+                        self._lon[indices].tolist(), self._nodo[indices].tolist(), self._estado[indices].tolist(),
+                        self._fila[indices].tolist())
+            return {'version': self.version,
+                    'patrullas': [[u, la, lo, n, ESTADOS[e], v] for u, la, lo, n, e, v in filas]}
+
+    def patrullas(self):
+        """
+        Estado actual en el formato de st.session_state.patrullas_data.
+        """
+        with self._bloqueo:
+            return [{'id': u, 'nodo_actual': n, 'status': ESTADOS[e], 'version': v}
+                    for u, n, e, v in zip(self._ids, self._nodo.tolist(), self._estado.tolist(), self._fila.tolist())]
+
+    def iniciar(self, intervalo_s=INTERVALO_S):
+        """
+        Sincroniza y avanza la flota cada intervalo_s segundos en un hilo de fondo
+        (detener() lo para).
+        """
+        if self._detener is None:
+            self._detener = threading.Event()
+
+            def bucle():
+                while not self._detener.wait(intervalo_s):
+                    try:
+                        self.sincronizar()
+                        self.avanzar()
+                    except Exception:
+                        # Un almacén bloqueado o un error puntual no detiene el seguimiento
+                        logging.getLogger(__name__).exception("error al avanzar la flota %s", self.region)
+
+            threading.Thread(target=bucle, daemon=True, name="avance-flota").start()
+        return self
+
+    def detener(self):
+        if self._detener is not None:
+            self._detener.set()
+            self._detener = None
+
+
+_BLOQUEO_FLOTAS = threading.Lock()
+
+
+def obtener_flota(flotas, clave, grafo, aceleracion=1.0, almacen=None, bitacora=None):
+    """
+    La flota de la clave (una región) en el diccionario compartido, creada y puesta
+    en marcha la primera vez (con almacen, con el estado que este guarda).
+    """
+    with _BLOQUEO_FLOTAS:
+        if clave not in flotas:
+            flotas[clave] = Flota(grafo, aceleracion, almacen=almacen, region=clave, bitacora=bitacora).iniciar()
+        return flotas[clave]
+
+
+def aplicar_solicitud(flota, ruta, cuerpo):
+    """
+    Aplica un POST del mapa o de un GPS: /despacho {'id', 'ruta', 'tiempos', 'ocupada',
+    'version', 'incidente', 'tipo_ruta', 'decision'}, /liberar {'id'} o /gps [[id, lat, lon], …].
+    Retorna el cuerpo de la respuesta ({'version'} de un despacho, {} si no hay nada
+    que responder) o None si el despacho perdió ante otra consola. Lanza ValueError
+    si no es válido.
+    """
+    if len(cuerpo) > MAX_BYTES_SOLICITUD:
+        raise ValueError("solicitud demasiado grande")
+    datos = json.loads(cuerpo.decode('utf-8'))
+    try:
+        if ruta == '/despacho':
+            version = flota.despachar(datos['id'], datos['ruta'], datos['tiempos'], bool(datos.get('ocupada', True)),
+                                      version=datos.get('version'), incidente=datos.get('incidente'),
+                                      tipo_ruta=datos.get('tipo_ruta'), decision=datos.get('decision'))
+            return None if version is None else {'version': version}
+        if ruta == '/liberar':
+            flota.liberar(datos['id'])
+        elif ruta == '/gps':
+            flota.reportar_gps([(u, float(lat), float(lon)) for u, lat, lon in datos])
+        else:
+            raise ValueError(f"ruta desconocida: {ruta}")
+        return {}
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"solicitud mal formada: {e}") from e
+
+
+def iniciar_servidor_seguimiento(flotas, puerto, host="127.0.0.1", token=None):
+    """
+    Sirve GET /posiciones?flota=…&desde=N y los POST de aplicar_solicitud (texto JSON,
+    como los envía el mapa sin verificación previa CORS) en un hilo de fondo. flotas
+    es un diccionario {clave: Flota} que puede crecer después de iniciar el servidor.
+    Toda solicitud sin &token=… igual a token (uno al azar si no se da) recibe 403.
+    Retorna el servidor (server.token es el token; server.shutdown() lo detiene).
+    """
+    token = token or secrets.token_urlsafe(24)
+
+    class Manejador(BaseHTTPRequestHandler):
+        # Conexiones persistentes: el mapa consulta cada segundo. Sin Nagle, la
+        # cabecera y el cuerpo (escritos por separado) no esperan el ACK retrasado
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def _responder(self, codigo, datos=None):
+            cuerpo = json.dumps(datos, ensure_ascii=False, separators=(',', ':')).encode('utf-8') if datos else b''
+            self.send_response(codigo)
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+            self.send_header('Cache-Control', 'no-store')
+            if cuerpo:
+                self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def _autorizada(self, consulta):
+            if hmac.compare_digest(consulta.get('token', [''])[0].encode('utf-8'), token.encode('utf-8')):
+                return True
+            self._responder(403, {'error': 'token inválido'})
+            return False
+
+        def _flota(self, consulta):
+            clave = consulta.get('flota', [None])[0]
+            if clave not in flotas:
+                raise ValueError(f"flota desconocida: {clave}")
+            return flotas[clave]
+
+        def do_OPTIONS(self):
+            self._responder(204)
+
+        def do_GET(self):
+            partes = urllib.parse.urlsplit(self.path)
+            if partes.path != '/posiciones':
+                self._responder(404, {'error': 'no encontrado'})
+                return
+            consulta = urllib.parse.parse_qs(partes.query)
+            if not self._autorizada(consulta):
+                return
+            try:
+                flota = self._flota(consulta)
+                desde = int(consulta.get('desde', ['0'])[0])
+            except ValueError as e:
+                self._responder(400, {'error': str(e)})
+                return
+            self._responder(200, flota.cambios(desde))
+
+        def do_POST(self):
+            partes = urllib.parse.urlsplit(self.path)
+            consulta = urllib.parse.parse_qs(partes.query)
+            largo = -1
+            try:
+                valor = self.headers.get('Content-Length', '0')
+                if not valor.strip().isdigit():
+                    raise ValueError(f"Content-Length inválido: {valor!r}")
+                largo = int(valor)
+                cuerpo = self.rfile.read(min(largo, MAX_BYTES_SOLICITUD + 1))
+                if not self._autorizada(consulta):
+                    self.close_connection = largo > MAX_BYTES_SOLICITUD
+                    return
+                respuesta = aplicar_solicitud(self._flota(consulta), partes.path, cuerpo)
+            except ValueError as e:
+                # Un largo inválido o lo que quedó sin leer de un cuerpo demasiado grande
+                # invalida la conexión
+                self.close_connection = not 0 <= largo <= MAX_BYTES_SOLICITUD
+                self._responder(400, {'error': str(e)})
+                return
+            if respuesta is None:
+                self._responder(409, {'error': 'la patrulla o el incidente cambió desde otra consola'})
+            else:
+                self._responder(200 if respuesta else 204, respuesta)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, puerto), Manejador)
+    servidor.token = token
+    threading.Thread(target=servidor.serve_forever, daemon=True, name="servidor-seguimiento").start()
+    return servidor
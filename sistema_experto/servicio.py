@@ -0,0 +1,352 @@
+"""
+Servicio de ruteo JSON sobre HTTP para varios frentes (la consola de Streamlit,
+la integración con el CAD, scripts), con asyncio y solo la biblioteca estándar.
+
+Carga el grafo una vez (instantánea mapeada) y expone:
+
+    GET  /salud          nodos, arcos, lugar y contadores
+    POST /nodo_cercano   {"lat", "lon"}
+    POST /ruta           {"origen": [lat, lon] | "nodo_origen", "destino" | "nodo_destino", "nivel"?, "clima"?, "k"?,
+                          "plazo_min"?, "correlacion"?}
+    POST /ranking        {"incidente": [lat, lon] | "nodo_incidente", "patrullas": [{"id", "nodo_actual", "status"?}],
+                          "percentil"?, ...}
+    POST /isocronas      {"patrullas": [{"id", "nodo_actual"}], "nivel"?, "clima"?, "umbrales_min"?}
+
+Las conexiones se atienden de forma concurrente y persistente (keep-alive); las
+búsquedas corren en un pool de procesos que comparten la instantánea y las
+solicitudes idénticas que llegan mientras otra igual está en curso esperan ese
+mismo resultado en lugar de recalcularlo.
+
+Uso:
+    python -m sistema_experto serve --instantanea instantanea --puerto 8770 --procesos 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+
+from .costos import FACTORES_CLIMA, NIVELES_TRAFICO, calcular_costos, costo_seguro, nivel_vigente
+from .despacho import eta_percentil, matriz_eta
+from .fiabilidad import PLAZO_MIN, fiabilidad_rutas, ruta_a_tiempo
+from .grafo import GrafoEmpaquetado, leer_metadatos
+from .isocronas import UMBRALES_MIN, isocronas_patrullas
+from .ruteo import a_estrella, matriz_costos, resumen_ruta
+
+MAX_BYTES_SOLICITUD = 1024 * 1024
+SEGUNDOS_INACTIVIDAD = 30
+K_POR_DEFECTO = 1.5
+ESTADOS_HTTP = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+# --- Trabajadores del pool de procesos ---
+_GRAFO = None
+_PESOS = {}
+_MATRICES = {}
+# Costos seguros y matrices distintas que conserva cada trabajador (k es libre)
+MAX_PERFILES = 32
+
+
+def _iniciar_trabajador(carpeta):
+    global _GRAFO
+    _GRAFO = GrafoEmpaquetado.cargar(carpeta, mapear=True)
+    _GRAFO.listas_adyacencia()
+
+
+def _pesos(nivel, clima, k):
+    """
+    (μ, σ, pesos) de un perfil; los pesos como lista para A*.
+    """
+    clave = (nivel, clima, k)
+    if clave not in _PESOS:
+        if len(_PESOS) >= MAX_PERFILES:
+            _PESOS.clear()
+        mu, sigma = calcular_costos(_GRAFO, nivel, clima)
+        pesos = mu if k is None else costo_seguro(mu, sigma, k)
+        _PESOS[clave] = (mu, sigma, pesos.tolist())
+    return _PESOS[clave]
+
+
+def _ruta(nodo_origen, nodo_destino, nivel, clima, k, plazo_min, correlacion):
+    mu, sigma, rapidos = _pesos(nivel, clima, None)
+    _, _, seguros = _pesos(nivel, clima, k)
+    rutas = {
+        'rapida': a_estrella(_GRAFO, nodo_origen, nodo_destino, rapidos),
+        'segura': a_estrella(_GRAFO, nodo_origen, nodo_destino, seguros),
+    }
+    rutas['a_tiempo'] = ruta_a_tiempo(_GRAFO, nodo_origen, nodo_destino, mu, sigma, plazo_min * 60,
+                                      [ruta['arcos'] for ruta in rutas.values() if ruta is not None])
+    fiabilidad = fiabilidad_rutas(_GRAFO, list(rutas.values()), mu, sigma, plazo_min * 60, correlacion=correlacion)
+    resultado = {}
+    for (tipo, ruta), fiabilidad_ruta in zip(rutas.items(), fiabilidad):
+        resultado[tipo] = resumen_ruta(_GRAFO, ruta, mu, sigma)
+        if resultado[tipo] is not None:
+            resultado[tipo]['fiabilidad'] = fiabilidad_ruta
+    if rutas['a_tiempo'] is not None:
+        resultado['a_tiempo'].update(p_a_tiempo_gaussiana=round(rutas['a_tiempo']['p_a_tiempo'], 4),
+                                     etiquetas=rutas['a_tiempo']['etiquetas'], exacta=rutas['a_tiempo']['exacta'])
+    return resultado
+
+
+def _ranking(nodo_incidente, nodos_patrullas, nivel, clima, k, percentil):
+    """
+    (eta, media, desviación) por patrulla; sin percentil, eta es el costo de la
+    ruta y no se calculan media ni desviación.
+    """
+    clave = (nivel, clima, k)
+    mu, sigma = calcular_costos(_GRAFO, nivel, clima)
+    if clave not in _MATRICES:
+        if len(_MATRICES) >= MAX_PERFILES:
+            _MATRICES.clear()
+        _MATRICES[clave] = matriz_costos(_GRAFO, mu if k is None else costo_seguro(mu, sigma, k), con_arcos=True)
+    if percentil is None:
+        eta = matriz_eta(_GRAFO, None, nodos_patrullas, [nodo_incidente], _MATRICES[clave][0])[:, 0]
+        return [(float(t), None, None) for t in eta]
+    columnas = eta_percentil(_GRAFO, mu, sigma, nodos_patrullas, nodo_incidente, percentil,
+                             matrices=_MATRICES[clave])
+    return [tuple(float(x) for x in fila) for fila in zip(*columnas)]
+
+
+def _isocronas(patrullas, nivel, clima, umbrales_min):
+    mu, _ = calcular_costos(_GRAFO, nivel, clima)
+    return isocronas_patrullas(_GRAFO, mu, patrullas, umbrales_min)
+
+
+class ServicioRuteo:
+    """
+    Estado del servicio: grafo (para validar y ubicar nodos en el propio bucle),
+    pool de procesos y solicitudes en curso por clave.
+    """
+
+    def __init__(self, carpeta, procesos=None):
+        self.grafo = GrafoEmpaquetado.cargar(carpeta, mapear=True)
+        self.metadatos = leer_metadatos(carpeta)
+        self.procesos = procesos or os.cpu_count()
+        self.pool = ProcessPoolExecutor(max_workers=self.procesos, initializer=_iniciar_trabajador,
+                                        initargs=(carpeta,))
+        self.contadores = {'solicitudes': 0, 'calculos': 0, 'coalescidas': 0, 'errores': 0}
+        self._en_curso = {}
+        self.rutas = {
+            ('GET', '/salud'): self.salud,
+            ('POST', '/nodo_cercano'): self.nodo_cercano,
+            ('POST', '/ruta'): self.ruta,
+            ('POST', '/ranking'): self.ranking,
+            ('POST', '/isocronas'): self.isocronas,
+        }
+
+    async def calcular(self, funcion, *args):
+        """
+        Ejecuta funcion(*args) en el pool. Si ya hay un cálculo idéntico en curso
+        se espera ese mismo resultado.
+        """
+        clave = (funcion.__name__, json.dumps(args, sort_keys=True))
+        futuro = self._en_curso.get(clave)
+        if futuro is None:
+            self.contadores['calculos'] += 1
+            futuro = asyncio.get_running_loop().run_in_executor(self.pool, funcion, *args)
+            self._en_curso[clave] = futuro
+            futuro.add_done_callback(lambda _: self._en_curso.pop(clave, None))
+        else:
+            self.contadores['coalescidas'] += 1
+        # shield: si un cliente se desconecta, el cálculo sigue para los demás que lo esperan
+        return await asyncio.shield(futuro)
+
+    # --- Validación de parámetros ---
+    def _nodo(self, datos, campo):
+        if f"nodo_{campo}" in datos:
+            nodo = int(datos[f"nodo_{campo}"])
+            if not 0 <= nodo < self.grafo.num_nodos:
+                raise ValueError(f"nodo_{campo} fuera de rango")
+            return nodo
+        if campo not in datos:
+            raise ValueError(f"falta '{campo}' o 'nodo_{campo}'")
+        lat, lon = (float(valor) for valor in datos[campo])
+        return self.grafo.nodo_mas_cercano(lat, lon)
+
+    def _patrullas(self, datos):
+        patrullas = []
+        for patrulla in datos.get('patrullas') or []:
+            nodo = int(patrulla['nodo_actual'])
+            if not 0 <= nodo < self.grafo.num_nodos:
+                raise ValueError(f"nodo_actual fuera de rango en {patrulla.get('id')}")
+            patrullas.append({'id': str(patrulla['id']), 'nodo_actual': nodo,
+                              'status': patrulla.get('status', 'disponible')})
+        if not patrullas:
+            raise ValueError("faltan 'patrullas'")
+        return patrullas
+
+    @staticmethod
+    def _condiciones(datos):
+        nivel = nivel_vigente(datos.get('nivel'))
+        clima = datos.get('clima', 'despejado')
+        if nivel not in NIVELES_TRAFICO:
+            raise ValueError(f"nivel desconocido: {nivel}")
+        if clima not in FACTORES_CLIMA:
+            raise ValueError(f"clima desconocido: {clima}")
+        return nivel, clima
+
+    # --- Endpoints ---
+    async def salud(self, datos):
+        return {'nodos': self.grafo.num_nodos, 'arcos': self.grafo.num_arcos,
+                'lugar': self.metadatos.get('lugar'), **self.contadores}
+
+    async def nodo_cercano(self, datos):
+        nodo = self.grafo.nodo_mas_cercano(float(datos['lat']), float(datos['lon']))
+        return {'nodo': nodo, 'lat': float(self.grafo.lat[nodo]), 'lon': float(self.grafo.lon[nodo])}
+
+    async def ruta(self, datos):
+        nivel, clima = self._condiciones(datos)
+        k = float(datos.get('k', K_POR_DEFECTO))
+        plazo_min = float(datos.get('plazo_min') or PLAZO_MIN)
+        correlacion = float(datos.get('correlacion') or 0.0)
+        if not 0.0 <= correlacion <= 1.0:
+            raise ValueError(f"correlacion debe estar en [0, 1], no {correlacion}")
+        origen, destino = self._nodo(datos, 'origen'), self._nodo(datos, 'destino')
+        resultado = await self.calcular(_ruta, origen, destino, nivel, clima, k, plazo_min, correlacion)
+        return {'nivel_trafico': nivel, 'clima': clima, 'k': k, 'nodo_origen': origen, 'nodo_destino': destino,
+                **resultado}
+
+    async def ranking(self, datos):
+        """
+        Patrullas disponibles ordenadas por ETA al incidente (las inalcanzables al final);
+        con percentil, por la ETA en ese percentil del modelo gaussiano.
+        """
+        nivel, clima = self._condiciones(datos)
+        k = float(datos['k']) if datos.get('k') is not None else None
+        percentil = float(datos['percentil']) if datos.get('percentil') is not None else None
+        if percentil is not None and not 0 < percentil < 100:
+            raise ValueError(f"percentil debe estar entre 0 y 100, no {percentil}")
+        incidente = self._nodo(datos, 'incidente')
+        disponibles = [p for p in self._patrullas(datos) if p['status'] == 'disponible']
+        if not disponibles:
+            return {'nivel_trafico': nivel, 'clima': clima, 'nodo_incidente': incidente, 'percentil': percentil,
+                    'ranking': []}
+        filas = await self.calcular(_ranking, incidente, [p['nodo_actual'] for p in disponibles], nivel, clima, k,
+                                    percentil)
+        orden = sorted(range(len(disponibles)), key=lambda i: filas[i][0])
+        ranking = []
+        for i in orden:
+            eta, media, desviacion = filas[i]
+            fila = {'id': disponibles[i]['id'], 'nodo': disponibles[i]['nodo_actual'],
+                    'eta_s': round(eta, 1) if eta != float('inf') else None}
+            if percentil is not None and fila['eta_s'] is not None:
+                fila.update(media_s=round(media, 1), desviacion_s=round(desviacion, 1))
+            ranking.append(fila)
+        return {'nivel_trafico': nivel, 'clima': clima, 'nodo_incidente': incidente, 'percentil': percentil,
+                'ranking': ranking}
+
+    async def isocronas(self, datos):
+        nivel, clima = self._condiciones(datos)
+        umbrales = sorted(int(u) for u in datos.get('umbrales_min') or UMBRALES_MIN)
+        patrullas = [{'id': p['id'], 'nodo_actual': p['nodo_actual']} for p in self._patrullas(datos)]
+        return await self.calcular(_isocronas, patrullas, nivel, clima, umbrales)
+
+    # --- HTTP/1.1 mínimo ---
+    async def despachar(self, metodo, ruta, cuerpo):
+        """
+        (código, respuesta JSON) de una solicitud.
+        """
+        ruta = ruta.split('?')[0]
+        manejador = self.rutas.get((metodo, ruta))
+        if manejador is None:
+            if any(ruta == r for _, r in self.rutas):
+                return 405, {'error': f"método {metodo} no permitido en {ruta}"}
+            return 404, {'error': f"ruta desconocida: {ruta}"}
+        try:
+            datos = json.loads(cuerpo) if cuerpo else {}
+            if not isinstance(datos, dict):
+                raise ValueError("se esperaba un objeto JSON")
+            return 200, await manejador(datos)
+        except (ValueError, KeyError, TypeError) as e:
+            self.contadores['errores'] += 1
+            return 400, {'error': f"{type(e).__name__}: {e}"}
+        except Exception as e:
+            self.contadores['errores'] += 1
+            return 500, {'error': f"{type(e).__name__}: {e}"}
+
+    async def atender(self, lector, escritor):
+        """
+        Una conexión: solicitudes sucesivas mientras el cliente la mantenga abierta.
+        """
+        try:
+            while True:
+                linea = await asyncio.wait_for(lector.readline(), SEGUNDOS_INACTIVIDAD)
+                if not linea:
+                    break
+                metodo, ruta, version = linea.decode('latin-1').split()
+                cabeceras = {}
+                while True:
+                    linea = await lector.readline()
+                    if linea in (b'\r\n', b'\n', b''):
+                        break
+                    nombre, _, valor = linea.decode('latin-1').partition(':')
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+
+                largo = int(cabeceras.get('content-length', 0))
+                if largo > MAX_BYTES_SOLICITUD:
+                    await self._responder(escritor, 413, {'error': "solicitud demasiado grande"}, False)
+                    break
+                cuerpo = await lector.readexactly(largo) if largo else b''
+                self.contadores['solicitudes'] += 1
+                codigo, respuesta = await self.despachar(metodo, ruta, cuerpo)
+                mantener = version == 'HTTP/1.1' and cabeceras.get('connection', '').lower() != 'close'
+                await self._responder(escritor, codigo, respuesta, mantener)
+                if not mantener:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+    @staticmethod
+    async def _responder(escritor, codigo, respuesta, mantener):
+        cuerpo = json.dumps(respuesta, ensure_ascii=False).encode('utf-8')
+        escritor.write(
+            f"HTTP/1.1 {codigo} {ESTADOS_HTTP[codigo]}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(cuerpo)}\r\n"
+            f"Access-Control-Allow-Origin: *\r\n"
+            f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n".encode('latin-1') + cuerpo
+        )
+        await escritor.drain()
+
+
+async def servir(servicio, host="127.0.0.1", puerto=8770):
+    servidor = await asyncio.start_server(servicio.atender, host, puerto)
+    print(f"🛰️ Servicio de ruteo en http://{host}:{puerto} ({servicio.grafo.num_nodos} nodos, "
+          f"{servicio.procesos} procesos)", flush=True)
+    # SIGTERM (y Ctrl+C) cierran el servidor de forma ordenada para que main()
+    # apague el pool y no queden trabajadores huérfanos
+    detener = asyncio.Event()
+    bucle = asyncio.get_running_loop()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            bucle.add_signal_handler(senal, detener.set)
+        except NotImplementedError:
+            pass
+    async with servidor:
+        await detener.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sistema_experto serve", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instantanea", default=os.environ.get("INSTANTANEA_GRAFO", "instantanea"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8770)
+    parser.add_argument("--procesos", type=int, default=None, help="Por defecto, uno por núcleo")
+    args = parser.parse_args(argv)
+
+    servicio = ServicioRuteo(args.instantanea, args.procesos)
+    try:
+        asyncio.run(servir(servicio, args.host, args.puerto))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servicio.pool.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+"""
+Simulador de eventos discretos de un turno de despacho, sin interfaz.
+
+Genera incidentes con un proceso espacio-temporal reproducible, asigna patrullas
+con la misma política de procesarEmergencia (preselección opcional con la matriz
+de zonas y, entre las evaluadas, la de menor ETA en el percentil PERCENTIL_ETA
+sobre su ruta de menor costo_rapido), mueve cada unidad por su ruta en tiempo
+simulado y la devuelve a 'disponible' al terminar la atención.
+
+Uso:
+    python -m sistema_experto.simulador --instantanea instantanea --matrices matrices \
+        --horas 24 --incidentes 1500 --patrullas 60 --semilla 7
+"""
+import argparse
+import heapq
+import time
+from collections import deque
+from statistics import NormalDist
+
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from .costos import calcular_costos, nivel_trafico_en
+from .despacho import (MARGEN_PRESELECCION_S, MAX_CANDIDATOS_ASTAR, PERCENTIL_ETA, preseleccion_zonas,
+                       sumar_hacia_raiz)
+from .ruteo import matriz_costos
+
+METROS_POR_GRADO = 111320.0
+
+# Intensidad relativa de incidentes por hora del día (0 h … 23 h)
+INTENSIDAD_HORARIA = np.array([
+    0.6, 0.5, 0.4, 0.3, 0.3, 0.4, 0.6, 0.9, 1.0, 1.0, 1.0, 1.1,
+    1.2, 1.1, 1.0, 1.0, 1.1, 1.3, 1.5, 1.6, 1.5, 1.3, 1.0, 0.8,
+])
+
+# Tiempo objetivo de llegada para el indicador de cumplimiento
+OBJETIVO_RESPUESTA_S = 600
+
+# Radio (s) de la primera búsqueda desde cada incidente
+LIMITE_BUSQUEDA_S = 900
+
+# Los tiempos reales de un arco no bajan de esta fracción de μ
+FRACCION_MINIMA_VIAJE = 0.3
+
+
+def pesos_espaciales(grafo, num_focos=8, radio_m=400, peso_focos=0.6, semilla=0):
+    """
+    Probabilidad de que un incidente ocurra en cada nodo: una base uniforme más
+    focos gaussianos (mercados, zonas de ocio) centrados en nodos al azar.
+    """
+    rng = np.random.default_rng(semilla)
+    x = grafo.lon * METROS_POR_GRADO * np.cos(np.radians(grafo.lat.mean()))
+    y = grafo.lat * METROS_POR_GRADO
+    densidad = np.zeros(grafo.num_nodos)
+    for centro in rng.choice(grafo.num_nodos, size=num_focos, replace=False):
+        d2 = (x - x[centro]) ** 2 + (y - y[centro]) ** 2
+        densidad += np.exp(-d2 / (2 * radio_m ** 2))
+    densidad /= densidad.sum()
+    return (1 - peso_focos) / grafo.num_nodos + peso_focos * densidad
+
+
+def generar_incidentes(grafo, incidentes, horas=24, hora_inicio=0.0, pesos=None, semilla=0):
+    """
+    Proceso de Poisson no homogéneo: 'incidentes' es el número esperado en el
+    turno, repartido según INTENSIDAD_HORARIA; cada incidente cae en un nodo
+    según 'pesos'. Retorna (tiempos en s desde el inicio del turno, nodos), ordenados.
+    """
+    rng = np.random.default_rng(semilla)
+    pesos = pesos_espaciales(grafo, semilla=semilla) if pesos is None else pesos
+
+    inicios = np.arange(0, horas * 3600, 3600.0)
+    duracion = np.minimum(3600.0, horas * 3600 - inicios)
+    intensidad = INTENSIDAD_HORARIA[((hora_inicio + inicios / 3600) % 24).astype(int)] * duracion
+    conteos = rng.poisson(incidentes * intensidad / intensidad.sum())
+
+    tiempos = np.sort(np.concatenate([
+        inicio + rng.uniform(0, largo, n) for inicio, largo, n in zip(inicios, duracion, conteos)
+    ]))
+    nodos = rng.choice(grafo.num_nodos, size=len(tiempos), p=pesos)
+    return tiempos, nodos
+
+
+def mas_cercana(eta, disponibles):
+    """
+    Política de procesarEmergencia: entre las patrullas evaluadas, la de menor ETA
+    (en el percentil de simular_turno). Retorna su índice o -1.
+    """
+    tiempos = np.where(disponibles, eta, np.inf)
+    mejor = int(np.argmin(tiempos))
+    return mejor if np.isfinite(tiempos[mejor]) else -1
+
+
+class _RedPorNivel:
+    """
+    Costos, matrices directa e inversa (todos → destino) y arco de menor μ entre
+    cada par de nodos para cada nivel de tráfico, creados al primer uso.
+    """
+
+    def __init__(self, grafo, condicion_clima, semilla, costos):
+        self.grafo = grafo
+        self.condicion_clima = condicion_clima
+        self.semilla = semilla
+        self.costos = dict(costos or {})
+        self._directas = {}
+        self._inversas = {}
+        self._pares = {}
+
+    def _preparar(self, nivel):
+        if nivel not in self.costos:
+            self.costos[nivel] = calcular_costos(self.grafo, nivel, self.condicion_clima, self.semilla)
+        mu = self.costos[nivel][0]
+        self._directas[nivel] = matriz_costos(self.grafo, mu)
+        self._inversas[nivel] = self._directas[nivel].T.tocsr()
+
+        # Clave u·n + v ordenada → arco u→v de menor μ (los arcos ya vienen ordenados por origen)
+        orden = np.lexsort((mu, self.grafo.destino, self.grafo.origen))
+        claves = self.grafo.origen[orden].astype(np.int64) * self.grafo.num_nodos + self.grafo.destino[orden]
+        primero = np.ones(len(claves), dtype=bool)
+        primero[1:] = claves[1:] != claves[:-1]
+        self._pares[nivel] = (claves[primero], orden[primero])
+
+    def hacia(self, destino, nivel, limite=np.inf):
+        """
+        Tiempos de todos los nodos hacia 'destino' (∞ más allá de 'limite') y el
+        siguiente nodo de cada uno en su ruta.
+        """
+        if nivel not in self._inversas:
+            self._preparar(nivel)
+        return dijkstra(self._inversas[nivel], directed=True, indices=destino,
+                        limit=limite, return_predecessors=True)
+
+    def alcanzables(self, origenes, nivel):
+        """
+        Máscara de los nodos a los que se llega desde alguno de 'origenes'.
+        """
+        if nivel not in self._directas:
+            self._preparar(nivel)
+        return np.isfinite(dijkstra(self._directas[nivel], directed=True, indices=origenes, min_only=True))
+
+    def ruta(self, origen, siguiente, nivel):
+        """
+        Arcos de la ruta desde 'origen' siguiendo el árbol de la búsqueda inversa.
+        """
+        nodos = [origen]
+        while siguiente[nodos[-1]] >= 0:
+            nodos.append(int(siguiente[nodos[-1]]))
+        nodos = np.asarray(nodos, dtype=np.int64)
+        claves, arcos = self._pares[nivel]
+        return arcos[np.searchsorted(claves, nodos[:-1] * self.grafo.num_nodos + nodos[1:])]
+
+    def desviacion(self, siguiente, nivel):
+        """
+        √Σσ² de la ruta de cada nodo siguiendo el árbol de la búsqueda inversa
+        (0 en el destino y fuera del árbol).
+        """
+        nodos = np.flatnonzero(siguiente >= 0)
+        claves, arcos = self._pares[nivel]
+        varianza = np.zeros(self.grafo.num_nodos)
+        arco = arcos[np.searchsorted(claves, nodos * self.grafo.num_nodos + siguiente[nodos])]
+        varianza[nodos] = self.costos[nivel][1][arco] ** 2
+        return np.sqrt(sumar_hacia_raiz(siguiente, varianza))
+
+
+def simular_turno(grafo, nodos_patrullas, tiempos, nodos_incidentes, hora_inicio=0.0,
+                  condicion_clima="despejado", servicio_medio_s=1200, politica=mas_cercana,
+                  costos=None, variabilidad=True, registrar_rutas=False, semilla=0,
+                  percentil=PERCENTIL_ETA, matriz_zonas=None, max_candidatos=MAX_CANDIDATOS_ASTAR,
+                  margen_s=MARGEN_PRESELECCION_S):
+    """
+    Simula un turno completo con una cola de eventos (incidente, llegada, fin de servicio).
+
+    - Al ocurrir un incidente se evalúan las patrullas disponibles con el nivel de
+      tráfico de esa hora (una búsqueda inversa desde el incidente) y 'politica'
+      elige una según su ETA en 'percentil' (Σμ + z·√Σσ² sobre la ruta de menor
+      μ, como eta_percentil); si no hay ninguna, el incidente espera en cola FIFO.
+      Si no se llega a él desde la posición inicial de ninguna patrulla queda
+      inalcanzable: toda posición futura de una unidad es alcanzable desde la inicial.
+    - Con 'matriz_zonas' (MatrizTiempos del mismo grafo) solo se evalúan las
+      patrullas de preseleccion_zonas(max_candidatos, margen_s), como en el mapa;
+      si ninguna de ellas llega al incidente, todas las disponibles.
+    - El viaje real suma, arco por arco, μ + σ·z (z normal estándar) cuando
+      'variabilidad' es verdadero; la ETA del despacho sigue siendo Σμ y
+      'eta_percentil' guarda la que ordenó a las patrullas.
+    - Tras la atención (gamma de media servicio_medio_s) la patrulla queda
+      disponible en el nodo del incidente y toma el incidente más antiguo en cola
+      al que pueda llegar (los de otra componente de la red no bloquean la cola).
+
+    'costos' permite fijar {nivel: (mu, sigma)} (p. ej. con calles cerradas) para
+    comparar cambios del grafo. Retorna un dict con los despachos, los tiempos
+    de respuesta y la utilización de cada patrulla.
+    """
+    if not 0 < percentil < 100:
+        raise ValueError(f"percentil debe estar entre 0 y 100, no {percentil}")
+    z_percentil = NormalDist().inv_cdf(percentil / 100)
+    rng = np.random.default_rng(semilla)
+    red = _RedPorNivel(grafo, condicion_clima, semilla, costos)
+    num_patrullas = len(nodos_patrullas)
+    nodo_actual = np.asarray(nodos_patrullas, dtype=np.int64).copy()
+    estado = ['disponible'] * num_patrullas
+    disponibles = np.ones(num_patrullas, dtype=bool)
+    ocupado_s = np.zeros(num_patrullas)
+
+    eventos = [(float(t), 0, i, 'incidente') for i, t in enumerate(tiempos)]
+    heapq.heapify(eventos)
+    en_espera = deque()
+    despachos = [None] * len(tiempos)
+    inalcanzables = []
+
+    def despachar(i, p, ahora, nivel, eta, eta_orden, siguiente):
+        arcos = red.ruta(int(nodo_actual[p]), siguiente, nivel)
+        mu, sigma = red.costos[nivel]
+        tramos = mu[arcos]
+        if variabilidad:
+            tramos = np.maximum(tramos + sigma[arcos] * rng.standard_normal(len(arcos)),
+                                FRACCION_MINIMA_VIAJE * tramos)
+        viaje = float(tramos.sum())
+        servicio = float(rng.gamma(2.0, servicio_medio_s / 2.0))
+
+        estado[p] = 'en_ruta'
+        disponibles[p] = False
+        ocupado_s[p] += viaje + servicio
+        despachos[i] = {
+            'incidente': i,
+            'nodo': int(nodos_incidentes[i]),
+            'patrulla': p,
+            'nivel_trafico': nivel,
+            'ocurrido': float(tiempos[i]),
+            'salida': ahora,
+            'eta': float(eta),
+            'eta_percentil': float(eta_orden),
+            'llegada': ahora + viaje,
+            'fin': ahora + viaje + servicio,
+        }
+        if registrar_rutas:
+            despachos[i]['ruta'] = [int(nodo_actual[p])] + grafo.destino[arcos].tolist()
+            despachos[i]['tiempos_ruta'] = (ahora + np.concatenate([[0.0], np.cumsum(tramos)])).tolist()
+        heapq.heappush(eventos, (ahora + viaje, 1, p, 'llegada'))
+        heapq.heappush(eventos, (ahora + viaje + servicio, 2, p, 'fin_servicio'))
+        nodo_actual[p] = nodos_incidentes[i]
+
+    # Por nivel, nodos alcanzables desde las posiciones iniciales de las patrullas
+    alcanzables_flota = {}
+
+    def alcanzable(i, nivel):
+        if nivel not in alcanzables_flota:
+            alcanzables_flota[nivel] = red.alcanzables(np.asarray(nodos_patrullas, dtype=np.int64), nivel)
+        return alcanzables_flota[nivel][nodos_incidentes[i]]
+
+    def evaluar(i, nivel, limite=np.inf):
+        hacia, siguiente = red.hacia(int(nodos_incidentes[i]), nivel, limite)
+        eta = hacia[nodo_actual]
+        if z_percentil == 0:
+            return eta, eta, siguiente
+        return eta, eta + z_percentil * red.desviacion(siguiente, nivel)[nodo_actual], siguiente
+
+    def atender(i, ahora, libres):
+        nivel = nivel_trafico_en((hora_inicio + ahora / 3600) % 24)
+        evaluadas = libres
+        if matriz_zonas is not None and nivel in matriz_zonas.niveles:
+            zonas = matriz_zonas.zona_de_nodo
+            eta_zona = matriz_zonas.matriz(nivel)[zonas[nodo_actual], zonas[nodos_incidentes[i]]]
+            evaluadas = preseleccion_zonas(eta_zona, libres, max_candidatos, margen_s)
+
+        # Búsqueda acotada primero; búsqueda completa si ninguna evaluada queda en el radio
+        # o si la mejor supera el radio en el percentil (una de fuera podría ganarle)
+        eta, orden, siguiente = evaluar(i, nivel, LIMITE_BUSQUEDA_S)
+        if z_percentil < 0 or not np.where(evaluadas, orden, np.inf).min() <= LIMITE_BUSQUEDA_S:
+            eta, orden, siguiente = evaluar(i, nivel)
+            if not np.isfinite(eta[evaluadas]).any():
+                evaluadas = libres
+        p = politica(orden, evaluadas)
+        if p < 0:
+            return False
+        despachar(i, p, ahora, nivel, eta[p], orden[p], siguiente)
+        return True
+
+    while eventos:
+        ahora, _, indice, tipo = heapq.heappop(eventos)
+        if tipo == 'incidente':
+            if not alcanzable(indice, nivel_trafico_en((hora_inicio + ahora / 3600) % 24)):
+                inalcanzables.append(indice)
+            elif not disponibles.any() or not atender(indice, ahora, disponibles):
+                en_espera.append(indice)
+        elif tipo == 'llegada':
+            estado[indice] = 'en_escena'
+        else:
+            estado[indice] = 'disponible'
+            disponibles[indice] = True
+            # El incidente más antiguo en cola toma la patrulla recién liberada; si ella no
+            # llega (sentido único, otra componente), el siguiente de la cola al que sí
+            if not en_espera:
+                continue
+            if atender(en_espera[0], ahora, disponibles):
+                en_espera.popleft()
+                continue
+            alcanza = red.alcanzables(int(nodo_actual[indice]), nivel_trafico_en((hora_inicio + ahora / 3600) % 24))
+            for posicion, i in enumerate(en_espera):
+                if posicion > 0 and alcanza[nodos_incidentes[i]]:
+                    if atender(i, ahora, disponibles):
+                        del en_espera[posicion]
+                    break
+
+    atendidos = [d for d in despachos if d is not None]
+    duracion = max([float(tiempos[-1]) if len(tiempos) else 0.0] + [d['fin'] for d in atendidos])
+    return {
+        'despachos': atendidos,
+        'respuesta_s': np.array([d['llegada'] - d['ocurrido'] for d in atendidos]),
+        'espera_s': np.array([d['salida'] - d['ocurrido'] for d in atendidos]),
+        'viaje_s': np.array([d['llegada'] - d['salida'] for d in atendidos]),
+        'error_eta_s': np.array([d['llegada'] - d['salida'] - d['eta'] for d in atendidos]),
+        'sin_atender': list(en_espera) + inalcanzables,
+        'inalcanzables': inalcanzables,
+        'utilizacion': ocupado_s / duracion if duracion > 0 else ocupado_s,
+        'estado_final': list(zip(nodo_actual.tolist(), estado)),
+    }
+
+
+def posicion_en(despacho, t):
+    """
+    Nodo en el que está (o que acaba de dejar) la patrulla de un despacho a la
+    hora simulada t. Requiere simular con registrar_rutas=True.
+    """
+    if t >= despacho['llegada']:
+        return despacho['nodo']
+    paso = int(np.searchsorted(despacho['tiempos_ruta'], t, side='right')) - 1
+    return despacho['ruta'][max(paso, 0)]
+
+
+def resumen(resultado, objetivo_s=OBJETIVO_RESPUESTA_S):
+    """
+    Distribución de tiempos de respuesta (incidente → llegada) de una simulación.
+    """
+    respuesta = resultado['respuesta_s']
+    if len(respuesta) == 0:
+        return {'atendidos': 0, 'sin_atender': len(resultado['sin_atender']),
+                'inalcanzables': len(resultado['inalcanzables'])}
+    return {
+        'atendidos': len(respuesta),
+        'sin_atender': len(resultado['sin_atender']),
+        'inalcanzables': len(resultado['inalcanzables']),
+        'media_s': float(respuesta.mean()),
+        'p50_s': float(np.percentile(respuesta, 50)),
+        'p90_s': float(np.percentile(respuesta, 90)),
+        'p95_s': float(np.percentile(respuesta, 95)),
+        'max_s': float(respuesta.max()),
+        'en_objetivo': float(np.mean(respuesta <= objetivo_s)),
+        'con_espera': float(np.mean(resultado['espera_s'] > 0)),
+        'error_eta_medio_s': float(resultado['error_eta_s'].mean()),
+        'utilizacion_media': float(np.mean(resultado['utilizacion'])),
+    }
+
+
+def main():
+    from .cli import cargar_grafo
+    from .matriz_zonas import MatrizTiempos
+
+    parser = argparse.ArgumentParser(description="Simula un turno de despacho sin interfaz")
+    parser.add_argument("--lugar", default="Tacna, Peru")
+    parser.add_argument("--cache", help="Carpeta con respuestas de Overpass (sin conexión)")
+    parser.add_argument("--instantanea", help="Instantánea del grafo (python -m sistema_experto snapshot); "
+                                              "sin ella ni --cache se descarga de OpenStreetMap")
+    parser.add_argument("--matrices", help="Matriz de zonas del mismo grafo para la preselección del mapa")
+    parser.add_argument("--max-candidatos", type=int, default=MAX_CANDIDATOS_ASTAR,
+                        help="Patrullas que evalúa la preselección (0 = todas)")
+    parser.add_argument("--margen-s", type=float, default=MARGEN_PRESELECCION_S, help="Margen de la preselección")
+    parser.add_argument("--percentil", type=float, default=PERCENTIL_ETA, help="Percentil de la ETA del despacho")
+    parser.add_argument("--horas", type=float, default=24)
+    parser.add_argument("--hora-inicio", type=float, default=0.0)
+    parser.add_argument("--incidentes", type=float, default=1500, help="Número esperado de incidentes en el turno")
+    parser.add_argument("--patrullas", type=int, default=60)
+    parser.add_argument("--servicio-min", type=float, default=20, help="Tiempo medio de atención en escena")
+    parser.add_argument("--clima", default="despejado", choices=['despejado', 'lluvia', 'neblina'])
+    parser.add_argument("--sin-variabilidad", action="store_true", help="Viajes iguales a la ETA (Σμ)")
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    grafo = cargar_grafo(args.lugar, args.cache, args.instantanea)
+    matriz_zonas = None
+    if args.matrices:
+        matriz_zonas = MatrizTiempos(args.matrices)
+        if not matriz_zonas.corresponde(grafo):
+            raise SystemExit("❌ La matriz de zonas se calculó sobre otro grafo")
+    rng = np.random.default_rng(args.semilla)
+    nodos_patrullas = rng.choice(grafo.num_nodos, size=args.patrullas, replace=False)
+    tiempos, nodos = generar_incidentes(grafo, args.incidentes, args.horas, args.hora_inicio, semilla=args.semilla)
+
+    inicio = time.perf_counter()
+    resultado = simular_turno(grafo, nodos_patrullas, tiempos, nodos, args.hora_inicio, args.clima,
+                              args.servicio_min * 60, variabilidad=not args.sin_variabilidad,
+                              semilla=args.semilla, percentil=args.percentil, matriz_zonas=matriz_zonas,
+                              max_candidatos=args.max_candidatos, margen_s=args.margen_s)
+    segundos = time.perf_counter() - inicio
+
+    r = resumen(resultado)
+    print(f"Grafo: {grafo.num_nodos} nodos — {len(tiempos)} incidentes, {args.patrullas} patrullas, "
+          f"{args.horas:g} h simuladas en {segundos:.2f} s")
+    if r['atendidos'] == 0:
+        print("Ningún incidente atendido")
+        return
+    print(f"Atendidos: {r['atendidos']} · sin atender: {r['sin_atender']} "
+          f"({r['inalcanzables']} inalcanzables) · "
+          f"con espera: {r['con_espera'] * 100:.1f}% · utilización media: {r['utilizacion_media'] * 100:.1f}%")
+    print(f"Respuesta (min): media {r['media_s'] / 60:.1f} · p50 {r['p50_s'] / 60:.1f} · "
+          f"p90 {r['p90_s'] / 60:.1f} · p95 {r['p95_s'] / 60:.1f} · máx {r['max_s'] / 60:.1f}")
+    print(f"Dentro de {OBJETIVO_RESPUESTA_S // 60} min: {r['en_objetivo'] * 100:.1f}% · "
+          f"error medio de la ETA: {r['error_eta_medio_s']:+.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Redes viales sintéticas para pruebas de escala más allá de Tacna.
+
+Rejilla perturbada con jerarquía de vías (troncales, avenidas, colectoras y
+calles locales), calles de sentido único alternado, cuadras eliminadas al azar
+y una mezcla de etiquetas 'highway' parecida a la de una ciudad real. El grafo
+tiene el mismo esquema de atributos que el de construir_grafo().
+"""
+import networkx as nx
+import numpy as np
+
+from .grafo import preparar_grafo
+
+CENTRO_TACNA = (-18.0138, -70.2511)
+METROS_POR_GRADO = 111320.0
+
+# Cada cuántas filas/columnas aparece cada nivel de la jerarquía arterial
+PERIODO_TRONCAL = 64
+PERIODO_AVENIDA = 24
+PERIODO_COLECTORA = 12
+PERIODO_TERCIARIA = 6
+
+# Mezcla de etiquetas de las calles locales
+MEZCLA_LOCAL = {'residential': 0.74, 'unclassified': 0.12, 'service': 0.08, 'living_street': 0.06}
+
+ATRIBUTOS_ARTERIA = {
+    'trunk': {'lanes': '3', 'maxspeed': '60'},
+    'primary': {'lanes': '2', 'maxspeed': '50'},
+    'secondary': {'lanes': '2', 'maxspeed': '40'},
+    'tertiary': {'maxspeed': '40'},
+}
+NOMBRES = {'trunk': 'Vía Expresa', 'primary': 'Avenida', 'secondary': 'Avenida', 'tertiary': 'Calle'}
+
+
+def _clase_linea(indice, rng):
+    """
+    Etiqueta 'highway' de una fila o columna completa según su posición en la jerarquía.
+    """
+    if indice % PERIODO_TRONCAL == 0:
+        return 'trunk'
+    if indice % PERIODO_AVENIDA == 0:
+        return 'primary'
+    if indice % PERIODO_COLECTORA == 0:
+        return 'secondary'
+    if indice % PERIODO_TERCIARIA == 0:
+        return 'tertiary'
+    return str(rng.choice(list(MEZCLA_LOCAL), p=list(MEZCLA_LOCAL.values())))
+
+
+def red_sintetica(num_nodos, semilla=0, espaciado_m=110.0, perturbacion=0.15, cuadras_eliminadas=0.06,
+                  fraccion_sentido_unico=0.2, centro=CENTRO_TACNA):
+    """
+    Red vial sintética de aproximadamente 'num_nodos' intersecciones, con ids
+    tipo OSM, tal como la entregaría ox.graph_from_place (antes de preparar_grafo).
+    """
+    rng = np.random.default_rng(semilla)
+    lado = int(np.ceil(np.sqrt(num_nodos)))
+    filas, columnas = np.divmod(np.arange(lado * lado), lado)
+
+    # Coordenadas de la rejilla con desplazamiento aleatorio de cada intersección
+    metros_lon = METROS_POR_GRADO * np.cos(np.radians(centro[0]))
+    este = (columnas - lado / 2 + rng.normal(0, perturbacion, lado * lado)) * espaciado_m
+    norte = (filas - lado / 2 + rng.normal(0, perturbacion, lado * lado)) * espaciado_m
+    lat = centro[0] + norte / METROS_POR_GRADO
+    lon = centro[1] + este / metros_lon
+
+    # Una "vía" OSM por fila (horizontal) y por columna (vertical)
+    clases = [_clase_linea(i, rng) for i in range(lado)] + [_clase_linea(j, rng) for j in range(lado)]
+    locales = np.array([c in MEZCLA_LOCAL for c in clases])
+    sentido_unico = locales & (rng.random(2 * lado) < fraccion_sentido_unico)
+
+    # Cuadras: (u, v, vía) con u → v en sentido creciente de la fila o columna
+    base = np.arange(lado * lado).reshape(lado, lado)
+    u = np.concatenate([base[:, :-1].ravel(), base[:-1, :].ravel()])
+    v = np.concatenate([base[:, 1:].ravel(), base[1:, :].ravel()])
+    via = np.concatenate([np.repeat(np.arange(lado), lado - 1), lado + np.tile(np.arange(lado), lado - 1)])
+
+    # Se eliminan cuadras locales al azar para romper la regularidad
+    conservar = ~(locales[via] & (rng.random(len(u)) < cuadras_eliminadas))
+    u, v, via = u[conservar], v[conservar], via[conservar]
+
+    # Sentido único alternado: las vías pares van en sentido creciente, las impares al revés
+    invertir = sentido_unico[via] & (via % 2 == 1)
+    u, v = np.where(invertir, v, u), np.where(invertir, u, v)
+
+    longitud = np.hypot((lat[v] - lat[u]) * METROS_POR_GRADO, (lon[v] - lon[u]) * metros_lon)
+    osmid_nodo = 1_000_000_000 + np.arange(lado * lado)
+    grado = np.bincount(np.concatenate([u, v]), minlength=lado * lado)
+
+    G = nx.MultiDiGraph(crs='epsg:4326', created_with='sistema_experto.sintetico')
+    G.add_nodes_from(
+        (int(osmid_nodo[i]), {'y': float(lat[i]), 'x': float(lon[i]), 'street_count': int(grado[i])})
+        for i in np.flatnonzero(grado)
+    )
+
+    atributos_via = []
+    for indice, clase in enumerate(clases):
+        nombre = f"{NOMBRES.get(clase, 'Jirón')} {indice + 1}"
+        atributos_via.append({'osmid': 500_000_000 + indice, 'highway': clase, 'name': nombre,
+                              'oneway': bool(sentido_unico[indice]), **ATRIBUTOS_ARTERIA.get(clase, {})})
+
+    def arcos():
+        for a, b, w, largo in zip(osmid_nodo[u].tolist(), osmid_nodo[v].tolist(), via.tolist(), longitud.tolist()):
+            yield a, b, {**atributos_via[w], 'reversed': False, 'length': largo}
+            if not sentido_unico[w]:
+                yield b, a, {**atributos_via[w], 'reversed': True, 'length': largo}
+
+    G.add_edges_from(arcos())
+    return G
+
+
+def grafo_sintetico(num_nodos, semilla=0, **opciones):
+    """
+    Red sintética lista para el sistema: componente fuertemente conexa, nodos
+    enteros y arcos enriquecidos (mismo esquema que construir_grafo()).
+    """
+    return preparar_grafo(red_sintetica(num_nodos, semilla, **opciones))
@@ -0,0 +1,171 @@
+"""
+Telemetría del mapa (iframe) hacia Python: un colector HTTP mínimo recibe los
+eventos que envía el navegador en cada despacho y los agrega a un registro
+JSONL de solo anexado con rotación por tamaño.
+
+Análisis de latencias por turno:
+    python -m sistema_experto.telemetria --carpeta telemetria
+"""
+import argparse
+import datetime
+import glob
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+ARCHIVO = "eventos.jsonl"
+TIPOS_EVENTO = {'carga', 'despacho', 'despacho_lote'}
+MAX_BYTES_EVENTO = 64 * 1024
+ZONA_HORARIA = ZoneInfo("America/Lima")
+
+# Turnos de despacho por hora local de inicio
+TURNOS = [(0, 'madrugada'), (6, 'mañana'), (12, 'tarde'), (18, 'noche')]
+
+
+class RegistroTelemetria:
+    """
+    Registro JSONL de solo anexado; al superar max_bytes rota a eventos.jsonl.1, .2, …
+    conservando 'respaldos' archivos.
+    """
+
+    def __init__(self, carpeta="telemetria", max_bytes=10 * 2 ** 20, respaldos=20):
+        os.makedirs(carpeta, exist_ok=True)
+        self.carpeta = carpeta
+        self._logger = logging.getLogger(f"{__name__}.{os.path.abspath(carpeta)}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        if not self._logger.handlers:
+            manejador = RotatingFileHandler(os.path.join(carpeta, ARCHIVO), maxBytes=max_bytes,
+                                            backupCount=respaldos, encoding='utf-8')
+            manejador.setFormatter(logging.Formatter('%(message)s'))
+            self._logger.addHandler(manejador)
+
+    def escribir(self, evento):
+        evento = dict(evento, recibido=datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds'))
+        self._logger.info(json.dumps(evento, ensure_ascii=False, separators=(',', ':')))
+
+
+def validar_evento(cuerpo):
+    """
+    Decodifica un evento enviado por el navegador. Lanza ValueError si no es válido.
+    """
+    if len(cuerpo) > MAX_BYTES_EVENTO:
+        raise ValueError("evento demasiado grande")
+    evento = json.loads(cuerpo.decode('utf-8'))
+    if not isinstance(evento, dict) or evento.get('tipo') not in TIPOS_EVENTO:
+        raise ValueError("tipo de evento desconocido")
+    return evento
+
+
+def iniciar_colector(registro, puerto, host="127.0.0.1"):
+    """
+    Acepta POST /telemetria (texto JSON, como lo envía navigator.sendBeacon) en un hilo de fondo.
+    Retorna el servidor (server.shutdown() lo detiene).
+    """
+    class Manejador(BaseHTTPRequestHandler):
+        def _responder(self, codigo):
+            self.send_response(codigo)
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def do_OPTIONS(self):
+            self._responder(204)
+
+        def do_POST(self):
+            if self.path.split('?')[0] != '/telemetria':
+                self._responder(404)
+                return
+            try:
+                largo = int(self.headers.get('Content-Length', 0))
+                registro.escribir(validar_evento(self.rfile.read(min(largo, MAX_BYTES_EVENTO + 1))))
+            except ValueError:
+                self._responder(400)
+                return
+            self._responder(204)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, puerto), Manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True, name="colector-telemetria").start()
+    return servidor
+
+
+def leer_eventos(carpeta="telemetria"):
+    """
+    Eventos del registro en orden cronológico (de los respaldos más antiguos al archivo actual).
+    """
+    base = os.path.join(carpeta, ARCHIVO)
+    respaldos = sorted(glob.glob(base + '.*'), key=lambda ruta: int(ruta.rsplit('.', 1)[1]), reverse=True)
+    for ruta in respaldos + [base]:
+        if not os.path.exists(ruta):
+            continue
+        with open(ruta, encoding='utf-8') as f:
+            for linea in f:
+                if linea.strip():
+                    yield json.loads(linea)
+
+
+def turno_de(evento):
+    instante = datetime.datetime.fromisoformat(evento['recibido']).astimezone(ZONA_HORARIA)
+    return [nombre for inicio, nombre in TURNOS if instante.hour >= inicio][-1]
+
+
+def latencias_por_turno(eventos):
+    """
+    Agrupa las latencias de interés por turno: {turno: {métrica: [valores en ms]}}.
+    """
+    grupos = {}
+    for evento in eventos:
+        metricas = grupos.setdefault(turno_de(evento), {})
+        carga = evento.get('carga', {})
+        if evento['tipo'] == 'carga':
+            for clave in ('parseo_payload_ms', 'adyacencia_ms', 'inicio_script_ms'):
+                if carga.get(clave) is not None:
+                    metricas.setdefault(clave, []).append(carga[clave])
+            continue
+        # Una búsqueda sin ruta llega sin 'ms' ni 'nodos' ({patrulla} solo); la ruta
+        # a tiempo informa etiquetas en lugar de nodos
+        busquedas = evento.get('busquedas', []) + list((evento.get('rutas') or {}).values())
+        for busqueda in busquedas:
+            if not busqueda or busqueda.get('ms') is None:
+                continue
+            metricas.setdefault('busqueda_ms', []).append(busqueda['ms'])
+            if busqueda.get('nodos') is not None:
+                metricas.setdefault('nodos_asentados', []).append(busqueda['nodos'])
+        for clave in ('seleccion_ms', 'calculo_ms', 'decision_ms'):
+            if evento.get(clave) is not None:
+                metricas.setdefault(clave, []).append(evento[clave])
+    return grupos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distribución de latencias del navegador por turno")
+    parser.add_argument("--carpeta", default="telemetria")
+    args = parser.parse_args()
+
+    eventos = list(leer_eventos(args.carpeta))
+    print(f"{len(eventos)} eventos ({sum(e['tipo'] != 'carga' for e in eventos)} despachos) en {args.carpeta}")
+    grupos = latencias_por_turno(eventos)
+    for _, turno in TURNOS:
+        if turno not in grupos:
+            continue
+        print(f"\n== Turno {turno} ==")
+        print(f"{'métrica':<20}{'n':>7}{'p50':>10}{'p90':>10}{'p99':>10}{'máx':>10}")
+        for metrica, valores in sorted(grupos[turno].items()):
+            v = np.asarray(valores, dtype=float)
+            print(f"{metrica:<20}{len(v):>7}{np.percentile(v, 50):>10.1f}{np.percentile(v, 90):>10.1f}"
+                  f"{np.percentile(v, 99):>10.1f}{v.max():>10.1f}")
+
+
+if __name__ == "__main__":
+    main()